@@ -5,11 +5,15 @@ Centraliza todas las configuraciones del proyecto
 """
 
 import os
+from pathlib import Path
 from dotenv import load_dotenv
 
 # Cargar variables de entorno
 load_dotenv()
 
+# Raíz del proyecto: las rutas de datos no dependen del directorio desde el que se lanza
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+
 class Settings:
     """Configuraciones centralizadas del sistema"""
     
@@ -27,20 +31,107 @@ class Settings:
     NOTION_DATABASE_ID = "28815eefe92680389583cff88068af9e"
     NOTION_PAGE_ID = "28815eefe92680389583cff88068af9e"
     
+    # Notion Resilience Config
+    NOTION_RATE_LIMIT = 3.0  # requests por segundo en promedio (límite de la API)
+    NOTION_RATE_BURST = 5
+    NOTION_MAX_RETRIES = 5
+    NOTION_BACKOFF_BASE = 0.5  # segundos
+    NOTION_BACKOFF_MAX = 30.0
+    NOTION_CIRCUIT_FAILURE_THRESHOLD = 5
+    NOTION_CIRCUIT_RESET_TIMEOUT = 30.0  # segundos con el circuito abierto
+    
+    # Notion Batching Config
+    NOTION_BATCH_MAX_BLOCKS = 100  # límite de hijos por request de la API
+    NOTION_BATCH_MAX_BYTES = 400_000  # margen bajo el límite de 500 KB por request
+    NOTION_BATCH_WINDOW = 5.0  # segundos máximos que un bloque espera antes de enviarse
+    
+    # Menu Config
+    MENU_DIRECTORY = str(PROJECT_ROOT / "data" / "menu")
+    MENU_VERSION_CHECK_INTERVAL = 60  # segundos entre revisiones de cambios en el menú
+    
+    # Gemini Context Cache Config
+    CONTEXT_CACHE_ENABLED = True
+    CONTEXT_CACHE_TTL = 3600  # segundos
+    CONTEXT_CACHE_REFRESH_MARGIN = 60  # recrear el caché antes de que venza
+    CONTEXT_CACHE_RETRY_INTERVAL = 300  # espera tras un error al crear el caché
+    
     # ChromaDB Config
-    CHROMA_PERSIST_DIRECTORY = "./data/chroma_db"
+    CHROMA_PERSIST_DIRECTORY = str(PROJECT_ROOT / "data" / "chroma_db")
     
     # Logging Config
     LOG_LEVEL = "INFO"
-    LOG_FILE = "./data/conversations/conversaciones_robino.log"
+    LOG_FILE = str(PROJECT_ROOT / "data" / "conversations" / "conversaciones_robino.log")
+    LOG_BUFFER_BYTES = 64 * 1024
+    LOG_FLUSH_INTERVAL = 1.0  # segundos máximos antes de volcar el buffer
+    LOG_ROTATE_MAX_BYTES = 50 * 1024 * 1024
+    LOG_ROTATE_INTERVAL = 24 * 3600  # segundos; 0 desactiva la rotación por tiempo
+    LOG_COMPRESS_ROTATED = True
+    LOG_FSYNC = "flush"  # "nunca", "flush" (al volcar el buffer) o "siempre" (cada registro)
     
     # Agent Config
-    MAX_ITERATIONS = 10
+    MAX_ITERATIONS = 10  # vueltas agente <-> herramientas por turno (límite de recursión del grafo)
+    MAX_LLM_CALLS_PER_TURN = 8
+    AGENT_TURN_TIMEOUT = 25  # segundos de reloj por turno del agente conversacional
+    BUDGET_CALL_WORKERS = 8  # hilos para llamadas síncronas con plazo (las vencidas terminan en segundo plano)
+    LLM_REQUEST_TIMEOUT = 30  # segundos: el cliente de Gemini corta las llamadas, también las abandonadas
     TEMPERATURE = 0.7
+    STREAMING_ENABLED = True  # Mostrar la respuesta token a token en consola
+    
+    # Speculative Retrieval Config
+    PREFETCH_ENABLED = True  # buscar el mensaje del cliente en paralelo con la primera llamada al LLM
+    PREFETCH_WORKERS = 4
+    PREFETCH_MIN_OVERLAP = 0.5  # proporción de palabras de la consulta del modelo presentes en el mensaje
+    
+    # Conversation Memory Config
+    MEMORY_MAX_TURNS = 6
+    MEMORY_TOKEN_BUDGET = 3000
+    MEMORY_TOOL_OUTPUT_MAX_CHARS = 300
+    MEMORY_SUMMARY_MAX_CHARS = 2000
+    MEMORY_LLM_SUMMARY = False  # True: el LLM condensa los turnos plegados (una llamada más); False: resumen extractivo
     
     # Multi-Agent Config
-    INVESTIGATION_TIMEOUT = 30
-    REPORT_GENERATION_TIMEOUT = 45
+    INVESTIGATION_TIMEOUT = 30  # segundos para la etapa de investigación
+    REPORT_GENERATION_TIMEOUT = 45  # segundos para la etapa de informe
+    MULTI_AGENT_WORKERS = 4  # hilos para los pasos independientes del pipeline multi-agente
+    REPORT_STORE_DIRECTORY = str(PROJECT_ROOT / "data" / "reports")
+    REPORT_LEGACY_FILE = "informes_robino.json"  # se importa al almacén si existe
+    MULTI_AGENT_CHECKPOINT_DB = str(PROJECT_ROOT / "data" / "checkpoints" / "multi_agent.sqlite")  # estado del grafo por consulta
+    MULTI_AGENT_CHECKPOINT_RETENTION = 7 * 24 * 3600  # segundos sin actividad antes de podar una ejecución
+    MULTI_AGENT_CHECKPOINT_PRUNE_INTERVAL = 3600  # segundos entre podas de ejecuciones vencidas
+    MULTI_AGENT_SYSTEM = "simple"  # "simple": pipeline sin checkpoints; "grafo": grafo con checkpoints (reanudable)
+    REPORT_HISTORY_CAPACITY = 100  # informes recientes en memoria; el resto se lee del almacén
+    RECOMMENDATION_TOP_N = 3  # platos sugeridos por el motor de recomendaciones
+    INTENT_TRAINING_FILE = str(PROJECT_ROOT / "data" / "intents" / "consultas.tsv")  # consultas etiquetadas simple/compleja
+    INTENT_CONFIDENCE_THRESHOLD = 0.7  # por debajo se usa la regla de palabras clave
+    
+    # Write-Behind Persistence Config
+    WRITE_BEHIND_QUEUE_SIZE = 256
+    WRITE_BEHIND_POLICY = "descartar"  # "descartar" o "bloquear" cuando la cola está llena
+    WRITE_BEHIND_BLOCK_TIMEOUT = 0.5  # segundos de espera con la política "bloquear"
+    WRITE_BEHIND_FLUSH_TIMEOUT = 10  # segundos para vaciar la cola al salir
+    PERSISTED_KEYS_MAX = 10000  # claves (sesión, turno) recordadas para no repetir escrituras
+    
+    # Durable Outbox Config
+    OUTBOX_ENABLED = True  # escrituras a Notion vía outbox SQLite (si no, vía agrupador en memoria)
+    OUTBOX_PATH = str(PROJECT_ROOT / "data" / "outbox" / "outbox.db")
+    OUTBOX_BATCH_SIZE = 500  # registros por lote del replicador
+    OUTBOX_POLL_INTERVAL = 2.0  # segundos entre pasadas del replicador
+    OUTBOX_RETRY_INTERVAL = 30.0  # espera de un sink tras un lote fallido
+    OUTBOX_KEY_RETENTION = 24 * 3600  # segundos que se recuerdan las claves ya entregadas
+    
+    # Order Journal Config
+    JOURNAL_DIRECTORY = str(PROJECT_ROOT / "data" / "journal")
+    JOURNAL_SNAPSHOT_INTERVAL = 20
+    JOURNAL_FSYNC = False
+    
+    # Session Manager Config
+    SESSION_POOL_MODE = "thread"  # "thread" o "process"
+    SESSION_WORKERS = 8
+    MAX_LLM_CONCURRENT_CALLS = 4
+    
+    # Server Config
+    SERVER_HOST = "0.0.0.0"
+    SERVER_PORT = 8080
     
     @classmethod
     def validate_config(cls):
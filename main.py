@@ -6,6 +6,7 @@ Proyecto Final Integrador - CACIC 2025
 
 import sys
 import os
+import argparse
 from pathlib import Path
 
 # Agregar el directorio src al path
@@ -14,8 +15,21 @@ sys.path.append(str(Path(__file__).parent / "src"))
 from config.settings import settings
 from src.agents import MozoVirtualAgent
 
+def parse_args():
+    """Parsear los argumentos de línea de comandos"""
+    parser = argparse.ArgumentParser(description="Sistema Mozo Virtual")
+    parser.add_argument("--servidor", action="store_true",
+                        help="Atender mesas por HTTP/WebSocket en lugar de la consola")
+    parser.add_argument("--host", default=settings.SERVER_HOST, help="Host del servidor")
+    parser.add_argument("--puerto", type=int, default=settings.SERVER_PORT, help="Puerto del servidor")
+    parser.add_argument("--restaurar", metavar="SESSION_ID",
+                        help="Retomar en consola el pedido de una sesión a partir de su journal")
+    return parser.parse_args()
+
 def main():
     """Función principal del sistema"""
+    args = parse_args()
+    
     print("=" * 60)
     print("[ROBOT] SISTEMA MOZO VIRTUAL - PROYECTO FINAL CACIC 2025")
     print("=" * 60)
@@ -41,8 +55,15 @@ def main():
         print("- Observabilidad completa con LangSmith")
         print("- Tracing y análisis de rendimiento")
         
-        print("\n[START] Iniciando conversación...")
-        agent.start_conversation()
+        if args.servidor:
+            from src.serving import RobinoServer
+            print("\n[START] Iniciando servidor...")
+            RobinoServer(agent).iniciar(args.host, args.puerto)
+        else:
+            if args.restaurar:
+                agent.restaurar_pedido(args.restaurar)
+            print("\n[START] Iniciando conversación...")
+            agent.start_conversation()
         
     except Exception as e:
         print(f"[ERROR] Error inicializando el sistema: {e}")
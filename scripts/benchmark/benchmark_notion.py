@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+Benchmark de Escritura en Notion
+Mide throughput sostenido y latencia p50/p95/p99 de blocks.children.append
+contra el servidor falso de Notion (límite de 3 req/s con 429 + Retry-After),
+comparando el cliente directo con NotionIntegration.
+
+Uso: python scripts/benchmark/benchmark_notion.py --escrituras 60 --hilos 4
+"""
+
+import argparse
+import sys
+import threading
+import time
+from pathlib import Path
+
+# Agregar la raíz del proyecto al path
+sys.path.append(str(Path(__file__).parent.parent.parent))
+
+from src.integrations.fake_notion_server import FakeNotionServer
+from src.integrations.notion_integration import NotionIntegration
+from src.observability.performance_metrics import PerformanceMetrics
+
+
+def bloque(texto: str) -> dict:
+    return {"object": "block", "type": "paragraph",
+            "paragraph": {"rich_text": [{"type": "text", "text": {"content": texto}}]}}
+
+
+def ejecutar(nombre: str, cliente, escrituras: int, hilos: int) -> PerformanceMetrics:
+    """Lanzar 'escrituras' appends repartidos en 'hilos' y medir cada uno"""
+    metricas = PerformanceMetrics()
+
+    def trabajador(indice: int):
+        for i in range(indice, escrituras, hilos):
+            inicio = time.perf_counter()
+            try:
+                cliente.blocks.children.append(block_id="conversaciones", children=[bloque(f"{nombre}-{i}")])
+                metricas.incrementar("exitos")
+            except Exception:
+                metricas.incrementar("fallos")
+            metricas.registrar_latencia("append", time.perf_counter() - inicio)
+
+    inicio = time.perf_counter()
+    trabajadores = [threading.Thread(target=trabajador, args=(n,)) for n in range(hilos)]
+    for hilo in trabajadores:
+        hilo.start()
+    for hilo in trabajadores:
+        hilo.join()
+    duracion = time.perf_counter() - inicio
+
+    p = metricas.percentiles("append")
+    exitos = metricas.contador("exitos")
+    print(f"[{nombre}] {exitos}/{escrituras} escrituras en {duracion:.1f}s "
+          f"({exitos / duracion:.2f} escrituras/s) - perdidas: {metricas.contador('fallos')}")
+    print(f"    latencia p50={p['p50'] * 1000:.0f}ms p95={p['p95'] * 1000:.0f}ms p99={p['p99'] * 1000:.0f}ms")
+    return metricas
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de escritura en Notion")
+    parser.add_argument("--escrituras", type=int, default=60)
+    parser.add_argument("--hilos", type=int, default=4)
+    parser.add_argument("--tasa", type=float, default=3.0, help="Límite de req/s del servidor falso")
+    parser.add_argument("--latencia", type=float, default=0.05, help="Latencia simulada por request (s)")
+    parser.add_argument("--errores", type=float, default=0.02, help="Proporción de errores 500 simulados")
+    args = parser.parse_args()
+
+    from notion_client import Client
+    from notion_client.client import ClientOptions
+
+    for nombre in ("directo", "resiliente"):
+        with FakeNotionServer(tasa=args.tasa, rafaga=args.tasa, latencia=args.latencia,
+                              tasa_error=args.errores) as servidor:
+            if nombre == "directo":
+                opciones = {"auth": "benchmark", "base_url": servidor.url}
+                if "retry" in getattr(ClientOptions, "__dataclass_fields__", {}):
+                    opciones["retry"] = False
+                cliente = Client(**opciones)
+            else:
+                cliente = NotionIntegration(token="benchmark", base_url=servidor.url, tasa=args.tasa)
+            ejecutar(nombre, cliente, args.escrituras, args.hilos)
+            print(f"    servidor: {servidor.estadisticas}")
+            if isinstance(cliente, NotionIntegration):
+                print(f"    cliente: {cliente.resumen()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+Benchmark de Construcción de Sub-Agentes
+Mide el costo por llamada de nodo de armar el sub-agente ReAct del sistema
+multi-agente: reconstruirlo en cada llamada (PromptTemplate + create_react_agent,
+como hacían los nodos) frente a reutilizar el runnable construido en setup.
+No invoca al LLM: solo mide la construcción.
+
+Uso: python scripts/benchmark/benchmark_subagentes.py --llamadas 200
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+# Agregar la raíz del proyecto al path
+sys.path.append(str(Path(__file__).parent.parent.parent))
+
+os.environ.setdefault("ANONYMIZED_TELEMETRY", "False")
+os.environ.setdefault("GEMINI_API_KEY", "benchmark")
+
+from langchain.agents import create_react_agent
+from langchain.prompts import PromptTemplate
+
+from config.settings import Settings
+from src.agents.multi_agent_system import MultiAgentMozoVirtual, PROMPT_INVESTIGADOR, PROMPT_GENERADOR
+from src.observability.performance_metrics import PerformanceMetrics
+
+# El benchmark no llama al LLM ni envía trazas
+os.environ["LANGCHAIN_TRACING_V2"] = "false"
+
+
+def medir(nombre: str, construir, llamadas: int, metricas: PerformanceMetrics):
+    """Medir 'llamadas' construcciones del sub-agente"""
+    for _ in range(llamadas):
+        inicio = time.perf_counter()
+        construir()
+        metricas.registrar_latencia(nombre, time.perf_counter() - inicio)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de construcción de sub-agentes")
+    parser.add_argument("--llamadas", type=int, default=200)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directorio:
+        Settings.REPORT_STORE_DIRECTORY = directorio
+        sistema = MultiAgentMozoVirtual()
+        os.environ["LANGCHAIN_TRACING_V2"] = "false"
+
+        sub_agentes = {
+            "investigador": (sistema.llm_investigator, sistema.investigator_tools,
+                             PROMPT_INVESTIGADOR, lambda: sistema.investigator_agent),
+            "generador": (sistema.llm_generator, sistema.generator_tools,
+                          PROMPT_GENERADOR, lambda: sistema.generator_agent),
+        }
+        metricas = PerformanceMetrics()
+        for nombre, (llm, herramientas, prompt, reutilizar) in sub_agentes.items():
+            def reconstruir():
+                create_react_agent(llm, herramientas,
+                                   PromptTemplate(input_variables=prompt.input_variables, template=prompt.template))
+
+            medir(f"{nombre}/por_llamada", reconstruir, args.llamadas, metricas)
+            medir(f"{nombre}/en_setup", reutilizar, args.llamadas, metricas)
+
+            for modo in ("por_llamada", "en_setup"):
+                p = metricas.percentiles(f"{nombre}/{modo}")
+                print(f"[{nombre}] {modo:12s} p50={p['p50'] * 1e6:8.1f}us "
+                      f"p95={p['p95'] * 1e6:8.1f}us p99={p['p99'] * 1e6:8.1f}us")
+        sistema.report_store.cerrar()
+
+
+if __name__ == "__main__":
+    main()
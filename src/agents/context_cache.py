@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+"""
+Caché de Contexto de Gemini
+Sube una vez por TTL el prefijo invariante (instrucciones de Robino, menú completo,
+información del restaurante y herramientas) y devuelve el handle para que las
+llamadas a ChatGoogleGenerativeAI lo referencien con cached_content.
+"""
+
+import hashlib
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from config.settings import Settings
+
+
+# Contenido del caché: (instrucción de sistema, contenido estático)
+ContenidoCache = Tuple[str, str]
+
+
+class LocalContextCacheBackend:
+    """
+    Backend en memoria que imita el servicio de caché de Gemini
+    Para tests y desarrollo offline: registra creaciones y borrados.
+    """
+
+    def __init__(self):
+        self.caches: Dict[str, Dict[str, Any]] = {}
+        self.creados = 0
+        self.eliminados = 0
+
+    def crear(self, system_instruction: str, contenido: str, herramientas: Sequence, ttl: int) -> str:
+        """Registrar un caché y devolver su nombre"""
+        self.creados += 1
+        nombre = f"cachedContents/local-{self.creados}"
+        self.caches[nombre] = {
+            "system_instruction": system_instruction,
+            "contenido": contenido,
+            "herramientas": [getattr(h, "name", str(h)) for h in herramientas],
+            "expira": time.time() + ttl
+        }
+        return nombre
+
+    def eliminar(self, nombre: str):
+        """Borrar un caché"""
+        if self.caches.pop(nombre, None) is not None:
+            self.eliminados += 1
+
+
+class GeminiContextCacheBackend:
+    """Backend real sobre el CacheService de la API de Gemini"""
+
+    def __init__(self, api_key: str, modelo: str):
+        from google.ai import generativelanguage_v1beta as glm
+        from google.api_core.client_options import ClientOptions
+
+        self._glm = glm
+        self.modelo = modelo if modelo.startswith("models/") else f"models/{modelo}"
+        self.cliente = glm.CacheServiceClient(client_options=ClientOptions(api_key=api_key))
+
+    def crear(self, system_instruction: str, contenido: str, herramientas: Sequence, ttl: int) -> str:
+        """Crear el caché en Gemini y devolver su nombre (cachedContents/...)"""
+        from langchain_google_genai._function_utils import convert_to_genai_function_declarations
+
+        glm = self._glm
+        cache = glm.CachedContent(
+            model=self.modelo,
+            display_name="robino-prefijo",
+            system_instruction=glm.Content(parts=[glm.Part(text=system_instruction)]),
+            contents=[glm.Content(role="user", parts=[glm.Part(text=contenido)])],
+            tools=[convert_to_genai_function_declarations(herramientas)] if herramientas else [],
+            ttl={"seconds": ttl}
+        )
+        return self.cliente.create_cached_content(cached_content=cache).name
+
+    def eliminar(self, nombre: str):
+        """Borrar un caché en Gemini"""
+        self.cliente.delete_cached_content(name=nombre)
+
+
+class ContextCacheManager:
+    """
+    Administra el handle del caché de contexto
+    - Reutiliza el handle mientras no venza el TTL ni cambie el contenido
+    - La versión del menú dispara la relectura del contenido
+    - Si el backend falla, se trabaja sin caché hasta el próximo intento
+    """
+
+    def __init__(self, backend, herramientas: Sequence = (), ttl: int = None,
+                 margen_refresco: int = None, reintento: int = None):
+        """Configurar backend, herramientas cacheadas y tiempos de vida"""
+        self.backend = backend
+        self.herramientas = list(herramientas)
+        self.ttl = ttl or Settings.CONTEXT_CACHE_TTL
+        self.margen_refresco = Settings.CONTEXT_CACHE_REFRESH_MARGIN if margen_refresco is None else margen_refresco
+        self.reintento = Settings.CONTEXT_CACHE_RETRY_INTERVAL if reintento is None else reintento
+
+        self._lock = threading.Lock()
+        self._nombre: Optional[str] = None
+        self._huella: Optional[str] = None
+        self._version: Optional[str] = None
+        self._vence = 0.0
+        self._reintentar_desde = 0.0
+        self._creando = False  # un hilo está recreando el caché en el backend
+
+        self.estadisticas = {"creados": 0, "reutilizados": 0, "refrescos_por_cambio": 0, "fallos": 0}
+
+    def _huella_de(self, contenido: ContenidoCache) -> str:
+        """Hash del contenido y de los nombres de las herramientas"""
+        huella = hashlib.sha256()
+        for parte in contenido:
+            huella.update(parte.encode("utf-8"))
+            huella.update(b"\0")
+        for herramienta in self.herramientas:
+            huella.update(getattr(herramienta, "name", str(herramienta)).encode("utf-8"))
+        return huella.hexdigest()
+
+    def obtener_handle(self, version: str, construir: Callable[[], ContenidoCache]) -> Optional[str]:
+        """Nombre del caché vigente o None si no hay caché disponible
+
+        construir solo se llama cuando cambia la versión o hay que recrear el caché.
+        El lock no se retiene durante las llamadas al backend (red): mientras un hilo
+        recrea el caché, los demás usan el actual si no venció, o siguen sin caché.
+        """
+        ahora = time.time()
+        with self._lock:
+            if self._nombre and version == self._version and ahora < self._vence - self.margen_refresco:
+                self.estadisticas["reutilizados"] += 1
+                return self._nombre
+
+            if ahora < self._reintentar_desde and version == self._version:
+                return None
+
+            if self._creando:
+                return self._nombre if self._nombre and ahora < self._vence else None
+            self._creando = True
+
+        try:
+            return self._recrear(version, construir, ahora)
+        finally:
+            with self._lock:
+                self._creando = False
+
+    def _recrear(self, version: str, construir: Callable[[], ContenidoCache], ahora: float) -> Optional[str]:
+        """Construir el contenido y, si cambió o venció, reemplazar el caché en el backend"""
+        contenido = construir()
+        huella = self._huella_de(contenido)
+        with self._lock:
+            if self._nombre and huella == self._huella and ahora < self._vence - self.margen_refresco:
+                # Cambió la versión pero no el contenido: el caché sigue sirviendo
+                self._version = version
+                self.estadisticas["reutilizados"] += 1
+                return self._nombre
+
+            if self._nombre and huella != self._huella:
+                self.estadisticas["refrescos_por_cambio"] += 1
+            anterior, self._nombre, self._huella = self._nombre, None, None
+        self._eliminar(anterior)
+
+        try:
+            nombre = self.backend.crear(contenido[0], contenido[1], self.herramientas, self.ttl)
+        except Exception as e:
+            print(f"[ADVERTENCIA] No se pudo crear el caché de contexto, se continúa sin caché: {e}")
+            with self._lock:
+                self.estadisticas["fallos"] += 1
+                self._version = version
+                self._reintentar_desde = ahora + self.reintento
+            return None
+
+        with self._lock:
+            self._nombre = nombre
+            self._huella = huella
+            self._version = version
+            self._vence = ahora + self.ttl
+            self.estadisticas["creados"] += 1
+        return nombre
+
+    def _eliminar(self, nombre: Optional[str]):
+        """Eliminar un caché del backend (los errores de borrado no son críticos)"""
+        if nombre is None:
+            return
+        try:
+            self.backend.eliminar(nombre)
+        except Exception as e:
+            print(f"[ADVERTENCIA] No se pudo eliminar el caché de contexto {nombre}: {e}")
+
+    def invalidar(self):
+        """Forzar la recreación del caché en la próxima llamada"""
+        with self._lock:
+            anterior, self._nombre, self._huella = self._nombre, None, None
+            self._version = None
+        self._eliminar(anterior)
@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""
+Memoria de Conversación Acotada
+Mantiene el historial que se envía a Gemini dentro de un presupuesto de tokens:
+- los últimos N turnos se conservan textuales
+- los turnos anteriores se pliegan en un resumen acumulado de la sesión
+- las salidas voluminosas de herramientas ya respondidas se reemplazan por una marca
+"""
+
+from typing import Callable, List, Optional
+
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, ToolMessage
+
+from config.settings import Settings
+
+
+# Función que recibe el resumen previo y los mensajes a plegar y devuelve el nuevo resumen
+Resumidor = Callable[[str, List[BaseMessage]], str]
+
+
+def estimar_tokens(mensajes: List[BaseMessage]) -> int:
+    """Estimación rápida de tokens (~4 caracteres por token)"""
+    total = 0
+    for mensaje in mensajes:
+        contenido = mensaje.content if isinstance(mensaje.content, str) else str(mensaje.content)
+        total += len(contenido) // 4 + 4
+        if isinstance(mensaje, AIMessage) and mensaje.tool_calls:
+            total += sum(len(str(llamada["args"])) // 4 + 8 for llamada in mensaje.tool_calls)
+    return total
+
+
+def dividir_turnos(mensajes: List[BaseMessage]) -> List[List[BaseMessage]]:
+    """Agrupar el historial en turnos: cada turno empieza con un mensaje del cliente"""
+    turnos = []
+    for mensaje in mensajes:
+        if isinstance(mensaje, HumanMessage) or not turnos:
+            turnos.append([])
+        turnos[-1].append(mensaje)
+    return turnos
+
+
+def _recortar(texto: str, limite: int) -> str:
+    """Recortar un texto a un límite de caracteres en una sola línea"""
+    texto = " ".join(texto.split())
+    return texto if len(texto) <= limite else texto[:limite - 3] + "..."
+
+
+def resumen_extractivo(resumen_previo: str, mensajes: List[BaseMessage]) -> str:
+    """Resumidor por defecto: una línea por intervención, sin llamadas al LLM"""
+    lineas = [resumen_previo] if resumen_previo else []
+    for mensaje in mensajes:
+        if not isinstance(mensaje.content, str) or not mensaje.content.strip():
+            continue
+        if isinstance(mensaje, HumanMessage):
+            lineas.append(f"Cliente: {_recortar(mensaje.content, 160)}")
+        elif isinstance(mensaje, AIMessage):
+            lineas.append(f"Robino: {_recortar(mensaje.content, 160)}")
+    return "\n".join(lineas)
+
+
+def crear_resumidor_llm(llm) -> Resumidor:
+    """Resumidor que pide a un LLM condensar el resumen previo con los turnos plegados
+
+    Si la llamada falla, se usa el resumen extractivo: el turno no se pierde por el resumen.
+    """
+    def resumir(resumen_previo: str, mensajes: List[BaseMessage]) -> str:
+        transcripcion = resumen_extractivo("", mensajes)
+        prompt = f"""
+        Actualiza el resumen de la conversación entre un cliente y Robino, mozo virtual.
+        Conserva nombre del cliente, preferencias, restricciones alimentarias y platos mencionados.
+        Responde solo con el resumen, en menos de 120 palabras.
+
+        RESUMEN ACTUAL:
+        {resumen_previo or "(vacío)"}
+
+        NUEVOS TURNOS:
+        {transcripcion}
+        """
+        try:
+            return llm.invoke(prompt).content.strip()
+        except Exception as e:
+            print(f"[ADVERTENCIA] Error resumiendo la conversación con el LLM: {e}")
+            return resumen_extractivo(resumen_previo, mensajes)
+    return resumir
+
+
+class ConversationMemory:
+    """
+    Gestor de memoria de una conversación con presupuesto de tokens
+    El resumen se guarda en la sesión y solo se actualiza cuando un turno sale de la ventana.
+    """
+
+    def __init__(self, max_turnos: int = None, presupuesto_tokens: int = None,
+                 max_chars_herramienta: int = None, max_chars_resumen: int = None,
+                 resumidor: Optional[Resumidor] = None):
+        """Configurar la ventana de turnos, el presupuesto y el resumidor"""
+        self.max_turnos = max_turnos or Settings.MEMORY_MAX_TURNS
+        self.presupuesto_tokens = presupuesto_tokens or Settings.MEMORY_TOKEN_BUDGET
+        self.max_chars_herramienta = max_chars_herramienta or Settings.MEMORY_TOOL_OUTPUT_MAX_CHARS
+        self.max_chars_resumen = max_chars_resumen or Settings.MEMORY_SUMMARY_MAX_CHARS
+        self.resumidor = resumidor or resumen_extractivo
+
+    def podar_herramientas(self, turno: List[BaseMessage]) -> List[BaseMessage]:
+        """Reemplazar salidas largas de herramientas manteniendo el par tool_call/ToolMessage"""
+        podado = []
+        for mensaje in turno:
+            if isinstance(mensaje, ToolMessage) and len(str(mensaje.content)) > self.max_chars_herramienta:
+                mensaje = ToolMessage(
+                    content=f"[Salida de {mensaje.name or 'herramienta'} omitida: ya fue respondida]",
+                    tool_call_id=mensaje.tool_call_id,
+                    name=mensaje.name,
+                    id=mensaje.id
+                )
+            podado.append(mensaje)
+        return podado
+
+    def compactar(self, sesion) -> int:
+        """Acotar el historial de la sesión al terminar un turno
+
+        Devuelve la cantidad de turnos plegados en el resumen.
+        """
+        turnos = [self.podar_herramientas(turno) for turno in dividir_turnos(sesion.historial)]
+
+        plegados = []
+        while len(turnos) > 1 and (
+            len(turnos) > self.max_turnos
+            or estimar_tokens([m for turno in turnos for m in turno]) > self.presupuesto_tokens
+        ):
+            plegados.extend(turnos.pop(0))
+
+        if plegados:
+            resumen = self.resumidor(sesion.resumen, plegados)
+            if len(resumen) > self.max_chars_resumen:
+                # Descartar las líneas más antiguas del resumen
+                resumen = resumen[-self.max_chars_resumen:].split("\n", 1)[-1]
+            sesion.resumen = resumen
+
+        sesion.historial = [mensaje for turno in turnos for mensaje in turno]
+        return len(dividir_turnos(plegados))
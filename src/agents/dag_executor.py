@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+Ejecutor de Pasos en DAG
+Los pasos sin dependencias entre sí corren en paralelo en un pool de hilos;
+un paso arranca cuando terminaron todas sus dependencias (punto de unión).
+Cada paso corre con una copia del contexto (contextvars) de quien ejecuta el DAG.
+Un paso puede tener un tiempo límite: vencido, se usa su resultado de respaldo
+(el hilo del paso termina en segundo plano y su resultado se descarta).
+"""
+
+import contextvars
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict, Iterable, Optional
+
+
+class DAGExecutor:
+    """
+    DAG de pasos reutilizable
+    Cada paso recibe un dict con las entradas iniciales y los resultados de los
+    pasos ya terminados; devuelve su propio resultado.
+    """
+
+    def __init__(self, pool: ThreadPoolExecutor):
+        """Usar un pool compartido (el ejecutor no lo cierra)"""
+        self.pool = pool
+        self.pasos: Dict[str, Callable[[Dict[str, Any]], Any]] = {}
+        self.dependencias: Dict[str, tuple] = {}
+        self.limites: Dict[str, Optional[float]] = {}
+        self.respaldos: Dict[str, Optional[Callable[[Dict[str, Any]], Any]]] = {}
+
+    def agregar(self, nombre: str, funcion: Callable[[Dict[str, Any]], Any], dependencias: Iterable[str] = (),
+                limite: float = None, respaldo: Callable[[Dict[str, Any]], Any] = None):
+        """Registrar un paso; sus dependencias deben existir de antemano (el grafo queda acíclico)
+
+        Con limite (segundos), al vencer se usa respaldo(datos) como resultado; sin respaldo
+        se lanza TimeoutError.
+        """
+        dependencias = tuple(dependencias)
+        faltantes = [d for d in dependencias if d not in self.pasos]
+        if faltantes:
+            raise ValueError(f"Dependencias desconocidas para '{nombre}': {', '.join(faltantes)}")
+        self.pasos[nombre] = funcion
+        self.dependencias[nombre] = dependencias
+        self.limites[nombre] = limite
+        self.respaldos[nombre] = respaldo
+        return self
+
+    def ejecutar(self, entradas: Dict[str, Any] = None,
+                 al_terminar: Optional[Callable[[str, float], None]] = None,
+                 al_vencer: Optional[Callable[[str, float], None]] = None) -> Dict[str, Any]:
+        """Ejecutar todos los pasos; devuelve {paso: resultado}
+
+        al_terminar(nombre, segundos) se llama al completar cada paso y
+        al_vencer(nombre, limite) cuando un paso agota su tiempo.
+        Si un paso falla, no se lanzan nuevos pasos y se propaga su excepción.
+        """
+        contexto = dict(entradas or {})
+        resultados: Dict[str, Any] = {}
+        pendientes = dict(self.dependencias)
+        en_curso: Dict[Future, str] = {}
+        plazos: Dict[Future, tuple] = {}  # futuro -> (vencimiento, datos del paso)
+
+        def correr(nombre: str, datos: Dict[str, Any]):
+            inicio = time.perf_counter()
+            resultado = self.pasos[nombre](datos)
+            return resultado, time.perf_counter() - inicio
+
+        while pendientes or en_curso:
+            listos = [n for n, deps in pendientes.items() if all(d in resultados for d in deps)]
+            for nombre in listos:
+                del pendientes[nombre]
+                datos = {**contexto, **resultados}
+                futuro = self.pool.submit(contextvars.copy_context().run, correr, nombre, datos)
+                en_curso[futuro] = nombre
+                if self.limites[nombre] is not None:
+                    plazos[futuro] = (time.monotonic() + self.limites[nombre], datos)
+
+            espera = None
+            if plazos:
+                espera = max(0.0, min(vence for vence, _ in plazos.values()) - time.monotonic())
+            terminados, _ = wait(en_curso, timeout=espera, return_when=FIRST_COMPLETED)
+            for futuro in terminados:
+                nombre = en_curso.pop(futuro)
+                plazos.pop(futuro, None)
+                try:
+                    resultado, duracion = futuro.result()
+                except Exception:
+                    # Esperar a los pasos en vuelo antes de propagar el error
+                    wait(en_curso)
+                    raise
+                resultados[nombre] = resultado
+                if al_terminar:
+                    al_terminar(nombre, duracion)
+
+            ahora = time.monotonic()
+            for futuro, (vence, datos) in list(plazos.items()):
+                if ahora < vence or futuro.done():
+                    continue
+                nombre = en_curso.pop(futuro)
+                del plazos[futuro]
+                if al_vencer:
+                    al_vencer(nombre, self.limites[nombre])
+                if self.respaldos[nombre] is None:
+                    wait(en_curso)
+                    raise TimeoutError(f"El paso '{nombre}' superó su límite de {self.limites[nombre]} s")
+                resultados[nombre] = self.respaldos[nombre](datos)
+
+        return resultados
@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+Clasificador Local de Intención
+Regresión logística sobre n-gramas hasheados (palabras, pares de palabras
+y n-gramas de caracteres del texto normalizado), entrenada al arrancar desde
+un archivo de consultas etiquetadas del repositorio. La inferencia es NumPy
+puro: sin red y en microsegundos. Si la confianza no alcanza el umbral, quien
+lo usa recurre a su regla de respaldo.
+"""
+
+import math
+import re
+import zlib
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, List, Sequence, Tuple
+
+import numpy as np
+
+from config.settings import Settings
+from .keyword_matcher import normalizar
+
+
+PALABRA = re.compile(r"\w+")
+
+
+def _indice(termino: str, dimension: int) -> int:
+    # crc32 es estable entre procesos (hash() de Python no lo es)
+    return zlib.crc32(termino.encode("utf-8")) % dimension
+
+
+@lru_cache(maxsize=8192)
+def _indices_palabra(palabra: str, dimension: int) -> Tuple[int, ...]:
+    """La palabra y sus n-gramas de 3 a 5 caracteres; el vocabulario se repite, así que se cachea"""
+    marcada = f"<{palabra}>"
+    terminos = [palabra] + [f"#{marcada[i:i + n]}" for n in (3, 4, 5) for i in range(len(marcada) - n + 1)]
+    return tuple(_indice(termino, dimension) for termino in terminos)
+
+
+def caracteristicas(texto: str, dimension: int) -> List[int]:
+    """Índices hasheados de las palabras, pares de palabras y n-gramas de 3 a 5 caracteres"""
+    palabras = PALABRA.findall(normalizar(texto))
+    indices = [indice for palabra in palabras for indice in _indices_palabra(palabra, dimension)]
+    indices.extend(_indice(f"{a} {b}", dimension) for a, b in zip(palabras, palabras[1:]))
+    return indices
+
+
+def leer_consultas(ruta: str) -> List[Tuple[str, str]]:
+    """Pares (etiqueta, consulta) de un archivo 'etiqueta<TAB>consulta' ('#' comenta)"""
+    ejemplos = []
+    for linea in Path(ruta).read_text(encoding="utf-8").splitlines():
+        if not linea.strip() or linea.startswith("#"):
+            continue
+        etiqueta, _, consulta = linea.partition("\t")
+        if consulta.strip():
+            ejemplos.append((etiqueta.strip(), consulta.strip()))
+    return ejemplos
+
+
+class IntentClassifier:
+    """
+    Regresión logística binaria entre dos etiquetas
+    clasificar(texto) devuelve (etiqueta, probabilidad)
+    """
+
+    def __init__(self, dimension: int = 2 ** 12, epocas: int = 300,
+                 tasa: float = 4.0, regularizacion: float = 1e-3):
+        self.dimension = dimension
+        self.epocas = epocas
+        self.tasa = tasa
+        self.regularizacion = regularizacion
+        self.etiquetas: Tuple[str, ...] = ()
+        self.pesos = np.zeros(dimension, dtype=np.float64)
+        self.sesgo = 0.0
+
+    def vectorizar(self, texto: str) -> np.ndarray:
+        """Conteos hasheados escalados por 1/sqrt(términos), igual que en inferencia"""
+        indices = caracteristicas(texto, self.dimension)
+        vector = np.zeros(self.dimension, dtype=np.float64)
+        if indices:
+            np.add.at(vector, indices, 1.0 / np.sqrt(len(indices)))
+        return vector
+
+    def entrenar(self, ejemplos: Sequence[Tuple[str, str]]) -> "IntentClassifier":
+        """Descenso por gradiente sobre pares (etiqueta, consulta); la segunda etiqueta es la positiva"""
+        self.etiquetas = tuple(sorted({etiqueta for etiqueta, _ in ejemplos}))
+        if len(self.etiquetas) != 2:
+            raise ValueError(f"Se esperaban dos etiquetas y hay {len(self.etiquetas)}: {self.etiquetas}")
+        matriz = np.stack([self.vectorizar(consulta) for _, consulta in ejemplos])
+        objetivo = np.array([etiqueta == self.etiquetas[1] for etiqueta, _ in ejemplos], dtype=np.float64)
+
+        self.pesos = np.zeros(self.dimension, dtype=np.float64)
+        self.sesgo = 0.0
+        for _ in range(self.epocas):
+            error = 1.0 / (1.0 + np.exp(-(matriz @ self.pesos + self.sesgo))) - objetivo
+            self.pesos -= self.tasa * (matriz.T @ error / len(objetivo) + self.regularizacion * self.pesos)
+            self.sesgo -= self.tasa * float(error.mean())
+        return self
+
+    @classmethod
+    def desde_archivo(cls, ruta: str = None, **kwargs) -> "IntentClassifier":
+        """Entrenar con el archivo de consultas etiquetadas de Settings"""
+        return cls(**kwargs).entrenar(leer_consultas(ruta or Settings.INTENT_TRAINING_FILE))
+
+    def probabilidades(self, texto: str) -> Dict[str, float]:
+        """Probabilidad de cada etiqueta"""
+        indices = caracteristicas(texto, self.dimension)
+        puntaje = self.sesgo
+        if indices:
+            puntaje += float(self.pesos[indices].sum()) / math.sqrt(len(indices))
+        positiva = 1.0 / (1.0 + math.exp(-puntaje))
+        return {self.etiquetas[0]: 1.0 - positiva, self.etiquetas[1]: positiva}
+
+    def clasificar(self, texto: str) -> Tuple[str, float]:
+        """Etiqueta más probable y su probabilidad"""
+        probabilidades = self.probabilidades(texto)
+        etiqueta = max(probabilidades, key=probabilidades.get)
+        return etiqueta, probabilidades[etiqueta]
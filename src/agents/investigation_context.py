@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+Contexto de Investigación por Consulta
+Estado de trabajo de los sistemas multi-agente (investigación en curso e
+informes generados) ligado a la consulta mediante contextvars, para que una
+misma instancia atienda varias consultas en paralelo sin mezclarlas.
+"""
+
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, List, Optional
+
+
+class InvestigationContext:
+    """Borrador de una consulta: resultados de la investigación e informes generados"""
+
+    def __init__(self, informes: List[Dict[str, Any]] = None):
+        self.investigacion: Dict[str, Any] = {}
+        self.informes = informes if informes is not None else []
+
+
+# Contexto sobre el que operan las herramientas multi-agente en la consulta actual
+_contexto_activo: ContextVar[Optional[InvestigationContext]] = ContextVar("contexto_investigacion", default=None)
+
+
+def contexto_investigacion() -> Optional[InvestigationContext]:
+    """Obtener el contexto de investigación ligado a la consulta actual"""
+    return _contexto_activo.get()
+
+
+@contextmanager
+def usar_contexto_investigacion(contexto: InvestigationContext = None):
+    """Ligar un contexto (nuevo si no se pasa) a la consulta actual mientras dura el bloque"""
+    contexto = contexto or InvestigationContext()
+    token = _contexto_activo.set(contexto)
+    try:
+        yield contexto
+    finally:
+        _contexto_activo.reset(token)
+
+
+class InvestigationStateMixin:
+    """
+    current_investigation y generated_reports resueltos contra el contexto activo
+    Fuera de una consulta (demos, llamadas directas a las herramientas) se usa un
+    contexto propio de la instancia cuyos informes son el historial acotado.
+    Requiere self.historial_informes (ReportHistory).
+    """
+
+    @property
+    def contexto(self) -> InvestigationContext:
+        contexto = contexto_investigacion()
+        if contexto is None:
+            contexto = self.__dict__.get("_contexto_por_defecto")
+            if contexto is None:
+                contexto = InvestigationContext(self.historial_informes)
+                self._contexto_por_defecto = contexto
+        return contexto
+    
+    def registrar_informe(self, informe: Dict[str, Any]):
+        """Agregar un informe a la consulta actual y al historial (una sola vez)"""
+        contexto = self.contexto
+        if contexto.informes is not self.historial_informes:
+            contexto.informes.append(informe)
+        self.historial_informes.agregar(informe)
+
+    @property
+    def current_investigation(self) -> Dict[str, Any]:
+        return self.contexto.investigacion
+
+    @current_investigation.setter
+    def current_investigation(self, valor: Dict[str, Any]):
+        self.contexto.investigacion = valor
+
+    @property
+    def generated_reports(self) -> List[Dict[str, Any]]:
+        return self.contexto.informes
+
+    @generated_reports.setter
+    def generated_reports(self, valor: List[Dict[str, Any]]):
+        self.contexto.informes = valor
@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""
+Detector de Palabras Clave
+Una tabla declarativa de categorías -> palabras clave compilada una sola vez
+en una expresión regular; cada texto se normaliza (minúsculas, sin acentos)
+y se recorre una única vez para obtener todas las categorías presentes.
+"""
+
+import re
+import unicodedata
+from typing import Any, Dict, FrozenSet, Iterable
+
+
+# Tabla de palabras clave usada para el ruteo y el análisis de preferencias.
+# Las palabras se buscan como subcadenas, igual que los 'in' que reemplaza.
+PALABRAS_CLAVE: Dict[str, tuple] = {
+    # Ruteo al sistema multi-agente y al investigador
+    "investigacion": (
+        "recomendar", "recomendación", "sugerir", "qué me recomiendas",
+        "qué me sugieres", "ayuda a elegir", "no sé qué pedir",
+        "romántica", "pareja", "familia", "negocio", "especial",
+        "vegetariano", "vegano", "sin gluten", "alergias"
+    ),
+    "informe": ("informe",),
+    # Pedidos explícitos (recomendación, restricciones alimentarias, informe): van al
+    # multi-agente aunque el clasificador de intención diga otra cosa
+    "ruteo_explicito": (
+        "recomendar", "recomendación", "qué me recomiendas", "qué me sugieres",
+        "ayuda a elegir", "no sé qué pedir", "vegetariano", "vegano", "sin gluten",
+        "alergia", "informe"
+    ),
+    "resumen": ("resumen",),
+
+    # Preguntas que probablemente terminen en consultar_menu (búsqueda especulativa)
+    "consulta_menu": (
+        "menú", "carta", "plato", "precio", "cuesta", "cuánto sale", "ingrediente", "lleva",
+        "entrada", "principal", "postre", "bebida", "vino", "cerveza", "café", "especialidad",
+        "horario", "solomillo", "chuletón", "pulpo", "croqueta", "gazpacho", "jamón", "merluza",
+        "tarta", "flan", "crema catalana", "queso"
+    ),
+
+    # Tipo de comida
+    "comida_carnes": ("carne", "ternera", "cordero", "cochinillo"),
+    "comida_pescados_mariscos": ("pescado", "marisco", "paella", "bacalao"),
+    "comida_vegetariano": ("vegetariano", "vegano", "ensalada", "quinoa"),
+
+    # Ocasión
+    "ocasion_romantica": ("romántic", "pareja", "especial"),
+    "ocasion_familiar": ("familia", "niños", "grupo"),
+    "ocasion_negocio": ("negocio", "trabajo", "formal"),
+
+    # Presupuesto
+    "presupuesto_bajo": ("económico", "barato", "simple"),
+    "presupuesto_alto": ("lujo", "premium", "especial"),
+}
+
+
+def normalizar(texto: str) -> str:
+    """Minúsculas y sin acentos ni diéresis ('Niños Románticos' -> 'ninos romanticos')"""
+    descompuesto = unicodedata.normalize("NFKD", str(texto).lower())
+    return "".join(c for c in descompuesto if not unicodedata.combining(c))
+
+
+class KeywordMatcher:
+    """
+    Detector compilado a partir de una tabla {categoria: palabras}
+    categorias(texto) devuelve el conjunto de categorías con alguna palabra en el texto.
+    """
+
+    def __init__(self, tabla: Dict[str, Iterable[str]]):
+        """Compilar la tabla en una sola alternativa (las palabras más largas primero)"""
+        self.categorias_por_palabra: Dict[str, set] = {}
+        for categoria, palabras in tabla.items():
+            for palabra in palabras:
+                self.categorias_por_palabra.setdefault(normalizar(palabra), set()).add(categoria)
+
+        # En cada posición la regex toma la palabra más larga; las palabras contenidas
+        # en ella ('romantic' dentro de 'romantica') aportan también sus categorías
+        palabras = sorted(self.categorias_por_palabra, key=len, reverse=True)
+        self._categorias: Dict[str, FrozenSet[str]] = {
+            palabra: frozenset().union(*(self.categorias_por_palabra[otra]
+                                         for otra in palabras if otra in palabra))
+            for palabra in palabras
+        }
+        alternativa = "|".join(re.escape(palabra) for palabra in palabras)
+        # Lookahead: se prueba cada posición aunque las coincidencias se solapen
+        self._patron = re.compile(f"(?=({alternativa}))")
+
+    def categorias(self, texto: str) -> FrozenSet[str]:
+        """Todas las categorías presentes en el texto, en una sola pasada"""
+        encontradas = set()
+        for coincidencia in self._patron.finditer(normalizar(texto)):
+            encontradas |= self._categorias[coincidencia.group(1)]
+        return frozenset(encontradas)
+
+
+# Detector compartido por el agente y los sistemas multi-agente
+MATCHER = KeywordMatcher(PALABRAS_CLAVE)
+
+
+def extraer_preferencias(descripcion: str) -> Dict[str, Any]:
+    """Preferencias del cliente (tipo de comida, ocasión, presupuesto) a partir de su descripción"""
+    categorias = MATCHER.categorias(descripcion)
+    preferencias = {
+        "tipo_comida": [],
+        "presupuesto": "medio",
+        "ocasion": "general",
+        "restricciones": [],
+        "gustos": []
+    }
+
+    # Analizar tipo de comida
+    for tipo in ("carnes", "pescados_mariscos", "vegetariano"):
+        if f"comida_{tipo}" in categorias:
+            preferencias["tipo_comida"].append(tipo)
+
+    # Analizar ocasión
+    if "ocasion_romantica" in categorias:
+        preferencias["ocasion"] = "romantica"
+    elif "ocasion_familiar" in categorias:
+        preferencias["ocasion"] = "familiar"
+    elif "ocasion_negocio" in categorias:
+        preferencias["ocasion"] = "negocio"
+
+    # Analizar presupuesto
+    if "presupuesto_bajo" in categorias:
+        preferencias["presupuesto"] = "bajo"
+    elif "presupuesto_alto" in categorias:
+        preferencias["presupuesto"] = "alto"
+
+    return preferencias
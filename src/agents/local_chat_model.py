@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+Modelo de Chat Local
+Sustituto de Gemini sin red para tests, benchmarks y desarrollo offline
+"""
+
+import json
+import time
+import asyncio
+from typing import Any, AsyncIterator, Iterator, List, Optional, Union
+
+from pydantic import Field
+
+from langchain_core.callbacks import AsyncCallbackManagerForLLMRun, CallbackManagerForLLMRun
+from langchain_core.embeddings import DeterministicFakeEmbedding
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage, HumanMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+
+class LocalChatModel(BaseChatModel):
+    """
+    Modelo de chat determinístico que imita a Gemini
+    - respuestas: guion de respuestas (texto o AIMessage con tool_calls), en ciclo
+    - latencia: demora simulada por llamada (asyncio.sleep en modo async)
+    - caches_usados: cached_content recibido en cada llamada (caché de contexto)
+    - timeouts_usados: timeout recibido en cada llamada (plazo del presupuesto)
+    Sin guion, responde con un eco del último mensaje del cliente.
+    """
+
+    respuestas: List[Union[str, AIMessage]] = Field(default_factory=list)
+    latencia: float = 0.0
+    llamadas: List[List[BaseMessage]] = Field(default_factory=list)
+    caches_usados: List[Optional[str]] = Field(default_factory=list)
+    timeouts_usados: List[Optional[float]] = Field(default_factory=list)
+
+    @property
+    def _llm_type(self) -> str:
+        return "local-robino"
+
+    def bind_tools(self, tools: Any, **kwargs: Any) -> "LocalChatModel":
+        """Las herramientas solo se usan si el guion incluye tool_calls"""
+        return self
+
+    def _siguiente_respuesta(self, messages: List[BaseMessage], **kwargs: Any) -> AIMessage:
+        """Elegir la respuesta del guion o generar el eco"""
+        self.llamadas.append(list(messages))
+        self.caches_usados.append(kwargs.get("cached_content"))
+        self.timeouts_usados.append(kwargs.get("timeout"))
+
+        if self.respuestas:
+            respuesta = self.respuestas[(len(self.llamadas) - 1) % len(self.respuestas)]
+            if isinstance(respuesta, AIMessage):
+                return respuesta.model_copy()
+            return AIMessage(content=respuesta)
+
+        ultimo_cliente = next(
+            (m.content for m in reversed(messages) if isinstance(m, HumanMessage)), ""
+        )
+        return AIMessage(content=f"¡Hola! Soy Robino (modelo local). Recibí tu mensaje: '{ultimo_cliente}'")
+
+    def _fragmentos(self, respuesta: AIMessage) -> Iterator[AIMessageChunk]:
+        """Dividir una respuesta en fragmentos como los del streaming de Gemini"""
+        if respuesta.tool_calls:
+            # Como Gemini, el texto que acompaña a las llamadas a herramientas llega antes
+            if respuesta.content:
+                yield AIMessageChunk(content=respuesta.content)
+            yield AIMessageChunk(
+                content="",
+                tool_call_chunks=[
+                    {
+                        "name": llamada["name"],
+                        "args": json.dumps(llamada["args"]),
+                        "id": llamada["id"],
+                        "index": i
+                    }
+                    for i, llamada in enumerate(respuesta.tool_calls)
+                ]
+            )
+            return
+
+        palabras = respuesta.content.split(" ")
+        for i, palabra in enumerate(palabras):
+            yield AIMessageChunk(content=palabra if i == 0 else f" {palabra}")
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                  run_manager: Optional[CallbackManagerForLLMRun] = None, **kwargs: Any) -> ChatResult:
+        if self.latencia:
+            time.sleep(self.latencia)
+        return ChatResult(generations=[ChatGeneration(message=self._siguiente_respuesta(messages, **kwargs))])
+
+    async def _agenerate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                         run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+                         **kwargs: Any) -> ChatResult:
+        if self.latencia:
+            await asyncio.sleep(self.latencia)
+        return ChatResult(generations=[ChatGeneration(message=self._siguiente_respuesta(messages, **kwargs))])
+
+    def _stream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                run_manager: Optional[CallbackManagerForLLMRun] = None,
+                **kwargs: Any) -> Iterator[ChatGenerationChunk]:
+        if self.latencia:
+            time.sleep(self.latencia)
+        for fragmento in self._fragmentos(self._siguiente_respuesta(messages, **kwargs)):
+            chunk = ChatGenerationChunk(message=fragmento)
+            if run_manager:
+                run_manager.on_llm_new_token(fragmento.content, chunk=chunk)
+            yield chunk
+
+    async def _astream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                       run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+                       **kwargs: Any) -> AsyncIterator[ChatGenerationChunk]:
+        if self.latencia:
+            await asyncio.sleep(self.latencia)
+        for fragmento in self._fragmentos(self._siguiente_respuesta(messages, **kwargs)):
+            chunk = ChatGenerationChunk(message=fragmento)
+            if run_manager:
+                await run_manager.on_llm_new_token(fragmento.content, chunk=chunk)
+            yield chunk
+
+
+def crear_embeddings_locales(dimension: int = 256) -> DeterministicFakeEmbedding:
+    """Embeddings determinísticos sin red para la base vectorial de prueba"""
+    return DeterministicFakeEmbedding(size=dimension)
@@ -5,9 +5,15 @@ Sistema conversacional inteligente para restaurante usando LangChain y Gemini
 """
 
 import os
-from typing import Sequence, Annotated, TypedDict, Literal
+import asyncio
+from typing import Sequence, Annotated, TypedDict, Literal, AsyncIterator, Iterator
 from datetime import datetime
+from pathlib import Path
 import json
+import time
+import uuid
+from collections import OrderedDict
+from contextlib import nullcontext
 
 # Carga de variables de entorno
 from dotenv import load_dotenv
@@ -21,9 +27,9 @@ os.environ["LANGCHAIN_ENDPOINT"] = "https://api.smith.langchain.com"
 # Componentes de LangChain
 from langchain.schema import Document
 from langchain.text_splitter import RecursiveCharacterTextSplitter
-from langchain.tools.retriever import create_retriever_tool
 from langchain_core.tools import tool
-from langchain_core.messages import BaseMessage, SystemMessage, HumanMessage
+from langchain_core.messages import BaseMessage, SystemMessage, HumanMessage, AIMessage, AIMessageChunk, ToolMessage
+from langchain_core.runnables import RunnableConfig, RunnableLambda
 
 # Componentes específicos de Google
 from langchain_google_genai import GoogleGenerativeAIEmbeddings, ChatGoogleGenerativeAI
@@ -33,32 +39,117 @@ from langchain_chroma import Chroma
 from langgraph.graph import StateGraph, START, END
 from langgraph.graph.message import add_messages
 from langgraph.prebuilt import ToolNode
+from langgraph.checkpoint.memory import MemorySaver
+from langgraph.types import Command, interrupt
 
 # Integración con Notion
 from notion_client import Client
+from ..integrations.notion_integration import NotionIntegration, texto_enriquecido
+from ..integrations.notion_batcher import NotionBlockBatcher
+from ..integrations.notion_outbox import NotionOutboxClient
+
+# Configuración del sistema
+from config.settings import Settings
 
 # Sistema Multi-Agente
 from .simple_multi_agent import SimpleMultiAgentMozoVirtual
+from .multi_agent_system import MultiAgentMozoVirtual
+from .keyword_matcher import MATCHER
+from .intent_classifier import IntentClassifier
+
+# Journal de eventos del pedido
+from ..persistence.order_journal import (
+    EVENTO_ITEM_AGREGADO, EVENTO_ITEM_ELIMINADO, EVENTO_PAGO_PROCESADO
+)
+
+# Cola de escritura en segundo plano para Notion / backup local
+from ..persistence.write_behind import WriteBehindQueue
+
+# Consultas complejas fallidas: se retoman reintentando con su request_id
+from ..persistence.checkpoints import ConsultaFallida
+
+# Log JSONL de conversaciones con buffer y rotación
+from ..persistence.conversation_log import ConversationLogWriter
+
+# Estado por sesión (mesa)
+from .session_state import TableSession, sesion_activa, usar_sesion
+
+# Memoria acotada de la conversación
+from .conversation_memory import ConversationMemory, crear_resumidor_llm
+
+# Prompt de sistema cacheado por día y versión del menú
+from .prompt_provider import SystemPromptProvider
+
+# Caché de contexto de Gemini para el prefijo invariante
+from .context_cache import ContextCacheManager, GeminiContextCacheBackend
+
+# Topes de tiempo y de llamadas al LLM por turno
+from .turn_budget import TurnBudget, BudgetExceeded, respuesta_parcial
+
+# Búsqueda especulativa en el menú en paralelo con la primera llamada al LLM
+from .retrieval_prefetch import RetrievalPrefetcher, consulta_de_menu_probable
 
 
 class AgentState(TypedDict):
     messages: Annotated[Sequence[BaseMessage], add_messages]
 
 
+# Métodos de pago por opción del menú y por palabra clave
+METODOS_PAGO = {
+    "1": "efectivo",
+    "2": "tarjeta de crédito/débito",
+    "3": "transferencia bancaria"
+}
+PALABRAS_METODO_PAGO = {
+    "efectivo": "1", "cash": "1",
+    "tarjeta": "2", "crédito": "2", "credito": "2", "débito": "2", "debito": "2",
+    "transferencia": "3"
+}
+
+
+# Salida de procesar_pago mientras el nodo "pago" espera el método del cliente
+PAGO_SOLICITADO = "[PENDIENTE] Esperando el método de pago del cliente"
+
+
+def metodo_de_pago(respuesta) -> str:
+    """Interpretar la respuesta del cliente; None si no corresponde a ningún método"""
+    texto = str(respuesta).strip().lower()
+    if texto in METODOS_PAGO:
+        return METODOS_PAGO[texto]
+    for palabra, opcion in PALABRAS_METODO_PAGO.items():
+        if palabra in texto:
+            return METODOS_PAGO[opcion]
+    return None
+
+
 class MozoVirtualAgent:
     """
     Agente conversacional Robino - Mozo Virtual del restaurante
     """
     
-    def __init__(self):
-        """Inicializar el agente con configuración y herramientas"""
-        self.setup_environment()
-        self.setup_llm()
+    def __init__(self, llm=None, embedding_model=None):
+        """Inicializar el agente con configuración y herramientas
+        
+        llm y embedding_model permiten inyectar modelos locales (tests, modo offline).
+        """
+        self.setup_environment(requiere_gemini=llm is None)
+        self.setup_llm(llm, embedding_model)
         self.setup_vectorstore()
-        # Inicializar sistema de pedidos
-        self.pedido_actual = []
-        self.total_pedido = 0.0
-        self.pagado = False
+        # Inicializar sistema de pedidos (sesión por defecto para el modo consola)
+        self.sesion_por_defecto = TableSession(self.generar_session_id())
+        # Límite de llamadas concurrentes al LLM (lo configuran SessionManager / servidor)
+        self.limite_llm = nullcontext()
+        self.limite_llm_async = nullcontext()
+        # Historial acotado: últimos turnos + resumen de los anteriores (extractivo o del LLM)
+        self.memoria = ConversationMemory(
+            resumidor=crear_resumidor_llm(self.llm) if Settings.MEMORY_LLM_SUMMARY else None
+        )
+        self.prompt_provider = SystemPromptProvider()
+        # Persistencia de conversaciones fuera del camino crítico del turno
+        self.log_conversaciones = ConversationLogWriter()
+        self.escritor_conversaciones = WriteBehindQueue(self.persistir_registro, nombre="robino-conversaciones")
+        # Claves (sesión, turno) ya persistidas: cada intercambio se escribe una sola vez
+        self.intercambios_persistidos = OrderedDict()
         # Diccionario de precios para cálculo de totales
         self.precios = {
             # Aperitivos
@@ -102,21 +193,63 @@ class MozoVirtualAgent:
             "cocido completo": 25000
         }
         self.setup_tools()
+        self.setup_context_cache()
         self.setup_graph()
-        # Inicializar sistema multi-agente
+        # Inicializar sistema multi-agente y el clasificador que decide cuándo usarlo
         self.multi_agent_system = None
         self.initialize_multi_agent()
+        self.setup_intent_classifier()
         
-    def setup_environment(self):
+    def sesion_actual(self) -> TableSession:
+        """Sesión ligada al contexto actual o la sesión por defecto"""
+        return sesion_activa() or self.sesion_por_defecto
+    
+    @property
+    def session_id(self) -> str:
+        return self.sesion_actual().session_id
+    
+    @property
+    def order_journal(self):
+        return self.sesion_actual().order_journal
+    
+    @property
+    def pedido_actual(self) -> list:
+        return self.sesion_actual().pedido_actual
+    
+    @pedido_actual.setter
+    def pedido_actual(self, valor: list):
+        self.sesion_actual().pedido_actual = valor
+    
+    @property
+    def total_pedido(self) -> float:
+        return self.sesion_actual().total_pedido
+    
+    @total_pedido.setter
+    def total_pedido(self, valor: float):
+        self.sesion_actual().total_pedido = valor
+    
+    @property
+    def pagado(self) -> bool:
+        return self.sesion_actual().pagado
+    
+    @pagado.setter
+    def pagado(self, valor: bool):
+        self.sesion_actual().pagado = valor
+    
+    def setup_environment(self, requiere_gemini: bool = True):
         """Cargar variables de entorno"""
         load_dotenv()
-        if not os.getenv("GEMINI_API_KEY"):
+        if requiere_gemini and not os.getenv("GEMINI_API_KEY"):
             raise ValueError("La variable de entorno GEMINI_API_KEY no está definida.")
         
         # Configurar Notion si está disponible
         self.notion_token = os.getenv('NOTION_API_KEY')
         if self.notion_token:
-            self.notion_client = Client(auth=self.notion_token)
+            # Control de tasa y reintentos; las escrituras de bloques se agrupan en pocas llamadas
+            notion = NotionIntegration(cliente=Client(auth=self.notion_token))
+            # Outbox durable (entrega al-menos-una-vez) o agrupador en memoria
+            self.notion_client = (NotionOutboxClient(notion) if Settings.OUTBOX_ENABLED
+                                  else NotionBlockBatcher(notion))
             self.setup_notion_page()
         else:
             self.notion_client = None
@@ -140,13 +273,20 @@ class MozoVirtualAgent:
             print(f"[ADVERTENCIA] Error configurando Notion: {e}")
             self.notion_client = None
     
-    def setup_llm(self):
+    def setup_llm(self, llm=None, embedding_model=None):
         """Configurar el modelo de lenguaje Gemini"""
+        if llm is not None:
+            self.llm = llm
+            self.embedding_model = embedding_model
+            print("Modelo local configurado correctamente.")
+            return
+        
         self.llm = ChatGoogleGenerativeAI(
             model="gemini-2.0-flash",
             google_api_key=os.getenv("GEMINI_API_KEY"), 
             temperature=0.3,
-            max_output_tokens=2048
+            max_output_tokens=2048,
+            timeout=Settings.LLM_REQUEST_TIMEOUT
         )
         self.embedding_model = GoogleGenerativeAIEmbeddings(
             model="models/gemini-embedding-001",
@@ -275,6 +415,7 @@ class MozoVirtualAgent:
     def setup_vectorstore(self):
         """Crear o cargar la base de datos vectorial"""
         documents = self.create_menu_documents()
+        self.menu_documents = documents
         text_splitter = RecursiveCharacterTextSplitter(chunk_size=500, chunk_overlap=100)
         splits = text_splitter.split_documents(documents)
         
@@ -287,12 +428,20 @@ class MozoVirtualAgent:
     def setup_tools(self):
         """Definir las herramientas del agente"""
         retriever = self.vectorstore.as_retriever(search_kwargs={"k": 3})
+        self.prefetcher = RetrievalPrefetcher(retriever)
         
-        self.retriever_tool = create_retriever_tool(
-            retriever,
-            name="consultar_menu",
-            description="Busca información sobre platos del menú, precios, ingredientes, especialidades del día, horarios del restaurante y cualquier información relacionada con La Taberna del Río."
-        )
+        @tool("consultar_menu")
+        def consultar_menu(query: str) -> str:
+            """Busca información sobre platos del menú, precios, ingredientes, especialidades del día, horarios del restaurante y cualquier información relacionada con La Taberna del Río."""
+            # Si la búsqueda especulativa del turno corresponde a esta consulta, se reutiliza
+            sesion = self.sesion_actual()
+            prefetch, sesion.prefetch = sesion.prefetch, None
+            documentos = self.prefetcher.usar(prefetch, query) if prefetch else None
+            if documentos is None:
+                documentos = self.prefetcher.buscar(query)
+            return "\n\n".join(doc.page_content for doc in documentos)
+        
+        self.retriever_tool = consultar_menu
         
         @tool
         def obtener_info_restaurante():
@@ -414,6 +563,12 @@ class MozoVirtualAgent:
                     })
                     self.total_pedido += precio_item
                 
+                self.order_journal.registrar(EVENTO_ITEM_AGREGADO, {
+                    "item": item_encontrado,
+                    "precio": precio_item,
+                    "cantidad": cantidad
+                })
+                
                 return f"[OK] Agregado al pedido: {cantidad}x {item_encontrado} (${precio_item:,} cada uno)\nTotal actual: ${self.total_pedido:,}"
             else:
                 return f"[ERROR] No se encontró '{item}' en el menú. Por favor, consulta el menú para ver los platos disponibles."
@@ -448,6 +603,12 @@ class MozoVirtualAgent:
             item_eliminado = self.pedido_actual.pop(numero_item - 1)
             self.total_pedido -= item_eliminado['precio']
             
+            self.order_journal.registrar(EVENTO_ITEM_ELIMINADO, {
+                "indice": numero_item - 1,
+                "item": item_eliminado['item'],
+                "precio": item_eliminado['precio']
+            })
+            
             return f"[OK] Eliminado: {item_eliminado['item'].title()}\nNuevo total: ${self.total_pedido:,}"
         
         @tool
@@ -459,25 +620,9 @@ class MozoVirtualAgent:
             if self.pagado:
                 return "[OK] Ya has pagado tu pedido. ¡Gracias por tu visita!"
             
-            # Preguntar por el método de pago
-            print(f"\n[MENSAJE] Total a pagar: ${self.total_pedido:,}")
-            print("[MENSAJE] ¿Cómo desea pagar?")
-            print("[MENSAJE] 1. Efectivo")
-            print("[MENSAJE] 2. Tarjeta de crédito/débito")
-            print("[MENSAJE] 3. Transferencia bancaria")
-            
-            metodo_pago = input("\n[MENSAJE] Seleccione una opción (1, 2 o 3): ")
-            
-            metodos = {
-                "1": "efectivo",
-                "2": "tarjeta de crédito/débito", 
-                "3": "transferencia bancaria"
-            }
-            
-            metodo_seleccionado = metodos.get(metodo_pago, "efectivo")
-            
-            self.pagado = True
-            return f"[OK] PAGO PROCESADO EXITOSAMENTE\n\n[DINERO] Total pagado: ${self.total_pedido:,}\n[METODO] Método de pago: {metodo_seleccionado}\n\n¡Gracias por tu visita! Tu pedido está siendo preparado. ¡Que disfrutes tu comida!"
+            # El método se pregunta en el nodo "pago", después de las herramientas: interrumpir
+            # acá repetiría al reanudar las demás herramientas pedidas en el mismo mensaje
+            return PAGO_SOLICITADO
         
         @tool
         def verificar_estado_pago():
@@ -581,66 +726,6 @@ class MozoVirtualAgent:
 ¿Te gustaría pedir algo del menú?
 """
         
-        @tool
-        def guardar_conversacion(mensaje_cliente: str, respuesta_robino: str):
-            """Guarda la conversación en Notion para análisis posterior."""
-            if not self.notion_client:
-                return "Conversación registrada localmente (Notion no disponible)"
-            
-            try:
-                # Usar la página específica de La Taberna del Río
-                page_id = "28815eef-e926-8038-9583-cff88068af9e"
-                
-                # Crear timestamp
-                timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-                
-                # Crear bloques estructurados
-                blocks = [
-                    {
-                        "object": "block",
-                        "type": "divider",
-                        "divider": {}
-                    },
-                    {
-                        "object": "block",
-                        "type": "paragraph",
-                        "paragraph": {
-                            "rich_text": [{"type": "text", "text": {"content": f"[FECHA] {timestamp}"}}]
-                        }
-                    },
-                    {
-                        "object": "block",
-                        "type": "paragraph",
-                        "paragraph": {
-                            "rich_text": [{"type": "text", "text": {"content": f"[CLIENTE] Cliente: {mensaje_cliente}"}}]
-                        }
-                    },
-                    {
-                        "object": "block",
-                        "type": "paragraph",
-                        "paragraph": {
-                            "rich_text": [{"type": "text", "text": {"content": f"[ROBINO] Robino: {respuesta_robino}"}}]
-                        }
-                    }
-                ]
-                
-                # Agregar a la página
-                self.notion_client.blocks.children.append(
-                    block_id=page_id,
-                    children=blocks
-                )
-                
-                # También guardar en archivo local como backup
-                self.guardar_conversacion_local(mensaje_cliente, respuesta_robino, timestamp)
-                
-                return "Conversación guardada exitosamente en Notion y localmente"
-                
-            except Exception as e:
-                # Si falla Notion, al menos guardar localmente
-                timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-                self.guardar_conversacion_local(mensaje_cliente, respuesta_robino, timestamp)
-                return f"Error con Notion, guardado localmente: {str(e)}"
-        
         # Asignar las herramientas al agente
         self.tools = [
             self.retriever_tool, 
@@ -651,12 +736,29 @@ class MozoVirtualAgent:
             ver_pedido_actual,
             eliminar_del_pedido,
             procesar_pago,
-            verificar_estado_pago,
-            guardar_conversacion
+            verificar_estado_pago
         ]
         print("Herramientas del agente configuradas.")
     
-    def guardar_inicio_conversacion(self, nombre_cliente: str):
+    def generar_session_id(self) -> str:
+        """Generar un identificador único para la sesión del cliente"""
+        return f"{datetime.now().strftime('%Y%m%d_%H%M%S')}_{uuid.uuid4().hex[:8]}"
+    
+    def restaurar_pedido(self, session_id: str):
+        """Recuperar el pedido de una sesión a partir de su journal (snapshot + eventos)"""
+        self.sesion_por_defecto.order_journal.cerrar()
+        self.sesion_por_defecto = TableSession(session_id)
+        self.sesion_por_defecto.restaurar_pedido()
+        print(f"[OK] Pedido restaurado: {len(self.pedido_actual)} items, total ${self.total_pedido:,}")
+    
+    def finalizar_sesion(self, sesion: TableSession = None):
+        """Tomar snapshot final del pedido y compactar el journal de la sesión"""
+        try:
+            (sesion or self.sesion_actual()).cerrar()
+        except Exception as e:
+            print(f"[ADVERTENCIA] Error compactando journal de la sesión: {e}")
+    
+    def guardar_inicio_conversacion(self, nombre_cliente: str, session_id: str = None):
         """Guardar inicio de conversación con nombre del cliente en Notion"""
         if not self.notion_client:
             return
@@ -675,7 +777,7 @@ class MozoVirtualAgent:
                     "object": "block",
                     "type": "heading_2",
                     "heading_2": {
-                        "rich_text": [{"type": "text", "text": {"content": f"NUEVA CONVERSACIÓN - {nombre_cliente}"}}]
+                        "rich_text": texto_enriquecido(f"NUEVA CONVERSACIÓN - {nombre_cliente}")
                     }
                 },
                 {
@@ -689,7 +791,7 @@ class MozoVirtualAgent:
                     "object": "block",
                     "type": "paragraph",
                     "paragraph": {
-                        "rich_text": [{"type": "text", "text": {"content": f"CLIENTE: {nombre_cliente}"}}]
+                        "rich_text": texto_enriquecido(f"CLIENTE: {nombre_cliente}")
                     }
                 },
                 {
@@ -707,26 +809,27 @@ class MozoVirtualAgent:
             )
             
             # También guardar localmente
-            self.guardar_conversacion_local(f"[INICIO] Cliente {nombre_cliente} inició conversación", "Sistema", datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
+            self.log_conversaciones.registrar_mensaje(session_id or self.session_id, "sistema",
+                                                      f"Cliente {nombre_cliente} inició conversación")
             
         except Exception as e:
             print(f"[ADVERTENCIA] Error guardando inicio de conversación en Notion: {e}")
 
-    def guardar_conversacion(self, mensaje_cliente: str, respuesta_robino: str):
+    def guardar_conversacion(self, mensaje_cliente: str, respuesta_robino: str, timestamp: str = None,
+                             session_id: str = None, latencia: float = None, turno: int = None,
+                             id_turno: str = None):
         """Método principal para guardar conversaciones en Notion y localmente."""
+        # Crear timestamp
+        timestamp = timestamp or datetime.now().strftime("%Y-%m-%d %H:%M:%S")
         if not self.notion_client:
             # Solo guardar localmente si Notion no está disponible
-            timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-            self.guardar_conversacion_local(mensaje_cliente, respuesta_robino, timestamp)
+            self.guardar_conversacion_local(mensaje_cliente, respuesta_robino, timestamp, session_id, latencia, turno)
             return "Conversación registrada localmente (Notion no disponible)"
         
         try:
             # Usar la página específica de La Taberna del Río
             page_id = "28815eef-e926-8038-9583-cff88068af9e"
             
-            # Crear timestamp
-            timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-            
             # Crear bloques estructurados
             blocks = [
                 {
@@ -745,42 +848,44 @@ class MozoVirtualAgent:
                     "object": "block",
                     "type": "paragraph",
                     "paragraph": {
-                        "rich_text": [{"type": "text", "text": {"content": f"[CLIENTE] Cliente: {mensaje_cliente}"}}]
+                        "rich_text": texto_enriquecido(f"[CLIENTE] Cliente: {mensaje_cliente}")
                     }
                 },
                 {
                     "object": "block",
                     "type": "paragraph",
                     "paragraph": {
-                        "rich_text": [{"type": "text", "text": {"content": f"[ROBINO] Robino: {respuesta_robino}"}}]
+                        "rich_text": texto_enriquecido(f"[ROBINO] Robino: {respuesta_robino}")
                     }
                 }
             ]
             
-            # Agregar a la página
+            # Agregar a la página (el outbox deduplica por clave de sesión y turno)
             self.notion_client.blocks.children.append(
                 block_id=page_id,
-                children=blocks
+                children=blocks,
+                clave=self.clave_intercambio(session_id, id_turno)
             )
             
             # También guardar en archivo local como backup
-            self.guardar_conversacion_local(mensaje_cliente, respuesta_robino, timestamp)
+            self.guardar_conversacion_local(mensaje_cliente, respuesta_robino, timestamp, session_id, latencia, turno)
             
             return "Conversación guardada exitosamente en Notion y localmente"
             
         except Exception as e:
             # Si falla Notion, al menos guardar localmente
-            timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-            self.guardar_conversacion_local(mensaje_cliente, respuesta_robino, timestamp)
+            self.guardar_conversacion_local(mensaje_cliente, respuesta_robino, timestamp, session_id, latencia, turno)
             return f"Error con Notion, guardado localmente: {str(e)}"
     
-    def guardar_conversacion_local(self, mensaje_cliente: str, respuesta_robino: str, timestamp: str):
-        """Guarda la conversación en un archivo local como backup."""
+    def guardar_conversacion_local(self, mensaje_cliente: str, respuesta_robino: str, timestamp: str,
+                                   session_id: str = None, latencia: float = None, turno: int = None):
+        """Guarda el intercambio en el log JSONL local (Settings.LOG_FILE) como backup."""
         try:
-            log_entry = f"\n[{timestamp}] Cliente: {mensaje_cliente}\n[{timestamp}] Robino: {respuesta_robino}\n"
-            
-            with open("conversaciones_robino.log", "a", encoding="utf-8") as f:
-                f.write(log_entry)
+            session_id = session_id or self.session_id
+            self.log_conversaciones.registrar_mensaje(session_id, "cliente", mensaje_cliente,
+                                                      timestamp=timestamp, turno=turno)
+            self.log_conversaciones.registrar_mensaje(session_id, "robino", respuesta_robino,
+                                                      latencia=latencia, timestamp=timestamp, turno=turno)
         except Exception as e:
             print(f"Error guardando conversación local: {e}")
     
@@ -789,57 +894,163 @@ class MozoVirtualAgent:
         timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
         self.guardar_conversacion_local(mensaje_cliente, respuesta_robino, timestamp)
     
+    def setup_context_cache(self, backend=None):
+        """Configurar el caché de contexto de Gemini (backend local para tests)"""
+        self.context_cache = None
+        self._llm_cacheado = (None, None)
+        if backend is None:
+            if not Settings.CONTEXT_CACHE_ENABLED or not isinstance(self.llm, ChatGoogleGenerativeAI):
+                return
+            backend = GeminiContextCacheBackend(os.getenv("GEMINI_API_KEY"), self.llm.model)
+        self.context_cache = ContextCacheManager(backend, herramientas=self.tools)
+    
+    def contenido_cacheable(self) -> tuple:
+        """Prefijo invariante para el caché: instrucciones, menú completo e info del restaurante
+        
+        El menú se lee de los mismos archivos que definen su versión: un cambio en el menú
+        cambia el contenido y el caché se recrea con el menú nuevo.
+        """
+        info = [doc.page_content for doc in self.menu_documents if doc.metadata.get("type") == "restaurant_info"]
+        contenido = "\n\n".join([self.prompt_provider.contenido_menu()] + info)
+        return self.prompt_provider.prefijo_estable, contenido
+    
     def setup_graph(self):
         """Construir el grafo de conversación"""
-        def agent_node(state: AgentState):
-            """Nodo del agente que procesa mensajes y decide acciones"""
-            # Obtener fecha actual
-            from datetime import datetime
-            fecha_actual = datetime.now()
-            dia_semana = fecha_actual.strftime("%A")
-            dia_espanol = {
-                "Monday": "Lunes", "Tuesday": "Martes", "Wednesday": "Miércoles",
-                "Thursday": "Jueves", "Friday": "Viernes", "Saturday": "Sábado", "Sunday": "Domingo"
-            }
-            dia_actual = dia_espanol.get(dia_semana, dia_semana)
-            
-            system_prompt = f"""
-            Eres Robino, el mozo virtual del restaurante "La Taberna del Río".
-            
-            FECHA ACTUAL: {dia_actual}, {fecha_actual.strftime('%d/%m/%Y')}
-            
-            REGLA FUNDAMENTAL: SIEMPRE usa las herramientas disponibles. NUNCA respondas con texto libre cuando hay una herramienta específica.
-            
-            CUANDO EL CLIENTE PIDA EL MENÚ:
-            - "carta" → mostrar_menu_completo()
-            - "menú" → mostrar_menu_completo()
-            - "la carta" → mostrar_menu_completo()
-            - "el menu" → mostrar_menu_completo()
-            - "menu" → mostrar_menu_completo()
-            - "QUe hay para cenar?" → mostrar_menu_completo()
-            - "¿qué hay para cenar?" → mostrar_menu_completo()
-            
-            OTRAS HERRAMIENTAS:
-            - Para pedidos → agregar_al_pedido()
-            - Para pagos → procesar_pago()
-            - Para ver pedido → ver_pedido_actual()
-            
-            ESPECIALIDADES DEL DIA:
-            - Lunes: Cocido Madrileño - $20.000
-            - Martes: Fabada Asturiana - $22.000
-            - Miércoles: Gazpacho y Salmorejo - $15.000
-            - Jueves: Pulpo a Feira - $25.000
-            - Viernes: Paella de Mariscos - $32.000
-            - Sábado: Cochinillo Asado - $45.000
-            - Domingo: Cocido Completo - $25.000
-            
-            RECUERDA: USA LAS HERRAMIENTAS. NO RESPONDAS CON TEXTO LIBRE.
+        def construir_mensajes(state: AgentState) -> list:
+            """Armar el prompt de sistema (cacheado por día) y el historial para el LLM"""
+            mensajes = [self.prompt_provider.obtener()]
+            
+            resumen = self.sesion_actual().resumen
+            if resumen:
+                # Gemini concatena los SystemMessage adicionales a la instrucción de sistema
+                mensajes.append(SystemMessage(content=f"RESUMEN DE LA CONVERSACIÓN ANTERIOR:\n{resumen}"))
+            
+            return mensajes + list(state["messages"])
+        
+        def preparar_llamada(state: AgentState):
+            """Elegir modelo y mensajes: con caché de contexto o con el prompt completo"""
+            handle = None
+            if self.context_cache:
+                handle = self.context_cache.obtener_handle(
+                    self.prompt_provider.version_menu(), self.contenido_cacheable
+                )
+            if handle is None:
+                return self.llm_with_tools, construir_mensajes(state)
+            
+            # El caché ya contiene instrucciones, menú y herramientas: Gemini no admite
+            # repetir system_instruction ni tools, así que el contexto variable va como mensaje
+            if self._llm_cacheado[0] != handle:
+                self._llm_cacheado = (handle, self.llm.bind(cached_content=handle))
+            contexto = self.prompt_provider.linea_fecha(datetime.now().date())
+            resumen = self.sesion_actual().resumen
+            if resumen:
+                contexto += f"\nRESUMEN DE LA CONVERSACIÓN ANTERIOR:\n{resumen}"
+            return self._llm_cacheado[1], [HumanMessage(content=f"[CONTEXTO] {contexto}")] + list(state["messages"])
+        
+        def especular_busqueda(state: AgentState):
+            """En la primera llamada del turno, buscar el mensaje del cliente mientras responde el LLM
+            
+            Sólo si el mensaje parece una consulta al menú; si no, el turno se cuenta como omitido.
             """
+            sesion = self.sesion_actual()
+            ultimo = state["messages"][-1]
+            if Settings.PREFETCH_ENABLED and sesion.prefetch is None and isinstance(ultimo, HumanMessage):
+                if consulta_de_menu_probable(ultimo.content):
+                    sesion.prefetch = self.prefetcher.iniciar(ultimo.content)
+                else:
+                    self.prefetcher.omitir()
+        
+        def agent_node(state: AgentState, config: RunnableConfig):
+            """Nodo del agente que procesa mensajes y decide acciones"""
+            especular_busqueda(state)
+            llm, messages = preparar_llamada(state)
             
-            messages = [SystemMessage(content=system_prompt)] + state["messages"]
-            response = self.llm_with_tools.invoke(messages)
+            presupuesto = config["configurable"].get("presupuesto")
+            
+            def invocar():
+                if presupuesto:
+                    # Medido al arrancar la llamada: la espera por el límite ya consumió tiempo
+                    return llm.invoke(messages, config, timeout=presupuesto.plazo_cliente())
+                return llm.invoke(messages, config)
+            
+            try:
+                if presupuesto:
+                    # El lugar en el límite se libera también si la llamada se abandona por tiempo
+                    response = presupuesto.llamar(invocar, limite=self.limite_llm)
+                else:
+                    with self.limite_llm:
+                        response = invocar()
+            except BudgetExceeded:
+                # Sin tool_calls el grafo termina: se responde con lo que haya
+                response = AIMessage(content=respuesta_parcial(state["messages"]))
             return {"messages": [response]}
         
+        async def aagent_node(state: AgentState, config: RunnableConfig):
+            """Versión async del nodo del agente (ainvoke/astream) sin bloquear hilos"""
+            especular_busqueda(state)
+            # Crear o refrescar el caché de contexto es una llamada de red bloqueante:
+            # se hace fuera del event loop
+            llm, messages = (await asyncio.to_thread(preparar_llamada, state) if self.context_cache
+                             else preparar_llamada(state))
+            
+            presupuesto = config["configurable"].get("presupuesto")
+            
+            async def invocar():
+                async with self.limite_llm_async:
+                    if presupuesto:
+                        return await llm.ainvoke(messages, config, timeout=presupuesto.plazo_cliente())
+                    return await llm.ainvoke(messages, config)
+            
+            try:
+                response = await presupuesto.allamar(invocar) if presupuesto else await invocar()
+            except BudgetExceeded:
+                response = AIMessage(content=respuesta_parcial(state["messages"]))
+            return {"messages": [response]}
+        
+        def pagos_solicitados(state: AgentState) -> list:
+            """Salidas de procesar_pago de la última tanda de herramientas que esperan el método"""
+            solicitudes = []
+            for mensaje in reversed(state["messages"]):
+                if not isinstance(mensaje, ToolMessage):
+                    break
+                if mensaje.name == "procesar_pago" and mensaje.content == PAGO_SOLICITADO:
+                    solicitudes.append(mensaje)
+            return solicitudes
+        
+        def pago_node(state: AgentState):
+            """Preguntar el método de pago y registrarlo
+            
+            La sesión queda estacionada en la interrupción; al reanudar sólo se repite este
+            nodo, así que las herramientas del mismo mensaje no se vuelven a ejecutar.
+            """
+            mensaje = (f"[MENSAJE] Total a pagar: ${self.total_pedido:,}\n"
+                       "[MENSAJE] ¿Cómo desea pagar?\n"
+                       "[MENSAJE] 1. Efectivo\n"
+                       "[MENSAJE] 2. Tarjeta de crédito/débito\n"
+                       "[MENSAJE] 3. Transferencia bancaria\n\n"
+                       "[MENSAJE] Seleccione una opción (1, 2 o 3)")
+            respuesta = interrupt({"tipo": "pago", "total": self.total_pedido, "mensaje": mensaje})
+            metodo_seleccionado = metodo_de_pago(respuesta)
+            while metodo_seleccionado is None:
+                respuesta = interrupt({"tipo": "pago", "total": self.total_pedido,
+                                       "mensaje": f"[MENSAJE] No entendí el método de pago '{respuesta}'.\n{mensaje}"})
+                metodo_seleccionado = metodo_de_pago(respuesta)
+            
+            self.pagado = True
+            self.order_journal.registrar(EVENTO_PAGO_PROCESADO, {
+                "metodo": metodo_seleccionado,
+                "total": self.total_pedido
+            })
+            resultado = f"[OK] PAGO PROCESADO EXITOSAMENTE\n\n[DINERO] Total pagado: ${self.total_pedido:,}\n[METODO] Método de pago: {metodo_seleccionado}\n\n¡Gracias por tu visita! Tu pedido está siendo preparado. ¡Que disfrutes tu comida!"
+            # Mismo id: add_messages reemplaza la salida pendiente por el resultado
+            return {"messages": [ToolMessage(content=resultado, tool_call_id=solicitud.tool_call_id,
+                                             name=solicitud.name, id=solicitud.id)
+                                 for solicitud in pagos_solicitados(state)]}
+        
+        def despues_de_herramientas(state: AgentState) -> Literal["pago", "agent"]:
+            """Pasar por el nodo de pago si procesar_pago quedó esperando el método"""
+            return "pago" if pagos_solicitados(state) else "agent"
+        
         def should_continue(state: AgentState) -> Literal["tools", "__end__"]:
             """Determina si usar herramientas o terminar"""
             if state["messages"][-1].tool_calls:
@@ -851,22 +1062,35 @@ class MozoVirtualAgent:
         
         # Construir grafo
         graph = StateGraph(AgentState)
-        graph.add_node("agent", agent_node)
+        graph.add_node("agent", RunnableLambda(agent_node, afunc=aagent_node, name="agent"))
         graph.add_node("tools", ToolNode(self.tools))
+        graph.add_node("pago", pago_node)
         
         graph.set_entry_point("agent")
         graph.add_conditional_edges(
             "agent", should_continue, {"tools": "tools", "__end__": END}
         )
-        graph.add_edge("tools", "agent")
+        graph.add_conditional_edges(
+            "tools", despues_de_herramientas, {"pago": "pago", "agent": "agent"}
+        )
+        graph.add_edge("pago", "agent")
         
-        self.graph = graph.compile()
+        # El checkpointer guarda la ejecución interrumpida (pago pendiente) hasta que el cliente responda
+        self.checkpointer = MemorySaver()
+        self.graph = graph.compile(checkpointer=self.checkpointer)
         print("Grafo de conversación construido correctamente.")
     
     def initialize_multi_agent(self):
-        """Inicializar el sistema multi-agente"""
+        """Inicializar el sistema multi-agente (Settings.MULTI_AGENT_SYSTEM)
+        
+        Con "grafo" cada consulta queda en checkpoints: si el cliente repite una consulta
+        que falló, responder_compleja la retoma desde el último nodo completado.
+        """
+        sistemas = {"simple": SimpleMultiAgentMozoVirtual, "grafo": MultiAgentMozoVirtual}
         try:
-            self.multi_agent_system = SimpleMultiAgentMozoVirtual(
+            if Settings.MULTI_AGENT_SYSTEM not in sistemas:
+                raise ValueError(f"Sistema multi-agente no soportado: {Settings.MULTI_AGENT_SYSTEM}")
+            self.multi_agent_system = sistemas[Settings.MULTI_AGENT_SYSTEM](
                 vectorstore=self.vectorstore,
                 notion_client=self.notion_client
             )
@@ -875,21 +1099,313 @@ class MozoVirtualAgent:
             print(f"[ADVERTENCIA] Error inicializando sistema multi-agente: {e}")
             self.multi_agent_system = None
     
+    def setup_intent_classifier(self):
+        """Entrenar el clasificador local de intención (sin él se usa sólo la regla de palabras clave)"""
+        try:
+            self.clasificador_intencion = IntentClassifier.desde_archivo()
+            print("[OK] Clasificador de intención entrenado.")
+        except Exception as e:
+            print(f"[ADVERTENCIA] No se pudo entrenar el clasificador de intención: {e}")
+            self.clasificador_intencion = None
+    
     def is_complex_query(self, query: str) -> bool:
-        """Determina si una consulta requiere el sistema multi-agente"""
-        complex_keywords = [
-            "recomendar", "recomendación", "sugerir", "qué me recomiendas",
-            "qué me sugieres", "ayuda a elegir", "no sé qué pedir",
-            "romántica", "pareja", "familia", "negocio", "especial",
-            "vegetariano", "vegano", "sin gluten", "alergias", "informe"
-        ]
-        query_lower = query.lower()
-        return any(keyword in query_lower for keyword in complex_keywords)
+        """Determina si una consulta requiere el sistema multi-agente
+        
+        Un pedido explícito de recomendación, restricción alimentaria o informe va
+        siempre al multi-agente; si no, decide el clasificador local cuando su
+        confianza alcanza el umbral, y si no, la regla de palabras clave.
+        """
+        categorias = MATCHER.categorias(query)
+        if "ruteo_explicito" in categorias:
+            return True
+        if self.clasificador_intencion is not None:
+            etiqueta, confianza = self.clasificador_intencion.clasificar(query)
+            if confianza >= Settings.INTENT_CONFIDENCE_THRESHOLD:
+                return etiqueta == "compleja"
+        return bool(categorias & {"investigacion", "informe"})
+    
+    def procesar_turno(self, query: str, sesion: TableSession = None) -> str:
+        """Procesar un mensaje del cliente en su sesión y devolver la respuesta de Robino"""
+        sesion = sesion or self.sesion_actual()
+        
+        with sesion.lock, usar_sesion(sesion):
+            inicio = time.perf_counter()
+            final_response = self.responder_compleja(sesion, query) if self.iniciar_turno(sesion, query) else None
+            
+            if final_response is None:
+                config = self.config_turno(sesion)
+                self.graph.invoke(self.entrada_turno(sesion, query), config)
+                final_response = self.resolver_ejecucion(sesion, self.graph.get_state(config))
+            
+            self.cerrar_turno(sesion, query, final_response, inicio)
+        
+        return final_response
+    
+    def iniciar_turno(self, sesion: TableSession, query: str) -> bool:
+        """Agregar el mensaje al historial; True si la consulta va al sistema multi-agente
+        
+        Con un pago pendiente, el mensaje es la respuesta del cliente a la interrupción:
+        no entra al historial ni se enruta.
+        """
+        if sesion.pago_pendiente is not None:
+            return False
+        sesion.historial.append(HumanMessage(content=query))
+        return self.multi_agent_system is not None and self.is_complex_query(query)
+    
+    def responder_compleja(self, sesion: TableSession, query: str):
+        """Responder con el sistema multi-agente; None si falla (sigue el agente simple)
+        
+        El request_id es estable (sesión y turno); si el cliente repite una consulta que
+        falló, se reusa el de la ejecución fallida para retomarla desde su checkpoint.
+        """
+        print("\n[BUSCAR] Detectada consulta compleja - Activando sistema multi-agente...")
+        fallida = sesion.consulta_fallida
+        if fallida is not None and fallida["query"] == query:
+            request_id = fallida["request_id"]
+        else:
+            request_id = f"{sesion.session_id}:{sesion.id_turno()}"
+        try:
+            final_response = self.multi_agent_system.process_complex_query(query, request_id=request_id)
+        except ConsultaFallida as e:
+            sesion.consulta_fallida = {"query": query, "request_id": e.request_id}
+            print(f"[ADVERTENCIA] Error en sistema multi-agente, usando agente simple: {e}")
+            return None
+        except Exception as e:
+            print(f"[ADVERTENCIA] Error en sistema multi-agente, usando agente simple: {e}")
+            return None
+        sesion.consulta_fallida = None
+        sesion.historial.append(AIMessage(content=final_response))
+        return final_response
+    
+    def config_turno(self, sesion: TableSession) -> dict:
+        """Config del grafo: hilo del pago pendiente o uno nuevo para el turno, con su presupuesto
+        
+        Cada vuelta agente <-> herramientas son dos pasos del grafo; el límite de recursión
+        es el respaldo del tope de llamadas al LLM.
+        """
+        if sesion.pago_pendiente is not None:
+            thread_id = sesion.pago_pendiente["thread_id"]
+        else:
+            thread_id = f"{sesion.session_id}:{uuid.uuid4().hex[:8]}"
+        presupuesto = TurnBudget("agente", Settings.AGENT_TURN_TIMEOUT, Settings.MAX_LLM_CALLS_PER_TURN)
+        return {"configurable": {"thread_id": thread_id, "presupuesto": presupuesto},
+                "recursion_limit": 2 * Settings.MAX_ITERATIONS + 1}
+    
+    def entrada_turno(self, sesion: TableSession, query: str):
+        """Entrada del grafo: el historial o la reanudación de la interrupción pendiente"""
+        if sesion.pago_pendiente is not None:
+            return Command(resume=query)
+        return {"messages": sesion.historial}
+    
+    def resolver_ejecucion(self, sesion: TableSession, estado) -> str:
+        """Estacionar la sesión si el grafo quedó interrumpido; si no, tomar el resultado
+        
+        Mientras espera, el estado vive en el checkpointer: no se retiene hilo ni llamada al LLM.
+        """
+        thread_id = estado.config["configurable"]["thread_id"]
+        if estado.interrupts:
+            interrupcion = estado.interrupts[0].value
+            sesion.pago_pendiente = {"thread_id": thread_id, **interrupcion}
+            return interrupcion["mensaje"]
+        
+        sesion.pago_pendiente = None
+        sesion.historial = list(estado.values["messages"])
+        self.checkpointer.delete_thread(thread_id)
+        return sesion.historial[-1].content
+    
+    def cerrar_turno(self, sesion: TableSession, query: str, final_response: str, inicio: float):
+        """Contabilizar el turno, acotar la memoria y encolar su persistencia"""
+        if sesion.prefetch is not None:
+            # El modelo no consultó el menú: la búsqueda especulativa se descarta
+            self.prefetcher.cancelar(sesion.prefetch)
+            sesion.prefetch = None
+        sesion.turnos += 1
+        if sesion.pago_pendiente is None:
+            # El historial de un turno interrumpido se reemplaza al reanudar: se compacta después
+            self.memoria.compactar(sesion)
+        self.registrar_intercambio(query, final_response, time.perf_counter() - inicio)
+    
+    def registrar_intercambio(self, query: str, final_response: str, latencia: float = None):
+        """Encolar el intercambio para guardarlo en segundo plano sin demorar el turno"""
+        self.escritor_conversaciones.encolar({
+            "tipo": "intercambio",
+            "mensaje_cliente": query,
+            "respuesta_robino": final_response,
+            "session_id": self.session_id,
+            "turno": self.sesion_actual().turnos,
+            "id_turno": self.sesion_actual().id_turno(),
+            "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            "latencia": latencia
+        })
+    
+    def registrar_inicio_conversacion(self, nombre_cliente: str, session_id: str = None):
+        """Encolar el inicio de conversación de un cliente
+        
+        El session_id se fija al encolar: el hilo escritor no ve la sesión del contexto de quien encola.
+        """
+        self.escritor_conversaciones.encolar({"tipo": "inicio", "nombre_cliente": nombre_cliente,
+                                              "session_id": session_id or self.session_id})
+    
+    @staticmethod
+    def clave_intercambio(session_id: str, id_turno: str):
+        """Clave de idempotencia de un intercambio; None si no se conoce el turno"""
+        return None if session_id is None or id_turno is None else f"{session_id}:{id_turno}"
+    
+    def marcar_persistido(self, clave: str) -> bool:
+        """Registrar la clave; False si el intercambio ya se había persistido"""
+        if clave in self.intercambios_persistidos:
+            return False
+        self.intercambios_persistidos[clave] = True
+        if len(self.intercambios_persistidos) > Settings.PERSISTED_KEYS_MAX:
+            self.intercambios_persistidos.popitem(last=False)
+        return True
+    
+    def persistir_registro(self, registro: dict):
+        """Sink del escritor en segundo plano: Notion y backup local, una vez por (sesión, turno)"""
+        if registro["tipo"] == "inicio":
+            self.guardar_inicio_conversacion(registro["nombre_cliente"], registro.get("session_id"))
+            return
+        
+        clave = self.clave_intercambio(registro.get("session_id"), registro.get("id_turno"))
+        if clave is not None and not self.marcar_persistido(clave):
+            return
+        
+        query, final_response = registro["mensaje_cliente"], registro["respuesta_robino"]
+        metadatos = {"timestamp": registro.get("timestamp"), "session_id": registro.get("session_id"),
+                     "latencia": registro.get("latencia"), "turno": registro.get("turno"),
+                     "id_turno": registro.get("id_turno")}
+        try:
+            self.guardar_conversacion(query, final_response, **metadatos)
+        except Exception as e:
+            # Fallback: guardar solo localmente
+            try:
+                metadatos["timestamp"] = metadatos["timestamp"] or datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+                metadatos.pop("id_turno")
+                self.guardar_conversacion_local(query, final_response, **metadatos)
+            except Exception as e2:
+                pass  # Silenciar errores de guardado
+    
+    def cerrar(self):
+        """Escribir los registros pendientes y detener el escritor en segundo plano"""
+        self.escritor_conversaciones.cerrar()
+        self.prefetcher.cerrar()
+        if isinstance(self.notion_client, (NotionBlockBatcher, NotionOutboxClient)):
+            self.notion_client.cerrar()
+        self.log_conversaciones.cerrar()
+    
+    @staticmethod
+    def texto_visible(fragmento, metadata: dict) -> str:
+        """Texto de un fragmento del stream que debe ver el cliente
+        
+        Solo se muestran tokens del nodo del agente; los pasos de llamadas a
+        herramientas y las salidas de las herramientas quedan ocultos.
+        """
+        if metadata.get("langgraph_node") != "agent":
+            return ""
+        if not isinstance(fragmento, AIMessageChunk) or fragmento.tool_call_chunks:
+            return ""
+        return fragmento.content if isinstance(fragmento.content, str) else ""
+    
+    def stream_turno(self, query: str, sesion: TableSession = None) -> Iterator[str]:
+        """Procesar un turno emitiendo los tokens de la respuesta final a medida que llegan"""
+        sesion = sesion or self.sesion_actual()
+        
+        with sesion.lock, usar_sesion(sesion):
+            inicio = time.perf_counter()
+            final_response = self.responder_compleja(sesion, query) if self.iniciar_turno(sesion, query) else None
+            
+            if final_response is not None:
+                yield final_response
+            else:
+                config = self.config_turno(sesion)
+                emitidos = []
+                for modo, dato in self.graph.stream(
+                    self.entrada_turno(sesion, query), config, stream_mode=["messages", "values"]
+                ):
+                    if modo == "messages" and (texto := self.texto_visible(*dato)):
+                        emitidos.append(texto)
+                        yield texto
+                
+                final_response = self.resolver_ejecucion(sesion, self.graph.get_state(config))
+                if self.respuesta_fuera_del_stream(sesion, config):
+                    if resto := self.resto_sin_emitir(final_response, "".join(emitidos)):
+                        yield resto
+            
+            self.cerrar_turno(sesion, query, final_response, inicio)
+    
+    @staticmethod
+    def respuesta_fuera_del_stream(sesion: TableSession, config: dict) -> bool:
+        """La interrupción de pago y la respuesta parcial por presupuesto no pasan por el stream del LLM"""
+        return sesion.pago_pendiente is not None or bool(config["configurable"]["presupuesto"].excedido)
+    
+    @staticmethod
+    def resto_sin_emitir(respuesta: str, emitido: str) -> str:
+        """Parte de una respuesta fuera del stream que el cliente todavía no vio
+        
+        La respuesta parcial por presupuesto puede ser un texto del modelo que ya se
+        emitió token a token: no se repite.
+        """
+        if not emitido:
+            return respuesta
+        if respuesta in emitido:
+            return ""
+        if respuesta.startswith(emitido):
+            return respuesta[len(emitido):]
+        return "\n\n" + respuesta
+    
+    async def aprocesar_turno(self, query: str, sesion: TableSession) -> str:
+        """Versión async de procesar_turno: el grafo se ejecuta con ainvoke
+        
+        El llamador debe serializar los turnos de la misma sesión.
+        """
+        with usar_sesion(sesion):
+            inicio = time.perf_counter()
+            final_response = None
+            if self.iniciar_turno(sesion, query):
+                final_response = await asyncio.to_thread(self.responder_compleja, sesion, query)
+            
+            if final_response is None:
+                config = self.config_turno(sesion)
+                await self.graph.ainvoke(self.entrada_turno(sesion, query), config)
+                final_response = self.resolver_ejecucion(sesion, await self.graph.aget_state(config))
+            
+            self.cerrar_turno(sesion, query, final_response, inicio)
+        
+        return final_response
+    
+    async def astream_turno(self, query: str, sesion: TableSession) -> AsyncIterator[str]:
+        """Procesar un turno emitiendo los tokens de la respuesta final a medida que llegan
+        
+        Los pasos de llamadas a herramientas no se emiten. El llamador debe
+        serializar los turnos de la misma sesión.
+        """
+        with usar_sesion(sesion):
+            inicio = time.perf_counter()
+            final_response = None
+            if self.iniciar_turno(sesion, query):
+                final_response = await asyncio.to_thread(self.responder_compleja, sesion, query)
+            
+            if final_response is not None:
+                yield final_response
+            else:
+                config = self.config_turno(sesion)
+                emitidos = []
+                async for modo, dato in self.graph.astream(
+                    self.entrada_turno(sesion, query), config, stream_mode=["messages", "values"]
+                ):
+                    if modo == "messages" and (texto := self.texto_visible(*dato)):
+                        emitidos.append(texto)
+                        yield texto
+                
+                final_response = self.resolver_ejecucion(sesion, await self.graph.aget_state(config))
+                if self.respuesta_fuera_del_stream(sesion, config):
+                    if resto := self.resto_sin_emitir(final_response, "".join(emitidos)):
+                        yield resto
+            
+            self.cerrar_turno(sesion, query, final_response, inicio)
     
     def start_conversation(self):
         """Iniciar conversación interactiva con Robino"""
-        conversation_history = []
-        
         print("\n" + "="*60)
         print("    BIENVENIDO A LA TABERNA DEL RIO")
         print("="*60)
@@ -898,12 +1414,10 @@ class MozoVirtualAgent:
         # Solicitar nombre del cliente primero
         print("\nPara brindarte el mejor servicio, necesito conocer tu nombre.")
         nombre_cliente = input("¿Cómo te llamas? ")
+        self.sesion_por_defecto.nombre_cliente = nombre_cliente
         
-        # Almacenar nombre en Notion (sin mostrar mensajes)
-        try:
-            self.guardar_inicio_conversacion(nombre_cliente)
-        except Exception as e:
-            pass  # Silenciar errores de guardado
+        # Almacenar nombre en Notion en segundo plano (sin mostrar mensajes)
+        self.registrar_inicio_conversacion(nombre_cliente)
         
         print(f"\n¡Perfecto, {nombre_cliente}! Bienvenido a La Taberna del Río.")
         
@@ -923,28 +1437,17 @@ class MozoVirtualAgent:
                     print("\nRobino: ¡Gracias por tu visita! ¡Esperamos verte pronto!")
                     break
             
-            # Procesar mensaje
-            conversation_history.append(HumanMessage(content=query))
-            
-            # Decidir si usar sistema multi-agente o agente simple
-            if self.is_complex_query(query) and self.multi_agent_system:
-                print("\n[BUSCAR] Detectada consulta compleja - Activando sistema multi-agente...")
-                try:
-                    # Usar sistema multi-agente para consultas complejas
-                    final_response = self.multi_agent_system.process_complex_query(query)
-                    conversation_history.append(HumanMessage(content=final_response))
-                except Exception as e:
-                    print(f"[ADVERTENCIA] Error en sistema multi-agente, usando agente simple: {e}")
-                    # Fallback al agente simple
-                    result = self.graph.invoke({"messages": conversation_history})
-                    conversation_history = result["messages"]
-                    final_response = conversation_history[-1].content
+            if Settings.STREAMING_ENABLED:
+                print("\nRobino: ", end="", flush=True)
+                fragmentos = []
+                for texto in self.stream_turno(query):
+                    fragmentos.append(texto)
+                    print(texto, end="", flush=True)
+                print()
+                final_response = "".join(fragmentos)
             else:
-                # Usar agente simple para consultas básicas
-                result = self.graph.invoke({"messages": conversation_history})
-                conversation_history = result["messages"]
-                final_response = conversation_history[-1].content
-            print(f"\nRobino: {final_response}")
+                final_response = self.procesar_turno(query)
+                print(f"\nRobino: {final_response}")
             
             # Verificar si el cliente ha pagado y se está despidiendo
             if self.pagado and self.pedido_actual:
@@ -955,16 +1458,9 @@ class MozoVirtualAgent:
                     print("¡HASTA LUEGO! ¡Esperamos verte pronto en La Taberna del Río!")
                     print("="*60)
                     break
-            
-            # Guardar conversación en Notion automáticamente (sin mostrar mensajes)
-            try:
-                self.guardar_conversacion(query, final_response)
-            except Exception as e:
-                # Fallback: guardar solo localmente
-                try:
-                    self.guardar_conversacion_local_simple(query, final_response)
-                except Exception as e2:
-                    pass  # Silenciar errores de guardado
+        
+        self.finalizar_sesion()
+        self.cerrar()
 
 
 def main():
@@ -7,7 +7,11 @@ Implementa dos agentes colaborativos: Investigador y Generador de Informes
 import os
 from typing import Sequence, Annotated, TypedDict, Literal
 from datetime import datetime
+from pathlib import Path
 import json
+import time
+import uuid
+import threading
 
 # Carga de variables de entorno
 from dotenv import load_dotenv
@@ -25,7 +29,8 @@ from langchain.tools.retriever import create_retriever_tool
 from langchain.agents import create_react_agent
 from langchain.prompts import PromptTemplate
 from langchain_core.tools import tool
-from langchain_core.messages import BaseMessage, SystemMessage, HumanMessage
+from langchain_core.messages import BaseMessage, SystemMessage, HumanMessage, AIMessage
+from langchain_core.runnables import RunnableConfig, RunnableLambda
 
 # Componentes específicos de Google
 from langchain_google_genai import GoogleGenerativeAIEmbeddings, ChatGoogleGenerativeAI
@@ -38,10 +43,93 @@ from langgraph.prebuilt import ToolNode
 
 # Integración con Notion
 from notion_client import Client
+from ..integrations.notion_integration import texto_enriquecido
+
+# Detector de palabras clave y contexto de investigación por consulta
+from .keyword_matcher import MATCHER, extraer_preferencias
+from .recommender import RecommendationEngine
+from .investigation_context import InvestigationStateMixin, usar_contexto_investigacion
+from .turn_budget import TurnBudget, BudgetExceeded, respuesta_parcial
 
 # LangSmith Observer
 from ..observability.langsmith_observer import LangSmithObserver
 
+# Almacén indexado de informes e historial acotado en memoria
+from ..persistence.report_store import ReportStore
+from ..persistence.report_history import ReportHistory
+
+# Checkpoints del grafo en SQLite: reintentos que retoman y trazas reproducibles
+from ..persistence.checkpoints import (ConsultaFallida, crear_checkpointer, config_ejecucion,
+                                       pasos_ejecucion, podar_checkpoints)
+
+# Configuración
+from config.settings import Settings
+
+
+# Prompts de los sub-agentes: se construyen una vez al importar el módulo
+PROMPT_INVESTIGADOR = PromptTemplate(
+    input_variables=["input", "agent_scratchpad", "tools", "tool_names"],
+    template="""
+Eres el Agente Investigador del sistema multi-agente de La Taberna del Río.
+
+Tu función:
+1. Buscar información específica en la base de conocimiento
+2. Analizar las preferencias del cliente
+3. Preparar datos para el agente generador
+
+IMPORTANTE: DEBES USAR LAS HERRAMIENTAS DISPONIBLES.
+
+Instrucciones:
+- SIEMPRE usa 'investigar_plato_detallado' para búsquedas específicas
+- SIEMPRE usa 'analizar_preferencias_cliente' para entender necesidades
+- NO respondas sin usar las herramientas
+- Después de usar las herramientas, resume tus hallazgos
+- Siempre responde en español
+- Sé meticuloso en la investigación
+
+Herramientas disponibles:
+{tools}
+
+Nombres de herramientas: {tool_names}
+
+Input: {input}
+
+{agent_scratchpad}
+"""
+)
+
+PROMPT_GENERADOR = PromptTemplate(
+    input_variables=["input", "agent_scratchpad", "tools", "tool_names"],
+    template="""
+Eres el Agente Generador de Informes del sistema multi-agente de La Taberna del Río.
+
+Tu función:
+1. Crear informes estructurados basados en la investigación
+2. Generar recomendaciones personalizadas
+3. Guardar informes en Notion
+
+IMPORTANTE: DEBES USAR LAS HERRAMIENTAS DISPONIBLES.
+
+Instrucciones:
+- SIEMPRE usa 'generar_informe_recomendacion' para crear informes
+- SIEMPRE usa 'guardar_informe_notion' para persistir datos
+- SIEMPRE usa 'generar_resumen_decision' para resumir decisiones
+- NO respondas sin usar las herramientas
+- Después de usar las herramientas, proporciona un resumen claro
+- Siempre responde en español
+- Crea informes profesionales y estructurados
+
+Herramientas disponibles:
+{tools}
+
+Nombres de herramientas: {tool_names}
+
+Input: {input}
+
+{agent_scratchpad}
+"""
+)
+
 
 class MultiAgentState(TypedDict):
     messages: Annotated[Sequence[BaseMessage], add_messages]
@@ -51,27 +139,40 @@ class MultiAgentState(TypedDict):
     client_preferences: dict
 
 
-class MultiAgentMozoVirtual:
+class MultiAgentMozoVirtual(InvestigationStateMixin):
     """
     Sistema Multi-Agente para el Mozo Virtual
     - Agente Investigador: Busca información específica
     - Agente Generador: Crea informes estructurados
     """
     
-    def __init__(self, vectorstore=None, notion_client=None):
-        """Inicializar el sistema multi-agente"""
+    def __init__(self, vectorstore=None, notion_client=None, report_store=None, checkpointer=None):
+        """Inicializar el sistema multi-agente
+        
+        checkpointer guarda el estado del grafo por consulta (por defecto, SQLite en Settings);
+        las ejecuciones que superaron la retención se podan al iniciar y luego cada
+        MULTI_AGENT_CHECKPOINT_PRUNE_INTERVAL segundos.
+        """
         self.setup_environment()
         self.setup_llm()
         self.vectorstore = vectorstore
         self.notion_client = notion_client
         
-        # Estado del sistema
-        self.current_investigation = {}
-        self.generated_reports = []
+        # Estado del sistema: current_investigation y generated_reports
+        # pertenecen al contexto de cada consulta (InvestigationStateMixin);
+        # los informes se guardan en el almacén y sólo los recientes quedan en memoria
+        self.report_store = report_store if report_store is not None else ReportStore()
+        self.importar_informes_legacy()
+        self.historial_informes = ReportHistory(self.report_store)
+        self.recomendador = RecommendationEngine.desde_menu()
         
         # LangSmith Observer
         self.observer = LangSmithObserver()
         
+        self.checkpointer = checkpointer if checkpointer is not None else crear_checkpointer()
+        self._lock_poda = threading.Lock()
+        self._proxima_poda = 0.0
+        self.podar_si_corresponde()
         self.setup_tools()
         self.setup_multi_agent_graph()
         
@@ -88,7 +189,8 @@ class MultiAgentMozoVirtual:
         self.llm = ChatGoogleGenerativeAI(
             model="gemini-2.0-flash",
             google_api_key=os.getenv("GEMINI_API_KEY"), 
-            temperature=0.7
+            temperature=0.7,
+            timeout=Settings.LLM_REQUEST_TIMEOUT
         )
         self.embedding_model = GoogleGenerativeAIEmbeddings(
             model="models/gemini-embedding-001",
@@ -99,12 +201,14 @@ class MultiAgentMozoVirtual:
         self.llm_investigator = ChatGoogleGenerativeAI(
             model="gemini-2.0-flash",
             google_api_key=os.getenv("GEMINI_API_KEY"), 
-            temperature=0.7
+            temperature=0.7,
+            timeout=Settings.LLM_REQUEST_TIMEOUT
         )
         self.llm_generator = ChatGoogleGenerativeAI(
             model="gemini-2.0-flash",
             google_api_key=os.getenv("GEMINI_API_KEY"), 
-            temperature=0.7
+            temperature=0.7,
+            timeout=Settings.LLM_REQUEST_TIMEOUT
         )
         
         print("Modelo Gemini configurado para sistema multi-agente.")
@@ -145,25 +249,8 @@ class MultiAgentMozoVirtual:
                         "fuente": doc.metadata.get("source", "desconocida")
                     })
                 
-                # Generar recomendaciones basadas en la búsqueda
-                if "romántic" in consulta.lower() or "pareja" in consulta.lower():
-                    resultados["recomendaciones"] = [
-                        "Solomillo de Ternera - Elegante y sofisticado",
-                        "Rioja Reserva - Vino perfecto para ocasiones especiales",
-                        "Crema Catalana - Postre tradicional español"
-                    ]
-                elif "familia" in consulta.lower() or "niños" in consulta.lower():
-                    resultados["recomendaciones"] = [
-                        "Paella Valenciana - Ideal para compartir",
-                        "Tortilla Española - Clásico familiar",
-                        "Limonada Casera - Refrescante para todos"
-                    ]
-                elif "vegetariano" in consulta.lower() or "vegano" in consulta.lower():
-                    resultados["recomendaciones"] = [
-                        "Risotto de Setas - Cremoso y sabroso",
-                        "Ensalada de Quinoa - Saludable y nutritiva",
-                        "Gazpacho Andaluz - Refrescante y natural"
-                    ]
+                # Recomendaciones puntuadas sobre todo el catálogo
+                resultados["recomendaciones"] = self.recomendador.recomendar_textos(extraer_preferencias(consulta))
                 
                 self.current_investigation = resultados
                 return f"Investigacion completada. Encontrados {len(docs)} documentos relevantes."
@@ -177,40 +264,11 @@ class MultiAgentMozoVirtual:
         def analizar_preferencias_cliente(descripcion: str):
             """Analiza las preferencias del cliente basándose en su descripción."""
             try:
-                # Simular análisis de preferencias
-                preferencias = {
-                    "tipo_comida": [],
-                    "presupuesto": "medio",
-                    "ocasion": "general",
-                    "restricciones": [],
-                    "gustos": []
-                }
-                
-                desc_lower = descripcion.lower()
-                
-                # Analizar tipo de comida
-                if any(word in desc_lower for word in ["carne", "ternera", "cordero", "cochinillo"]):
-                    preferencias["tipo_comida"].append("carnes")
-                if any(word in desc_lower for word in ["pescado", "marisco", "paella", "bacalao"]):
-                    preferencias["tipo_comida"].append("pescados_mariscos")
-                if any(word in desc_lower for word in ["vegetariano", "vegano", "ensalada", "quinoa"]):
-                    preferencias["tipo_comida"].append("vegetariano")
-                
-                # Analizar ocasión
-                if any(word in desc_lower for word in ["romántic", "pareja", "especial"]):
-                    preferencias["ocasion"] = "romantica"
-                elif any(word in desc_lower for word in ["familia", "niños", "grupo"]):
-                    preferencias["ocasion"] = "familiar"
-                elif any(word in desc_lower for word in ["negocio", "trabajo", "formal"]):
-                    preferencias["ocasion"] = "negocio"
-                
-                # Analizar presupuesto
-                if any(word in desc_lower for word in ["económico", "barato", "simple"]):
-                    preferencias["presupuesto"] = "bajo"
-                elif any(word in desc_lower for word in ["lujo", "premium", "especial"]):
-                    preferencias["presupuesto"] = "alto"
-                
+                preferencias = extraer_preferencias(descripcion)
                 self.current_investigation["preferencias_cliente"] = preferencias
+                if self.current_investigation.get("consulta"):
+                    # Con las preferencias del cliente se vuelve a puntuar el catálogo
+                    self.current_investigation["recomendaciones"] = self.recomendador.recomendar_textos(preferencias)
                 return f"Preferencias analizadas: {preferencias['ocasion']}, presupuesto {preferencias['presupuesto']}"
                 
             except Exception as e:
@@ -241,7 +299,7 @@ class MultiAgentMozoVirtual:
                     "proxima_accion": "Guardar informe en Notion"
                 }
                 
-                self.generated_reports.append(informe)
+                self.registrar_informe(informe)
                 return f"Informe generado exitosamente. Tipo: {tipo_informe}, {len(informe['recomendaciones'])} recomendaciones incluidas."
                 
             except Exception as e:
@@ -280,7 +338,7 @@ class MultiAgentMozoVirtual:
                         "object": "block",
                         "type": "paragraph",
                         "paragraph": {
-                            "rich_text": [{"type": "text", "text": {"content": f"[BUSCAR] Consulta: {informe['consulta_original']}"}}]
+                            "rich_text": texto_enriquecido(f"[BUSCAR] Consulta: {informe['consulta_original']}")
                         }
                     },
                     {
@@ -298,7 +356,7 @@ class MultiAgentMozoVirtual:
                         "object": "block",
                         "type": "bulleted_list_item",
                         "bulleted_list_item": {
-                            "rich_text": [{"type": "text", "text": {"content": f"{i}. {rec}"}}]
+                            "rich_text": texto_enriquecido(f"{i}. {rec}")
                         }
                     })
                 
@@ -307,25 +365,20 @@ class MultiAgentMozoVirtual:
                     "object": "block",
                     "type": "paragraph",
                     "paragraph": {
-                        "rich_text": [{"type": "text", "text": {"content": f"[IDEA] Justificación: {informe['justificacion']}"}}]
+                        "rich_text": texto_enriquecido(f"[IDEA] Justificación: {informe['justificacion']}")
                     }
                 })
                 
-                # Guardar en Notion
+                # Guardar en Notion (localmente ya quedó guardado al generarse)
                 self.notion_client.blocks.children.append(
                     block_id=page_id,
                     children=blocks
                 )
                 
-                # También guardar localmente
-                self.guardar_informe_local(informe)
-                
                 return "Informe guardado exitosamente en Notion y localmente."
                 
             except Exception as e:
-                # Fallback: guardar solo localmente
-                informe = self.generated_reports[-1]
-                self.guardar_informe_local(informe)
+                # Fallback: el informe ya está en el almacén local
                 return f"Error con Notion, guardado localmente: {str(e)}"
         
         self.generator_tools.append(guardar_informe_notion)
@@ -383,113 +436,104 @@ class MultiAgentMozoVirtual:
         
         return justificaciones.get(ocasión, justificaciones["general"])
     
-    def guardar_informe_local(self, informe):
-        """Guarda el informe en un archivo local."""
+    def importar_informes_legacy(self):
+        """Importar informes_robino.json (formato anterior) si el almacén está vacío."""
+        legacy = Path(Settings.REPORT_LEGACY_FILE)
+        if len(self.report_store) or not legacy.exists():
+            return
         try:
-            with open("informes_robino.json", "a", encoding="utf-8") as f:
-                f.write(json.dumps(informe, ensure_ascii=False, indent=2) + "\n")
+            importados = self.report_store.importar_legacy(str(legacy))
+            print(f"[OK] {importados} informes importados desde {legacy}")
         except Exception as e:
-            print(f"Error guardando informe local: {e}")
+            print(f"[ADVERTENCIA] Error importando informes legacy: {e}")
+    
+    def setup_subagents(self):
+        """Construir una sola vez los sub-agentes ReAct; los nodos del grafo los reutilizan en cada llamada"""
+        # Configurar LLMs con herramientas
+        self.llm_investigator = self.llm.bind_tools(self.investigator_tools)
+        self.llm_generator = self.llm.bind_tools(self.generator_tools)
+        
+        self.investigator_agent = create_react_agent(
+            self.con_plazo(self.llm_investigator),
+            self.investigator_tools,
+            PROMPT_INVESTIGADOR
+        )
+        self.generator_agent = create_react_agent(
+            self.con_plazo(self.llm_generator),
+            self.generator_tools,
+            PROMPT_GENERADOR
+        )
+    
+    @staticmethod
+    def con_plazo(llm) -> RunnableLambda:
+        """Modelo del sub-agente cuyo timeout de cliente es el tiempo restante de su etapa
+        
+        El presupuesto llega en la config de la invocación; sin él, rige el timeout del cliente.
+        """
+        def invocar(entrada, config: RunnableConfig, **kwargs):
+            presupuesto = config.get("configurable", {}).get("presupuesto")
+            if presupuesto:
+                kwargs["timeout"] = presupuesto.plazo_cliente()
+            return llm.invoke(entrada, config, **kwargs)
+        return RunnableLambda(invocar)
     
     def setup_multi_agent_graph(self):
         """Construir el grafo multi-agente con LangGraph"""
         
-        def investigator_node(state: MultiAgentState):
+        def invocar_subagente(agente, etapa: str, state: MultiAgentState, config: RunnableConfig):
+            """Invocar un sub-agente dentro del presupuesto de su etapa; agotado, la mejor respuesta parcial"""
+            presupuesto = config["configurable"].get("presupuestos", {}).get(etapa)
+            try:
+                if presupuesto:
+                    response = presupuesto.llamar(agente.invoke, state, {"configurable": {"presupuesto": presupuesto}})
+                else:
+                    response = agente.invoke(state)
+                return response["messages"][-1]
+            except BudgetExceeded:
+                # Sin tool_calls: el investigador pasa al generador y el generador termina
+                return AIMessage(content=respuesta_parcial(state["messages"]))
+        
+        def restaurar_contexto(state: MultiAgentState):
+            """Ejecución retomada desde un checkpoint: recuperar la investigación y los informes guardados"""
+            if state.get("investigation_results") and not self.current_investigation:
+                self.current_investigation = dict(state["investigation_results"])
+            informes = (state.get("report_data") or {}).get("informes")
+            if informes and not self.generated_reports:
+                self.generated_reports = list(informes)
+        
+        def contexto_actual() -> dict:
+            """Investigación e informes de la consulta: el checkpoint de cada nodo los conserva"""
+            return {"investigation_results": dict(self.current_investigation),
+                    "report_data": {"informes": list(self.generated_reports)}}
+        
+        def investigator_node(state: MultiAgentState, config: RunnableConfig):
             """Nodo del agente investigador"""
-            system_prompt = PromptTemplate(
-                input_variables=["input", "agent_scratchpad", "tools", "tool_names"],
-                template="""
-Eres el Agente Investigador del sistema multi-agente de La Taberna del Río.
-
-Tu función:
-1. Buscar información específica en la base de conocimiento
-2. Analizar las preferencias del cliente
-3. Preparar datos para el agente generador
-
-IMPORTANTE: DEBES USAR LAS HERRAMIENTAS DISPONIBLES.
-
-Instrucciones:
-- SIEMPRE usa 'investigar_plato_detallado' para búsquedas específicas
-- SIEMPRE usa 'analizar_preferencias_cliente' para entender necesidades
-- NO respondas sin usar las herramientas
-- Después de usar las herramientas, resume tus hallazgos
-- Siempre responde en español
-- Sé meticuloso en la investigación
-
-Herramientas disponibles: {tool_names}
-
-Input: {input}
-
-{agent_scratchpad}
-"""
-            )
-            
-            # Crear agente con herramientas
-            investigator_agent = create_react_agent(
-                self.llm_investigator,
-                self.investigator_tools,
-                system_prompt
-            )
-            
-            response = investigator_agent.invoke(state)
-            return {"messages": [response["messages"][-1]], "current_agent": "investigator"}
+            restaurar_contexto(state)
+            mensaje = invocar_subagente(self.investigator_agent, "investigator", state, config)
+            return {"messages": [mensaje], "current_agent": "investigator", **contexto_actual()}
         
-        def generator_node(state: MultiAgentState):
+        def generator_node(state: MultiAgentState, config: RunnableConfig):
             """Nodo del agente generador"""
-            system_prompt = PromptTemplate(
-                input_variables=["input", "agent_scratchpad", "tools", "tool_names"],
-                template="""
-Eres el Agente Generador de Informes del sistema multi-agente de La Taberna del Río.
-
-Tu función:
-1. Crear informes estructurados basados en la investigación
-2. Generar recomendaciones personalizadas
-3. Guardar informes en Notion
-
-IMPORTANTE: DEBES USAR LAS HERRAMIENTAS DISPONIBLES.
-
-Instrucciones:
-- SIEMPRE usa 'generar_informe_recomendacion' para crear informes
-- SIEMPRE usa 'guardar_informe_notion' para persistir datos
-- SIEMPRE usa 'generar_resumen_decision' para resumir decisiones
-- NO respondas sin usar las herramientas
-- Después de usar las herramientas, proporciona un resumen claro
-- Siempre responde en español
-- Crea informes profesionales y estructurados
-
-Herramientas disponibles: {tool_names}
-
-Input: {input}
-
-{agent_scratchpad}
-"""
-            )
-            
-            # Crear agente con herramientas
-            generator_agent = create_react_agent(
-                self.llm_generator,
-                self.generator_tools,
-                system_prompt
-            )
+            restaurar_contexto(state)
+            mensaje = invocar_subagente(self.generator_agent, "generator", state, config)
+            return {"messages": [mensaje], "current_agent": "generator", **contexto_actual()}
+        
+        def nodo_herramientas(herramientas: list):
+            """ToolNode que además guarda en el estado lo que sus herramientas dejaron en el contexto"""
+            ejecutor = ToolNode(herramientas)
             
-            response = generator_agent.invoke(state)
-            return {"messages": [response["messages"][-1]], "current_agent": "generator"}
+            def tools_node(state: MultiAgentState, config: RunnableConfig):
+                restaurar_contexto(state)
+                return {**ejecutor.invoke(state, config), **contexto_actual()}
+            return tools_node
         
         def should_use_investigator(state: MultiAgentState) -> Literal["investigator", "generator", "__end__"]:
             """Decide si usar el agente investigador"""
-            last_message = state["messages"][-1].content.lower()
-            
-            # Palabras clave que requieren investigación
-            investigacion_keywords = [
-                "recomendar", "recomendación", "sugerir", "qué me recomiendas",
-                "qué me sugieres", "ayuda a elegir", "no sé qué pedir",
-                "romántica", "pareja", "familia", "negocio", "especial",
-                "vegetariano", "vegano", "sin gluten", "alergias"
-            ]
+            categorias = MATCHER.categorias(state["messages"][-1].content)
             
-            if any(keyword in last_message for keyword in investigacion_keywords):
+            if "investigacion" in categorias:
                 return "investigator"
-            elif "informe" in last_message or "resumen" in last_message:
+            elif categorias & {"informe", "resumen"}:
                 return "generator"
             else:
                 return "__end__"
@@ -510,9 +554,7 @@ Input: {input}
             else:
                 return "__end__"
         
-        # Configurar LLMs con herramientas
-        self.llm_investigator = self.llm.bind_tools(self.investigator_tools)
-        self.llm_generator = self.llm.bind_tools(self.generator_tools)
+        self.setup_subagents()
         
         # Construir grafo
         graph = StateGraph(MultiAgentState)
@@ -520,8 +562,8 @@ Input: {input}
         # Agregar nodos
         graph.add_node("investigator", investigator_node)
         graph.add_node("generator", generator_node)
-        graph.add_node("investigator_tools", ToolNode(self.investigator_tools))
-        graph.add_node("generator_tools", ToolNode(self.generator_tools))
+        graph.add_node("investigator_tools", nodo_herramientas(self.investigator_tools))
+        graph.add_node("generator_tools", nodo_herramientas(self.generator_tools))
         
         # Definir flujo
         graph.set_entry_point("investigator")
@@ -549,17 +591,46 @@ Input: {input}
         )
         graph.add_edge("generator_tools", "generator")
         
-        self.multi_agent_graph = graph.compile()
+        self.multi_agent_graph = graph.compile(checkpointer=self.checkpointer)
         print("Grafo multi-agente construido correctamente.")
     
-    def process_complex_query(self, query: str):
-        """Procesa consultas complejas usando el sistema multi-agente"""
+    @staticmethod
+    def config_consulta(request_id: str) -> dict:
+        """Config de una ejecución con presupuestos por etapa y límite de recursión
+        
+        Investigación e informe tienen su propio tope de tiempo y comparten el de llamadas
+        al LLM; el límite de recursión cubre las dos vueltas sub-agente <-> herramientas.
+        """
+        config = config_ejecucion(request_id)
+        consulta = TurnBudget("multi_agente", Settings.INVESTIGATION_TIMEOUT + Settings.REPORT_GENERATION_TIMEOUT,
+                              Settings.MAX_LLM_CALLS_PER_TURN)
+        config["configurable"]["presupuestos"] = {
+            "investigator": consulta.etapa("investigacion", Settings.INVESTIGATION_TIMEOUT),
+            "generator": consulta.etapa("informe", Settings.REPORT_GENERATION_TIMEOUT),
+        }
+        config["recursion_limit"] = 4 * Settings.MAX_ITERATIONS + 1
+        return config
+    
+    def process_complex_query(self, query: str, request_id: str = None):
+        """Procesa consultas complejas usando el sistema multi-agente
+        
+        Con el request_id de una ejecución que falló se retoma desde el último nodo completado;
+        si ya había terminado, se devuelve su respuesta sin recalcular. Un fallo se lanza como
+        ConsultaFallida con el request_id para poder reintentar.
+        """
+        # Cada consulta trabaja sobre su propio contexto: una instancia atiende consultas en paralelo
+        with usar_contexto_investigacion():
+            return self.procesar_consulta(query, request_id or uuid.uuid4().hex)
+    
+    def procesar_consulta(self, query: str, request_id: str):
+        """Pipeline de una consulta dentro de su contexto de investigación"""
         try:
             # Iniciar trace en LangSmith
             trace_index = self.observer.start_trace(
                 "multi_agent_query",
                 {
                     "query": query,
+                    "request_id": request_id,
                     "timestamp": datetime.now().isoformat(),
                     "system": "multi_agent_mozo_virtual"
                 }
@@ -571,16 +642,27 @@ Input: {input}
                 {"message": f"Consulta recibida: {query[:50]}..."}
             )
             
-            # Procesar con el grafo multi-agente
-            result = self.multi_agent_graph.invoke({
-                "messages": [HumanMessage(content=query)],
-                "current_agent": "investigator",
-                "investigation_results": {},
-                "report_data": {},
-                "client_preferences": {}
-            })
+            # Procesar con el grafo multi-agente, retomando el checkpoint de la consulta si existe
+            config = self.config_consulta(request_id)
+            estado = self.multi_agent_graph.get_state(config)
+            if estado.next:
+                self.observer.log_event(trace_index, "checkpoint_resumed",
+                                        {"message": f"Retomando desde {', '.join(estado.next)}",
+                                         "request_id": request_id})
+                result = self.multi_agent_graph.invoke(None, config)
+            elif estado.values:
+                result = estado.values
+            else:
+                result = self.multi_agent_graph.invoke({
+                    "messages": [HumanMessage(content=query)],
+                    "current_agent": "investigator",
+                    "investigation_results": {},
+                    "report_data": {},
+                    "client_preferences": {}
+                }, config)
             
             response = result["messages"][-1].content
+            self.podar_si_corresponde()
             
             # Finalizar trace
             self.observer.end_trace(
@@ -604,8 +686,41 @@ Input: {input}
                         "success": False
                     }
                 )
-            return f"Error procesando consulta compleja: {str(e)}"
+            raise ConsultaFallida(request_id, e) from e
 
+    
+    def podar_si_corresponde(self):
+        """Podar las ejecuciones vencidas, a lo sumo una vez por MULTI_AGENT_CHECKPOINT_PRUNE_INTERVAL"""
+        ahora = time.monotonic()
+        with self._lock_poda:
+            if ahora < self._proxima_poda:
+                return
+            self._proxima_poda = ahora + Settings.MULTI_AGENT_CHECKPOINT_PRUNE_INTERVAL
+        try:
+            podadas = podar_checkpoints(self.checkpointer)
+            if podadas:
+                print(f"[OK] Checkpoints podados: {podadas} ejecuciones vencidas")
+        except Exception as e:
+            print(f"[ADVERTENCIA] Error podando checkpoints: {e}")
+    
+    def pasos_ejecucion(self, request_id: str):
+        """Checkpoints guardados de una consulta, del primero al último"""
+        return pasos_ejecucion(self.multi_agent_graph, request_id)
+    
+    def reproducir_traza(self, request_id: str, checkpoint_id: str = None) -> str:
+        """Volver a ejecutar una consulta desde uno de sus checkpoints (por defecto, la entrada)
+        
+        El estado se restaura tal como quedó guardado, así que cada reproducción parte de las
+        mismas entradas; útil para perfilar un nodo sin repetir los anteriores.
+        """
+        if checkpoint_id is None:
+            pasos = self.pasos_ejecucion(request_id)
+            if not pasos:
+                raise ValueError(f"No hay checkpoints para la consulta {request_id}")
+            checkpoint_id = pasos[0]["checkpoint_id"]
+        with usar_contexto_investigacion():
+            result = self.multi_agent_graph.invoke(None, config_ejecucion(request_id, checkpoint_id))
+        return result["messages"][-1].content
 
 def main():
     """Función principal para probar el sistema multi-agente"""
@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+Proveedor del Prompt de Sistema de Robino
+Renderiza el prompt una vez por día y versión del menú y reutiliza el mismo SystemMessage.
+El prefijo estable (instrucciones y especialidades) va primero; la fecha va al final
+para que el prefijo pueda aprovecharse con el caché de contexto de Gemini.
+"""
+
+import hashlib
+import threading
+import time
+from datetime import date, datetime
+from pathlib import Path
+from typing import Optional, Tuple
+
+from langchain_core.messages import SystemMessage
+
+from config.settings import Settings
+
+
+DIAS_SEMANA = ("Lunes", "Martes", "Miércoles", "Jueves", "Viernes", "Sábado", "Domingo")
+
+PREFIJO_ESTABLE = """
+Eres Robino, el mozo virtual del restaurante "La Taberna del Río".
+
+REGLA FUNDAMENTAL: SIEMPRE usa las herramientas disponibles. NUNCA respondas con texto libre cuando hay una herramienta específica.
+
+CUANDO EL CLIENTE PIDA EL MENÚ:
+- "carta" → mostrar_menu_completo()
+- "menú" → mostrar_menu_completo()
+- "la carta" → mostrar_menu_completo()
+- "el menu" → mostrar_menu_completo()
+- "menu" → mostrar_menu_completo()
+- "QUe hay para cenar?" → mostrar_menu_completo()
+- "¿qué hay para cenar?" → mostrar_menu_completo()
+
+OTRAS HERRAMIENTAS:
+- Para pedidos → agregar_al_pedido()
+- Para pagos → procesar_pago()
+- Para ver pedido → ver_pedido_actual()
+
+ESPECIALIDADES DEL DIA:
+- Lunes: Cocido Madrileño - $20.000
+- Martes: Fabada Asturiana - $22.000
+- Miércoles: Gazpacho y Salmorejo - $15.000
+- Jueves: Pulpo a Feira - $25.000
+- Viernes: Paella de Mariscos - $32.000
+- Sábado: Cochinillo Asado - $45.000
+- Domingo: Cocido Completo - $25.000
+
+RECUERDA: USA LAS HERRAMIENTAS. NO RESPONDAS CON TEXTO LIBRE.
+"""
+
+
+def version_menu(directorio: str = None) -> str:
+    """Huella de los archivos del menú (nombre, tamaño y fecha de modificación)"""
+    directorio = Path(directorio or Settings.MENU_DIRECTORY)
+    huella = hashlib.sha256()
+    if directorio.exists():
+        for archivo in sorted(directorio.glob("*.txt")):
+            estado = archivo.stat()
+            huella.update(f"{archivo.name}:{estado.st_size}:{estado.st_mtime_ns}\n".encode("utf-8"))
+    return huella.hexdigest()[:16]
+
+
+def contenido_menu(directorio: str = None) -> str:
+    """Texto de los archivos del menú, los mismos (y en el mismo orden) que version_menu"""
+    directorio = Path(directorio or Settings.MENU_DIRECTORY)
+    if not directorio.exists():
+        return ""
+    return "\n\n".join(archivo.read_text(encoding="utf-8") for archivo in sorted(directorio.glob("*.txt")))
+
+
+class SystemPromptProvider:
+    """
+    Prompt de sistema cacheado por (fecha, versión del menú)
+    La versión del menú se revisa como máximo una vez por intervalo.
+    """
+
+    def __init__(self, directorio_menu: str = None, intervalo_version: float = None):
+        """Configurar el directorio del menú y cada cuánto revisar su versión"""
+        self.directorio_menu = directorio_menu or Settings.MENU_DIRECTORY
+        self.intervalo_version = (Settings.MENU_VERSION_CHECK_INTERVAL
+                                  if intervalo_version is None else intervalo_version)
+        self._lock = threading.Lock()
+        self._clave: Optional[Tuple[date, str]] = None
+        self._mensaje: Optional[SystemMessage] = None
+        self._version = None
+        self._version_revisada = 0.0
+        self.renderizados = 0
+
+    @property
+    def prefijo_estable(self) -> str:
+        """Parte del prompt que no cambia entre días (apta para caché de contexto)"""
+        return PREFIJO_ESTABLE
+
+    def version_menu(self) -> str:
+        """Versión del menú, recalculada como máximo una vez por intervalo"""
+        ahora = time.monotonic()
+        if self._version is None or ahora - self._version_revisada >= self.intervalo_version:
+            self._version = version_menu(self.directorio_menu)
+            self._version_revisada = ahora
+        return self._version
+
+    def contenido_menu(self) -> str:
+        """Texto actual de los archivos del menú (el contenido que versiona version_menu)"""
+        return contenido_menu(self.directorio_menu)
+
+    def linea_fecha(self, fecha: date) -> str:
+        """Parte variable del prompt: el día actual"""
+        return f"FECHA ACTUAL: {DIAS_SEMANA[fecha.weekday()]}, {fecha.strftime('%d/%m/%Y')}"
+
+    def renderizar(self, fecha: date) -> str:
+        """Armar el texto completo del prompt para una fecha"""
+        return f"{PREFIJO_ESTABLE}\n{self.linea_fecha(fecha)}\n"
+
+    def obtener(self, ahora: datetime = None) -> SystemMessage:
+        """SystemMessage del día; el mismo objeto mientras no cambien fecha ni menú"""
+        fecha = (ahora or datetime.now()).date()
+        with self._lock:
+            clave = (fecha, self.version_menu())
+            if clave != self._clave:
+                self._mensaje = SystemMessage(content=self.renderizar(fecha))
+                self._clave = clave
+                self.renderizados += 1
+            return self._mensaje
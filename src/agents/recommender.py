@@ -0,0 +1,212 @@
+#!/usr/bin/env python3
+"""
+Motor de Recomendaciones
+El catálogo se convierte una sola vez en una matriz de rasgos por plato
+(categoría, precio, aptitud dietaria, afinidad con cada ocasión y, si hay
+modelo de embeddings, su vector). Las preferencias del cliente se traducen a
+un vector de pesos y todos los platos se puntúan con un único producto
+matriz-vector; se devuelven los mejores con la explicación de su puntaje.
+"""
+
+import re
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from config.settings import Settings
+from .keyword_matcher import KeywordMatcher, normalizar
+
+
+# Columnas de la matriz de rasgos
+CATEGORIAS = ("aperitivos", "carnes", "pescados", "postres", "bebidas", "especialidades")
+COLUMNAS = tuple(f"categoria_{c}" for c in CATEGORIAS) + (
+    "precio", "economico",
+    "carnes", "pescados_mariscos", "vegetariano",
+    "romantica", "familiar", "negocio",
+)
+INDICE = {columna: i for i, columna in enumerate(COLUMNAS)}
+
+# Encabezados del menú que se agrupan en una categoría
+SECCIONES = {"vinos": "bebidas", "cervezas": "bebidas", "refrescos": "bebidas",
+             "especialidades del dia": "especialidades"}
+
+# Rasgos de cada plato detectados en su nombre y descripción
+RASGOS_PLATO = {
+    "carnes": ("carne", "ternera", "cordero", "cochinillo", "buey", "chuleton", "solomillo",
+               "jamon", "chorizo", "fiambre", "pollo", "conejo", "morcilla", "cocido", "fabada"),
+    "pescados_mariscos": ("pescado", "marisco", "bacalao", "merluza", "pulpo", "gamba", "calamar"),
+    "romantica": ("solomillo", "vino", "rioja", "cava", "albarino", "crema catalana", "tarta", "trufa"),
+    "familiar": ("paella", "compartir", "tabla", "croqueta", "patatas", "tortilla", "limonada",
+                 "cocido", "fabada", "flan", "helado"),
+    "negocio": ("plancha", "merluza", "bacalao", "solomillo", "albarino", "cafe", "agua mineral"),
+}
+DETECTOR_RASGOS = KeywordMatcher(RASGOS_PLATO)
+
+# Peso base por categoría: ante preferencias neutras se sugieren platos antes que bebidas
+PESO_CATEGORIA = {"categoria_carnes": 0.3, "categoria_pescados": 0.3, "categoria_especialidades": 0.2,
+                  "categoria_aperitivos": 0.1, "categoria_postres": 0.1}
+
+EXPLICACIONES = {
+    "carnes": "plato de carne",
+    "pescados_mariscos": "pescados y mariscos",
+    "vegetariano": "apto vegetariano",
+    "precio": "opción premium",
+    "economico": "precio accesible",
+    "romantica": "ideal para una ocasión especial",
+    "familiar": "ideal para compartir en familia",
+    "negocio": "adecuado para una comida de negocios",
+    "embedding": "similar a lo que pediste",
+}
+
+
+def parsear_menu(texto: str) -> List[Dict[str, Any]]:
+    """Platos de un menú en el formato de data/menu: '• Nombre - $35.000' y descripción opcional debajo"""
+    platos: List[Dict[str, Any]] = []
+    vistos = set()
+    categoria = None
+    plato = None
+    for linea in texto.splitlines():
+        limpia = linea.strip()
+        if limpia.endswith(":") and not limpia.startswith("•"):
+            seccion = normalizar(limpia[:-1])
+            categoria = SECCIONES.get(seccion, seccion)
+            continue
+        encontrado = re.match(r"•\s*(?:\w+:\s*)?(.+?)\s*-\s*\$([\d.]+)", limpia)
+        if encontrado:
+            nombre = encontrado.group(1)
+            if normalizar(nombre) in vistos:
+                plato = None
+                continue
+            vistos.add(normalizar(nombre))
+            plato = {"nombre": nombre, "categoria": categoria or "general",
+                     "precio": int(encontrado.group(2).replace(".", "")), "descripcion": ""}
+            platos.append(plato)
+        elif limpia and plato is not None and linea.startswith(" ") and not plato["descripcion"]:
+            plato["descripcion"] = limpia
+    return platos
+
+
+class RecommendationEngine:
+    """
+    Recomendador vectorizado sobre el catálogo
+    recomendar(preferencias) puntúa todos los platos con matriz @ pesos y devuelve el top-N.
+    """
+
+    def __init__(self, platos: List[Dict[str, Any]], embedding_model=None, peso_embedding: float = 1.0):
+        """Precalcular la matriz de rasgos (y de embeddings, si hay modelo)"""
+        self.platos = platos
+        self.nombres = [plato["nombre"] for plato in platos]
+        self.matriz = np.zeros((len(platos), len(COLUMNAS)), dtype=np.float32)
+
+        precios = np.array([plato["precio"] for plato in platos], dtype=np.float32)
+        if len(platos):
+            rango = float(precios.max() - precios.min()) or 1.0
+            self.matriz[:, INDICE["precio"]] = (precios - precios.min()) / rango
+            self.matriz[:, INDICE["economico"]] = 1.0 - self.matriz[:, INDICE["precio"]]
+
+        for fila, plato in enumerate(platos):
+            columna = f"categoria_{plato['categoria']}"
+            if columna in INDICE:
+                self.matriz[fila, INDICE[columna]] = 1.0
+            rasgos = DETECTOR_RASGOS.categorias(f"{plato['nombre']} {plato['descripcion']}")
+            for rasgo in rasgos:
+                self.matriz[fila, INDICE[rasgo]] = 1.0
+            if not rasgos & {"carnes", "pescados_mariscos"}:
+                self.matriz[fila, INDICE["vegetariano"]] = 1.0
+
+        self.embedding_model = embedding_model
+        self.peso_embedding = peso_embedding
+        self.embeddings = None
+        if embedding_model is not None and platos:
+            vectores = np.array(embedding_model.embed_documents(
+                [f"{p['nombre']}. {p['descripcion']}" for p in platos]), dtype=np.float32)
+            self.embeddings = vectores / np.maximum(np.linalg.norm(vectores, axis=1, keepdims=True), 1e-9)
+
+    @classmethod
+    def desde_menu(cls, ruta: str = None, **kwargs) -> "RecommendationEngine":
+        """Construir el recomendador desde menu_completo.txt"""
+        ruta = Path(ruta or Path(Settings.MENU_DIRECTORY) / "menu_completo.txt")
+        texto = ruta.read_text(encoding="utf-8") if ruta.exists() else ""
+        return cls(parsear_menu(texto), **kwargs)
+
+    @staticmethod
+    def vector_preferencias(preferencias: Dict[str, Any]) -> np.ndarray:
+        """Pesos de cada columna según las preferencias de analizar_preferencias_cliente"""
+        pesos = np.zeros(len(COLUMNAS), dtype=np.float32)
+        for columna, peso in PESO_CATEGORIA.items():
+            pesos[INDICE[columna]] = peso
+
+        tipos = (preferencias or {}).get("tipo_comida", [])
+        for tipo in tipos:
+            if tipo in INDICE:
+                pesos[INDICE[tipo]] += 2.0
+        if "vegetariano" in tipos:
+            pesos[INDICE["carnes"]] -= 5.0
+            pesos[INDICE["pescados_mariscos"]] -= 5.0
+
+        presupuesto = (preferencias or {}).get("presupuesto", "medio")
+        if presupuesto == "bajo":
+            pesos[INDICE["economico"]] += 1.0
+        elif presupuesto == "alto":
+            pesos[INDICE["precio"]] += 1.0
+
+        ocasion = (preferencias or {}).get("ocasion", "general")
+        if ocasion in INDICE:
+            pesos[INDICE[ocasion]] += 1.5
+        return pesos
+
+    def similitud(self, consulta: str = None) -> Optional[np.ndarray]:
+        """Similitud coseno de la consulta con cada plato (None sin embeddings o sin consulta)"""
+        if not consulta or self.embeddings is None:
+            return None
+        vector = np.asarray(self.embedding_model.embed_query(consulta), dtype=np.float32)
+        return self.peso_embedding * (self.embeddings @ (vector / max(float(np.linalg.norm(vector)), 1e-9)))
+
+    def puntajes(self, preferencias: Dict[str, Any], consulta: str = None) -> np.ndarray:
+        """Puntaje de todos los platos: una multiplicación matriz-vector (más la similitud semántica)"""
+        puntajes = self.matriz @ self.vector_preferencias(preferencias)
+        similitud = self.similitud(consulta)
+        return puntajes if similitud is None else puntajes + similitud
+
+    def explicar(self, fila: int, pesos: np.ndarray, similitud: float = 0.0) -> str:
+        """Los rasgos que más aportaron al puntaje del plato"""
+        aportes = [(float(self.matriz[fila, i] * pesos[i]), columna)
+                   for i, columna in enumerate(COLUMNAS) if columna in EXPLICACIONES]
+        if similitud > 0:
+            aportes.append((similitud, "embedding"))
+        motivos = [EXPLICACIONES[columna] for aporte, columna in sorted(aportes, reverse=True) if aporte > 0]
+        return ", ".join(motivos[:2]) or "de los más elegidos de la carta"
+
+    def recomendar(self, preferencias: Dict[str, Any], cantidad: int = None,
+                   consulta: str = None) -> List[Dict[str, Any]]:
+        """Los 'cantidad' platos con mayor puntaje, con su explicación"""
+        cantidad = min(cantidad or Settings.RECOMMENDATION_TOP_N, len(self.platos))
+        if cantidad <= 0:
+            return []
+        pesos = self.vector_preferencias(preferencias)
+        puntajes = self.matriz @ pesos
+        similitud = self.similitud(consulta)
+        if similitud is not None:
+            puntajes = puntajes + similitud
+        # argpartition elige el top-N en O(n); sólo esos se ordenan
+        candidatos = np.argpartition(-puntajes, cantidad - 1)[:cantidad]
+        mejores = sorted(candidatos.tolist(), key=lambda fila: (-puntajes[fila], fila))
+
+        recomendaciones = []
+        for fila in mejores:
+            plato = self.platos[fila]
+            recomendaciones.append({
+                "nombre": plato["nombre"],
+                "categoria": plato["categoria"],
+                "precio": plato["precio"],
+                "puntaje": round(float(puntajes[fila]), 3),
+                "explicacion": self.explicar(fila, pesos, 0.0 if similitud is None else float(similitud[fila])),
+            })
+        return recomendaciones
+
+    def recomendar_textos(self, preferencias: Dict[str, Any], cantidad: int = None,
+                          consulta: str = None) -> List[str]:
+        """Recomendaciones con el formato de los informes: 'Plato - explicación'"""
+        return [f"{r['nombre']} - {r['explicacion'].capitalize()}"
+                for r in self.recomendar(preferencias, cantidad, consulta)]
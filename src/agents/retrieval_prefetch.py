@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""
+Búsqueda Especulativa en el Menú
+Al empezar un turno cuyo mensaje probablemente lleve a consultar el menú (platos,
+precios, carta...), la búsqueda del mensaje en el vectorstore se lanza en paralelo
+con la primera llamada al LLM; saludos, pagos y demás turnos no la lanzan. Si el modelo después pide
+consultar_menu con una consulta compatible (sus palabras significativas están
+en el mensaje), se usan esos documentos sin volver a buscar; si no, la búsqueda
+especulativa se descarta al cerrar el turno.
+"""
+
+import re
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Dict, FrozenSet, List, Optional
+
+from config.settings import Settings
+from ..observability.performance_metrics import PerformanceMetrics
+from .keyword_matcher import MATCHER, normalizar
+
+
+PALABRA = re.compile(r"\w+")
+
+# Categorías de MATCHER que anticipan una consulta al menú
+CATEGORIAS_MENU = frozenset({"consulta_menu", "comida_carnes", "comida_pescados_mariscos", "comida_vegetariano"})
+
+# Palabras que no distinguen una consulta de otra
+PALABRAS_VACIAS = frozenset({
+    "que", "los", "las", "del", "con", "por", "para", "una", "uno", "unos", "unas", "sus",
+    "hay", "tienen", "tiene", "quiero", "queria", "mas", "muy", "como", "cual", "cuales",
+    "sobre", "informacion", "menu", "carta", "restaurante", "taberna", "rio",
+})
+
+
+def palabras_significativas(texto: str) -> FrozenSet[str]:
+    """Palabras normalizadas de 3 o más letras que no son palabras vacías"""
+    return frozenset(p for p in PALABRA.findall(normalizar(texto))
+                     if len(p) >= 3 and p not in PALABRAS_VACIAS)
+
+
+def consultas_compatibles(mensaje: str, consulta: str, minimo: float = None) -> bool:
+    """La consulta del modelo está contenida (en la proporción mínima) en el mensaje del cliente"""
+    minimo = Settings.PREFETCH_MIN_OVERLAP if minimo is None else minimo
+    pedidas = palabras_significativas(consulta)
+    if not pedidas:
+        return normalizar(consulta).strip() == normalizar(mensaje).strip()
+    return len(pedidas & palabras_significativas(mensaje)) / len(pedidas) >= minimo
+
+
+def consulta_de_menu_probable(mensaje: str) -> bool:
+    """El mensaje menciona la carta, precios o platos: vale la pena buscar por adelantado"""
+    return bool(MATCHER.categorias(mensaje) & CATEGORIAS_MENU)
+
+
+class Prefetch:
+    """Búsqueda especulativa en curso para un mensaje"""
+
+    def __init__(self, consulta: str, futuro: Future):
+        self.consulta = consulta
+        self.futuro = futuro
+
+
+class RetrievalPrefetcher:
+    """
+    Búsquedas especulativas sobre un retriever
+    - iniciar(mensaje): lanzar la búsqueda en segundo plano
+    - omitir(): contar un turno en que no se especuló (no parecía una consulta al menú)
+    - usar(prefetch, consulta): documentos si la consulta es compatible, None si no
+    - cancelar(prefetch): descartar una búsqueda que no se usó
+    """
+
+    def __init__(self, retriever, max_workers: int = None):
+        self.retriever = retriever
+        self.pool = ThreadPoolExecutor(max_workers=max_workers or Settings.PREFETCH_WORKERS,
+                                       thread_name_prefix="robino-prefetch")
+        self.metricas = PerformanceMetrics()
+
+    def buscar(self, consulta: str):
+        """Búsqueda normal (sin especulación)"""
+        return self.retriever.invoke(consulta)
+
+    def _buscar_midiendo(self, consulta: str):
+        inicio = time.perf_counter()
+        documentos = self.buscar(consulta)
+        return documentos, time.perf_counter() - inicio
+
+    def iniciar(self, mensaje: str) -> Prefetch:
+        """Lanzar la búsqueda del mensaje del cliente en paralelo con el LLM"""
+        self.metricas.incrementar("iniciados")
+        return Prefetch(mensaje, self.pool.submit(self._buscar_midiendo, mensaje))
+
+    def omitir(self):
+        """Registrar un turno sin búsqueda especulativa"""
+        self.metricas.incrementar("omitidos")
+
+    def usar(self, prefetch: Prefetch, consulta: str) -> Optional[List[Any]]:
+        """Documentos de la búsqueda especulativa si la consulta del modelo es compatible"""
+        if not consultas_compatibles(prefetch.consulta, consulta):
+            self.metricas.incrementar("fallos")
+            self.cancelar(prefetch)
+            return None
+        inicio = time.perf_counter()
+        try:
+            documentos, duracion = prefetch.futuro.result()
+        except Exception:
+            # Si la búsqueda especulativa falló, se busca de nuevo de la forma normal
+            self.metricas.incrementar("errores")
+            return None
+        espera = time.perf_counter() - inicio
+        self.metricas.incrementar("aciertos")
+        # Sin especulación la herramienta habría esperado la búsqueda completa
+        self.metricas.registrar_latencia("ahorro", max(0.0, duracion - espera))
+        return documentos
+
+    def cancelar(self, prefetch: Prefetch):
+        """Descartar la búsqueda: se cancela si no empezó; si ya corre, su resultado se ignora"""
+        prefetch.futuro.cancel()
+        self.metricas.incrementar("cancelados")
+
+    def estadisticas(self) -> Dict[str, Any]:
+        """Contadores, tasa de aciertos (sobre los turnos que iniciaron búsqueda) y latencia ahorrada
+
+        cancelados incluye las búsquedas de turnos sin consultar_menu y las de consultas incompatibles;
+        omitidos, los turnos que no parecían una consulta al menú y no lanzaron búsqueda.
+        """
+        contadores = self.metricas.resumen()["contadores"]
+        iniciados = contadores.get("iniciados", 0)
+        contadores["tasa_aciertos"] = round(contadores.get("aciertos", 0) / iniciados, 3) if iniciados else 0.0
+        ahorro = self.metricas.percentiles("ahorro")
+        contadores["ahorro_ms"] = {"aciertos": ahorro["muestras"],
+                                   **{p: round(ahorro[p] * 1000, 1) for p in ("p50", "p95", "max")}}
+        return contadores
+
+    def cerrar(self):
+        """Detener el pool sin esperar búsquedas descartadas"""
+        self.pool.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+Estado de Sesión por Mesa
+Agrupa historial y pedido de un cliente para que un mismo agente atienda varias mesas
+"""
+
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime
+from typing import Optional
+
+from ..persistence.order_journal import OrderJournal
+
+
+# Sesión sobre la que operan las herramientas del agente en el contexto actual
+_sesion_activa: ContextVar[Optional["TableSession"]] = ContextVar("sesion_activa", default=None)
+
+
+class TableSession:
+    """
+    Sesión de una mesa: historial de conversación y estado del pedido
+    El lock serializa los turnos de la misma mesa
+    """
+
+    def __init__(self, session_id: str, nombre_cliente: str = None):
+        """Crear la sesión y abrir su journal de pedido"""
+        self.session_id = session_id
+        self.nombre_cliente = nombre_cliente
+        self.creada = datetime.now()
+        self.historial = []
+        self.resumen = ""  # Turnos antiguos plegados por ConversationMemory
+        self.pago_pendiente = None  # Interrupción de pago esperando la respuesta del cliente
+        self.prefetch = None  # Búsqueda especulativa en el menú del turno en curso
+        self.consulta_fallida = None  # Consulta compleja fallida: su request_id se reusa al repetirla
+        self.turnos = 0
+
+        # Estado del pedido
+        self.pedido_actual = []
+        self.total_pedido = 0.0
+        self.pagado = False
+        self.order_journal = OrderJournal(session_id)
+
+        self.lock = threading.RLock()
+
+    def id_turno(self) -> str:
+        """Identificador del último turno, único aunque la sesión se restaure con el mismo id"""
+        return f"{self.creada:%Y%m%d%H%M%S%f}.{self.turnos}"
+
+    def restaurar_pedido(self):
+        """Cargar el pedido desde el journal (snapshot + eventos)"""
+        estado = self.order_journal.estado
+        self.pedido_actual = [dict(item) for item in estado.pedido]
+        self.total_pedido = estado.total
+        self.pagado = estado.pagado
+
+    def cerrar(self):
+        """Tomar snapshot final del pedido y compactar el journal"""
+        if self.order_journal.estado.ultimo_seq == 0:
+            # Sesión sin pedido: no hay nada que persistir
+            self.order_journal.cerrar()
+            return
+        self.order_journal.tomar_snapshot()
+        self.order_journal.compactar()
+        self.order_journal.cerrar()
+
+
+def sesion_activa() -> Optional[TableSession]:
+    """Obtener la sesión ligada al contexto actual"""
+    return _sesion_activa.get()
+
+
+@contextmanager
+def usar_sesion(sesion: TableSession):
+    """Ligar una sesión al contexto actual mientras dura el bloque"""
+    token = _sesion_activa.set(sesion)
+    try:
+        yield sesion
+    finally:
+        _sesion_activa.reset(token)
@@ -5,8 +5,10 @@ Versión que funciona correctamente sin LangGraph complejo
 """
 
 import os
+import uuid
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional, Tuple
 from dotenv import load_dotenv
 
 # Componentes de LangChain
@@ -20,27 +22,42 @@ from pathlib import Path
 sys.path.append(str(Path(__file__).parent.parent))
 from observability.langsmith_observer import LangSmithObserver
 
-class SimpleMultiAgentMozoVirtual:
+# Configuración y ejecutor de pasos en paralelo
+from config.settings import Settings
+from .dag_executor import DAGExecutor
+from .keyword_matcher import extraer_preferencias
+from .recommender import RecommendationEngine
+from .investigation_context import InvestigationStateMixin, usar_contexto_investigacion
+from .turn_budget import contar_exceso
+from ..persistence.report_store import ReportStore
+from ..persistence.report_history import ReportHistory
+from ..persistence.checkpoints import ConsultaFallida
+
+class SimpleMultiAgentMozoVirtual(InvestigationStateMixin):
     """
     Sistema Multi-Agente Simplificado para el Mozo Virtual
     - Agente Investigador: Busca información específica
     - Agente Generador: Crea informes estructurados
     """
     
-    def __init__(self, vectorstore=None, notion_client=None):
+    def __init__(self, vectorstore=None, notion_client=None, report_store=None):
         """Inicializar el sistema multi-agente simplificado"""
         self.setup_environment()
         self.setup_llm()
         self.vectorstore = vectorstore
         self.notion_client = notion_client
         
-        # Estado del sistema
-        self.current_investigation = {}
-        self.generated_reports = []
+        # Estado del sistema: current_investigation y generated_reports
+        # pertenecen al contexto de cada consulta (InvestigationStateMixin);
+        # los informes se guardan en el almacén y sólo los recientes quedan en memoria
+        self.report_store = report_store if report_store is not None else ReportStore()
+        self.historial_informes = ReportHistory(self.report_store)
+        self.recomendador = RecommendationEngine.desde_menu()
         
         # LangSmith Observer
         self.observer = LangSmithObserver()
         
+        self.setup_pipeline()
         print("Sistema multi-agente simplificado inicializado correctamente.")
         
     def setup_environment(self):
@@ -56,12 +73,49 @@ class SimpleMultiAgentMozoVirtual:
         self.llm = ChatGoogleGenerativeAI(
             model="gemini-2.0-flash",
             google_api_key=os.getenv("GEMINI_API_KEY"), 
-            temperature=0.7
+            temperature=0.7,
+            timeout=Settings.LLM_REQUEST_TIMEOUT
         )
         print("Modelo Gemini configurado para sistema multi-agente simplificado.")
     
+    def setup_pipeline(self):
+        """Definir el pipeline como DAG: investigación y preferencias en paralelo, luego informe y resumen"""
+        self.pool = ThreadPoolExecutor(max_workers=Settings.MULTI_AGENT_WORKERS,
+                                       thread_name_prefix="multi-agente")
+        self.pipeline = DAGExecutor(self.pool)
+        # Investigación e informe tienen tope de tiempo: vencidos, se sigue con lo disponible
+        self.pipeline.agregar("investigation", lambda datos: self.buscar_informacion(datos["consulta"]),
+                              limite=Settings.INVESTIGATION_TIMEOUT,
+                              respaldo=lambda datos: (None, "La búsqueda en el menú no respondió a tiempo."))
+        self.pipeline.agregar("preferences_analysis", lambda datos: self.detectar_preferencias(datos["consulta"]))
+        self.pipeline.agregar("report_generation", self.paso_informe,
+                              dependencias=["investigation", "preferences_analysis"],
+                              limite=Settings.REPORT_GENERATION_TIMEOUT,
+                              respaldo=lambda datos: "El informe no se completó a tiempo.")
+        self.pipeline.agregar("decision_summary", lambda datos: self.generar_resumen_decision(),
+                              dependencias=["report_generation"])
+    
+    def paso_informe(self, datos: Dict[str, Any]) -> str:
+        """Punto de unión: combinar investigación y preferencias y generar el informe"""
+        resultados, _ = datos["investigation"]
+        preferencias, _ = datos["preferences_analysis"]
+        # Si la búsqueda no encontró nada se conserva la investigación anterior
+        base = resultados if resultados is not None else self.current_investigation
+        self.current_investigation = dict(base)
+        if preferencias is not None:
+            self.current_investigation["preferencias_cliente"] = preferencias
+            self.current_investigation["recomendaciones"] = self.recomendador.recomendar_textos(preferencias)
+        return self.generar_informe_recomendacion()
+    
     def investigar_plato_detallado(self, consulta: str) -> str:
         """Investiga información detallada sobre platos específicos del menú."""
+        resultados, mensaje = self.buscar_informacion(consulta)
+        if resultados is not None:
+            self.current_investigation = resultados
+        return mensaje
+    
+    def buscar_informacion(self, consulta: str) -> Tuple[Optional[Dict[str, Any]], str]:
+        """Buscar en el menú y armar las recomendaciones; devuelve (resultados o None, mensaje)"""
         if not self.vectorstore:
             # Simular búsqueda si no hay vectorstore
             resultados = {
@@ -90,7 +144,7 @@ class SimpleMultiAgentMozoVirtual:
                 docs = retriever.get_relevant_documents(consulta)
                 
                 if not docs:
-                    return f"No se encontró información específica sobre: {consulta}"
+                    return None, f"No se encontró información específica sobre: {consulta}"
                 
                 # Procesar resultados
                 resultados = {
@@ -107,72 +161,28 @@ class SimpleMultiAgentMozoVirtual:
                     })
             
             except Exception as e:
-                return f"Error en la investigación: {str(e)}"
+                return None, f"Error en la investigación: {str(e)}"
         
-        # Generar recomendaciones basadas en la búsqueda
-        if "romántic" in consulta.lower() or "pareja" in consulta.lower():
-            resultados["recomendaciones"] = [
-                "Solomillo de Ternera - Elegante y sofisticado",
-                "Rioja Reserva - Vino perfecto para ocasiones especiales",
-                "Crema Catalana - Postre tradicional español"
-            ]
-        elif "familia" in consulta.lower() or "niños" in consulta.lower():
-            resultados["recomendaciones"] = [
-                "Paella Valenciana - Ideal para compartir",
-                "Tortilla Española - Clásico familiar",
-                "Limonada Casera - Refrescante para todos"
-            ]
-        elif "vegetariano" in consulta.lower() or "vegano" in consulta.lower():
-            resultados["recomendaciones"] = [
-                "Risotto de Setas - Cremoso y sabroso",
-                "Ensalada de Quinoa - Saludable y nutritiva",
-                "Gazpacho Andaluz - Refrescante y natural"
-            ]
+        # Recomendaciones puntuadas sobre todo el catálogo
+        resultados["recomendaciones"] = self.recomendador.recomendar_textos(extraer_preferencias(consulta))
         
-        self.current_investigation = resultados
-        return f"Investigación completada. Encontrados {resultados['documentos_encontrados']} documentos relevantes."
+        return resultados, f"Investigación completada. Encontrados {resultados['documentos_encontrados']} documentos relevantes."
     
     def analizar_preferencias_cliente(self, descripcion: str) -> str:
         """Analiza las preferencias del cliente basándose en su descripción."""
-        try:
-            # Simular análisis de preferencias
-            preferencias = {
-                "tipo_comida": [],
-                "presupuesto": "medio",
-                "ocasion": "general",
-                "restricciones": [],
-                "gustos": []
-            }
-            
-            desc_lower = descripcion.lower()
-            
-            # Analizar tipo de comida
-            if any(word in desc_lower for word in ["carne", "ternera", "cordero", "cochinillo"]):
-                preferencias["tipo_comida"].append("carnes")
-            if any(word in desc_lower for word in ["pescado", "marisco", "paella", "bacalao"]):
-                preferencias["tipo_comida"].append("pescados_mariscos")
-            if any(word in desc_lower for word in ["vegetariano", "vegano", "ensalada", "quinoa"]):
-                preferencias["tipo_comida"].append("vegetariano")
-            
-            # Analizar ocasión
-            if any(word in desc_lower for word in ["romántic", "pareja", "especial"]):
-                preferencias["ocasion"] = "romantica"
-            elif any(word in desc_lower for word in ["familia", "niños", "grupo"]):
-                preferencias["ocasion"] = "familiar"
-            elif any(word in desc_lower for word in ["negocio", "trabajo", "formal"]):
-                preferencias["ocasion"] = "negocio"
-            
-            # Analizar presupuesto
-            if any(word in desc_lower for word in ["económico", "barato", "simple"]):
-                preferencias["presupuesto"] = "bajo"
-            elif any(word in desc_lower for word in ["lujo", "premium", "especial"]):
-                preferencias["presupuesto"] = "alto"
-            
+        preferencias, mensaje = self.detectar_preferencias(descripcion)
+        if preferencias is not None:
             self.current_investigation["preferencias_cliente"] = preferencias
-            return f"Preferencias analizadas: {preferencias['ocasion']}, presupuesto {preferencias['presupuesto']}"
+        return mensaje
+    
+    def detectar_preferencias(self, descripcion: str) -> Tuple[Optional[Dict[str, Any]], str]:
+        """Detectar ocasión, presupuesto y tipo de comida; devuelve (preferencias o None, mensaje)"""
+        try:
+            preferencias = extraer_preferencias(descripcion)
+            return preferencias, f"Preferencias analizadas: {preferencias['ocasion']}, presupuesto {preferencias['presupuesto']}"
             
         except Exception as e:
-            return f"Error analizando preferencias: {str(e)}"
+            return None, f"Error analizando preferencias: {str(e)}"
     
     def generar_informe_recomendacion(self, tipo_informe: str = "recomendacion_completa") -> str:
         """Genera un informe estructurado basado en la investigación realizada."""
@@ -195,7 +205,7 @@ class SimpleMultiAgentMozoVirtual:
                 "proxima_accion": "Guardar informe en Notion"
             }
             
-            self.generated_reports.append(informe)
+            self.registrar_informe(informe)
             return f"Informe generado exitosamente. Tipo: {tipo_informe}, {len(informe['recomendaciones'])} recomendaciones incluidas."
             
         except Exception as e:
@@ -240,14 +250,24 @@ class SimpleMultiAgentMozoVirtual:
         except Exception as e:
             return f"Error generando resumen: {str(e)}"
     
-    def process_complex_query(self, query: str) -> str:
-        """Procesa consultas complejas usando el sistema multi-agente simplificado"""
+    def process_complex_query(self, query: str, request_id: str = None) -> str:
+        """Procesa consultas complejas usando el sistema multi-agente simplificado
+        
+        Un fallo se lanza como ConsultaFallida con el request_id de la consulta.
+        """
+        # Cada consulta trabaja sobre su propio contexto: una instancia atiende consultas en paralelo
+        with usar_contexto_investigacion():
+            return self.procesar_consulta(query, request_id or uuid.uuid4().hex)
+    
+    def procesar_consulta(self, query: str, request_id: str) -> str:
+        """Pipeline de una consulta dentro de su contexto de investigación"""
         try:
             # Iniciar trace en LangSmith
             trace_index = self.observer.start_trace(
                 "simple_multi_agent_query",
                 {
                     "query": query,
+                    "request_id": request_id,
                     "timestamp": datetime.now().isoformat(),
                     "system": "simple_multi_agent_mozo_virtual"
                 }
@@ -259,50 +279,27 @@ class SimpleMultiAgentMozoVirtual:
                 {"message": f"Consulta recibida: {query[:50]}..."}
             )
             
-            # PASO 1: Investigación
-            self.observer.log_event(
-                trace_index,
-                "investigation_start",
-                {"message": "Iniciando investigación con agente investigador"}
-            )
-            
-            investigacion_result = self.investigar_plato_detallado(query)
-            self.observer.log_event(
-                trace_index,
-                "investigation_complete",
-                {"message": f"Investigación completada: {investigacion_result}"}
-            )
-            
-            # PASO 2: Análisis de preferencias
-            self.observer.log_event(
-                trace_index,
-                "preferences_analysis_start",
-                {"message": "Iniciando análisis de preferencias"}
-            )
-            
-            preferencias_result = self.analizar_preferencias_cliente(query)
-            self.observer.log_event(
-                trace_index,
-                "preferences_analysis_complete",
-                {"message": f"Análisis de preferencias completado: {preferencias_result}"}
-            )
-            
-            # PASO 3: Generación de informe
-            self.observer.log_event(
-                trace_index,
-                "report_generation_start",
-                {"message": "Iniciando generación de informe"}
-            )
+            # PASOS 1 y 2 en paralelo (investigación y preferencias), luego informe y resumen
+            def paso_completado(paso: str, segundos: float):
+                self.observer.log_event(
+                    trace_index,
+                    f"{paso}_complete",
+                    {"message": f"Paso {paso} completado en {segundos * 1000:.0f} ms",
+                     "paso": paso, "duracion_ms": round(segundos * 1000, 1)}
+                )
             
-            informe_result = self.generar_informe_recomendacion()
-            self.observer.log_event(
-                trace_index,
-                "report_generation_complete",
-                {"message": f"Generación de informe completada: {informe_result}"}
-            )
+            def paso_vencido(paso: str, limite: float):
+                contar_exceso(paso, "tiempo")
+                self.observer.log_event(
+                    trace_index,
+                    "budget_exceeded",
+                    {"message": f"Paso {paso} superó su límite de {limite} s", "paso": paso, "limite_s": limite}
+                )
             
-            # PASO 4: Resumen final
-            resumen_result = self.generar_resumen_decision()
+            resultados = self.pipeline.ejecutar({"consulta": query}, al_terminar=paso_completado,
+                                                al_vencer=paso_vencido)
+            _, preferencias_result = resultados["preferences_analysis"]
+            resumen_result = resultados["decision_summary"]
             
             # Construir respuesta final
             recomendaciones = self.current_investigation.get("recomendaciones", [])
@@ -349,7 +346,7 @@ class SimpleMultiAgentMozoVirtual:
                         "success": False
                     }
                 )
-            return f"Error procesando consulta compleja: {str(e)}"
+            raise ConsultaFallida(request_id, e) from e
 
 
 def main():
@@ -0,0 +1,223 @@
+#!/usr/bin/env python3
+"""
+Presupuestos por Turno y por Etapa
+Cada turno (o consulta multi-agente) tiene un tope de tiempo de reloj y de
+llamadas al LLM; sus etapas (investigación, informe...) tienen además su propio
+tope de tiempo y consumen del presupuesto del turno. Las llamadas al LLM se
+hacen con el tiempo restante como límite duro: al agotarse, el nodo devuelve la
+mejor respuesta parcial en lugar de seguir iterando. Cada exceso (y cada llamada
+abandonada) se cuenta en METRICAS_PRESUPUESTO.
+"""
+
+import asyncio
+import contextvars
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+from contextlib import nullcontext
+from typing import Any, Callable, Optional, Sequence
+
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, ToolMessage
+
+from config.settings import Settings
+from ..observability.performance_metrics import PerformanceMetrics
+
+
+# Contadores de presupuestos excedidos de todo el proceso (los expone /metricas)
+METRICAS_PRESUPUESTO = PerformanceMetrics()
+
+# Un timeout 0 desactiva el corte en algunos clientes: el mínimo que se le pasa al LLM
+PLAZO_MINIMO_CLIENTE = 0.1
+
+RESPUESTA_SIN_TIEMPO = ("Disculpa, me está llevando más tiempo del habitual resolverlo. "
+                        "¿Me lo puedes pedir de nuevo en pocas palabras?")
+
+# Las llamadas síncronas corren aquí para poder abandonarlas al vencer el plazo;
+# una llamada abandonada termina en segundo plano (la corta el timeout del cliente
+# del LLM, que no pasa del tiempo restante: ver plazo_cliente) y su resultado se descarta
+_pool_llamadas = None
+_pool_lock = threading.Lock()
+
+
+def _pool() -> ThreadPoolExecutor:
+    global _pool_llamadas
+    with _pool_lock:
+        if _pool_llamadas is None:
+            _pool_llamadas = ThreadPoolExecutor(max_workers=Settings.BUDGET_CALL_WORKERS,
+                                                thread_name_prefix="robino-llm")
+        return _pool_llamadas
+
+
+def contar_exceso(etapa: str, motivo: str):
+    """Registrar en las métricas que una etapa agotó su presupuesto"""
+    METRICAS_PRESUPUESTO.incrementar("presupuesto_excedido")
+    METRICAS_PRESUPUESTO.incrementar(f"presupuesto_excedido.{etapa}.{motivo}")
+
+
+class _Permiso:
+    """Lugar en un límite de concurrencia (semáforo) para una llamada con plazo
+
+    Lo toma el hilo de la llamada y se devuelve una sola vez: al terminar la llamada
+    o al abandonarla, lo que ocurra primero. Así una llamada abandonada no retiene
+    el lugar mientras termina en segundo plano.
+    """
+
+    def __init__(self, limite):
+        self._limite = limite
+        self._lock = threading.Lock()
+        self._tomado = False
+        self._soltado = False
+
+    def tomar(self) -> bool:
+        """Entrar al límite; False si la llamada se abandonó mientras esperaba"""
+        self._limite.__enter__()
+        with self._lock:
+            if not self._soltado:
+                self._tomado = True
+                return True
+        self._limite.__exit__(None, None, None)
+        return False
+
+    def soltar(self):
+        with self._lock:
+            self._soltado = True
+            tomado, self._tomado = self._tomado, False
+        if tomado:
+            self._limite.__exit__(None, None, None)
+
+
+class BudgetExceeded(Exception):
+    """Se agotó el tiempo o las llamadas al LLM de una etapa"""
+
+    def __init__(self, etapa: str, motivo: str):
+        super().__init__(f"Presupuesto de '{etapa}' agotado: {motivo}")
+        self.etapa = etapa
+        self.motivo = motivo
+
+
+class TurnBudget:
+    """
+    Presupuesto de tiempo y llamadas al LLM
+    - etapa(nombre, segundos): sub-presupuesto que además respeta el del turno
+    - llamar / allamar: ejecutar una llamada al LLM dentro del presupuesto
+    """
+
+    def __init__(self, nombre: str, segundos: float = None, max_llamadas: int = None,
+                 padre: "TurnBudget" = None):
+        self.nombre = nombre
+        self.limite = time.monotonic() + segundos if segundos is not None else None
+        self.max_llamadas = max_llamadas
+        self.padre = padre
+        self.llamadas = 0
+        self.excedido: Optional[str] = None  # motivo del primer exceso
+        self._lock = threading.Lock()
+
+    def etapa(self, nombre: str, segundos: float = None, max_llamadas: int = None) -> "TurnBudget":
+        """Sub-presupuesto de una etapa del turno"""
+        return TurnBudget(nombre, segundos, max_llamadas, padre=self)
+
+    def restante(self) -> Optional[float]:
+        """Segundos disponibles (None sin límite de tiempo)"""
+        propios = None if self.limite is None else max(0.0, self.limite - time.monotonic())
+        del_padre = self.padre.restante() if self.padre else None
+        if propios is None or del_padre is None:
+            return propios if del_padre is None else del_padre
+        return min(propios, del_padre)
+
+    def plazo_cliente(self) -> float:
+        """Timeout para el cliente del LLM: el tiempo restante, sin pasar de LLM_REQUEST_TIMEOUT
+
+        Así una llamada abandonada no ocupa un hilo del pool más allá del presupuesto.
+        """
+        restante = self.restante()
+        if restante is None:
+            return Settings.LLM_REQUEST_TIMEOUT
+        return max(PLAZO_MINIMO_CLIENTE, min(Settings.LLM_REQUEST_TIMEOUT, restante))
+
+    def agotado(self) -> Optional[str]:
+        """Motivo por el que no se puede hacer otra llamada ("tiempo" o "llamadas"), o None"""
+        restante = self.restante()
+        if restante is not None and restante <= 0:
+            return "tiempo"
+        if self.max_llamadas is not None and self.llamadas >= self.max_llamadas:
+            return "llamadas"
+        return self.padre.agotado() if self.padre else None
+
+    def registrar_exceso(self, motivo: str):
+        """Marcar la etapa (y el turno) como excedidos y contar la métrica una sola vez"""
+        with self._lock:
+            if self.excedido is not None:
+                return
+            self.excedido = motivo
+        contar_exceso(self.nombre, motivo)
+        print(f"[ADVERTENCIA] Presupuesto de '{self.nombre}' agotado ({motivo}); se responde con lo disponible")
+        if self.padre:
+            self.padre.registrar_exceso(motivo)
+
+    def _reservar(self) -> Optional[float]:
+        """Contar una llamada (también en el turno) y devolver el plazo para hacerla"""
+        motivo = self.agotado()
+        if motivo:
+            self.registrar_exceso(motivo)
+            raise BudgetExceeded(self.nombre, motivo)
+        presupuesto = self
+        while presupuesto:
+            with presupuesto._lock:
+                presupuesto.llamadas += 1
+            presupuesto = presupuesto.padre
+        return self.restante()
+
+    def llamar(self, funcion: Callable[..., Any], *args, limite=None, **kwargs) -> Any:
+        """Ejecutar una llamada síncrona con el tiempo restante como límite duro
+
+        limite es el límite de concurrencia de las llamadas (semáforo); al abandonar
+        la llamada su lugar se devuelve de inmediato.
+        """
+        plazo = self._reservar()
+        if plazo is None:
+            with limite or nullcontext():
+                return funcion(*args, **kwargs)
+        permiso = _Permiso(limite or nullcontext())
+
+        def ejecutar():
+            if not permiso.tomar():
+                return None
+            try:
+                return funcion(*args, **kwargs)
+            finally:
+                permiso.soltar()
+
+        futuro = _pool().submit(contextvars.copy_context().run, ejecutar)
+        try:
+            return futuro.result(timeout=plazo)
+        except FutureTimeout:
+            permiso.soltar()
+            if not futuro.cancel():
+                METRICAS_PRESUPUESTO.incrementar("llamadas_abandonadas")
+            self.registrar_exceso("tiempo")
+            raise BudgetExceeded(self.nombre, "tiempo") from None
+
+    async def allamar(self, corrutina: Callable[..., Any], *args, **kwargs) -> Any:
+        """Versión async de llamar: la llamada se cancela al vencer el plazo"""
+        plazo = self._reservar()
+        try:
+            return await asyncio.wait_for(corrutina(*args, **kwargs), timeout=plazo)
+        except asyncio.TimeoutError:
+            self.registrar_exceso("tiempo")
+            raise BudgetExceeded(self.nombre, "tiempo") from None
+
+
+def respuesta_parcial(mensajes: Sequence[BaseMessage]) -> str:
+    """Mejor respuesta disponible del turno en curso: el último texto del modelo
+    o, si no lo hay, lo que devolvieron las herramientas"""
+    salidas = []
+    for mensaje in reversed(mensajes):
+        if isinstance(mensaje, HumanMessage):
+            break
+        if isinstance(mensaje, AIMessage) and isinstance(mensaje.content, str) and mensaje.content.strip():
+            return mensaje.content
+        if isinstance(mensaje, ToolMessage) and str(mensaje.content).strip():
+            salidas.append(str(mensaje.content))
+    if salidas:
+        return "Esto es lo que pude resolver por ahora:\n" + "\n".join(reversed(salidas))
+    return RESPUESTA_SIN_TIEMPO
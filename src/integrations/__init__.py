@@ -3,6 +3,8 @@ Módulo de Integraciones
 Integraciones con servicios externos (Notion, etc.)
 """
 
-from .notion_integration import NotionIntegration
+from .notion_integration import NotionIntegration, NotionNoDisponibleError
+from .notion_batcher import NotionBlockBatcher
+from .notion_outbox import NotionOutboxClient
 
-__all__ = ["NotionIntegration"]
+__all__ = ["NotionIntegration", "NotionNoDisponibleError", "NotionBlockBatcher", "NotionOutboxClient"]
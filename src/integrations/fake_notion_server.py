@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+"""
+Servidor Falso de Notion
+Servidor HTTP en proceso que imita los endpoints usados por Robino para
+medir throughput y latencia de escritura sin red ni credenciales:
+- PATCH /v1/blocks/{id}/children   agregar bloques (máximo 100 por request)
+- GET   /v1/pages/{id}             obtener página
+Aplica su propio límite de tasa (429 + Retry-After), latencia y errores 5xx simulados.
+"""
+
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List
+
+
+class FakeNotionServer:
+    """
+    Notion simulado en un hilo de fondo
+    Uso: with FakeNotionServer(tasa=3) as servidor: Client(auth="x", base_url=servidor.url)
+    """
+
+    def __init__(self, tasa: float = 3.0, rafaga: float = 10.0, latencia: float = 0.0,
+                 tasa_error: float = 0.0, retry_after: float = 1.0, puerto: int = 0):
+        """Configurar límite de tasa, latencia y proporción de errores 500"""
+        self.tasa = tasa
+        self.rafaga = rafaga
+        self.latencia = latencia
+        self.tasa_error = tasa_error
+        self.retry_after = retry_after
+        self.puerto = puerto
+
+        self._lock = threading.Lock()
+        self._tokens = rafaga
+        self._ultimo = time.monotonic()
+        self.bloques: Dict[str, List[Dict[str, Any]]] = {}
+        self.estadisticas = {"requests": 0, "rechazados_429": 0, "errores_500": 0, "bloques": 0}
+        self._servidor = None
+        self._hilo = None
+
+    @property
+    def url(self) -> str:
+        """URL base para notion_client (base_url)"""
+        return f"http://127.0.0.1:{self._servidor.server_address[1]}"
+
+    def _admitir(self) -> bool:
+        """Token bucket del lado del servidor"""
+        with self._lock:
+            ahora = time.monotonic()
+            self._tokens = min(self.rafaga, self._tokens + (ahora - self._ultimo) * self.tasa)
+            self._ultimo = ahora
+            if self._tokens < 1:
+                return False
+            self._tokens -= 1
+            return True
+
+    def _crear_handler(self):
+        servidor = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def _responder(self, estado: int, cuerpo: Dict[str, Any], headers: Dict[str, str] = None):
+                datos = json.dumps(cuerpo).encode("utf-8")
+                self.send_response(estado)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(datos)))
+                for nombre, valor in (headers or {}).items():
+                    self.send_header(nombre, valor)
+                self.end_headers()
+                self.wfile.write(datos)
+
+            def _error(self, estado: int, codigo: str, mensaje: str, headers: Dict[str, str] = None):
+                self._responder(estado, {"object": "error", "status": estado,
+                                         "code": codigo, "message": mensaje}, headers)
+
+            def _controlar(self) -> bool:
+                """Aplicar latencia, límite de tasa y errores simulados"""
+                with servidor._lock:
+                    servidor.estadisticas["requests"] += 1
+                if servidor.latencia:
+                    time.sleep(servidor.latencia)
+                if not servidor._admitir():
+                    with servidor._lock:
+                        servidor.estadisticas["rechazados_429"] += 1
+                    self._error(429, "rate_limited", "Rate limited",
+                                {"Retry-After": str(servidor.retry_after)})
+                    return False
+                if servidor.tasa_error and random.random() < servidor.tasa_error:
+                    with servidor._lock:
+                        servidor.estadisticas["errores_500"] += 1
+                    self._error(500, "internal_server_error", "Error simulado")
+                    return False
+                return True
+
+            def do_PATCH(self):
+                partes = self.path.strip("/").split("/")
+                if len(partes) != 4 or partes[:2] != ["v1", "blocks"] or partes[3] != "children":
+                    return self._error(404, "object_not_found", f"Ruta desconocida: {self.path}")
+                largo = int(self.headers.get("Content-Length", 0))
+                cuerpo = json.loads(self.rfile.read(largo) or b"{}")
+                if not self._controlar():
+                    return
+                hijos = cuerpo.get("children", [])
+                if len(hijos) > 100:
+                    return self._error(400, "validation_error", "body.children.length should be ≤ 100")
+                with servidor._lock:
+                    servidor.bloques.setdefault(partes[2], []).extend(hijos)
+                    servidor.estadisticas["bloques"] += len(hijos)
+                self._responder(200, {"object": "list", "results": hijos})
+
+            def do_GET(self):
+                partes = self.path.strip("/").split("/")
+                if len(partes) != 3 or partes[:2] != ["v1", "pages"]:
+                    return self._error(404, "object_not_found", f"Ruta desconocida: {self.path}")
+                if not self._controlar():
+                    return
+                self._responder(200, {"object": "page", "id": partes[2]})
+
+        return Handler
+
+    def iniciar(self) -> "FakeNotionServer":
+        """Levantar el servidor en un hilo de fondo"""
+        self._servidor = ThreadingHTTPServer(("127.0.0.1", self.puerto), self._crear_handler())
+        self._servidor.daemon_threads = True
+        self._hilo = threading.Thread(target=self._servidor.serve_forever, name="fake-notion", daemon=True)
+        self._hilo.start()
+        return self
+
+    def detener(self):
+        """Detener el servidor"""
+        if self._servidor:
+            self._servidor.shutdown()
+            self._servidor.server_close()
+            self._servidor = None
+
+    def __enter__(self) -> "FakeNotionServer":
+        return self.iniciar()
+
+    def __exit__(self, *args):
+        self.detener()
@@ -0,0 +1,220 @@
+#!/usr/bin/env python3
+"""
+Agrupador de Bloques para Notion
+Acumula los bloques de todos los productores (conversaciones, inicios, informes)
+y los envía en pocas llamadas a blocks.children.append:
+- al llegar a 100 hijos por página (límite de la API)
+- al superar un tamaño estimado del payload
+- al vencer una ventana de tiempo
+El orden de los bloques de cada página se conserva. Si Notion rechaza un lote
+de forma permanente, los bloques de cada productor se reenvían por separado:
+sólo se pierden los del productor culpable.
+"""
+
+import atexit
+import json
+import threading
+import time
+from typing import Any, Dict, List, Tuple
+
+from config.settings import Settings
+
+from .notion_integration import NotionNoDisponibleError, es_rechazo_permanente
+
+
+# Máximo de hijos por request de blocks.children.append en la API de Notion
+MAX_HIJOS_POR_REQUEST = 100
+
+
+class _BloquesProxy:
+    """Expone blocks.children.append con la firma de notion_client"""
+
+    def __init__(self, batcher: "NotionBlockBatcher"):
+        self.children = self
+        self._batcher = batcher
+
+    def append(self, block_id: str, children: List[Dict[str, Any]], **kwargs) -> Dict[str, Any]:
+        self._batcher.agregar(block_id, children)
+        return {"object": "list", "results": [], "encolado": True}
+
+
+class NotionBlockBatcher:
+    """
+    Cliente de Notion que agrupa las escrituras de bloques
+    Reemplaza al notion_client.Client: blocks.children.append se acumula y el
+    resto de los endpoints (pages, databases, ...) se delega al cliente real.
+    """
+
+    def __init__(self, cliente, max_bloques: int = None, max_bytes: int = None, ventana: float = None):
+        """Envolver un cliente de Notion y arrancar el hilo de la ventana de tiempo"""
+        self.cliente = cliente
+        self.max_bloques = min(max_bloques or Settings.NOTION_BATCH_MAX_BLOCKS, MAX_HIJOS_POR_REQUEST)
+        self.max_bytes = max_bytes or Settings.NOTION_BATCH_MAX_BYTES
+        self.ventana = Settings.NOTION_BATCH_WINDOW if ventana is None else ventana
+        self.blocks = _BloquesProxy(self)
+
+        self._lock = threading.Lock()
+        self._condicion = threading.Condition(self._lock)
+        # Por página: (productor, bloque) pendientes, bytes estimados y momento del primer pendiente
+        self._pendientes: Dict[str, List[Tuple[int, Dict[str, Any]]]] = {}
+        self._bytes: Dict[str, int] = {}
+        self._desde: Dict[str, float] = {}
+        # Un lock de envío por página mantiene el orden entre envíos concurrentes
+        self._locks_envio: Dict[str, threading.Lock] = {}
+        self._cerrado = False
+        self._productores = 0  # cada llamada a agregar es un productor distinto
+
+        self.estadisticas = {"bloques": 0, "requests": 0, "reencolados": 0, "bloques_perdidos": 0, "errores": 0}
+
+        self._hilo = threading.Thread(target=self._vigilar_ventana, name="notion-batcher", daemon=True)
+        self._hilo.start()
+        atexit.register(self.cerrar)
+
+    def __getattr__(self, nombre: str):
+        # Solo se invoca para atributos que el batcher no define (pages, databases, ...)
+        if nombre == "cliente":
+            raise AttributeError(nombre)
+        return getattr(self.cliente, nombre)
+
+    def agregar(self, page_id: str, bloques: List[Dict[str, Any]]):
+        """Acumular bloques para una página; envía si se alcanza un límite
+
+        Después de cerrar() ya no hay ventana de tiempo: los bloques se envían en el acto.
+        """
+        tamano = len(json.dumps(bloques, ensure_ascii=False).encode("utf-8"))
+        with self._lock:
+            self._productores += 1
+            pendientes = self._pendientes.setdefault(page_id, [])
+            if not pendientes:
+                self._desde[page_id] = time.monotonic()
+                self._condicion.notify()
+            pendientes.extend((self._productores, bloque) for bloque in bloques)
+            self._bytes[page_id] = self._bytes.get(page_id, 0) + tamano
+            self.estadisticas["bloques"] += len(bloques)
+            lleno = (self._cerrado or len(pendientes) >= self.max_bloques
+                     or self._bytes[page_id] >= self.max_bytes)
+
+        if lleno:
+            self.flush(page_id)
+
+    def _tomar_lote(self, page_id: str) -> List[Tuple[int, Dict[str, Any]]]:
+        """Sacar de los pendientes el siguiente lote que entra en un request"""
+        with self._lock:
+            pendientes = self._pendientes.get(page_id, [])
+            lote = []
+            tamano = 0
+            while pendientes and len(lote) < self.max_bloques:
+                bloque_bytes = len(json.dumps(pendientes[0][1], ensure_ascii=False).encode("utf-8"))
+                if lote and tamano + bloque_bytes > self.max_bytes:
+                    break
+                lote.append(pendientes.pop(0))
+                tamano += bloque_bytes
+            self._bytes[page_id] = max(0, self._bytes.get(page_id, 0) - tamano)
+            if pendientes:
+                self._desde[page_id] = time.monotonic()
+            else:
+                self._desde.pop(page_id, None)
+            return lote
+
+    def _devolver_lote(self, page_id: str, lote: List[Tuple[int, Dict[str, Any]]]):
+        """Reponer un lote no enviado al frente de los pendientes de la página"""
+        tamano = len(json.dumps([bloque for _, bloque in lote], ensure_ascii=False).encode("utf-8"))
+        with self._lock:
+            self._pendientes[page_id] = lote + self._pendientes.get(page_id, [])
+            self._bytes[page_id] = self._bytes.get(page_id, 0) + tamano
+            self._desde[page_id] = time.monotonic()
+            self.estadisticas["reencolados"] += len(lote)
+            self._condicion.notify()
+
+    def flush(self, page_id: str = None):
+        """Enviar los bloques pendientes de una página (o de todas)"""
+        if page_id is None:
+            with self._lock:
+                paginas = list(self._pendientes)
+            for pagina in paginas:
+                self.flush(pagina)
+            return
+
+        with self._lock:
+            lock_envio = self._locks_envio.setdefault(page_id, threading.Lock())
+
+        with lock_envio:
+            while True:
+                lote = self._tomar_lote(page_id)
+                if not lote:
+                    return
+                try:
+                    self._enviar(page_id, lote)
+                except NotionNoDisponibleError:
+                    # Notion caído: devolver el lote al frente y reintentar en la próxima ventana
+                    self._devolver_lote(page_id, lote)
+                    return
+                except Exception as e:
+                    if not es_rechazo_permanente(e):
+                        self._perder(lote, e)
+                        continue
+                    # Rechazo permanente: reenviar cada productor por separado para aislar al culpable
+                    grupos = self._por_productor(lote)
+                    for posicion, grupo in enumerate(grupos):
+                        try:
+                            self._enviar(page_id, grupo)
+                        except NotionNoDisponibleError:
+                            self._devolver_lote(page_id, [par for g in grupos[posicion:] for par in g])
+                            return
+                        except Exception as error_grupo:
+                            self._perder(grupo, error_grupo)
+
+    def _enviar(self, page_id: str, lote: List[Tuple[int, Dict[str, Any]]]):
+        self.cliente.blocks.children.append(block_id=page_id, children=[bloque for _, bloque in lote])
+        with self._lock:
+            self.estadisticas["requests"] += 1
+
+    def _perder(self, lote: List[Tuple[int, Dict[str, Any]]], error: Exception):
+        with self._lock:
+            self.estadisticas["errores"] += 1
+            self.estadisticas["bloques_perdidos"] += len(lote)
+        print(f"[ADVERTENCIA] Error enviando {len(lote)} bloques a Notion: {error}")
+
+    @staticmethod
+    def _por_productor(lote: List[Tuple[int, Dict[str, Any]]]) -> List[List[Tuple[int, Dict[str, Any]]]]:
+        """Partir un lote en tramos consecutivos del mismo productor"""
+        grupos: List[List[Tuple[int, Dict[str, Any]]]] = []
+        for par in lote:
+            if grupos and grupos[-1][0][0] == par[0]:
+                grupos[-1].append(par)
+            else:
+                grupos.append([par])
+        return grupos
+
+    def _vigilar_ventana(self):
+        """Hilo de fondo: envía las páginas cuyo primer pendiente superó la ventana"""
+        with self._lock:
+            while not self._cerrado:
+                ahora = time.monotonic()
+                vencidas = [p for p, desde in self._desde.items() if ahora - desde >= self.ventana]
+                if vencidas:
+                    self._lock.release()
+                    try:
+                        for page_id in vencidas:
+                            self.flush(page_id)
+                    finally:
+                        self._lock.acquire()
+                    continue
+                espera = min((self.ventana - (ahora - d) for d in self._desde.values()), default=None)
+                self._condicion.wait(espera)
+
+    def pendientes(self) -> int:
+        """Cantidad de bloques todavía no enviados"""
+        with self._lock:
+            return sum(len(bloques) for bloques in self._pendientes.values())
+
+    def cerrar(self):
+        """Enviar todo lo pendiente y detener el hilo de la ventana"""
+        with self._lock:
+            if self._cerrado:
+                return
+            self._cerrado = True
+            self._condicion.notify()
+        atexit.unregister(self.cerrar)
+        self._hilo.join()
+        self.flush()
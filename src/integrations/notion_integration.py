@@ -0,0 +1,254 @@
+#!/usr/bin/env python3
+"""
+Integración Resiliente con Notion
+Envuelve notion_client.Client para que ninguna llamada supere el ritmo de la API
+ni se pierda por errores transitorios:
+- token bucket con la tasa promedio permitida por Notion
+- reintentos con backoff exponencial y jitter, respetando Retry-After
+- circuit breaker que corta las llamadas mientras Notion está caído
+"""
+
+import random
+import threading
+import time
+from typing import Any, Callable, Dict, List
+
+import httpx
+
+from config.settings import Settings
+
+
+# Estados HTTP y códigos de Notion que vale la pena reintentar
+ESTADOS_REINTENTABLES = {408, 409, 429, 500, 502, 503, 504}
+CODIGOS_REINTENTABLES = {"rate_limited", "conflict_error", "internal_server_error",
+                         "service_unavailable", "database_connection_unavailable",
+                         "gateway_timeout", "notionhq_client_request_timeout"}
+
+
+# Largo máximo del contenido de un elemento rich_text (Notion lo mide en unidades UTF-16)
+MAX_CARACTERES_RICH_TEXT = 2000
+
+
+def texto_enriquecido(texto: str) -> List[Dict[str, Any]]:
+    """rich_text de Notion para un texto, partido en fragmentos que Notion acepta"""
+    if len(texto) <= MAX_CARACTERES_RICH_TEXT // 2:
+        return [{"type": "text", "text": {"content": texto}}]
+    fragmentos, inicio, unidades = [], 0, 0
+    for posicion, caracter in enumerate(texto):
+        ancho = 2 if ord(caracter) > 0xFFFF else 1
+        if unidades + ancho > MAX_CARACTERES_RICH_TEXT:
+            fragmentos.append(texto[inicio:posicion])
+            inicio, unidades = posicion, 0
+        unidades += ancho
+    fragmentos.append(texto[inicio:])
+    return [{"type": "text", "text": {"content": fragmento}} for fragmento in fragmentos]
+
+
+def es_rechazo_permanente(error: Exception) -> bool:
+    """4xx que no se resuelve reintentando (validación, permisos, objeto inexistente)"""
+    estado = getattr(error, "status", None)
+    return isinstance(estado, int) and 400 <= estado < 500 and not NotionIntegration.es_reintentable(error)
+
+
+class NotionNoDisponibleError(Exception):
+    """El circuito está abierto: Notion se considera caído y no se intenta la llamada"""
+
+
+class TokenBucket:
+    """
+    Limitador de tasa: 'tasa' tokens por segundo con ráfagas de hasta 'capacidad'
+    """
+
+    def __init__(self, tasa: float, capacidad: float):
+        self.tasa = tasa
+        self.capacidad = capacidad
+        self._tokens = capacidad
+        self._ultimo = time.monotonic()
+        self._lock = threading.Lock()
+
+    def adquirir(self) -> float:
+        """Tomar un token esperando lo necesario; devuelve los segundos esperados"""
+        with self._lock:
+            ahora = time.monotonic()
+            self._tokens = min(self.capacidad, self._tokens + (ahora - self._ultimo) * self.tasa)
+            self._ultimo = ahora
+            self._tokens -= 1
+            espera = -self._tokens / self.tasa if self._tokens < 0 else 0.0
+        # La espera se reserva bajo el lock y se duerme fuera de él
+        if espera:
+            time.sleep(espera)
+        return espera
+
+
+class CircuitBreaker:
+    """
+    Circuit breaker de tres estados
+    - cerrado: las llamadas pasan; 'umbral' fallos seguidos lo abren
+    - abierto: las llamadas fallan de inmediato durante 'tiempo_apertura'
+    - semiabierto: se deja pasar una llamada de prueba
+    """
+
+    CERRADO = "cerrado"
+    ABIERTO = "abierto"
+    SEMIABIERTO = "semiabierto"
+
+    def __init__(self, umbral: int, tiempo_apertura: float):
+        self.umbral = umbral
+        self.tiempo_apertura = tiempo_apertura
+        self.estado = self.CERRADO
+        self._fallos = 0
+        self._abierto_desde = 0.0
+        self._lock = threading.Lock()
+
+    def permitir(self):
+        """Verificar si se puede llamar; lanza NotionNoDisponibleError si no"""
+        with self._lock:
+            if self.estado == self.ABIERTO:
+                if time.monotonic() - self._abierto_desde < self.tiempo_apertura:
+                    raise NotionNoDisponibleError("Circuito de Notion abierto")
+                self.estado = self.SEMIABIERTO
+            elif self.estado == self.SEMIABIERTO:
+                raise NotionNoDisponibleError("Circuito de Notion en prueba")
+
+    def registrar_exito(self):
+        with self._lock:
+            self._fallos = 0
+            self.estado = self.CERRADO
+
+    def registrar_fallo(self) -> bool:
+        """Contar un fallo; devuelve True si el circuito se abrió"""
+        with self._lock:
+            self._fallos += 1
+            if self.estado == self.SEMIABIERTO or self._fallos >= self.umbral:
+                abierto_ahora = self.estado != self.ABIERTO
+                self.estado = self.ABIERTO
+                self._abierto_desde = time.monotonic()
+                return abierto_ahora
+            return False
+
+
+class _EndpointProxy:
+    """Proxy de un endpoint de notion_client que pasa cada llamada por la integración"""
+
+    def __init__(self, integracion: "NotionIntegration", objetivo: Any):
+        self._integracion = integracion
+        self._objetivo = objetivo
+
+    def __getattr__(self, nombre: str):
+        atributo = getattr(self._objetivo, nombre)
+        if callable(atributo):
+            def llamada(*args, **kwargs):
+                return self._integracion.ejecutar(atributo, *args, **kwargs)
+            return llamada
+        return _EndpointProxy(self._integracion, atributo)
+
+
+class NotionIntegration:
+    """
+    Cliente de Notion con control de tasa, reintentos y circuit breaker
+    Mantiene la interfaz de notion_client.Client: integracion.blocks.children.append(...)
+    """
+
+    def __init__(self, token: str = None, cliente=None, base_url: str = None,
+                 tasa: float = None, rafaga: float = None, max_reintentos: int = None,
+                 backoff_base: float = None, backoff_max: float = None,
+                 umbral_circuito: int = None, apertura_circuito: float = None):
+        """Crear (o envolver) el cliente de Notion con la política de resiliencia"""
+        if cliente is None:
+            from notion_client import Client
+            from notion_client.client import ClientOptions
+            opciones = {"auth": token}
+            if base_url:
+                opciones["base_url"] = base_url
+            if "retry" in getattr(ClientOptions, "__dataclass_fields__", {}):
+                # Versiones nuevas de notion-client reintentan solas: la política es de esta clase
+                opciones["retry"] = False
+            cliente = Client(**opciones)
+        self.cliente = cliente
+
+        self.bucket = TokenBucket(tasa or Settings.NOTION_RATE_LIMIT, rafaga or Settings.NOTION_RATE_BURST)
+        self.circuito = CircuitBreaker(umbral_circuito or Settings.NOTION_CIRCUIT_FAILURE_THRESHOLD,
+                                       apertura_circuito or Settings.NOTION_CIRCUIT_RESET_TIMEOUT)
+        self.max_reintentos = Settings.NOTION_MAX_RETRIES if max_reintentos is None else max_reintentos
+        self.backoff_base = backoff_base or Settings.NOTION_BACKOFF_BASE
+        self.backoff_max = backoff_max or Settings.NOTION_BACKOFF_MAX
+
+        self._lock = threading.Lock()
+        self.estadisticas = {"llamadas": 0, "exitos": 0, "reintentos": 0, "rate_limited": 0,
+                             "fallos": 0, "rechazadas_circuito": 0, "espera_bucket": 0.0}
+
+    def __getattr__(self, nombre: str):
+        # pages, blocks, databases, ... pasan por la política de resiliencia
+        if nombre == "cliente":
+            raise AttributeError(nombre)
+        return _EndpointProxy(self, getattr(self.cliente, nombre))
+
+    def _contar(self, nombre: str, cantidad: float = 1):
+        with self._lock:
+            self.estadisticas[nombre] += cantidad
+
+    @staticmethod
+    def es_reintentable(error: Exception) -> bool:
+        """Errores transitorios: 429, 5xx, timeouts y errores de red"""
+        estado = getattr(error, "status", None)
+        codigo = getattr(error, "code", None)
+        codigo = getattr(codigo, "value", codigo)
+        if estado in ESTADOS_REINTENTABLES or codigo in CODIGOS_REINTENTABLES:
+            return True
+        return isinstance(error, (httpx.TransportError, httpx.TimeoutException))
+
+    def calcular_espera(self, intento: int, error: Exception) -> float:
+        """Retry-After si la API lo indica; si no, backoff exponencial con jitter completo"""
+        headers = getattr(error, "headers", None) or {}
+        retry_after = headers.get("retry-after") if hasattr(headers, "get") else None
+        if retry_after is not None:
+            try:
+                return min(float(retry_after), self.backoff_max)
+            except ValueError:
+                pass
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** intento)))
+
+    def ejecutar(self, funcion: Callable, *args, **kwargs) -> Any:
+        """Ejecutar una llamada a Notion aplicando tasa, reintentos y circuit breaker"""
+        intento = 0
+        while True:
+            try:
+                self.circuito.permitir()
+            except NotionNoDisponibleError:
+                self._contar("rechazadas_circuito")
+                raise
+
+            self._contar("espera_bucket", self.bucket.adquirir())
+            self._contar("llamadas")
+            try:
+                resultado = funcion(*args, **kwargs)
+            except Exception as e:
+                if not self.es_reintentable(e):
+                    # Error del request (validación, permisos): Notion está sano
+                    self.circuito.registrar_exito()
+                    raise
+                if getattr(e, "status", None) == 429:
+                    self._contar("rate_limited")
+                if self.circuito.registrar_fallo():
+                    print(f"[ADVERTENCIA] Circuito de Notion abierto tras errores consecutivos: {e}")
+                if self.circuito.estado == CircuitBreaker.ABIERTO:
+                    self._contar("fallos")
+                    raise NotionNoDisponibleError(f"Notion no disponible: {e}") from e
+                if intento >= self.max_reintentos:
+                    self._contar("fallos")
+                    raise
+                time.sleep(self.calcular_espera(intento, e))
+                intento += 1
+                self._contar("reintentos")
+                continue
+
+            self.circuito.registrar_exito()
+            self._contar("exitos")
+            return resultado
+
+    def resumen(self) -> Dict[str, Any]:
+        """Estadísticas de uso y estado del circuito"""
+        with self._lock:
+            resumen = dict(self.estadisticas)
+        resumen["circuito"] = self.circuito.estado
+        return resumen
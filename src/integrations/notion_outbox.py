@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+Cliente de Notion con Outbox Durable
+blocks.children.append guarda los bloques en el outbox (SQLite) y vuelve enseguida;
+el replicador los entrega a Notion en lotes de hasta 100 hijos por request,
+agrupando registros consecutivos de la misma página. Los registros no entregados
+sobreviven a caídas del proceso y a cortes de Notion: 429, 5xx y errores de red se
+reintentan; un registro que Notion rechaza con otro 4xx se descarta.
+"""
+
+import hashlib
+import json
+from typing import Any, Dict, List
+
+from ..persistence.outbox import DurableOutbox, OutboxReplayer, RegistroRechazado
+from .notion_batcher import MAX_HIJOS_POR_REQUEST
+from .notion_integration import es_rechazo_permanente
+
+
+SINK_NOTION = "notion"
+
+
+def clave_bloques(page_id: str, children: List[Dict[str, Any]]) -> str:
+    """Clave de idempotencia por contenido: el mismo append no se replica dos veces"""
+    contenido = json.dumps([page_id, children], ensure_ascii=False, sort_keys=True)
+    return hashlib.sha256(contenido.encode("utf-8")).hexdigest()
+
+
+class _BloquesOutbox:
+    """Expone blocks.children.append con la firma de notion_client"""
+
+    def __init__(self, cliente: "NotionOutboxClient"):
+        self.children = self
+        self._cliente = cliente
+
+    def append(self, block_id: str, children: List[Dict[str, Any]], clave: str = None, **kwargs) -> Dict[str, Any]:
+        nuevo = self._cliente.agregar(block_id, children, clave)
+        return {"object": "list", "results": [], "encolado": True, "duplicado": not nuevo}
+
+
+class NotionOutboxClient:
+    """
+    Reemplaza al notion_client.Client para las escrituras de bloques
+    El resto de los endpoints (pages, databases, ...) se delega al cliente real.
+    """
+
+    def __init__(self, cliente, outbox: DurableOutbox = None, **opciones_replicador):
+        """Envolver un cliente de Notion y arrancar el replicador del outbox"""
+        self.cliente = cliente
+        self.outbox = outbox or DurableOutbox()
+        self.blocks = _BloquesOutbox(self)
+        self.replicador = OutboxReplayer(self.outbox, {SINK_NOTION: self.entregar},
+                                         nombre="notion-outbox", **opciones_replicador)
+
+    def __getattr__(self, nombre: str):
+        if nombre == "cliente":
+            raise AttributeError(nombre)
+        return getattr(self.cliente, nombre)
+
+    def agregar(self, page_id: str, children: List[Dict[str, Any]], clave: str = None) -> bool:
+        """Guardar el append en el outbox; False si la clave ya estaba registrada"""
+        nuevo = self.outbox.agregar(SINK_NOTION, clave or clave_bloques(page_id, children),
+                                    children, destino=page_id) is not None
+        if nuevo:
+            self.replicador.despertar()
+        return nuevo
+
+    def _enviar(self, page_id: str, hijos: List[Dict[str, Any]]):
+        for inicio in range(0, len(hijos), MAX_HIJOS_POR_REQUEST):
+            self.cliente.blocks.children.append(block_id=page_id, children=hijos[inicio:inicio + MAX_HIJOS_POR_REQUEST])
+
+    def entregar(self, lote: List[Dict[str, Any]]) -> int:
+        """Enviar un lote del outbox; devuelve cuántos registros del principio se entregaron
+
+        Si Notion rechaza un grupo de forma permanente, sus registros se reenvían de a uno
+        para aislar el culpable, que se informa con RegistroRechazado.
+        """
+        entregados = 0
+        while entregados < len(lote):
+            # Registros consecutivos de la misma página, sin pasar de 100 hijos por request
+            page_id = lote[entregados]["destino"]
+            hijos: List[Dict[str, Any]] = []
+            fin = entregados
+            while (fin < len(lote) and lote[fin]["destino"] == page_id
+                   and (not hijos or len(hijos) + len(lote[fin]["payload"]) <= MAX_HIJOS_POR_REQUEST)):
+                hijos.extend(lote[fin]["payload"])
+                fin += 1
+            try:
+                self._enviar(page_id, hijos)
+            except Exception as e:
+                if not es_rechazo_permanente(e):
+                    print(f"[ADVERTENCIA] Notion no aceptó el lote del outbox ({len(lote) - entregados} pendientes): {e}")
+                    return entregados
+                for posicion in range(entregados, fin):
+                    try:
+                        self._enviar(page_id, lote[posicion]["payload"])
+                    except Exception as error_registro:
+                        if es_rechazo_permanente(error_registro):
+                            raise RegistroRechazado(posicion, str(error_registro)) from error_registro
+                        print(f"[ADVERTENCIA] Notion no aceptó el lote del outbox "
+                              f"({len(lote) - posicion} pendientes): {error_registro}")
+                        return posicion
+            entregados = fin
+        return entregados
+
+    def pendientes(self) -> int:
+        """Registros del outbox todavía no entregados a Notion"""
+        return self.outbox.cantidad_pendiente(SINK_NOTION)
+
+    def cerrar(self):
+        """Última entrega, detener el replicador y cerrar el outbox"""
+        self.replicador.detener()
+        self.outbox.cerrar()
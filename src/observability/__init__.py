@@ -4,5 +4,6 @@ Sistema de tracing y monitoreo con LangSmith
 """
 
 from .langsmith_observer import LangSmithObserver, create_langsmith_report
+from .performance_metrics import PerformanceMetrics
 
-__all__ = ["LangSmithObserver", "create_langsmith_report"]
+__all__ = ["LangSmithObserver", "create_langsmith_report", "PerformanceMetrics"]
@@ -6,6 +6,7 @@ Configura y gestiona el tracing completo del sistema multi-agente
 
 import os
 import json
+import threading
 from datetime import datetime
 from typing import Dict, Any, List
 from dotenv import load_dotenv
@@ -27,6 +28,7 @@ class LangSmithObserver:
         self.setup_langsmith()
         self.setup_callback_handler()
         self.traces_data = []
+        self._lock = threading.Lock()
         
     def setup_langsmith(self):
         """Configurar LangSmith para tracing"""
@@ -63,9 +65,12 @@ class LangSmithObserver:
             "metadata": metadata or {},
             "events": []
         }
-        self.traces_data.append(trace_info)
+        # El índice se toma bajo lock: varias consultas pueden abrir traces en paralelo
+        with self._lock:
+            self.traces_data.append(trace_info)
+            indice = len(self.traces_data) - 1
         print(f"[TRACE] Iniciado: {trace_name}")
-        return len(self.traces_data) - 1
+        return indice
     
     def log_event(self, trace_index: int, event_type: str, data: Dict[str, Any]):
         """Registrar un evento en el trace"""
@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+"""
+Métricas de Rendimiento
+Contadores y latencias en memoria, seguros para uso concurrente
+"""
+
+import threading
+from collections import defaultdict, deque
+from typing import Dict, Any
+
+
+class PerformanceMetrics:
+    """
+    Registro de métricas de rendimiento del sistema
+    - Contadores: eventos acumulados (sesiones, descartes, reintentos...)
+    - Latencias: últimas N muestras por métrica con percentiles
+    """
+
+    def __init__(self, max_muestras: int = 10000):
+        """Inicializar el registro de métricas"""
+        self.max_muestras = max_muestras
+        self._lock = threading.Lock()
+        self._contadores = defaultdict(int)
+        self._latencias = defaultdict(lambda: deque(maxlen=self.max_muestras))
+
+    def incrementar(self, nombre: str, cantidad: int = 1):
+        """Incrementar un contador"""
+        with self._lock:
+            self._contadores[nombre] += cantidad
+
+    def registrar_latencia(self, nombre: str, segundos: float):
+        """Registrar una muestra de latencia en segundos"""
+        with self._lock:
+            self._latencias[nombre].append(segundos)
+
+    def contador(self, nombre: str) -> int:
+        """Obtener el valor de un contador"""
+        with self._lock:
+            return self._contadores.get(nombre, 0)
+
+    def percentiles(self, nombre: str) -> Dict[str, float]:
+        """Calcular p50/p95/p99/max de una métrica de latencia"""
+        with self._lock:
+            muestras = sorted(self._latencias.get(nombre, ()))
+
+        if not muestras:
+            return {"muestras": 0, "p50": 0.0, "p95": 0.0, "p99": 0.0, "max": 0.0}
+
+        def percentil(p: float) -> float:
+            return muestras[min(len(muestras) - 1, int(p * len(muestras)))]
+
+        return {
+            "muestras": len(muestras),
+            "p50": percentil(0.50),
+            "p95": percentil(0.95),
+            "p99": percentil(0.99),
+            "max": muestras[-1]
+        }
+
+    def resumen(self) -> Dict[str, Any]:
+        """Obtener un resumen de todos los contadores y latencias"""
+        with self._lock:
+            contadores = dict(self._contadores)
+            nombres_latencias = list(self._latencias.keys())
+
+        return {
+            "contadores": contadores,
+            "latencias": {nombre: self.percentiles(nombre) for nombre in nombres_latencias}
+        }
@@ -0,0 +1,19 @@
+"""
+Módulo de Persistencia
+Almacenamiento local duradero del estado del sistema
+"""
+
+from .file_lock import bloqueo_exclusivo
+from .order_journal import OrderJournal, OrderState, compactar_journals
+from .write_behind import WriteBehindQueue
+from .conversation_log import ConversationLogWriter, leer_log
+from .report_store import ReportStore
+from .report_history import ReportHistory
+from .outbox import DurableOutbox, OutboxReplayer, RegistroRechazado
+from .checkpoints import (ConsultaFallida, crear_checkpointer, config_ejecucion, pasos_ejecucion,
+                          podar_checkpoints)
+
+__all__ = ["bloqueo_exclusivo", "OrderJournal", "OrderState", "compactar_journals", "WriteBehindQueue",
+           "ConversationLogWriter", "leer_log", "ReportStore", "ReportHistory",
+           "DurableOutbox", "OutboxReplayer", "RegistroRechazado", "ConsultaFallida",
+           "crear_checkpointer", "config_ejecucion", "pasos_ejecucion", "podar_checkpoints"]
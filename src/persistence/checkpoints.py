@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+Checkpoints Persistentes de LangGraph
+El grafo multi-agente guarda su estado en SQLite después de cada nodo, con el
+id de la consulta como thread_id. Si una ejecución falla a mitad de camino, un
+reintento con el mismo id retoma desde el último nodo completado. El
+historial de cada ejecución permite además reproducirla desde cualquier paso.
+Las ejecuciones sin actividad durante la retención configurada se podan; la
+antigüedad se lee del id del último checkpoint (uuid6, ordenado por tiempo),
+sin deserializar los checkpoints.
+"""
+
+import sqlite3
+import time
+from pathlib import Path
+from typing import Any, Dict, List
+
+from langgraph.checkpoint.sqlite import SqliteSaver
+
+from config.settings import Settings
+
+
+class ConsultaFallida(Exception):
+    """Una ejecución falló; reintentar con su request_id retoma desde el último nodo completado"""
+
+    def __init__(self, request_id: str, causa: Exception):
+        super().__init__(f"Consulta {request_id} fallida: {causa}")
+        self.request_id = request_id
+        self.causa = causa
+
+
+def crear_checkpointer(ruta: str = None) -> SqliteSaver:
+    """Checkpointer SQLite compartible entre hilos (SqliteSaver serializa los accesos)"""
+    ruta = Path(ruta or Settings.MULTI_AGENT_CHECKPOINT_DB)
+    ruta.parent.mkdir(parents=True, exist_ok=True)
+    conexion = sqlite3.connect(str(ruta), check_same_thread=False)
+    return SqliteSaver(conexion)
+
+
+def config_ejecucion(request_id: str, checkpoint_id: str = None) -> Dict[str, Any]:
+    """Config de LangGraph de una ejecución (y, opcionalmente, de uno de sus checkpoints)"""
+    configurable = {"thread_id": request_id}
+    if checkpoint_id is not None:
+        configurable["checkpoint_id"] = checkpoint_id
+    return {"configurable": configurable}
+
+
+def pasos_ejecucion(grafo, request_id: str) -> List[Dict[str, Any]]:
+    """Checkpoints de una ejecución en orden cronológico: id, paso y nodos pendientes"""
+    pasos = [{
+        "checkpoint_id": estado.config["configurable"]["checkpoint_id"],
+        "paso": estado.metadata.get("step") if estado.metadata else None,
+        "siguiente": list(estado.next),
+        "creado": estado.created_at,
+    } for estado in grafo.get_state_history(config_ejecucion(request_id))]
+    return list(reversed(pasos))
+
+
+# Segundos entre el inicio del calendario gregoriano (época de los uuid6) y la época Unix
+_EPOCA_GREGORIANA = 12219292800
+
+
+def instante_checkpoint(checkpoint_id: str) -> float:
+    """Momento (epoch Unix) en que se creó un checkpoint, leído de su id uuid6"""
+    digitos = checkpoint_id.replace("-", "")
+    # 60 bits de tiempo en intervalos de 100 ns: 48 bits altos y 12 bajos, salteando la versión
+    intervalos = int(digitos[:12] + digitos[13:16], 16)
+    return intervalos / 1e7 - _EPOCA_GREGORIANA
+
+
+def podar_checkpoints(checkpointer: SqliteSaver, retencion: float = None) -> int:
+    """Borrar las ejecuciones cuyo último checkpoint supera la retención; devuelve cuántas"""
+    retencion = Settings.MULTI_AGENT_CHECKPOINT_RETENTION if retencion is None else retencion
+    limite = time.time() - retencion
+    with checkpointer.cursor(transaction=False) as cursor:
+        ultimos = cursor.execute(
+            "SELECT thread_id, MAX(checkpoint_id) FROM checkpoints GROUP BY thread_id"
+        ).fetchall()
+    vencidos = [thread_id for thread_id, ultimo in ultimos if instante_checkpoint(ultimo) < limite]
+    for thread_id in vencidos:
+        checkpointer.delete_thread(thread_id)
+    return len(vencidos)
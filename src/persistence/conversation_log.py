@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+"""
+Log de Conversaciones en JSONL
+Escritor de larga vida con buffer: cada mensaje es una línea JSON
+(session_id, timestamp, rol, texto, latencia_ms) en Settings.LOG_FILE.
+- el archivo se abre una vez y se vuelca por tamaño de buffer o por intervalo
+  (un hilo vuelca lo pendiente aunque no lleguen más escrituras)
+- rotación por tamaño y por tiempo, con gzip opcional de los segmentos rotados
+- política de fsync configurable
+"""
+
+import atexit
+import gzip
+import json
+import os
+import shutil
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from config.settings import Settings
+
+
+# Políticas de fsync
+FSYNC_NUNCA = "nunca"      # el sistema operativo decide cuándo llega a disco
+FSYNC_FLUSH = "flush"      # fsync cada vez que se vuelca el buffer
+FSYNC_SIEMPRE = "siempre"  # volcado y fsync por cada registro
+
+
+class ConversationLogWriter:
+    """
+    Escritor JSONL con buffer y rotación
+    Seguro para hilos; el archivo permanece abierto entre escrituras.
+    """
+
+    def __init__(self, ruta: str = None, buffer_bytes: int = None, intervalo_flush: float = None,
+                 max_bytes: int = None, intervalo_rotacion: float = None,
+                 comprimir: bool = None, fsync: str = None):
+        """Configurar el destino, el buffer, la rotación y la política de fsync"""
+        self.ruta = Path(ruta or Settings.LOG_FILE)
+        self.buffer_bytes = buffer_bytes or Settings.LOG_BUFFER_BYTES
+        self.intervalo_flush = Settings.LOG_FLUSH_INTERVAL if intervalo_flush is None else intervalo_flush
+        self.max_bytes = max_bytes or Settings.LOG_ROTATE_MAX_BYTES
+        self.intervalo_rotacion = (Settings.LOG_ROTATE_INTERVAL
+                                   if intervalo_rotacion is None else intervalo_rotacion)
+        self.comprimir = Settings.LOG_COMPRESS_ROTATED if comprimir is None else comprimir
+        self.fsync = fsync or Settings.LOG_FSYNC
+        if self.fsync not in (FSYNC_NUNCA, FSYNC_FLUSH, FSYNC_SIEMPRE):
+            raise ValueError(f"Política de fsync desconocida: {self.fsync}")
+
+        self._lock = threading.Lock()
+        self._archivo = None
+        self._tamano = 0
+        self._abierto_desde = 0.0
+        self._ultimo_flush = 0.0
+        self._pendiente = False  # hay registros escritos desde el último volcado
+        self._detener = threading.Event()
+        self._volcador: Optional[threading.Thread] = None
+        self._compresiones: List[threading.Thread] = []
+        self._cerrado = False
+        self.estadisticas = {"registros": 0, "flushes": 0, "rotaciones": 0, "errores": 0}
+        atexit.register(self.cerrar)
+
+    def _abrir(self):
+        self.ruta.parent.mkdir(parents=True, exist_ok=True)
+        self._archivo = open(self.ruta, "ab", buffering=self.buffer_bytes)
+        self._tamano = self._archivo.tell()
+        self._abierto_desde = time.time()
+        self._ultimo_flush = time.monotonic()
+        if self._volcador is None and self.intervalo_flush > 0 and self.fsync != FSYNC_SIEMPRE:
+            self._volcador = threading.Thread(target=self._volcar_periodicamente, name="robino-log-flush",
+                                              daemon=True)
+            self._volcador.start()
+
+    def _volcar_periodicamente(self):
+        """Volcar cada intervalo_flush lo que quedó en el buffer de una sesión ociosa"""
+        while not self._detener.wait(self.intervalo_flush):
+            with self._lock:
+                if self._archivo is None or not self._pendiente:
+                    continue
+                try:
+                    self._volcar()
+                except Exception as e:
+                    self.estadisticas["errores"] += 1
+                    print(f"[ADVERTENCIA] Error volcando el log de conversaciones: {e}")
+
+    def _volcar(self):
+        """Vaciar el buffer al sistema operativo y aplicar la política de fsync"""
+        self._archivo.flush()
+        if self.fsync != FSYNC_NUNCA:
+            os.fsync(self._archivo.fileno())
+        self._ultimo_flush = time.monotonic()
+        self._pendiente = False
+        self.estadisticas["flushes"] += 1
+
+    def _debe_rotar(self) -> bool:
+        if self._tamano >= self.max_bytes:
+            return True
+        return bool(self.intervalo_rotacion) and time.time() - self._abierto_desde >= self.intervalo_rotacion
+
+    def _rotar(self):
+        """Cerrar el segmento actual, renombrarlo con fecha y comprimirlo en segundo plano"""
+        self._volcar()
+        self._archivo.close()
+        self._archivo = None
+
+        marca = datetime.fromtimestamp(self._abierto_desde).strftime("%Y%m%d-%H%M%S")
+        destino = self.ruta.with_name(f"{self.ruta.stem}.{marca}{self.ruta.suffix}")
+        contador = 1
+        while destino.exists() or destino.with_name(destino.name + ".gz").exists():
+            destino = self.ruta.with_name(f"{self.ruta.stem}.{marca}.{contador}{self.ruta.suffix}")
+            contador += 1
+        os.replace(self.ruta, destino)
+        self.estadisticas["rotaciones"] += 1
+
+        if self.comprimir:
+            hilo = threading.Thread(target=self._comprimir, args=(destino,), name="log-gzip", daemon=True)
+            hilo.start()
+            self._compresiones = [h for h in self._compresiones if h.is_alive()] + [hilo]
+
+    @staticmethod
+    def _comprimir(ruta: Path):
+        """Comprimir un segmento rotado y borrar el original"""
+        try:
+            with open(ruta, "rb") as origen, gzip.open(f"{ruta}.gz", "wb") as destino:
+                shutil.copyfileobj(origen, destino)
+            ruta.unlink()
+        except Exception as e:
+            print(f"[ADVERTENCIA] Error comprimiendo log rotado {ruta}: {e}")
+
+    def escribir(self, registro: Dict[str, Any]):
+        """Agregar un registro como una línea JSON"""
+        linea = (json.dumps(registro, ensure_ascii=False) + "\n").encode("utf-8")
+        with self._lock:
+            if self._cerrado:
+                raise RuntimeError("El log de conversaciones está cerrado")
+            if self._archivo is None:
+                self._abrir()
+            elif self._debe_rotar():
+                self._rotar()
+                self._abrir()
+
+            self._archivo.write(linea)
+            self._tamano += len(linea)
+            self._pendiente = True
+            self.estadisticas["registros"] += 1
+            if self.fsync == FSYNC_SIEMPRE or time.monotonic() - self._ultimo_flush >= self.intervalo_flush:
+                self._volcar()
+
+    def registrar_mensaje(self, session_id: Optional[str], rol: str, texto: str,
+                          latencia: float = None, timestamp: str = None, turno: int = None):
+        """Registrar un mensaje de la conversación"""
+        self.escribir({
+            "session_id": session_id,
+            "turno": turno,
+            "timestamp": timestamp or datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            "rol": rol,
+            "texto": texto,
+            "latencia_ms": None if latencia is None else round(latencia * 1000, 1)
+        })
+
+    def flush(self):
+        """Volcar lo que haya en el buffer"""
+        with self._lock:
+            if self._archivo is not None:
+                self._volcar()
+
+    def cerrar(self):
+        """Detener el volcado periódico, volcar, cerrar el archivo y esperar las compresiones pendientes"""
+        with self._lock:
+            if self._cerrado:
+                return
+            self._cerrado = True
+            self._detener.set()
+            if self._archivo is not None:
+                self._volcar()
+                self._archivo.close()
+                self._archivo = None
+        atexit.unregister(self.cerrar)
+        if self._volcador is not None:
+            self._volcador.join()
+        for hilo in self._compresiones:
+            hilo.join()
+
+
+def leer_log(ruta: str) -> List[Dict[str, Any]]:
+    """Leer un segmento del log (plano o .gz) como lista de registros"""
+    abrir = gzip.open if str(ruta).endswith(".gz") else open
+    with abrir(ruta, "rt", encoding="utf-8") as f:
+        return [json.loads(linea) for linea in f if linea.strip()]
@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+"""
+Bloqueo de Archivos entre Procesos
+Lock exclusivo del sistema operativo sobre un archivo auxiliar: fcntl.flock en
+POSIX y msvcrt.locking en Windows. Lo toman todos los que escriben o reescriben
+el archivo protegido, sea en este proceso (otra instancia) o en otro.
+"""
+
+import os
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+
+def _bloquear(fd: int, esperar: bool = True) -> bool:
+    if fcntl is not None:
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX if esperar else fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            return False
+        return True
+    while True:
+        try:
+            # LK_LOCK reintenta durante 10 s y luego falla: se sigue esperando
+            msvcrt.locking(fd, msvcrt.LK_LOCK if esperar else msvcrt.LK_NBLCK, 1)
+            return True
+        except OSError:
+            if not esperar:
+                return False
+            time.sleep(0.05)
+
+
+def _desbloquear(fd: int):
+    if fcntl is not None:
+        fcntl.flock(fd, fcntl.LOCK_UN)
+    else:
+        os.lseek(fd, 0, os.SEEK_SET)
+        msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
+
+
+@contextmanager
+def bloqueo_exclusivo(ruta, esperar: bool = True):
+    """Mantener el lock exclusivo de ruta (se crea si no existe) mientras dura el bloque
+
+    Con esperar=False no se bloquea: el bloque recibe False si otro tiene el lock.
+    No es reentrante: dentro del bloque no se debe volver a pedir el mismo lock.
+    """
+    ruta = Path(ruta)
+    ruta.parent.mkdir(parents=True, exist_ok=True)
+    fd = os.open(str(ruta), os.O_RDWR | os.O_CREAT, 0o644)
+    try:
+        if not _bloquear(fd, esperar):
+            yield False
+            return
+        try:
+            yield True
+        finally:
+            _desbloquear(fd)
+    finally:
+        os.close(fd)
@@ -0,0 +1,294 @@
+#!/usr/bin/env python3
+"""
+Journal de Pedidos - Registro append-only por sesión
+Cada cambio del pedido (agregar, eliminar, pagar) se guarda como un evento JSONL.
+El estado se reconstruye como snapshot + reproducción de los eventos posteriores.
+Escritor y compactación (de esta u otra instancia o proceso) se coordinan con un
+lock de archivo por journal (<session_id>.lock).
+"""
+
+import os
+import json
+import threading
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Any, List, Iterator, Optional
+
+from config.settings import Settings
+from .file_lock import bloqueo_exclusivo
+
+
+# Tipos de evento soportados por el journal
+EVENTO_ITEM_AGREGADO = "item_agregado"
+EVENTO_ITEM_ELIMINADO = "item_eliminado"
+EVENTO_PAGO_PROCESADO = "pago_procesado"
+
+
+class OrderState:
+    """
+    Estado materializado del pedido de una sesión
+    Se obtiene aplicando los eventos del journal en orden
+    """
+
+    def __init__(self):
+        self.pedido: List[Dict[str, Any]] = []
+        self.total = 0.0
+        self.pagado = False
+        self.metodo_pago = None
+        self.ultimo_seq = 0
+
+    def aplicar(self, evento: Dict[str, Any]):
+        """Aplicar un evento del journal sobre el estado"""
+        tipo = evento["tipo"]
+        datos = evento.get("datos", {})
+
+        if tipo == EVENTO_ITEM_AGREGADO:
+            for _ in range(datos.get("cantidad", 1)):
+                self.pedido.append({"item": datos["item"], "precio": datos["precio"]})
+                self.total += datos["precio"]
+        elif tipo == EVENTO_ITEM_ELIMINADO:
+            item = self.pedido.pop(datos["indice"])
+            self.total -= item["precio"]
+        elif tipo == EVENTO_PAGO_PROCESADO:
+            self.pagado = True
+            self.metodo_pago = datos.get("metodo")
+        else:
+            raise ValueError(f"Tipo de evento desconocido: {tipo}")
+
+        self.ultimo_seq = evento["seq"]
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Serializar el estado para el snapshot"""
+        return {
+            "pedido": self.pedido,
+            "total": self.total,
+            "pagado": self.pagado,
+            "metodo_pago": self.metodo_pago,
+            "ultimo_seq": self.ultimo_seq
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "OrderState":
+        """Crear un estado a partir de un snapshot"""
+        estado = cls()
+        estado.pedido = list(data.get("pedido", []))
+        estado.total = data.get("total", 0.0)
+        estado.pagado = data.get("pagado", False)
+        estado.metodo_pago = data.get("metodo_pago")
+        estado.ultimo_seq = data.get("ultimo_seq", 0)
+        return estado
+
+
+class OrderJournal:
+    """
+    Journal append-only de eventos de pedido para una sesión
+    - <session_id>.jsonl: un evento por línea con número de secuencia
+    - <session_id>.snapshot.json: estado compacto hasta un número de secuencia
+    - <session_id>.lock: lock de archivo que toman las escrituras y la compactación
+    """
+
+    def __init__(self, session_id: str, directorio: str = None,
+                 intervalo_snapshot: int = None, fsync: bool = None):
+        """Abrir (o crear) el journal de la sesión y reconstruir su estado"""
+        self.session_id = session_id
+        self.directorio = Path(directorio or Settings.JOURNAL_DIRECTORY)
+        self.intervalo_snapshot = intervalo_snapshot or Settings.JOURNAL_SNAPSHOT_INTERVAL
+        self.fsync = Settings.JOURNAL_FSYNC if fsync is None else fsync
+
+        self.directorio.mkdir(parents=True, exist_ok=True)
+        self.journal_path = self.directorio / f"{session_id}.jsonl"
+        self.snapshot_path = self.directorio / f"{session_id}.snapshot.json"
+        self.lock_path = self.directorio / f"{session_id}.lock"
+
+        self._lock = threading.Lock()
+        with bloqueo_exclusivo(self.lock_path):
+            self._reparar_cola()
+        self.estado = self.reconstruir()
+        self._eventos_desde_snapshot = self.estado.ultimo_seq - self._seq_snapshot()
+        # El archivo se abre recién con el primer evento: las sesiones ociosas no ocupan descriptores
+        self._archivo = None
+
+    def _seq_snapshot(self) -> int:
+        """Número de secuencia cubierto por el snapshot actual"""
+        snapshot = self._leer_snapshot()
+        return snapshot.ultimo_seq if snapshot else 0
+
+    def _leer_snapshot(self) -> Optional[OrderState]:
+        """Leer el snapshot de la sesión si existe"""
+        if not self.snapshot_path.exists():
+            return None
+        with open(self.snapshot_path, "r", encoding="utf-8") as f:
+            return OrderState.from_dict(json.load(f))
+
+    def _leer_eventos(self) -> Iterator[Dict[str, Any]]:
+        """Leer los eventos del journal ignorando una última línea truncada"""
+        if not self.journal_path.exists():
+            return
+        with open(self.journal_path, "r", encoding="utf-8") as f:
+            for linea in f:
+                if not linea.strip():
+                    continue
+                try:
+                    yield json.loads(linea)
+                except json.JSONDecodeError:
+                    # Escritura interrumpida por una caída: el resto no es confiable
+                    break
+
+    def _reparar_cola(self):
+        """Truncar el journal tras el último evento completo
+
+        Una caída puede dejar una línea a medias; si quedara, el próximo evento se
+        pegaría a ella y la reconstrucción perdería todo lo escrito desde entonces.
+        """
+        if not self.journal_path.exists():
+            return
+        with open(self.journal_path, "rb") as f:
+            offset = 0
+            for linea in f:
+                if not linea.endswith(b"\n"):
+                    break
+                if linea.strip():
+                    try:
+                        json.loads(linea)
+                    except ValueError:
+                        break
+                offset += len(linea)
+            tamano = f.seek(0, os.SEEK_END)
+        if offset < tamano:
+            with open(self.journal_path, "r+b") as f:
+                f.truncate(offset)
+            print(f"[ADVERTENCIA] Journal {self.session_id}: {tamano - offset} bytes de una escritura "
+                  "interrumpida descartados")
+
+    def reconstruir(self) -> OrderState:
+        """Reconstruir el estado como snapshot + reproducción de la cola del journal"""
+        estado = self._leer_snapshot() or OrderState()
+        for evento in self._leer_eventos():
+            if evento["seq"] > estado.ultimo_seq:
+                estado.aplicar(evento)
+        return estado
+
+    def _archivo_vigente(self) -> bool:
+        """El descriptor abierto sigue apuntando al journal (otra instancia no lo reemplazó al compactar)"""
+        try:
+            return os.fstat(self._archivo.fileno()).st_ino == os.stat(self.journal_path).st_ino
+        except FileNotFoundError:
+            return False
+
+    def registrar(self, tipo: str, datos: Dict[str, Any]) -> Dict[str, Any]:
+        """Agregar un evento al journal y aplicarlo al estado materializado"""
+        with self._lock, bloqueo_exclusivo(self.lock_path):
+            evento = {
+                "seq": self.estado.ultimo_seq + 1,
+                "timestamp": datetime.now().isoformat(),
+                "session_id": self.session_id,
+                "tipo": tipo,
+                "datos": datos
+            }
+            self.estado.aplicar(evento)
+
+            if self._archivo is not None and not self._archivo_vigente():
+                self.cerrar_archivo()
+            if self._archivo is None:
+                self._archivo = open(self.journal_path, "a", encoding="utf-8")
+            self._archivo.write(json.dumps(evento, ensure_ascii=False) + "\n")
+            self._archivo.flush()
+            if self.fsync:
+                os.fsync(self._archivo.fileno())
+
+            self._eventos_desde_snapshot += 1
+            if self._eventos_desde_snapshot >= self.intervalo_snapshot:
+                self._escribir_snapshot()
+
+            return evento
+
+    def tomar_snapshot(self):
+        """Guardar un snapshot compacto del estado actual"""
+        with self._lock, bloqueo_exclusivo(self.lock_path):
+            self._escribir_snapshot()
+
+    def _escribir_snapshot(self):
+        """Escribir el snapshot de forma atómica (archivo temporal + rename)"""
+        tmp_path = self.snapshot_path.with_suffix(".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.estado.to_dict(), f, ensure_ascii=False)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.snapshot_path)
+        self._eventos_desde_snapshot = 0
+
+    def compactar(self, releer: bool = False) -> int:
+        """Descartar del journal los eventos ya cubiertos por el snapshot
+
+        Con releer=True (compactación desde otra instancia) el estado se reconstruye
+        desde disco y se toma el snapshot bajo el mismo lock, así no pisa uno más nuevo
+        del escritor ni pierde los eventos que agregó mientras tanto.
+        """
+        with self._lock, bloqueo_exclusivo(self.lock_path):
+            if releer:
+                self.estado = self.reconstruir()
+                self._escribir_snapshot()
+            seq_snapshot = self._seq_snapshot()
+            eventos = list(self._leer_eventos())
+            conservados = [e for e in eventos if e["seq"] > seq_snapshot]
+
+            self.cerrar_archivo()
+            tmp_path = self.journal_path.with_suffix(".tmp")
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                for evento in conservados:
+                    f.write(json.dumps(evento, ensure_ascii=False) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.journal_path)
+
+            return len(eventos) - len(conservados)
+
+    def eventos(self, tipo: str = None) -> List[Dict[str, Any]]:
+        """Consultar los eventos del journal (auditoría), opcionalmente por tipo"""
+        with self._lock:
+            return [e for e in self._leer_eventos() if tipo is None or e["tipo"] == tipo]
+
+    def cerrar_archivo(self):
+        """Cerrar el descriptor del journal si está abierto"""
+        if self._archivo is not None:
+            self._archivo.close()
+            self._archivo = None
+
+    def cerrar(self):
+        """Cerrar el archivo del journal"""
+        with self._lock:
+            self.cerrar_archivo()
+
+
+def compactar_journals(directorio: str = None) -> Dict[str, int]:
+    """Tarea de compactación: snapshot + descarte de eventos para todas las sesiones
+
+    Puede correr con sesiones abiertas: toma el lock de cada journal y el escritor
+    reabre el archivo reemplazado antes de su próxima escritura.
+    """
+    directorio = Path(directorio or Settings.JOURNAL_DIRECTORY)
+    resultados = {}
+
+    if not directorio.exists():
+        return resultados
+
+    for journal_path in sorted(directorio.glob("*.jsonl")):
+        journal = OrderJournal(journal_path.stem, directorio=str(directorio))
+        try:
+            resultados[journal.session_id] = journal.compactar(releer=True)
+        finally:
+            journal.cerrar()
+
+    return resultados
+
+
+def main():
+    """Ejecutar la compactación de todos los journals"""
+    resultados = compactar_journals()
+    for session_id, descartados in resultados.items():
+        print(f"[OK] {session_id}: {descartados} eventos compactados")
+    print(f"[OK] Journals procesados: {len(resultados)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,262 @@
+#!/usr/bin/env python3
+"""
+Outbox Durable para Sinks Externos
+Cada registro destinado a un sink externo (Notion) se guarda primero en SQLite
+con una clave de idempotencia por (sink, clave). Un replicador en segundo plano
+lo entrega en lotes grandes y avanza el offset confirmado del sink; al reiniciar
+retoma desde ese offset (entrega al-menos-una-vez). Un registro que el sink
+rechaza de forma permanente pasa a la tabla de descartados y el offset lo saltea,
+así no frena a los que vienen detrás. Aunque varios procesos abran el mismo
+outbox, una sola pasada de entrega corre a la vez (lock de archivo <outbox>.lock).
+"""
+
+import atexit
+import json
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+from config.settings import Settings
+from .file_lock import bloqueo_exclusivo
+
+
+class RegistroRechazado(Exception):
+    """El sink rechazó un registro de forma permanente (reintentarlo no sirve)
+
+    'entregados' es la cantidad de registros del principio del lote que sí se entregaron;
+    el rechazado es el siguiente.
+    """
+
+    def __init__(self, entregados: int, motivo: str):
+        super().__init__(motivo)
+        self.entregados = entregados
+        self.motivo = motivo
+
+
+class DurableOutbox:
+    """
+    Cola persistente en SQLite (modo WAL)
+    - outbox: registros pendientes, únicos por (sink, clave)
+    - offsets: último id confirmado por sink
+    - descartados: registros rechazados por el sink, para revisarlos a mano
+    """
+
+    def __init__(self, ruta: str = None):
+        """Abrir (o crear) la base del outbox"""
+        self.ruta = Path(ruta or Settings.OUTBOX_PATH)
+        self.ruta.parent.mkdir(parents=True, exist_ok=True)
+        self.ruta_lock = self.ruta.with_name(self.ruta.name + ".lock")
+        self._lock = threading.Lock()
+        self._conexion = sqlite3.connect(str(self.ruta), check_same_thread=False, isolation_level=None)
+        self._conexion.execute("PRAGMA journal_mode=WAL")
+        self._conexion.execute("PRAGMA synchronous=NORMAL")
+        self._conexion.executescript("""
+            CREATE TABLE IF NOT EXISTS outbox (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                sink TEXT NOT NULL,
+                clave TEXT NOT NULL,
+                destino TEXT,
+                payload TEXT NOT NULL,
+                creado REAL NOT NULL,
+                UNIQUE (sink, clave)
+            );
+            CREATE TABLE IF NOT EXISTS offsets (
+                sink TEXT PRIMARY KEY,
+                ultimo_id INTEGER NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS descartados (
+                id INTEGER PRIMARY KEY,
+                sink TEXT NOT NULL,
+                clave TEXT NOT NULL,
+                destino TEXT,
+                payload TEXT NOT NULL,
+                creado REAL NOT NULL,
+                motivo TEXT,
+                descartado REAL NOT NULL
+            );
+        """)
+
+    def agregar(self, sink: str, clave: str, payload: Any, destino: str = None) -> Optional[int]:
+        """Guardar un registro; devuelve su id o None si la clave ya estaba"""
+        with self._lock:
+            cursor = self._conexion.execute(
+                "INSERT OR IGNORE INTO outbox (sink, clave, destino, payload, creado) VALUES (?, ?, ?, ?, ?)",
+                (sink, clave, destino, json.dumps(payload, ensure_ascii=False), time.time())
+            )
+            return cursor.lastrowid if cursor.rowcount else None
+
+    def offset(self, sink: str) -> int:
+        """Último id confirmado del sink"""
+        with self._lock:
+            fila = self._conexion.execute("SELECT ultimo_id FROM offsets WHERE sink = ?", (sink,)).fetchone()
+        return fila[0] if fila else 0
+
+    def pendientes(self, sink: str, limite: int = None) -> List[Dict[str, Any]]:
+        """Registros posteriores al offset del sink, en orden de llegada"""
+        desde = self.offset(sink)
+        with self._lock:
+            filas = self._conexion.execute(
+                "SELECT id, clave, destino, payload, creado FROM outbox WHERE sink = ? AND id > ? ORDER BY id LIMIT ?",
+                (sink, desde, limite or Settings.OUTBOX_BATCH_SIZE)
+            ).fetchall()
+        return [{"id": id_, "clave": clave, "destino": destino, "payload": json.loads(payload), "creado": creado}
+                for id_, clave, destino, payload, creado in filas]
+
+    def cantidad_pendiente(self, sink: str) -> int:
+        """Cantidad de registros sin confirmar del sink"""
+        desde = self.offset(sink)
+        with self._lock:
+            return self._conexion.execute(
+                "SELECT COUNT(*) FROM outbox WHERE sink = ? AND id > ?", (sink, desde)
+            ).fetchone()[0]
+
+    def _avanzar_offset(self, sink: str, hasta_id: int):
+        self._conexion.execute(
+            "INSERT INTO offsets (sink, ultimo_id) VALUES (?, ?) "
+            "ON CONFLICT(sink) DO UPDATE SET ultimo_id = MAX(ultimo_id, excluded.ultimo_id)",
+            (sink, hasta_id)
+        )
+
+    def confirmar(self, sink: str, hasta_id: int):
+        """Avanzar el offset del sink y purgar los registros entregados más viejos que la retención"""
+        with self._lock:
+            self._conexion.execute("BEGIN IMMEDIATE")
+            try:
+                self._avanzar_offset(sink, hasta_id)
+                # Las filas entregadas se conservan un tiempo para seguir rechazando claves repetidas
+                self._conexion.execute("DELETE FROM outbox WHERE sink = ? AND id <= ? AND creado < ?",
+                                       (sink, hasta_id, time.time() - Settings.OUTBOX_KEY_RETENTION))
+                self._conexion.execute("COMMIT")
+            except Exception:
+                self._conexion.execute("ROLLBACK")
+                raise
+
+    def descartar(self, sink: str, registro: Dict[str, Any], motivo: str):
+        """Mover un registro rechazado a descartados y avanzar el offset más allá de él"""
+        with self._lock:
+            self._conexion.execute("BEGIN IMMEDIATE")
+            try:
+                self._conexion.execute(
+                    "INSERT OR REPLACE INTO descartados (id, sink, clave, destino, payload, creado, motivo, descartado) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    (registro["id"], sink, registro["clave"], registro["destino"],
+                     json.dumps(registro["payload"], ensure_ascii=False), registro["creado"], motivo, time.time())
+                )
+                self._avanzar_offset(sink, registro["id"])
+                self._conexion.execute("COMMIT")
+            except Exception:
+                self._conexion.execute("ROLLBACK")
+                raise
+
+    def descartados(self, sink: str) -> List[Dict[str, Any]]:
+        """Registros que el sink rechazó, en orden de llegada"""
+        with self._lock:
+            filas = self._conexion.execute(
+                "SELECT id, clave, destino, payload, motivo FROM descartados WHERE sink = ? ORDER BY id", (sink,)
+            ).fetchall()
+        return [{"id": id_, "clave": clave, "destino": destino, "payload": json.loads(payload), "motivo": motivo}
+                for id_, clave, destino, payload, motivo in filas]
+
+    def cerrar(self):
+        with self._lock:
+            self._conexion.close()
+
+
+class OutboxReplayer:
+    """
+    Replicador en segundo plano del outbox
+    Para cada sink, 'entregar(lote)' recibe hasta OUTBOX_BATCH_SIZE registros y devuelve
+    cuántos del principio del lote se entregaron; el offset avanza sólo hasta ahí.
+    Si no se entregó todo, espera OUTBOX_RETRY_INTERVAL antes de reintentar ese sink.
+    Si lanza RegistroRechazado, el registro rechazado va a descartados y se sigue.
+    """
+
+    def __init__(self, outbox: DurableOutbox, entregadores: Dict[str, Callable[[List[Dict[str, Any]]], int]],
+                 tamano_lote: int = None, intervalo: float = None, reintento: float = None,
+                 nombre: str = "outbox-replayer"):
+        """Configurar los sinks y arrancar el hilo (la primera pasada entrega el backlog)"""
+        self.outbox = outbox
+        self.entregadores = entregadores
+        self.tamano_lote = tamano_lote or Settings.OUTBOX_BATCH_SIZE
+        self.intervalo = Settings.OUTBOX_POLL_INTERVAL if intervalo is None else intervalo
+        self.reintento = Settings.OUTBOX_RETRY_INTERVAL if reintento is None else reintento
+
+        self._evento = threading.Event()
+        self._detenido = False
+        self._lock_pasada = threading.Lock()
+        self._suspendido_hasta: Dict[str, float] = {}
+        self.estadisticas = {"entregados": 0, "lotes": 0, "fallos": 0, "descartados": 0}
+
+        self._hilo = threading.Thread(target=self._bucle, name=nombre, daemon=True)
+        self._hilo.start()
+        atexit.register(self.detener)
+
+    def despertar(self):
+        """Avisar que hay registros nuevos"""
+        self._evento.set()
+
+    def reproducir(self, forzar: bool = False, esperar: bool = None) -> int:
+        """Entregar todo lo pendiente de cada sink; devuelve la cantidad entregada
+
+        Si otro replicador (de este u otro proceso) está entregando el mismo outbox, la
+        pasada se saltea: él entrega también lo de este. Con esperar=True (por defecto
+        al forzar) se espera a que termine y se hace la pasada igual.
+        """
+        esperar = forzar if esperar is None else esperar
+        with self._lock_pasada, bloqueo_exclusivo(self.outbox.ruta_lock, esperar) as propio:
+            if not propio:
+                return 0
+            return self._pasada(forzar)
+
+    def _pasada(self, forzar: bool) -> int:
+        entregados = 0
+        for sink, entregar in self.entregadores.items():
+            if not forzar and time.monotonic() < self._suspendido_hasta.get(sink, 0):
+                continue
+            while True:
+                lote = self.outbox.pendientes(sink, self.tamano_lote)
+                if not lote:
+                    break
+                rechazo = None
+                try:
+                    cantidad = min(entregar(lote), len(lote))
+                except RegistroRechazado as e:
+                    cantidad, rechazo = min(e.entregados, len(lote) - 1), e
+                except Exception as e:
+                    print(f"[ADVERTENCIA] Error entregando lote del outbox a {sink}: {e}")
+                    cantidad = 0
+                if cantidad:
+                    self.outbox.confirmar(sink, lote[cantidad - 1]["id"])
+                    entregados += cantidad
+                    self.estadisticas["entregados"] += cantidad
+                    self.estadisticas["lotes"] += 1
+                if rechazo is not None:
+                    registro = lote[cantidad]
+                    self.outbox.descartar(sink, registro, rechazo.motivo)
+                    self.estadisticas["descartados"] += 1
+                    print(f"[ADVERTENCIA] {sink} rechazó el registro {registro['clave']} del outbox "
+                          f"({rechazo.motivo}); se movió a descartados")
+                    continue
+                if cantidad < len(lote):
+                    self.estadisticas["fallos"] += 1
+                    self._suspendido_hasta[sink] = time.monotonic() + self.reintento
+                    break
+        return entregados
+
+    def _bucle(self):
+        while not self._detenido:
+            self.reproducir()
+            self._evento.wait(self.intervalo)
+            self._evento.clear()
+
+    def detener(self, timeout: float = None):
+        """Última pasada de entrega y detención del hilo"""
+        if self._detenido:
+            return
+        self._detenido = True
+        atexit.unregister(self.detener)
+        self._evento.set()
+        self._hilo.join(Settings.WRITE_BEHIND_FLUSH_TIMEOUT if timeout is None else timeout)
+        self.reproducir(esperar=True)
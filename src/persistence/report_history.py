@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+Historial Acotado de Informes
+Mantiene en memoria sólo los últimos informes (anillo de capacidad fija);
+cada informe se escribe en el ReportStore al agregarse, así que los que salen
+del anillo ya están en disco y se leen desde ahí cuando se piden.
+La memoria queda constante sin importar cuántos informes se generen.
+"""
+
+import threading
+from collections import deque
+from datetime import datetime
+from typing import Any, Dict, Iterator, List
+
+from config.settings import Settings
+from .report_store import ReportStore
+
+
+class ReportHistory:
+    """
+    Historial de informes con la interfaz de lista que usan los sistemas multi-agente
+    - append()/agregar(): guarda en disco y en el anillo de recientes
+    - historial[i], historial[-1], len(), iteración: recientes desde memoria, viejos desde disco
+    - ultimos(n) / rango(desde, hasta, ocasion): consultas paginadas al almacén
+    """
+
+    def __init__(self, store: ReportStore = None, capacidad: int = None):
+        """Usar un almacén existente (o el de Settings) y un anillo de 'capacidad' informes"""
+        self.store = store if store is not None else ReportStore()
+        self.capacidad = capacidad or Settings.REPORT_HISTORY_CAPACITY
+        self._recientes: deque = deque(maxlen=self.capacidad)  # (posición en el almacén, informe)
+        self._lock = threading.Lock()
+
+    def agregar(self, informe: Dict[str, Any]) -> int:
+        """Guardar un informe; devuelve su posición en el historial"""
+        with self._lock:
+            posicion = self.store.agregar(informe)
+            self._recientes.append((posicion, informe))
+            return posicion
+
+    append = agregar
+
+    def __len__(self) -> int:
+        return len(self.store)
+
+    def __getitem__(self, posicion: int) -> Dict[str, Any]:
+        """Informe por posición (admite negativas); fuera del anillo se lee del disco"""
+        with self._lock:
+            total = len(self.store)
+            if posicion < 0:
+                posicion += total
+            if not 0 <= posicion < total:
+                raise IndexError(f"Informe inexistente: {posicion}")
+            if self._recientes and posicion >= self._recientes[0][0]:
+                for guardada, informe in reversed(self._recientes):
+                    if guardada == posicion:
+                        return informe
+        return self.store.obtener(posicion)
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        """Todos los informes, del más viejo al más nuevo, leyendo de a uno"""
+        for posicion in range(len(self)):
+            yield self[posicion]
+
+    def recientes(self) -> List[Dict[str, Any]]:
+        """Los informes que están en memoria"""
+        with self._lock:
+            return [informe for _, informe in self._recientes]
+
+    def ultimos(self, cantidad: int) -> List[Dict[str, Any]]:
+        """Los últimos informes, desde memoria si entran en el anillo"""
+        with self._lock:
+            if self._recientes and cantidad <= len(self._recientes) \
+                    and self._recientes[-1][0] == len(self.store) - 1:
+                return [informe for _, informe in list(self._recientes)[len(self._recientes) - cantidad:]]
+        return self.store.ultimos(cantidad)
+
+    def rango(self, desde: datetime = None, hasta: datetime = None,
+              ocasion: str = None) -> Iterator[Dict[str, Any]]:
+        """Informes por rango de fechas (y ocasión), leídos del almacén"""
+        return self.store.rango(desde, hasta, ocasion)
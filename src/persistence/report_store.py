@@ -0,0 +1,240 @@
+#!/usr/bin/env python3
+"""
+Almacén de Informes Append-Only
+Los informes del sistema multi-agente se guardan como una línea JSON cada uno
+(informes.jsonl) con un índice lateral de registros de tamaño fijo (informes.idx):
+offset, largo, timestamp y ocasión. La lectura usa mmap para acceso aleatorio
+y el índice permite escaneos por rango de fechas y por ocasión sin parsear el archivo.
+Varios escritores (otros procesos u otras instancias) comparten el almacén: cada
+append y la reparación del índice se hacen con el lock de archivo informes.lock, y
+cada instancia incorpora las entradas ajenas leyendo la cola del índice.
+"""
+
+import bisect
+import json
+import mmap
+import os
+import struct
+import threading
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional
+
+from config.settings import Settings
+from .file_lock import bloqueo_exclusivo
+
+
+# offset (u64), largo (u32), timestamp epoch (f64), ocasión (16 bytes utf-8)
+REGISTRO_INDICE = struct.Struct("<QId16s")
+FORMATO_TIMESTAMP = "%Y-%m-%d %H:%M:%S"
+
+
+def ocasion_informe(informe: Dict[str, Any]) -> str:
+    """Ocasión detectada en el análisis del informe"""
+    preferencias = informe.get("analisis_realizado", {}).get("preferencias_detectadas", {}) or {}
+    return preferencias.get("ocasion") or "general"
+
+
+def timestamp_informe(informe: Dict[str, Any]) -> float:
+    """Timestamp del informe como epoch (ahora si falta o no se puede leer)"""
+    try:
+        return datetime.strptime(informe["timestamp"], FORMATO_TIMESTAMP).timestamp()
+    except (KeyError, TypeError, ValueError):
+        return datetime.now().timestamp()
+
+
+class ReportStore:
+    """
+    Almacén indexado de informes
+    - agregar(): append de una línea JSON + entrada de índice
+    - obtener(i) / ultimos(n): acceso aleatorio por posición
+    - rango(desde, hasta, ocasion): escaneo por fecha usando el índice
+    """
+
+    def __init__(self, directorio: str = None):
+        """Abrir (o crear) el almacén y cargar el índice"""
+        self.directorio = Path(directorio or Settings.REPORT_STORE_DIRECTORY)
+        self.directorio.mkdir(parents=True, exist_ok=True)
+        self.ruta_datos = self.directorio / "informes.jsonl"
+        self.ruta_indice = self.directorio / "informes.idx"
+        self.ruta_lock = self.directorio / "informes.lock"
+
+        self._lock = threading.Lock()
+        self._offsets: List[int] = []
+        self._largos: List[int] = []
+        self._timestamps: List[float] = []
+        self._ocasiones: List[str] = []
+        self._ordenado = True
+        self._mapa: Optional[mmap.mmap] = None
+        self._mapa_tamano = 0
+
+        self.ruta_datos.touch(exist_ok=True)
+        self.ruta_indice.touch(exist_ok=True)
+        # La reparación trunca la cola de los datos: sólo es segura sin otro escritor en curso
+        with bloqueo_exclusivo(self.ruta_lock):
+            self._cargar_indice()
+        self._datos = open(self.ruta_datos, "ab")
+        self._indice = open(self.ruta_indice, "ab")
+
+    def _cargar_indice(self):
+        """Leer el índice y repararlo si quedó desalineado con los datos (corte a mitad de escritura)"""
+        tamano_datos = self.ruta_datos.stat().st_size
+        contenido = self.ruta_indice.read_bytes()
+        completos = len(contenido) - len(contenido) % REGISTRO_INDICE.size
+
+        for offset, largo, ts, ocasion in REGISTRO_INDICE.iter_unpack(contenido[:completos]):
+            if offset + largo > tamano_datos:
+                break
+            self._registrar(offset, largo, ts, ocasion.rstrip(b"\0").decode("utf-8", "ignore"))
+
+        indexado = self._offsets[-1] + self._largos[-1] if self._offsets else 0
+        if len(self._offsets) * REGISTRO_INDICE.size != len(contenido) or indexado < tamano_datos:
+            self._reconstruir_cola(indexado, tamano_datos)
+
+    def _reconstruir_cola(self, desde: int, tamano_datos: int):
+        """Indexar las líneas escritas después de la última entrada válida del índice"""
+        with open(self.ruta_datos, "rb") as f:
+            f.seek(desde)
+            offset = desde
+            for linea in f:
+                if not linea.endswith(b"\n"):
+                    break  # línea incompleta: se descarta
+                try:
+                    informe = json.loads(linea)
+                    self._registrar(offset, len(linea), timestamp_informe(informe), ocasion_informe(informe))
+                except ValueError:
+                    pass
+                offset += len(linea)
+        with open(self.ruta_datos, "r+b") as f:
+            f.truncate(offset)
+        with open(self.ruta_indice, "wb") as f:
+            for entrada in zip(self._offsets, self._largos, self._timestamps, self._ocasiones):
+                f.write(self._empaquetar(*entrada))
+        print(f"[ADVERTENCIA] Índice de informes reconstruido: {len(self._offsets)} informes")
+
+    @staticmethod
+    def _empaquetar(offset: int, largo: int, ts: float, ocasion: str) -> bytes:
+        return REGISTRO_INDICE.pack(offset, largo, ts, ocasion.encode("utf-8")[:16])
+
+    def _registrar(self, offset: int, largo: int, ts: float, ocasion: str):
+        if self._timestamps and ts < self._timestamps[-1]:
+            self._ordenado = False
+        self._offsets.append(offset)
+        self._largos.append(largo)
+        self._timestamps.append(ts)
+        self._ocasiones.append(ocasion)
+
+    def _sincronizar(self):
+        """Incorporar las entradas que otros escritores agregaron al índice"""
+        conocido = len(self._offsets) * REGISTRO_INDICE.size
+        tamano = os.fstat(self._indice.fileno()).st_size
+        if tamano - conocido < REGISTRO_INDICE.size:
+            return
+        with open(self.ruta_indice, "rb") as f:
+            f.seek(conocido)
+            contenido = f.read(tamano - conocido)
+        completos = len(contenido) - len(contenido) % REGISTRO_INDICE.size
+        for offset, largo, ts, ocasion in REGISTRO_INDICE.iter_unpack(contenido[:completos]):
+            self._registrar(offset, largo, ts, ocasion.rstrip(b"\0").decode("utf-8", "ignore"))
+
+    def agregar(self, informe: Dict[str, Any]) -> int:
+        """Agregar un informe; devuelve su posición en el almacén"""
+        linea = (json.dumps(informe, ensure_ascii=False) + "\n").encode("utf-8")
+        ts, ocasion = timestamp_informe(informe), ocasion_informe(informe)
+        with self._lock, bloqueo_exclusivo(self.ruta_lock):
+            self._sincronizar()
+            # Con el lock tomado el final del archivo es el offset real, aunque otro escritor haya agregado
+            offset = os.fstat(self._datos.fileno()).st_size
+            self._datos.write(linea)
+            self._datos.flush()
+            # El índice se escribe después de los datos: nunca apunta a un informe incompleto
+            self._indice.write(self._empaquetar(offset, len(linea), ts, ocasion))
+            self._indice.flush()
+            self._registrar(offset, len(linea), ts, ocasion)
+            return len(self._offsets) - 1
+
+    def __len__(self) -> int:
+        with self._lock:
+            self._sincronizar()
+            return len(self._offsets)
+
+    def _leer(self, posicion: int) -> Dict[str, Any]:
+        """Decodificar un informe desde el mmap (se remapea si el archivo creció)"""
+        fin = self._offsets[posicion] + self._largos[posicion]
+        if self._mapa is None or fin > self._mapa_tamano:
+            if self._mapa is not None:
+                self._mapa.close()
+            with open(self.ruta_datos, "rb") as f:
+                self._mapa = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            self._mapa_tamano = len(self._mapa)
+        return json.loads(self._mapa[self._offsets[posicion]:fin])
+
+    def obtener(self, posicion: int) -> Dict[str, Any]:
+        """Informe en una posición (admite índices negativos)"""
+        with self._lock:
+            self._sincronizar()
+            if posicion < 0:
+                posicion += len(self._offsets)
+            if not 0 <= posicion < len(self._offsets):
+                raise IndexError(f"Informe inexistente: {posicion}")
+            return self._leer(posicion)
+
+    def ultimos(self, cantidad: int) -> List[Dict[str, Any]]:
+        """Los últimos informes guardados, del más viejo al más nuevo"""
+        with self._lock:
+            self._sincronizar()
+            inicio = max(0, len(self._offsets) - cantidad)
+            return [self._leer(i) for i in range(inicio, len(self._offsets))]
+
+    def rango(self, desde: datetime = None, hasta: datetime = None,
+              ocasion: str = None) -> Iterator[Dict[str, Any]]:
+        """Informes con timestamp en [desde, hasta), opcionalmente de una ocasión"""
+        ts_desde = desde.timestamp() if desde else float("-inf")
+        ts_hasta = hasta.timestamp() if hasta else float("inf")
+        with self._lock:
+            self._sincronizar()
+            if self._ordenado:
+                posiciones = range(bisect.bisect_left(self._timestamps, ts_desde),
+                                   bisect.bisect_left(self._timestamps, ts_hasta))
+            else:
+                posiciones = [i for i, ts in enumerate(self._timestamps) if ts_desde <= ts < ts_hasta]
+            posiciones = [i for i in posiciones if ocasion is None or self._ocasiones[i] == ocasion]
+            informes = [self._leer(i) for i in posiciones]
+        return iter(informes)
+
+    def contar_por_ocasion(self) -> Dict[str, int]:
+        """Cantidad de informes por ocasión, sólo con el índice"""
+        with self._lock:
+            self._sincronizar()
+            conteo: Dict[str, int] = {}
+            for ocasion in self._ocasiones:
+                conteo[ocasion] = conteo.get(ocasion, 0) + 1
+            return conteo
+
+    def importar_legacy(self, ruta: str) -> int:
+        """Importar un informes_robino.json antiguo (objetos JSON indentados concatenados)"""
+        texto = Path(ruta).read_text(encoding="utf-8")
+        decodificador = json.JSONDecoder()
+        posicion, importados = 0, 0
+        while True:
+            while posicion < len(texto) and texto[posicion].isspace():
+                posicion += 1
+            if posicion >= len(texto):
+                break
+            try:
+                informe, posicion = decodificador.raw_decode(texto, posicion)
+            except ValueError as e:
+                print(f"[ADVERTENCIA] Informe legacy ilegible en {ruta}: {e}")
+                break
+            self.agregar(informe)
+            importados += 1
+        return importados
+
+    def cerrar(self):
+        """Cerrar archivos y el mmap"""
+        with self._lock:
+            self._datos.close()
+            self._indice.close()
+            if self._mapa is not None:
+                self._mapa.close()
+                self._mapa = None
@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""
+Cola Write-Behind para Persistencia de Conversaciones
+Los turnos encolan registros sin esperar a Notion; un hilo de fondo los drena
+hacia el sink (Notion + backup local). La cola es acotada y expone contadores
+de profundidad, descartes y bloqueos por backpressure.
+"""
+
+import atexit
+import queue
+import threading
+import time
+from typing import Any, Callable, Dict
+
+from config.settings import Settings
+
+
+# Políticas cuando la cola está llena
+POLITICA_DESCARTAR = "descartar"  # se pierde el registro nuevo y se cuenta
+POLITICA_BLOQUEAR = "bloquear"    # se espera hasta timeout_bloqueo y luego se descarta
+
+# Marca de fin para el hilo escritor
+_FIN = object()
+
+
+class WriteBehindQueue:
+    """
+    Cola acotada con un hilo escritor en segundo plano
+    El sink recibe cada registro en orden de llegada; sus errores se cuentan y no detienen al hilo.
+    """
+
+    def __init__(self, sink: Callable[[Any], Any], capacidad: int = None,
+                 politica: str = None, timeout_bloqueo: float = None, nombre: str = "write-behind"):
+        """Crear la cola y arrancar el hilo escritor"""
+        self.sink = sink
+        self.politica = politica or Settings.WRITE_BEHIND_POLICY
+        self.timeout_bloqueo = (Settings.WRITE_BEHIND_BLOCK_TIMEOUT
+                                if timeout_bloqueo is None else timeout_bloqueo)
+        if self.politica not in (POLITICA_DESCARTAR, POLITICA_BLOQUEAR):
+            raise ValueError(f"Política de cola desconocida: {self.politica}")
+
+        self._cola = queue.Queue(maxsize=capacidad or Settings.WRITE_BEHIND_QUEUE_SIZE)
+        self._lock = threading.Lock()
+        self._cerrada = False
+        self.contadores = {"encolados": 0, "escritos": 0, "descartados": 0, "bloqueos": 0, "errores": 0}
+        self.profundidad_maxima = 0
+
+        self._hilo = threading.Thread(target=self._drenar, name=nombre, daemon=True)
+        self._hilo.start()
+        atexit.register(self.cerrar)
+
+    def _contar(self, nombre: str):
+        with self._lock:
+            self.contadores[nombre] += 1
+
+    @property
+    def profundidad(self) -> int:
+        """Registros pendientes de escribir"""
+        return self._cola.qsize()
+
+    def encolar(self, registro: Any) -> bool:
+        """Encolar un registro sin bloquear el turno (salvo política 'bloquear')
+
+        Devuelve False si el registro se descartó.
+        """
+        if self._cerrada:
+            self._contar("descartados")
+            return False
+
+        try:
+            self._cola.put_nowait(registro)
+        except queue.Full:
+            if self.politica == POLITICA_DESCARTAR:
+                self._contar("descartados")
+                return False
+            self._contar("bloqueos")
+            try:
+                self._cola.put(registro, timeout=self.timeout_bloqueo)
+            except queue.Full:
+                self._contar("descartados")
+                return False
+
+        self._contar("encolados")
+        profundidad = self._cola.qsize()
+        if profundidad > self.profundidad_maxima:
+            self.profundidad_maxima = profundidad
+        return True
+
+    def _drenar(self):
+        """Bucle del hilo escritor"""
+        while True:
+            registro = self._cola.get()
+            try:
+                if registro is _FIN:
+                    return
+                self.sink(registro)
+                self._contar("escritos")
+            except Exception as e:
+                self._contar("errores")
+                print(f"[ADVERTENCIA] Error persistiendo registro en segundo plano: {e}")
+            finally:
+                self._cola.task_done()
+
+    def vaciar(self, timeout: float = None) -> bool:
+        """Esperar a que se escriban los registros pendientes
+
+        Devuelve False si se agotó el timeout con registros pendientes.
+        """
+        limite = None if timeout is None else time.monotonic() + timeout
+        while self._cola.unfinished_tasks:
+            if limite is not None and time.monotonic() >= limite:
+                return False
+            time.sleep(0.01)
+        return True
+
+    def cerrar(self, timeout: float = None):
+        """Vaciar la cola y detener el hilo escritor (se llama también al salir)"""
+        if self._cerrada:
+            return
+        self._cerrada = True
+        atexit.unregister(self.cerrar)
+        timeout = Settings.WRITE_BEHIND_FLUSH_TIMEOUT if timeout is None else timeout
+        try:
+            self._cola.put(_FIN, timeout=timeout)
+        except queue.Full:
+            print(f"[ADVERTENCIA] Cola de persistencia sin vaciar al cerrar: {self.profundidad} registros pendientes")
+            return
+        self._hilo.join(timeout)
+
+    def estadisticas(self) -> Dict[str, Any]:
+        """Contadores y profundidad actual de la cola"""
+        with self._lock:
+            contadores = dict(self.contadores)
+        contadores["profundidad"] = self.profundidad
+        contadores["profundidad_maxima"] = self.profundidad_maxima
+        return contadores
@@ -0,0 +1,9 @@
+"""
+Módulo de Serving
+Ejecución concurrente de sesiones del Mozo Virtual y servidor HTTP/WebSocket
+"""
+
+from .session_manager import SessionManager
+from .server import RobinoServer
+
+__all__ = ["SessionManager", "RobinoServer"]
@@ -0,0 +1,270 @@
+#!/usr/bin/env python3
+"""
+Servidor Async del Mozo Virtual
+Expone a Robino por HTTP y WebSocket para tablets de mesa.
+Cada turno usa la API async del grafo (ainvoke/astream): una conexión
+ociosa no ocupa hilos mientras espera al cliente o a Gemini.
+
+Endpoints:
+- POST   /sesiones                   crear sesión
+- POST   /sesiones/{id}/mensajes     enviar mensaje y recibir la respuesta completa
+- POST   /sesiones/{id}/stream       enviar mensaje y recibir tokens por SSE
+- GET    /sesiones/{id}/ws           WebSocket: mensajes entrantes, tokens salientes
+- DELETE /sesiones/{id}              cerrar sesión
+- GET    /metricas                   métricas del servidor
+"""
+
+import json
+import time
+import asyncio
+from contextlib import asynccontextmanager
+from typing import Any, Dict
+
+from aiohttp import web, WSMsgType
+
+from config.settings import Settings
+
+from ..agents.session_state import TableSession
+from ..agents.turn_budget import METRICAS_PRESUPUESTO
+from ..observability.performance_metrics import PerformanceMetrics
+
+
+class RobinoServer:
+    """
+    Servidor asyncio de sesiones del Mozo Virtual
+    - Un agente compartido; estado de pedido aislado por sesión
+    - Un asyncio.Lock por sesión serializa sus turnos
+    - Un semáforo async limita las llamadas al LLM en vuelo
+    """
+
+    def __init__(self, agent, max_llm_concurrentes: int = None):
+        """Inicializar el servidor sobre un agente ya construido"""
+        self.agent = agent
+        self.max_llm_concurrentes = max_llm_concurrentes or Settings.MAX_LLM_CONCURRENT_CALLS
+        self.sesiones: Dict[str, TableSession] = {}
+        self.locks: Dict[str, asyncio.Lock] = {}
+        self.metricas = PerformanceMetrics()
+
+    def crear_app(self) -> web.Application:
+        """Construir la aplicación aiohttp con sus rutas"""
+        app = web.Application()
+        app.on_startup.append(self._al_iniciar)
+        app.on_shutdown.append(self._al_cerrar)
+        app.add_routes([
+            web.post("/sesiones", self.crear_sesion),
+            web.post("/sesiones/{session_id}/mensajes", self.enviar_mensaje),
+            web.post("/sesiones/{session_id}/stream", self.stream_respuesta),
+            web.post("/sesiones/{session_id}/pago", self.responder_pago),
+            web.get("/sesiones/{session_id}/ws", self.websocket),
+            web.delete("/sesiones/{session_id}", self.cerrar_sesion),
+            web.get("/metricas", self.obtener_metricas),
+        ])
+        return app
+
+    async def _al_iniciar(self, app: web.Application):
+        """Crear el semáforo dentro del loop del servidor"""
+        self.agent.limite_llm_async = asyncio.Semaphore(self.max_llm_concurrentes)
+
+    async def _al_cerrar(self, app: web.Application):
+        """Cerrar las sesiones abiertas y el agente (persistencia pendiente, Notion) al apagar el servidor"""
+        for session_id in list(self.sesiones):
+            await self._cerrar(session_id)
+        await asyncio.to_thread(self.agent.cerrar)
+
+    def _obtener_sesion(self, request: web.Request) -> TableSession:
+        """Buscar la sesión de la URL o responder 404"""
+        session_id = request.match_info["session_id"]
+        if session_id not in self.sesiones:
+            raise web.HTTPNotFound(
+                text=json.dumps({"error": f"Sesión no encontrada: {session_id}"}),
+                content_type="application/json"
+            )
+        return self.sesiones[session_id]
+
+    @staticmethod
+    def _solicitud_invalida(error: str) -> web.HTTPBadRequest:
+        return web.HTTPBadRequest(text=json.dumps({"error": error}), content_type="application/json")
+
+    async def _leer_json(self, request: web.Request) -> Dict[str, Any]:
+        """Leer el cuerpo como objeto JSON o responder 400"""
+        try:
+            cuerpo = await request.json()
+        except (json.JSONDecodeError, UnicodeDecodeError):
+            raise self._solicitud_invalida("El cuerpo no es un JSON válido")
+        if not isinstance(cuerpo, dict):
+            raise self._solicitud_invalida("El cuerpo debe ser un objeto JSON")
+        return cuerpo
+
+    async def _leer_campo(self, request: web.Request, campo: str) -> str:
+        """Leer un campo obligatorio del cuerpo JSON o responder 400"""
+        cuerpo = await self._leer_json(request)
+        if campo not in cuerpo:
+            raise self._solicitud_invalida(f"Se requiere un JSON con el campo '{campo}'")
+        return str(cuerpo[campo])
+
+    @asynccontextmanager
+    async def _turno(self, sesion: TableSession):
+        """Serializar un turno de la sesión; 404 si se cerró mientras esperaba el lock"""
+        no_encontrada = web.HTTPNotFound(
+            text=json.dumps({"error": f"Sesión no encontrada: {sesion.session_id}"}),
+            content_type="application/json"
+        )
+        lock = self.locks.get(sesion.session_id)
+        if lock is None:
+            raise no_encontrada
+        async with lock:
+            if self.sesiones.get(sesion.session_id) is not sesion:
+                raise no_encontrada
+            yield
+
+    async def _cerrar(self, session_id: str) -> bool:
+        """Cerrar una sesión esperando a que termine su turno en curso; False si ya estaba cerrada
+
+        Sesión y lock se quitan con el lock tomado: un turno que llega después no obtiene
+        un lock nuevo sobre una sesión que se está cerrando.
+        """
+        lock = self.locks.get(session_id)
+        if lock is None:
+            return False
+        async with lock:
+            sesion = self.sesiones.pop(session_id, None)
+            self.locks.pop(session_id, None)
+            if sesion is None:
+                return False
+            await asyncio.to_thread(self.agent.finalizar_sesion, sesion)
+        return True
+
+    async def crear_sesion(self, request: web.Request) -> web.Response:
+        """POST /sesiones"""
+        cuerpo = await self._leer_json(request) if request.can_read_body else {}
+        sesion = TableSession(self.agent.generar_session_id(), cuerpo.get("nombre_cliente"))
+        self.sesiones[sesion.session_id] = sesion
+        self.locks[sesion.session_id] = asyncio.Lock()
+        self.metricas.incrementar("sesiones_creadas")
+
+        if sesion.nombre_cliente:
+            self.agent.registrar_inicio_conversacion(sesion.nombre_cliente, sesion.session_id)
+
+        return web.json_response({"session_id": sesion.session_id}, status=201)
+
+    async def enviar_mensaje(self, request: web.Request) -> web.Response:
+        """POST /sesiones/{id}/mensajes"""
+        sesion = self._obtener_sesion(request)
+        mensaje = await self._leer_campo(request, "mensaje")
+
+        async with self._turno(sesion):
+            inicio = time.perf_counter()
+            respuesta = await self.agent.aprocesar_turno(mensaje, sesion)
+            self.metricas.registrar_latencia("turno", time.perf_counter() - inicio)
+
+        return web.json_response({"session_id": sesion.session_id, "respuesta": respuesta,
+                                  "pago_pendiente": sesion.pago_pendiente is not None})
+
+    async def responder_pago(self, request: web.Request) -> web.Response:
+        """POST /sesiones/{id}/pago - reanudar el pago pendiente con el método elegido"""
+        sesion = self._obtener_sesion(request)
+        metodo = await self._leer_campo(request, "metodo")
+
+        async with self._turno(sesion):
+            if sesion.pago_pendiente is None:
+                raise web.HTTPConflict(
+                    text=json.dumps({"error": "La sesión no tiene un pago pendiente"}),
+                    content_type="application/json"
+                )
+            inicio = time.perf_counter()
+            respuesta = await self.agent.aprocesar_turno(metodo, sesion)
+            self.metricas.registrar_latencia("turno", time.perf_counter() - inicio)
+            self.metricas.incrementar("pagos_reanudados")
+
+        return web.json_response({"session_id": sesion.session_id, "respuesta": respuesta,
+                                  "pago_pendiente": sesion.pago_pendiente is not None})
+
+    async def stream_respuesta(self, request: web.Request) -> web.StreamResponse:
+        """POST /sesiones/{id}/stream - tokens como Server-Sent Events"""
+        sesion = self._obtener_sesion(request)
+        mensaje = await self._leer_campo(request, "mensaje")
+
+        respuesta = web.StreamResponse(headers={
+            "Content-Type": "text/event-stream",
+            "Cache-Control": "no-cache"
+        })
+        # La respuesta se prepara con el lock tomado: una sesión cerrada todavía puede responder 404
+        async with self._turno(sesion):
+            await respuesta.prepare(request)
+            inicio = time.perf_counter()
+            primer_token = None
+            texto = []
+            async for token in self.agent.astream_turno(mensaje, sesion):
+                if primer_token is None:
+                    primer_token = time.perf_counter() - inicio
+                    self.metricas.registrar_latencia("primer_token", primer_token)
+                texto.append(token)
+                await respuesta.write(f"event: token\ndata: {json.dumps(token, ensure_ascii=False)}\n\n".encode("utf-8"))
+            self.metricas.registrar_latencia("turno", time.perf_counter() - inicio)
+
+        fin = json.dumps({"respuesta": "".join(texto), "pago_pendiente": sesion.pago_pendiente is not None},
+                         ensure_ascii=False)
+        await respuesta.write(f"event: fin\ndata: {fin}\n\n".encode("utf-8"))
+        await respuesta.write_eof()
+        return respuesta
+
+    async def websocket(self, request: web.Request) -> web.WebSocketResponse:
+        """GET /sesiones/{id}/ws - cada mensaje de texto es un turno"""
+        sesion = self._obtener_sesion(request)
+        ws = web.WebSocketResponse()
+        await ws.prepare(request)
+        self.metricas.incrementar("websockets_abiertos")
+
+        async for mensaje_ws in ws:
+            if mensaje_ws.type != WSMsgType.TEXT:
+                continue
+            try:
+                mensaje = json.loads(mensaje_ws.data)["mensaje"]
+            except (json.JSONDecodeError, KeyError, TypeError):
+                await ws.send_json({"tipo": "error", "error": "Se requiere un JSON con el campo 'mensaje'"})
+                continue
+
+            try:
+                async with self._turno(sesion):
+                    inicio = time.perf_counter()
+                    texto = []
+                    async for token in self.agent.astream_turno(mensaje, sesion):
+                        texto.append(token)
+                        await ws.send_json({"tipo": "token", "texto": token})
+                    self.metricas.registrar_latencia("turno", time.perf_counter() - inicio)
+            except web.HTTPNotFound:
+                await ws.send_json({"tipo": "error", "error": f"Sesión no encontrada: {sesion.session_id}"})
+                break
+
+            await ws.send_json({"tipo": "fin", "respuesta": "".join(texto),
+                                "pago_pendiente": sesion.pago_pendiente is not None})
+
+        self.metricas.incrementar("websockets_cerrados")
+        return ws
+
+    async def cerrar_sesion(self, request: web.Request) -> web.Response:
+        """DELETE /sesiones/{id}"""
+        sesion = self._obtener_sesion(request)
+        if not await self._cerrar(sesion.session_id):
+            raise web.HTTPNotFound(
+                text=json.dumps({"error": f"Sesión no encontrada: {sesion.session_id}"}),
+                content_type="application/json"
+            )
+        self.metricas.incrementar("sesiones_cerradas")
+        return web.json_response({"session_id": sesion.session_id, "cerrada": True})
+
+    async def obtener_metricas(self, request: web.Request) -> web.Response:
+        """GET /metricas"""
+        resumen = self.metricas.resumen()
+        resumen["sesiones_activas"] = len(self.sesiones)
+        resumen["persistencia"] = self.agent.escritor_conversaciones.estadisticas()
+        resumen["presupuesto"] = METRICAS_PRESUPUESTO.resumen()["contadores"]
+        resumen["prefetch"] = self.agent.prefetcher.estadisticas()
+        return web.json_response(resumen)
+
+    def iniciar(self, host: str = None, port: int = None):
+        """Levantar el servidor (bloqueante)"""
+        host = host or Settings.SERVER_HOST
+        port = port or Settings.SERVER_PORT
+        print(f"[OK] Servidor Robino escuchando en http://{host}:{port}")
+        web.run_app(self.crear_app(), host=host, port=port, print=None)
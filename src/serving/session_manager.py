@@ -0,0 +1,233 @@
+#!/usr/bin/env python3
+"""
+Gestor de Sesiones Concurrentes
+Permite que un mismo host atienda muchas mesas a la vez, planificando las
+sesiones sobre un pool de hilos (llamadas al LLM, I/O) o de procesos
+"""
+
+import time
+import threading
+import multiprocessing
+import multiprocessing.util
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, Future
+from typing import Callable, Dict, List, Any
+
+from config.settings import Settings
+
+from ..agents.session_state import TableSession
+from ..observability.performance_metrics import PerformanceMetrics
+
+
+# Agente propio de cada proceso del pool (modo "process")
+_agente_worker = None
+
+
+def _inicializar_worker(agent_factory: Callable, limite_llm):
+    """Construir el agente del proceso y compartir el límite global de llamadas al LLM"""
+    global _agente_worker
+    _agente_worker = agent_factory()
+    _agente_worker.limite_llm = limite_llm
+    cerrar = getattr(_agente_worker, "cerrar", None)
+    if cerrar:
+        # Los procesos del pool no ejecutan atexit: vaciar la persistencia pendiente al terminar
+        multiprocessing.util.Finalize(_agente_worker, cerrar, exitpriority=10)
+
+
+def _ejecutar_sesion(agente, session_id: str, mensajes: List[str]) -> Dict[str, Any]:
+    """Ejecutar todos los turnos de una sesión y medir la latencia de cada uno"""
+    sesion = TableSession(session_id)
+    respuestas = []
+    latencias = []
+
+    try:
+        for mensaje in mensajes:
+            inicio = time.perf_counter()
+            respuestas.append(agente.procesar_turno(mensaje, sesion))
+            latencias.append(time.perf_counter() - inicio)
+    finally:
+        agente.finalizar_sesion(sesion)
+
+    return {"session_id": session_id, "respuestas": respuestas, "latencias": latencias}
+
+
+def _ejecutar_sesion_en_worker(session_id: str, mensajes: List[str]) -> Dict[str, Any]:
+    """Punto de entrada de una sesión dentro de un proceso del pool"""
+    return _ejecutar_sesion(_agente_worker, session_id, mensajes)
+
+
+class SessionManager:
+    """
+    Planificador de sesiones independientes sobre un pool configurable
+    - modo "thread": un agente compartido, estado de pedido aislado por sesión
+    - modo "process": un agente por proceso, cada sesión completa en un proceso
+    En ambos modos un semáforo global limita las llamadas al LLM en vuelo.
+    Los turnos interactivos de una mesa se encolan y corren en orden, de a uno:
+    una mesa ocupa a lo sumo un hilo del pool.
+    """
+
+    def __init__(self, agent=None, agent_factory: Callable = None, modo: str = None,
+                 max_workers: int = None, max_llm_concurrentes: int = None):
+        """Crear el pool de ejecución y el límite global de llamadas al LLM"""
+        self.modo = modo or Settings.SESSION_POOL_MODE
+        self.max_workers = max_workers or Settings.SESSION_WORKERS
+        self.max_llm_concurrentes = max_llm_concurrentes or Settings.MAX_LLM_CONCURRENT_CALLS
+
+        if self.modo not in ("thread", "process"):
+            raise ValueError(f"Modo de pool no soportado: {self.modo}")
+
+        self.metricas = PerformanceMetrics()
+        self.sesiones: Dict[str, TableSession] = {}
+        self._turnos_pendientes: Dict[str, deque] = {}  # session_id -> (mensaje, futuro) en orden
+        self._lock = threading.Lock()
+        self._inicio = None
+
+        if self.modo == "thread":
+            if agent is None and agent_factory is None:
+                raise ValueError("Se requiere un agente o una fábrica de agentes")
+            self.agent = agent or agent_factory()
+            self.agent.limite_llm = threading.BoundedSemaphore(self.max_llm_concurrentes)
+            self.executor = ThreadPoolExecutor(
+                max_workers=self.max_workers,
+                thread_name_prefix="robino-sesion"
+            )
+        else:
+            if agent_factory is None:
+                raise ValueError("El modo 'process' requiere una fábrica de agentes importable")
+            self.agent = None
+            limite_llm = multiprocessing.get_context().BoundedSemaphore(self.max_llm_concurrentes)
+            self.executor = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                initializer=_inicializar_worker,
+                initargs=(agent_factory, limite_llm)
+            )
+
+        print(f"[OK] SessionManager iniciado: modo={self.modo}, workers={self.max_workers}, "
+              f"llm_concurrentes={self.max_llm_concurrentes}")
+
+    def _marcar_inicio(self):
+        """Registrar el inicio de la primera sesión para calcular el throughput"""
+        with self._lock:
+            if self._inicio is None:
+                self._inicio = time.perf_counter()
+
+    def crear_sesion(self, nombre_cliente: str = None) -> str:
+        """Crear una sesión interactiva (modo thread) y devolver su id"""
+        if self.modo != "thread":
+            raise RuntimeError("Las sesiones interactivas requieren el modo 'thread'")
+
+        sesion = TableSession(self.agent.generar_session_id(), nombre_cliente)
+        with self._lock:
+            self.sesiones[sesion.session_id] = sesion
+        self._marcar_inicio()
+        return sesion.session_id
+
+    def enviar_mensaje(self, session_id: str, mensaje: str) -> Future:
+        """Encolar un turno de una sesión; los turnos de la misma mesa corren en orden, de a uno"""
+        futuro = Future()
+        with self._lock:
+            if session_id not in self.sesiones:
+                raise KeyError(f"Sesión inexistente o cerrada: {session_id}")
+            cola = self._turnos_pendientes.setdefault(session_id, deque())
+            cola.append((mensaje, futuro))
+            lanzar = len(cola) == 1
+        if lanzar:
+            self._programar(session_id)
+        return futuro
+
+    def _programar(self, session_id: str):
+        """Mandar al pool el próximo turno de la sesión"""
+        try:
+            self.executor.submit(self._atender_turno, session_id)
+        except RuntimeError as e:
+            # El pool ya se cerró: los turnos encolados no se van a ejecutar
+            with self._lock:
+                pendientes = self._turnos_pendientes.pop(session_id, deque())
+            for _, futuro in pendientes:
+                if futuro.set_running_or_notify_cancel():
+                    futuro.set_exception(e)
+
+    def _atender_turno(self, session_id: str):
+        """Ejecutar el turno en la cabeza de la cola de la sesión y programar el siguiente"""
+        with self._lock:
+            mensaje, futuro = self._turnos_pendientes[session_id][0]
+            sesion = self.sesiones.get(session_id)
+
+        if futuro.set_running_or_notify_cancel():
+            try:
+                if sesion is None:
+                    raise KeyError(f"Sesión inexistente o cerrada: {session_id}")
+                with sesion.lock:
+                    # cerrar_sesion la quita antes de tomar su lock: si ya no está, no se atiende
+                    if self.sesiones.get(session_id) is not sesion:
+                        raise KeyError(f"Sesión inexistente o cerrada: {session_id}")
+                    inicio = time.perf_counter()
+                    respuesta = self.agent.procesar_turno(mensaje, sesion)
+                self.metricas.registrar_latencia("turno", time.perf_counter() - inicio)
+                self.metricas.incrementar("turnos")
+                futuro.set_result(respuesta)
+            except BaseException as e:
+                futuro.set_exception(e)
+
+        with self._lock:
+            cola = self._turnos_pendientes[session_id]
+            cola.popleft()
+            quedan = bool(cola)
+            if not quedan:
+                del self._turnos_pendientes[session_id]
+        if quedan:
+            self._programar(session_id)
+
+    def cerrar_sesion(self, session_id: str):
+        """Cerrar una sesión interactiva y compactar su journal"""
+        with self._lock:
+            sesion = self.sesiones.pop(session_id)
+        with sesion.lock:
+            self.agent.finalizar_sesion(sesion)
+        self.metricas.incrementar("sesiones_completadas")
+
+    def ejecutar_sesiones(self, guiones: Dict[str, List[str]]) -> Dict[str, List[str]]:
+        """Ejecutar sesiones completas (id -> mensajes) en paralelo y devolver sus respuestas"""
+        self._marcar_inicio()
+
+        if self.modo == "thread":
+            futuros = [
+                self.executor.submit(_ejecutar_sesion, self.agent, session_id, mensajes)
+                for session_id, mensajes in guiones.items()
+            ]
+        else:
+            futuros = [
+                self.executor.submit(_ejecutar_sesion_en_worker, session_id, mensajes)
+                for session_id, mensajes in guiones.items()
+            ]
+
+        respuestas = {}
+        for futuro in futuros:
+            resultado = futuro.result()
+            respuestas[resultado["session_id"]] = resultado["respuestas"]
+            for latencia in resultado["latencias"]:
+                self.metricas.registrar_latencia("turno", latencia)
+            self.metricas.incrementar("turnos", len(resultado["latencias"]))
+            self.metricas.incrementar("sesiones_completadas")
+
+        return respuestas
+
+    def obtener_metricas(self) -> Dict[str, Any]:
+        """Sesiones por segundo y latencia por turno"""
+        transcurrido = time.perf_counter() - self._inicio if self._inicio else 0.0
+        completadas = self.metricas.contador("sesiones_completadas")
+
+        return {
+            "modo": self.modo,
+            "sesiones_activas": len(self.sesiones),
+            "sesiones_completadas": completadas,
+            "turnos": self.metricas.contador("turnos"),
+            "sesiones_por_segundo": completadas / transcurrido if transcurrido else 0.0,
+            "latencia_turno": self.metricas.percentiles("turno")
+        }
+
+    def cerrar(self):
+        """Cerrar las sesiones abiertas y el pool de ejecución"""
+        for session_id in list(self.sesiones):
+            self.cerrar_sesion(session_id)
+        self.executor.shutdown(wait=True)
@@ -0,0 +1,269 @@
+#!/usr/bin/env python3
+"""
+Test de Checkpoints del Grafo Multi-Agente
+"""
+
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+# Agregar la raíz del proyecto al path
+sys.path.append(str(Path(__file__).parent.parent.parent))
+
+os.environ.setdefault("ANONYMIZED_TELEMETRY", "False")
+
+from langchain_core.messages import AIMessage
+
+from config.settings import Settings
+from src.agents.local_chat_model import LocalChatModel, crear_embeddings_locales
+from src.agents.mozo_virtual_agent import MozoVirtualAgent
+from src.agents.multi_agent_system import MultiAgentMozoVirtual
+from src.agents.session_state import TableSession
+from src.persistence.checkpoints import ConsultaFallida, crear_checkpointer, podar_checkpoints
+from src.persistence.report_store import ReportStore
+
+# El observer activa LangSmith al importarse; el test corre sin red
+os.environ["LANGCHAIN_TRACING_V2"] = "false"
+
+CONSULTA = "¿Qué me recomiendas para una cena romántica con mi pareja?"
+
+
+class Investigador:
+    """Sub-agente falso que deja una investigación en el contexto de la consulta"""
+
+    def __init__(self, sistema):
+        self.sistema = sistema
+        self.llamadas = 0
+
+    def invoke(self, state, config=None):
+        self.llamadas += 1
+        self.sistema.current_investigation = {"consulta": CONSULTA, "recomendaciones": ["Solomillo de Ternera"]}
+        return {"messages": [AIMessage(content="Investigación lista")]}
+
+
+class Generador:
+    """Sub-agente falso que falla en la primera llamada (p. ej. Notion caído)"""
+
+    def __init__(self, sistema):
+        self.sistema = sistema
+        self.llamadas = 0
+
+    def invoke(self, state, config=None):
+        self.llamadas += 1
+        if self.llamadas == 1:
+            raise RuntimeError("Notion no responde")
+        return {"messages": [AIMessage(content=f"Informe: {self.sistema.current_investigation['recomendaciones'][0]}")]}
+
+
+def crear_sistema(directorio: str, ruta_checkpoints: str) -> MultiAgentMozoVirtual:
+    """Sistema con una clave falsa (sólo se verifica al construir) y almacenes temporales"""
+    anterior = os.environ.setdefault("GEMINI_API_KEY", "clave-de-prueba")
+    try:
+        sistema = MultiAgentMozoVirtual(report_store=ReportStore(directorio),
+                                        checkpointer=crear_checkpointer(ruta_checkpoints))
+    finally:
+        if anterior == "clave-de-prueba":
+            del os.environ["GEMINI_API_KEY"]
+    os.environ["LANGCHAIN_TRACING_V2"] = "false"
+    sistema.investigator_agent = Investigador(sistema)
+    sistema.generator_agent = Generador(sistema)
+    return sistema
+
+
+def test_reintento_retoma_desde_el_ultimo_nodo():
+    """Tras un fallo del generador el reintento no repite la investigación, aun en otro proceso"""
+    with tempfile.TemporaryDirectory() as directorio:
+        ruta = os.path.join(directorio, "checkpoints.sqlite")
+        sistema = crear_sistema(directorio, ruta)
+        try:
+            sistema.process_complex_query(CONSULTA, request_id="pedido-1")
+            raise AssertionError("El fallo del generador debe lanzar ConsultaFallida")
+        except ConsultaFallida as e:
+            assert e.request_id == "pedido-1" and "Notion no responde" in str(e)
+        assert sistema.investigator_agent.llamadas == 1
+
+        # Un sistema nuevo sobre el mismo archivo simula el reintento después de reiniciar
+        otro = crear_sistema(directorio, ruta)
+        otro.generator_agent.llamadas = 1  # Notion ya responde
+        assert otro.pasos_ejecucion("pedido-1")[-1]["siguiente"] == ["generator"]
+        # La investigación se recupera del checkpoint, no del contexto de la consulta fallida
+        assert otro.process_complex_query(CONSULTA, request_id="pedido-1") == "Informe: Solomillo de Ternera"
+        assert otro.investigator_agent.llamadas == 0
+        assert otro.generator_agent.llamadas == 2
+
+        # Ya terminada, se responde desde el checkpoint sin ejecutar nodos
+        assert otro.process_complex_query(CONSULTA, request_id="pedido-1") == "Informe: Solomillo de Ternera"
+        assert otro.generator_agent.llamadas == 2
+
+        # Otro id es otra ejecución
+        assert otro.process_complex_query(CONSULTA, request_id="pedido-2") == "Informe: Solomillo de Ternera"
+        assert otro.investigator_agent.llamadas == 1
+        sistema.report_store.cerrar()
+        otro.report_store.cerrar()
+
+
+def test_reproducir_traza_desde_un_checkpoint():
+    """Reproducir desde el checkpoint del generador ejecuta sólo el generador"""
+    with tempfile.TemporaryDirectory() as directorio:
+        sistema = crear_sistema(directorio, os.path.join(directorio, "checkpoints.sqlite"))
+        sistema.generator_agent.llamadas = 1  # sin fallo
+        assert sistema.process_complex_query(CONSULTA, request_id="traza") == "Informe: Solomillo de Ternera"
+        pasos = sistema.pasos_ejecucion("traza")
+        assert [paso["siguiente"] for paso in pasos] == [["__start__"], ["investigator"], ["generator"], []]
+
+        antes_generador = pasos[2]["checkpoint_id"]
+        assert sistema.reproducir_traza("traza", antes_generador) == "Informe: Solomillo de Ternera"
+        assert sistema.investigator_agent.llamadas == 1
+        assert sistema.generator_agent.llamadas == 3
+
+        # Por defecto se reproduce desde la entrada
+        sistema.reproducir_traza("traza")
+        assert sistema.investigator_agent.llamadas == 2
+        sistema.report_store.cerrar()
+
+
+def test_poda_de_ejecuciones_vencidas():
+    """Se borran sólo las ejecuciones cuyo último checkpoint supera la retención"""
+    with tempfile.TemporaryDirectory() as directorio:
+        ruta = os.path.join(directorio, "checkpoints.sqlite")
+        sistema = crear_sistema(directorio, ruta)
+        sistema.generator_agent.llamadas = 1  # sin fallo
+        sistema.process_complex_query(CONSULTA, request_id="vieja")
+        sistema.process_complex_query(CONSULTA, request_id="nueva")
+
+        assert podar_checkpoints(sistema.checkpointer, retencion=3600) == 0
+        assert podar_checkpoints(sistema.checkpointer, retencion=0) == 2
+        assert sistema.pasos_ejecucion("vieja") == [] and sistema.pasos_ejecucion("nueva") == []
+        sistema.report_store.cerrar()
+
+
+class GeneradorConInforme:
+    """Sub-agente falso: genera el informe con su herramienta y falla antes de responder"""
+
+    def __init__(self, sistema):
+        self.sistema = sistema
+        self.llamadas = 0
+
+    def invoke(self, state, config=None):
+        self.llamadas += 1
+        if self.llamadas == 1:
+            return {"messages": [AIMessage(content="", tool_calls=[
+                {"name": "generar_informe_recomendacion", "args": {}, "id": "informe"}])]}
+        if self.llamadas == 2:
+            raise RuntimeError("Notion no responde")
+        informes = self.sistema.generated_reports
+        return {"messages": [AIMessage(content=f"Informes: {len(informes)} ({informes[-1]['tipo']})")]}
+
+
+def test_reanudar_restaura_investigacion_e_informes():
+    """Retomada en otro proceso, la ejecución ve los informes generados antes del fallo"""
+    with tempfile.TemporaryDirectory() as directorio:
+        ruta = os.path.join(directorio, "checkpoints.sqlite")
+        sistema = crear_sistema(directorio, ruta)
+        sistema.generator_agent = GeneradorConInforme(sistema)
+        try:
+            sistema.process_complex_query(CONSULTA, request_id="informe-1")
+            raise AssertionError("El fallo del generador debe lanzar ConsultaFallida")
+        except ConsultaFallida:
+            pass
+
+        otro = crear_sistema(directorio, ruta)
+        otro.generator_agent = GeneradorConInforme(otro)
+        otro.generator_agent.llamadas = 2
+        assert otro.process_complex_query(CONSULTA, request_id="informe-1") == "Informes: 1 (recomendacion_completa)"
+        assert otro.investigator_agent.llamadas == 0
+        sistema.report_store.cerrar()
+        otro.report_store.cerrar()
+
+
+def test_agente_retoma_la_consulta_con_el_grafo():
+    """Con MULTI_AGENT_SYSTEM="grafo" el agente usa el grafo con checkpoints y retoma la consulta fallida"""
+    originales = (Settings.MULTI_AGENT_SYSTEM, Settings.MULTI_AGENT_CHECKPOINT_DB,
+                  Settings.REPORT_STORE_DIRECTORY, Settings.JOURNAL_DIRECTORY)
+    anterior = os.environ.setdefault("GEMINI_API_KEY", "clave-de-prueba")
+    with tempfile.TemporaryDirectory() as directorio:
+        Settings.MULTI_AGENT_SYSTEM = "grafo"
+        Settings.MULTI_AGENT_CHECKPOINT_DB = os.path.join(directorio, "checkpoints.sqlite")
+        Settings.REPORT_STORE_DIRECTORY = os.path.join(directorio, "informes")
+        Settings.JOURNAL_DIRECTORY = directorio
+        try:
+            agente = MozoVirtualAgent(llm=LocalChatModel(respuestas=["Le sugiero la paella."]),
+                                      embedding_model=crear_embeddings_locales())
+            os.environ["LANGCHAIN_TRACING_V2"] = "false"
+            agente.registrar_intercambio = lambda query, respuesta, latencia=None: None
+            agente.is_complex_query = lambda query: True
+            sistema = agente.multi_agent_system
+            assert isinstance(sistema, MultiAgentMozoVirtual)
+            sistema.investigator_agent = Investigador(sistema)
+            sistema.generator_agent = Generador(sistema)
+
+            sesion = TableSession("mesa_grafo")
+            assert agente.procesar_turno(CONSULTA, sesion) == "Le sugiero la paella."
+            assert agente.procesar_turno(CONSULTA, sesion) == "Informe: Solomillo de Ternera"
+            assert sistema.investigator_agent.llamadas == 1
+            sesion.cerrar()
+            agente.cerrar()
+            sistema.report_store.cerrar()
+        finally:
+            (Settings.MULTI_AGENT_SYSTEM, Settings.MULTI_AGENT_CHECKPOINT_DB,
+             Settings.REPORT_STORE_DIRECTORY, Settings.JOURNAL_DIRECTORY) = originales
+            if anterior == "clave-de-prueba":
+                del os.environ["GEMINI_API_KEY"]
+
+
+class SistemaQueFalla:
+    """Sistema multi-agente falso: registra los request_id y falla la primera vez"""
+
+    def __init__(self):
+        self.request_ids = []
+
+    def process_complex_query(self, query, request_id=None):
+        self.request_ids.append(request_id)
+        if len(self.request_ids) == 1:
+            raise ConsultaFallida(request_id, RuntimeError("Notion no responde"))
+        return "Informe listo"
+
+
+def test_agente_reintenta_con_el_mismo_request_id():
+    """El agente pasa un id estable por turno y, si el cliente repite la consulta fallida, lo reusa"""
+    agente = MozoVirtualAgent(llm=LocalChatModel(respuestas=["Le sugiero la paella."]),
+                              embedding_model=crear_embeddings_locales())
+    agente.registrar_intercambio = lambda query, respuesta, latencia=None: None
+    agente.multi_agent_system = SistemaQueFalla()
+    agente.is_complex_query = lambda query: True
+    original = Settings.JOURNAL_DIRECTORY
+    with tempfile.TemporaryDirectory() as directorio:
+        Settings.JOURNAL_DIRECTORY = directorio
+        try:
+            sesion = TableSession("mesa_informe")
+            # Falla: responde el agente simple y la ejecución queda pendiente
+            assert agente.procesar_turno(CONSULTA, sesion) == "Le sugiero la paella."
+            assert agente.procesar_turno(CONSULTA, sesion) == "Informe listo"
+            primero, segundo = agente.multi_agent_system.request_ids
+            assert primero == segundo and primero.startswith("mesa_informe:")
+            assert sesion.consulta_fallida is None
+
+            agente.procesar_turno("Otra consulta", sesion)
+            assert agente.multi_agent_system.request_ids[-1] != primero
+            sesion.cerrar()
+        finally:
+            Settings.JOURNAL_DIRECTORY = original
+    agente.cerrar()
+
+
+def main():
+    """Función principal"""
+    print("=== TEST CHECKPOINTS ===")
+    for test in [test_reintento_retoma_desde_el_ultimo_nodo,
+                 test_reproducir_traza_desde_un_checkpoint,
+                 test_poda_de_ejecuciones_vencidas,
+                 test_reanudar_restaura_investigacion_e_informes,
+                 test_agente_retoma_la_consulta_con_el_grafo,
+                 test_agente_reintenta_con_el_mismo_request_id]:
+        test()
+        print(f"[OK] {test.__name__}")
+
+
+if __name__ == "__main__":
+    main()
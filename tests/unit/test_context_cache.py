@@ -0,0 +1,205 @@
+#!/usr/bin/env python3
+"""
+Test del Caché de Contexto de Gemini
+Usa el backend local en lugar del servicio de caché real
+"""
+
+import os
+import sys
+import time
+import asyncio
+import tempfile
+import threading
+from pathlib import Path
+
+# Agregar la raíz del proyecto al path
+sys.path.append(str(Path(__file__).parent.parent.parent))
+
+os.environ.setdefault("ANONYMIZED_TELEMETRY", "False")
+
+from langchain_core.messages import HumanMessage, SystemMessage
+
+from config.settings import Settings
+from src.agents.context_cache import ContextCacheManager, LocalContextCacheBackend
+from src.agents.local_chat_model import LocalChatModel, crear_embeddings_locales
+from src.agents.mozo_virtual_agent import MozoVirtualAgent
+from src.agents.prompt_provider import SystemPromptProvider
+from src.agents.session_state import TableSession
+
+# El módulo del agente activa LangSmith al importarse; el test corre sin red
+os.environ["LANGCHAIN_TRACING_V2"] = "false"
+
+
+class BackendConFallas(LocalContextCacheBackend):
+    """Backend que rechaza la creación (p. ej. contenido menor al mínimo de Gemini)"""
+
+    def crear(self, *args, **kwargs):
+        raise RuntimeError("contenido demasiado corto para cachear")
+
+
+class BackendLento(LocalContextCacheBackend):
+    """Backend cuya creación demora como una llamada de red"""
+
+    def crear(self, *args, **kwargs):
+        time.sleep(0.3)
+        return super().crear(*args, **kwargs)
+
+
+def test_handle_se_reutiliza_y_se_refresca_al_cambiar_el_menu():
+    """Un solo upload por contenido; un menú distinto reemplaza el caché"""
+    backend = LocalContextCacheBackend()
+    manager = ContextCacheManager(backend, ttl=3600, margen_refresco=0)
+    contenido = {"menu": "Paella $28.000"}
+
+    primero = manager.obtener_handle("v1", lambda: ("instrucciones", contenido["menu"]))
+    for _ in range(5):
+        assert manager.obtener_handle("v1", lambda: ("instrucciones", contenido["menu"])) == primero
+
+    # Nueva versión con el mismo contenido: se conserva el caché
+    assert manager.obtener_handle("v2", lambda: ("instrucciones", contenido["menu"])) == primero
+
+    contenido["menu"] = "Paella $30.000"
+    segundo = manager.obtener_handle("v3", lambda: ("instrucciones", contenido["menu"]))
+
+    assert segundo != primero
+    assert backend.creados == 2 and backend.eliminados == 1
+    assert list(backend.caches) == [segundo]
+    assert manager.estadisticas["refrescos_por_cambio"] == 1
+
+
+def test_ttl_vencido_y_fallo_del_backend():
+    """Al vencer el TTL se recrea; si el backend falla se sigue sin caché"""
+    backend = LocalContextCacheBackend()
+    manager = ContextCacheManager(backend, ttl=10, margen_refresco=10)
+    manager.obtener_handle("v1", lambda: ("a", "b"))
+    manager.obtener_handle("v1", lambda: ("a", "b"))
+    assert backend.creados == 2
+
+    con_fallas = ContextCacheManager(BackendConFallas(), ttl=3600, reintento=3600)
+    assert con_fallas.obtener_handle("v1", lambda: ("a", "b")) is None
+    assert con_fallas.obtener_handle("v1", lambda: ("a", "b")) is None
+    assert con_fallas.estadisticas["fallos"] == 1
+
+
+def test_creacion_no_bloquea_a_los_demas():
+    """Mientras un hilo crea el caché, los demás siguen sin esperar la llamada de red"""
+    manager = ContextCacheManager(BackendLento(), ttl=3600, margen_refresco=0)
+    creador = threading.Thread(target=manager.obtener_handle, args=("v1", lambda: ("a", "b")))
+    creador.start()
+    time.sleep(0.05)
+
+    inicio = time.perf_counter()
+    assert manager.obtener_handle("v1", lambda: ("a", "b")) is None
+    assert time.perf_counter() - inicio < 0.1
+    creador.join()
+    assert manager.obtener_handle("v1", lambda: ("a", "b")) is not None
+    assert manager.backend.creados == 1
+
+
+def test_turno_async_no_bloquea_el_event_loop():
+    """Crear el caché en un turno async no frena a las otras corrutinas del loop"""
+    agente = MozoVirtualAgent(llm=LocalChatModel(), embedding_model=crear_embeddings_locales())
+    agente.registrar_intercambio = lambda query, respuesta, latencia=None: None
+    agente.setup_context_cache(BackendLento())
+
+    async def escenario(sesion):
+        latidos = []
+
+        async def latir():
+            while True:
+                latidos.append(time.perf_counter())
+                await asyncio.sleep(0.02)
+
+        latido = asyncio.create_task(latir())
+        await agente.aprocesar_turno("hola", sesion)
+        latido.cancel()
+        return max(b - a for a, b in zip(latidos, latidos[1:]))
+
+    original = Settings.JOURNAL_DIRECTORY
+    with tempfile.TemporaryDirectory() as directorio:
+        Settings.JOURNAL_DIRECTORY = directorio
+        try:
+            sesion = TableSession("mesa_cache_async")
+            assert asyncio.run(escenario(sesion)) < 0.2
+            sesion.cerrar()
+        finally:
+            Settings.JOURNAL_DIRECTORY = original
+    assert agente.context_cache.backend.creados == 1
+    agente.cerrar()
+
+
+def test_agente_referencia_el_cache_en_cada_llamada():
+    """Las llamadas usan cached_content y no reenvían el prompt de sistema"""
+    llm = LocalChatModel()
+    agente = MozoVirtualAgent(llm=llm, embedding_model=crear_embeddings_locales())
+    agente.registrar_intercambio = lambda query, respuesta, latencia=None: None
+    backend = LocalContextCacheBackend()
+    agente.setup_context_cache(backend)
+
+    original = Settings.JOURNAL_DIRECTORY
+    with tempfile.TemporaryDirectory() as directorio:
+        Settings.JOURNAL_DIRECTORY = directorio
+        try:
+            sesion = TableSession("mesa_cache")
+            for mensaje in ["hola", "la carta", "la cuenta"]:
+                agente.procesar_turno(mensaje, sesion)
+            sesion.cerrar()
+        finally:
+            Settings.JOURNAL_DIRECTORY = original
+
+    handle, = backend.caches
+    assert backend.creados == 1
+    assert llm.caches_usados == [handle] * 3
+    assert "MENÚ COMPLETO - LA TABERNA DEL RÍO" in backend.caches[handle]["contenido"]
+    assert "agregar_al_pedido" in backend.caches[handle]["herramientas"]
+    for mensajes in llm.llamadas:
+        assert not any(isinstance(m, SystemMessage) for m in mensajes)
+        assert isinstance(mensajes[0], HumanMessage) and "FECHA ACTUAL" in mensajes[0].content
+
+
+def test_cambio_en_el_menu_llega_al_cache():
+    """Editar un archivo del menú cambia la versión y el contenido cacheado"""
+    llm = LocalChatModel()
+    agente = MozoVirtualAgent(llm=llm, embedding_model=crear_embeddings_locales())
+    agente.registrar_intercambio = lambda query, respuesta, latencia=None: None
+    backend = LocalContextCacheBackend()
+    agente.setup_context_cache(backend)
+
+    original = Settings.JOURNAL_DIRECTORY
+    with tempfile.TemporaryDirectory() as directorio:
+        menu = Path(directorio) / "menu"
+        menu.mkdir()
+        (menu / "postres.txt").write_text("Flan de caramelo - $8.000", encoding="utf-8")
+        agente.prompt_provider = SystemPromptProvider(directorio_menu=str(menu), intervalo_version=0)
+        Settings.JOURNAL_DIRECTORY = directorio
+        try:
+            sesion = TableSession("mesa_menu_nuevo")
+            agente.procesar_turno("hola", sesion)
+            (menu / "postres.txt").write_text("Flan de caramelo - $10.500", encoding="utf-8")
+            agente.procesar_turno("¿y los postres?", sesion)
+            sesion.cerrar()
+        finally:
+            Settings.JOURNAL_DIRECTORY = original
+
+    handle, = backend.caches
+    assert backend.creados == 2
+    assert "$10.500" in backend.caches[handle]["contenido"]
+    assert "$8.000" not in backend.caches[handle]["contenido"]
+    agente.cerrar()
+
+
+def main():
+    """Función principal"""
+    print("=== TEST CONTEXT CACHE ===")
+    for test in [test_handle_se_reutiliza_y_se_refresca_al_cambiar_el_menu,
+                 test_ttl_vencido_y_fallo_del_backend,
+                 test_creacion_no_bloquea_a_los_demas,
+                 test_turno_async_no_bloquea_el_event_loop,
+                 test_agente_referencia_el_cache_en_cada_llamada,
+                 test_cambio_en_el_menu_llega_al_cache]:
+        test()
+        print(f"[OK] {test.__name__}")
+
+
+if __name__ == "__main__":
+    main()
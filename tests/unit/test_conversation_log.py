@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+Test del Log de Conversaciones en JSONL
+Buffer, rotación por tamaño y tiempo, compresión y política de fsync
+"""
+
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+# Agregar la raíz del proyecto al path
+sys.path.append(str(Path(__file__).parent.parent.parent))
+
+from src.persistence.conversation_log import ConversationLogWriter, leer_log
+
+
+def test_registros_jsonl_con_buffer():
+    """Los mensajes quedan en el buffer hasta el intervalo y se leen como JSON"""
+    with tempfile.TemporaryDirectory() as directorio:
+        ruta = Path(directorio) / "conversaciones.log"
+        log = ConversationLogWriter(ruta=str(ruta), intervalo_flush=60, fsync="nunca")
+
+        log.registrar_mensaje("mesa1", "cliente", "Quiero una paella")
+        log.registrar_mensaje("mesa1", "robino", "¡Marchando una paella!", latencia=0.8123)
+        assert ruta.stat().st_size == 0  # todavía en el buffer
+
+        log.flush()
+        registros = leer_log(str(ruta))
+        assert [r["rol"] for r in registros] == ["cliente", "robino"]
+        assert registros[1]["texto"] == "¡Marchando una paella!"
+        assert registros[1]["latencia_ms"] == 812.3
+        assert registros[0]["session_id"] == "mesa1"
+        log.cerrar()
+
+
+def test_volcado_por_intervalo_sin_escrituras():
+    """El último mensaje de una sesión ociosa llega al archivo al vencer el intervalo"""
+    with tempfile.TemporaryDirectory() as directorio:
+        ruta = Path(directorio) / "conversaciones.log"
+        log = ConversationLogWriter(ruta=str(ruta), intervalo_flush=0.1, fsync="flush")
+
+        log.registrar_mensaje("mesa1", "cliente", "¿Me trae la cuenta?")
+        limite = time.monotonic() + 2
+        while ruta.stat().st_size == 0 and time.monotonic() < limite:
+            time.sleep(0.02)
+        assert [r["texto"] for r in leer_log(str(ruta))] == ["¿Me trae la cuenta?"]
+
+        volcador = log._volcador
+        log.cerrar()
+        assert not volcador.is_alive()
+
+
+def test_rotacion_por_tamano_con_gzip():
+    """Al superar max_bytes se rota el segmento y se comprime; no se pierde ningún registro"""
+    with tempfile.TemporaryDirectory() as directorio:
+        ruta = Path(directorio) / "conversaciones.log"
+        log = ConversationLogWriter(ruta=str(ruta), max_bytes=2000, intervalo_rotacion=0,
+                                    comprimir=True, fsync="flush")
+        for i in range(100):
+            log.registrar_mensaje("mesa1", "cliente", f"mensaje {i:03d} " + "x" * 40)
+        log.cerrar()
+
+        comprimidos = sorted(Path(directorio).glob("conversaciones.*.log.gz"))
+        assert log.estadisticas["rotaciones"] == len(comprimidos) > 0
+        assert not list(Path(directorio).glob("conversaciones.*.log"))
+
+        textos = [r["texto"] for segmento in comprimidos for r in leer_log(str(segmento))]
+        textos += [r["texto"] for r in leer_log(str(ruta))]
+        assert sorted(textos) == [f"mensaje {i:03d} " + "x" * 40 for i in range(100)]
+
+
+def test_rotacion_por_tiempo_y_fsync_siempre():
+    """Con fsync 'siempre' cada registro llega al archivo; el intervalo de tiempo también rota"""
+    with tempfile.TemporaryDirectory() as directorio:
+        ruta = Path(directorio) / "conversaciones.log"
+        log = ConversationLogWriter(ruta=str(ruta), intervalo_rotacion=0.2, comprimir=False,
+                                    intervalo_flush=60, fsync="siempre")
+        log.registrar_mensaje("mesa1", "cliente", "hola")
+        assert len(leer_log(str(ruta))) == 1
+
+        time.sleep(1.1)  # el nombre del segmento tiene resolución de segundos
+        log.registrar_mensaje("mesa1", "cliente", "sigo aquí")
+        log.cerrar()
+
+        rotados = list(Path(directorio).glob("conversaciones.*.log"))
+        assert len(rotados) == 1
+        assert leer_log(str(rotados[0]))[0]["texto"] == "hola"
+        assert leer_log(str(ruta))[0]["texto"] == "sigo aquí"
+
+
+def main():
+    test_registros_jsonl_con_buffer()
+    print("[OK] test_registros_jsonl_con_buffer")
+    test_volcado_por_intervalo_sin_escrituras()
+    print("[OK] test_volcado_por_intervalo_sin_escrituras")
+    test_rotacion_por_tamano_con_gzip()
+    print("[OK] test_rotacion_por_tamano_con_gzip")
+    test_rotacion_por_tiempo_y_fsync_siempre()
+    print("[OK] test_rotacion_por_tiempo_y_fsync_siempre")
+
+
+if __name__ == "__main__":
+    main()
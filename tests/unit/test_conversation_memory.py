@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+"""
+Test de la Memoria de Conversación Acotada
+"""
+
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+# Agregar la raíz del proyecto al path
+sys.path.append(str(Path(__file__).parent.parent.parent))
+
+os.environ.setdefault("ANONYMIZED_TELEMETRY", "False")
+
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
+
+from config.settings import Settings
+from src.agents.conversation_memory import ConversationMemory, crear_resumidor_llm, estimar_tokens
+from src.agents.local_chat_model import LocalChatModel, crear_embeddings_locales
+from src.agents.mozo_virtual_agent import MozoVirtualAgent
+from src.agents.session_state import TableSession
+
+# El módulo del agente activa LangSmith al importarse; el test corre sin red
+os.environ["LANGCHAIN_TRACING_V2"] = "false"
+
+
+class SesionSimple:
+    """Sesión mínima con historial y resumen"""
+
+    def __init__(self, historial):
+        self.historial = historial
+        self.resumen = ""
+
+
+def turno_con_menu(i: int):
+    """Turno que consulta la carta: pregunta, tool call, salida grande y respuesta"""
+    return [
+        HumanMessage(content=f"pregunta {i}"),
+        AIMessage(content="", tool_calls=[{"name": "mostrar_menu_completo", "args": {}, "id": f"llamada_{i}"}]),
+        ToolMessage(content="CARTA " * 500, tool_call_id=f"llamada_{i}", name="mostrar_menu_completo"),
+        AIMessage(content=f"respuesta {i}")
+    ]
+
+
+def test_compactar_pliega_turnos_y_poda_herramientas():
+    """Se conservan los últimos turnos y las salidas grandes se reemplazan"""
+    historial = [m for i in range(10) for m in turno_con_menu(i)]
+    sesion = SesionSimple(historial)
+    memoria = ConversationMemory(max_turnos=3, presupuesto_tokens=10000, max_chars_herramienta=100)
+
+    plegados = memoria.compactar(sesion)
+
+    assert plegados == 7
+    assert sesion.historial[0].content == "pregunta 7"
+    assert len(sesion.historial) == 12
+    assert "Cliente: pregunta 0" in sesion.resumen and "Robino: respuesta 6" in sesion.resumen
+    herramientas = [m for m in sesion.historial if isinstance(m, ToolMessage)]
+    assert all("omitida" in m.content for m in herramientas)
+    llamadas = {c["id"] for m in sesion.historial if isinstance(m, AIMessage) for c in m.tool_calls}
+    assert llamadas == {m.tool_call_id for m in herramientas}
+
+
+def test_presupuesto_de_tokens_acota_turnos_largos():
+    """Con turnos largos manda el presupuesto aunque no se llegue a max_turnos"""
+    historial = []
+    for i in range(5):
+        historial += [HumanMessage(content=f"pregunta {i}"), AIMessage(content="palabra " * 400)]
+    sesion = SesionSimple(historial)
+
+    ConversationMemory(max_turnos=10, presupuesto_tokens=1000).compactar(sesion)
+
+    assert estimar_tokens(sesion.historial) <= 1000
+    assert sesion.historial[-2].content == "pregunta 4"
+
+
+def test_contexto_del_turno_20_igual_al_del_turno_4():
+    """El prompt enviado al LLM deja de crecer una vez llena la ventana"""
+    llm = LocalChatModel()
+    agente = MozoVirtualAgent(llm=llm, embedding_model=crear_embeddings_locales())
+    agente.registrar_intercambio = lambda query, respuesta, latencia=None: None
+    agente.memoria = ConversationMemory(max_turnos=2, presupuesto_tokens=10000)
+
+    original = Settings.JOURNAL_DIRECTORY
+    with tempfile.TemporaryDirectory() as directorio:
+        Settings.JOURNAL_DIRECTORY = directorio
+        try:
+            sesion = TableSession("mesa_memoria")
+            for i in range(20):
+                agente.procesar_turno(f"mensaje {i}", sesion)
+            sesion.cerrar()
+        finally:
+            Settings.JOURNAL_DIRECTORY = original
+
+    assert len(llm.llamadas[-1]) == len(llm.llamadas[3])
+    assert len(sesion.historial) == 4
+    assert "mensaje 0" in sesion.resumen
+    assert "RESUMEN DE LA CONVERSACIÓN ANTERIOR" in llm.llamadas[-1][1].content
+
+
+def test_resumen_del_llm_por_configuracion():
+    """Con MEMORY_LLM_SUMMARY el agente pliega los turnos con un resumen del LLM"""
+    original = Settings.MEMORY_LLM_SUMMARY
+    Settings.MEMORY_LLM_SUMMARY = True
+    try:
+        agente = MozoVirtualAgent(llm=LocalChatModel(respuestas=["El cliente pidió paella."]),
+                                  embedding_model=crear_embeddings_locales())
+    finally:
+        Settings.MEMORY_LLM_SUMMARY = original
+    sesion = SesionSimple([m for i in range(4) for m in turno_con_menu(i)])
+    agente.memoria.max_turnos = 2
+    assert agente.memoria.compactar(sesion) == 2
+    assert sesion.resumen == "El cliente pidió paella."
+
+    class LLMCaido:
+        def invoke(self, prompt):
+            raise ConnectionError("Gemini no responde")
+
+    # Si el LLM falla, el resumen extractivo toma su lugar
+    memoria = ConversationMemory(max_turnos=2, resumidor=crear_resumidor_llm(LLMCaido()))
+    sesion = SesionSimple([m for i in range(4) for m in turno_con_menu(i)])
+    memoria.compactar(sesion)
+    assert "pregunta 0" in sesion.resumen
+
+
+def main():
+    """Función principal"""
+    print("=== TEST CONVERSATION MEMORY ===")
+    for test in [test_compactar_pliega_turnos_y_poda_herramientas,
+                 test_presupuesto_de_tokens_acota_turnos_largos,
+                 test_contexto_del_turno_20_igual_al_del_turno_4,
+                 test_resumen_del_llm_por_configuracion]:
+        test()
+        print(f"[OK] {test.__name__}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+Test del Ejecutor de Pasos en DAG
+"""
+
+import os
+import sys
+import time
+import tempfile
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+# Agregar la raíz del proyecto al path
+sys.path.append(str(Path(__file__).parent.parent.parent))
+
+os.environ.setdefault("ANONYMIZED_TELEMETRY", "False")
+
+from src.agents.dag_executor import DAGExecutor
+from src.agents.simple_multi_agent import SimpleMultiAgentMozoVirtual
+from src.persistence.report_store import ReportStore
+
+# El observer activa LangSmith al importarse; el test corre sin red
+os.environ["LANGCHAIN_TRACING_V2"] = "false"
+
+
+def test_pasos_independientes_corren_en_paralelo():
+    """Dos pasos independientes tardan lo del más lento y el paso de unión ve ambos resultados"""
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        dag = DAGExecutor(pool)
+        dag.agregar("a", lambda datos: (time.sleep(0.2), datos["x"] + 1)[1])
+        dag.agregar("b", lambda datos: (time.sleep(0.2), datos["x"] * 10)[1])
+        dag.agregar("union", lambda datos: datos["a"] + datos["b"], dependencias=["a", "b"])
+
+        tiempos = {}
+        inicio = time.perf_counter()
+        resultados = dag.ejecutar({"x": 2}, al_terminar=lambda paso, segundos: tiempos.__setitem__(paso, segundos))
+        duracion = time.perf_counter() - inicio
+
+    assert resultados == {"a": 3, "b": 20, "union": 23}
+    assert duracion < 0.35
+    assert set(tiempos) == {"a", "b", "union"}
+    assert tiempos["a"] >= 0.2 and tiempos["b"] >= 0.2
+
+
+def test_contexto_y_errores():
+    """Los pasos ven las contextvars del llamador; un fallo se propaga y corta los dependientes"""
+    mesa = contextvars.ContextVar("mesa", default=None)
+    mesa.set("mesa_7")
+    ejecutados = []
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        dag = DAGExecutor(pool)
+        dag.agregar("leer", lambda datos: mesa.get())
+        dag.agregar("fallar", lambda datos: 1 / 0)
+        dag.agregar("despues", lambda datos: ejecutados.append("despues"), dependencias=["fallar"])
+        try:
+            dag.ejecutar()
+            assert False, "Se esperaba ZeroDivisionError"
+        except ZeroDivisionError:
+            pass
+
+        solo_lectura = DAGExecutor(pool).agregar("leer", lambda datos: mesa.get())
+        assert solo_lectura.ejecutar() == {"leer": "mesa_7"}
+
+    assert ejecutados == []
+    try:
+        DAGExecutor(None).agregar("huerfano", lambda datos: None, dependencias=["inexistente"])
+        assert False, "Se esperaba ValueError"
+    except ValueError:
+        pass
+
+
+class Documento:
+    def __init__(self, texto):
+        self.page_content = texto
+        self.metadata = {"source": "menu"}
+
+
+class VectorstoreLento:
+    """Retriever con latencia fija para medir el fan-out"""
+
+    def as_retriever(self, search_kwargs=None):
+        return self
+
+    def get_relevant_documents(self, consulta):
+        time.sleep(0.2)
+        return [Documento("Bife de chorizo con papas, precio $8500, ideal para compartir")]
+
+
+def test_consulta_compleja_combina_pasos_paralelos():
+    """La investigación y las preferencias se unen en el informe y cada paso llega al observer"""
+    anterior = os.environ.setdefault("GEMINI_API_KEY", "clave-de-prueba")
+    with tempfile.TemporaryDirectory() as directorio:
+        try:
+            sistema = SimpleMultiAgentMozoVirtual(vectorstore=VectorstoreLento(),
+                                                  report_store=ReportStore(directorio))
+        finally:
+            if anterior == "clave-de-prueba":
+                del os.environ["GEMINI_API_KEY"]
+        os.environ["LANGCHAIN_TRACING_V2"] = "false"
+        lento = sistema.detectar_preferencias
+        sistema.detectar_preferencias = lambda descripcion: (time.sleep(0.2), lento(descripcion))[1]
+
+        inicio = time.perf_counter()
+        respuesta = sistema.process_complex_query("Cena romántica con presupuesto medio")
+        duracion = time.perf_counter() - inicio
+        sistema.pool.shutdown()
+        sistema.report_store.cerrar()
+
+    assert duracion < 0.35
+    assert "Preferencias analizadas: romantica" in respuesta
+    assert "Solomillo de Ternera" in respuesta
+    traza = sistema.observer.traces_data[-1]
+    pasos = [e["data"]["paso"] for e in traza["events"] if "paso" in e.get("data", {})]
+    assert set(pasos) == {"investigation", "preferences_analysis", "report_generation", "decision_summary"}
+
+
+def main():
+    """Función principal"""
+    print("=== TEST DAG EXECUTOR ===")
+    for test in [test_pasos_independientes_corren_en_paralelo,
+                 test_contexto_y_errores,
+                 test_consulta_compleja_combina_pasos_paralelos]:
+        test()
+        print(f"[OK] {test.__name__}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+Test del Clasificador Local de Intención
+"""
+
+import sys
+import time
+from pathlib import Path
+
+# Agregar la raíz del proyecto al path
+sys.path.append(str(Path(__file__).parent.parent.parent))
+
+from config.settings import Settings
+from src.agents.intent_classifier import IntentClassifier, caracteristicas, leer_consultas
+from src.agents.mozo_virtual_agent import MozoVirtualAgent
+
+
+def test_generaliza_a_consultas_nuevas():
+    """Consultas que no están en el archivo de entrenamiento se clasifican bien"""
+    clasificador = IntentClassifier.desde_archivo()
+    assert clasificador.etiquetas == ("compleja", "simple")
+    casos = [("¿Qué me aconsejarías para una velada íntima?", "compleja"),
+             ("No sé qué pedir, ayuda", "compleja"),
+             ("¿Qué me recomiendas para una cena especial?", "compleja"),
+             ("Che, ¿cuánto sale el flan?", "simple"),
+             ("¿Cuál es la especialidad del día?", "simple"),
+             ("¿Tienen menú?", "simple")]
+    for consulta, esperada in casos:
+        etiqueta, confianza = clasificador.clasificar(consulta)
+        assert etiqueta == esperada, (consulta, etiqueta, confianza)
+
+    probabilidades = clasificador.probabilidades("Hola")
+    assert abs(sum(probabilidades.values()) - 1.0) < 1e-9
+
+
+def test_precision_en_validacion_cruzada():
+    """Entrenado con cuatro quintos del archivo acierta la mayoría del quinto restante"""
+    ejemplos = leer_consultas(Settings.INTENT_TRAINING_FILE)
+    aciertos = 0
+    for pliegue in range(5):
+        entrenamiento = [e for i, e in enumerate(ejemplos) if i % 5 != pliegue]
+        validacion = [e for i, e in enumerate(ejemplos) if i % 5 == pliegue]
+        clasificador = IntentClassifier().entrenar(entrenamiento)
+        aciertos += sum(clasificador.clasificar(consulta)[0] == etiqueta for etiqueta, consulta in validacion)
+    assert aciertos / len(ejemplos) >= 0.85, f"{aciertos}/{len(ejemplos)}"
+
+
+def test_ruteo_con_umbral_y_respaldo():
+    """is_complex_query usa el clasificador si está seguro y la regla de palabras clave si no"""
+    agente = MozoVirtualAgent.__new__(MozoVirtualAgent)
+    agente.clasificador_intencion = IntentClassifier.desde_archivo()
+
+    # La regla marca 'especial' como investigación; el clasificador sabe que es una pregunta simple
+    assert not agente.is_complex_query("¿Cuál es la especialidad del día?")
+    assert agente.is_complex_query("No sé qué pedir, ayuda")
+
+    class Dudoso:
+        def clasificar(self, texto):
+            return "simple", Settings.INTENT_CONFIDENCE_THRESHOLD - 0.01
+
+    agente.clasificador_intencion = Dudoso()
+    assert agente.is_complex_query("Algo para mi pareja")
+    assert not agente.is_complex_query("La cuenta, por favor")
+
+    agente.clasificador_intencion = None
+    assert agente.is_complex_query("Algo para mi pareja")
+
+
+def test_pedidos_explicitos_conservan_el_ruteo_de_la_regla():
+    """Recomendaciones, restricciones alimentarias e informes siguen yendo al multi-agente"""
+    agente = MozoVirtualAgent.__new__(MozoVirtualAgent)
+    agente.clasificador_intencion = IntentClassifier.desde_archivo()
+    explicitas = ["¿tienen opciones sin gluten?", "Quiero un informe de ventas", "Soy vegano",
+                  "Tengo alergia al maní", "¿Qué me recomiendas?", "No sé qué pedir",
+                  "Hacé un informe del pedido"]
+    for consulta in explicitas:
+        assert agente.is_complex_query(consulta), consulta
+
+    class SiempreSimple:
+        def clasificar(self, texto):
+            return "simple", 0.99
+
+    agente.clasificador_intencion = SiempreSimple()
+    for consulta in explicitas:
+        assert agente.is_complex_query(consulta), consulta
+    assert not agente.is_complex_query("Algo para mi pareja")
+
+
+def test_inferencia_en_microsegundos():
+    """Clasificar una consulta no llega a un milisegundo (y los índices son estables)"""
+    clasificador = IntentClassifier.desde_archivo()
+    consulta = "¿Qué me recomendás para una cena romántica con mi pareja?"
+    assert caracteristicas(consulta, 4096) == caracteristicas(consulta, 4096)
+
+    clasificador.clasificar(consulta)
+    repeticiones = 1000
+    inicio = time.perf_counter()
+    for _ in range(repeticiones):
+        clasificador.clasificar(consulta)
+    promedio = (time.perf_counter() - inicio) / repeticiones
+    assert promedio < 0.001, f"{promedio * 1e6:.1f} µs por consulta"
+
+
+def main():
+    """Función principal"""
+    print("=== TEST INTENT CLASSIFIER ===")
+    for test in [test_generaliza_a_consultas_nuevas,
+                 test_precision_en_validacion_cruzada,
+                 test_ruteo_con_umbral_y_respaldo,
+                 test_pedidos_explicitos_conservan_el_ruteo_de_la_regla,
+                 test_inferencia_en_microsegundos]:
+        test()
+        print(f"[OK] {test.__name__}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""
+Test del Contexto de Investigación por Consulta
+"""
+
+import os
+import sys
+import time
+import tempfile
+import threading
+from pathlib import Path
+
+# Agregar la raíz del proyecto al path
+sys.path.append(str(Path(__file__).parent.parent.parent))
+
+os.environ.setdefault("ANONYMIZED_TELEMETRY", "False")
+
+from src.agents.investigation_context import usar_contexto_investigacion
+from src.agents.simple_multi_agent import SimpleMultiAgentMozoVirtual
+from src.persistence.report_store import ReportStore
+
+# El observer activa LangSmith al importarse; el test corre sin red
+os.environ["LANGCHAIN_TRACING_V2"] = "false"
+
+
+class Documento:
+    def __init__(self, texto):
+        self.page_content = texto
+        self.metadata = {"source": "menu"}
+
+
+class VectorstoreLento:
+    """Retriever lento para que las consultas se solapen"""
+
+    def as_retriever(self, search_kwargs=None):
+        return self
+
+    def get_relevant_documents(self, consulta):
+        time.sleep(0.1)
+        return [Documento(f"Menú para: {consulta}")]
+
+
+def crear_sistema(directorio: str) -> SimpleMultiAgentMozoVirtual:
+    """Sistema con una clave falsa (sólo se verifica al construir) y almacén temporal"""
+    anterior = os.environ.setdefault("GEMINI_API_KEY", "clave-de-prueba")
+    try:
+        sistema = SimpleMultiAgentMozoVirtual(vectorstore=VectorstoreLento(),
+                                              report_store=ReportStore(directorio))
+    finally:
+        if anterior == "clave-de-prueba":
+            del os.environ["GEMINI_API_KEY"]
+    os.environ["LANGCHAIN_TRACING_V2"] = "false"
+    return sistema
+
+
+def test_contexto_aislado_y_por_defecto():
+    """Dentro de un contexto el estado es propio; fuera se usa el de la instancia"""
+    with tempfile.TemporaryDirectory() as directorio:
+        sistema = crear_sistema(directorio)
+        sistema.current_investigation = {"consulta": "fuera"}
+        with usar_contexto_investigacion() as contexto:
+            assert sistema.current_investigation == {}
+            sistema.investigar_plato_detallado("cena romántica")
+            sistema.generar_informe_recomendacion()
+            assert contexto.investigacion["consulta"] == "cena romántica"
+            assert len(contexto.informes) == 1
+        assert sistema.current_investigation == {"consulta": "fuera"}
+        # Fuera de una consulta los informes son el historial de la instancia
+        assert len(sistema.generated_reports) == 1
+        assert sistema.generated_reports[-1]["consulta_original"] == "cena romántica"
+        sistema.pool.shutdown()
+        sistema.report_store.cerrar()
+
+
+def test_consultas_en_paralelo_no_se_mezclan():
+    """Una instancia compartida responde a cada consulta con su propia investigación"""
+    with tempfile.TemporaryDirectory() as directorio:
+        sistema = crear_sistema(directorio)
+        respuestas = atender_en_paralelo(sistema)
+        sistema.pool.shutdown()
+        assert len(sistema.generated_reports) == 12
+        sistema.report_store.cerrar()
+    verificar_respuestas(respuestas)
+
+
+def atender_en_paralelo(sistema: SimpleMultiAgentMozoVirtual):
+    consultas = {"romantica": "Cena romántica con mi pareja",
+                 "familiar": "Almuerzo en familia con niños",
+                 "vegetariana": "Algo vegetariano para compartir"}
+    respuestas = {}
+
+    def atender(clave, repeticiones=4):
+        respuestas[clave] = [sistema.process_complex_query(consultas[clave]) for _ in range(repeticiones)]
+
+    hilos = [threading.Thread(target=atender, args=(clave,)) for clave in consultas]
+    for hilo in hilos:
+        hilo.start()
+    for hilo in hilos:
+        hilo.join()
+    return respuestas
+
+
+def verificar_respuestas(respuestas):
+    esperado = {"romantica": "Solomillo de Ternera", "familiar": "Paella Valenciana",
+                "vegetariana": "Gazpacho y Salmorejo"}
+    for clave, lista in respuestas.items():
+        for respuesta in lista:
+            assert esperado[clave] in respuesta, (clave, respuesta)
+            otros = [texto for otra, texto in esperado.items() if otra != clave]
+            assert not any(texto in respuesta for texto in otros), (clave, respuesta)
+
+
+def main():
+    """Función principal"""
+    print("=== TEST CONTEXTO DE INVESTIGACION ===")
+    for test in [test_contexto_aislado_y_por_defecto,
+                 test_consultas_en_paralelo_no_se_mezclan]:
+        test()
+        print(f"[OK] {test.__name__}")
+
+
+if __name__ == "__main__":
+    main()
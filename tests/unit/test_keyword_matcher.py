@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+"""
+Test del Detector de Palabras Clave
+"""
+
+import sys
+from pathlib import Path
+
+# Agregar la raíz del proyecto al path
+sys.path.append(str(Path(__file__).parent.parent.parent))
+
+from src.agents.keyword_matcher import KeywordMatcher, MATCHER, PALABRAS_CLAVE, normalizar
+
+
+def test_categorias_en_una_pasada_con_acentos():
+    """Todas las categorías salen de una sola búsqueda, con o sin acentos"""
+    categorias = MATCHER.categorias("Una cena ROMANTICA con mi pareja, algo de Pescado y nada economico")
+    assert {"investigacion", "ocasion_romantica",
+            "comida_pescados_mariscos", "presupuesto_bajo"} <= categorias
+    assert "ocasion_familiar" not in categorias
+
+    assert normalizar("Niños Románticos") == "ninos romanticos"
+    assert "ocasion_familiar" in MATCHER.categorias("mesa para los ninos")
+    assert MATCHER.categorias("hola, la carta por favor") == frozenset({"consulta_menu"})
+
+
+def test_equivale_a_buscar_subcadenas():
+    """Mismo resultado que el 'any(palabra in texto)' por categoría sobre el texto normalizado"""
+    textos = ["Quiero algo especial y premium para un negocio",
+              "¿Qué me recomiendas? Somos un grupo con niños, sin gluten",
+              "informe y resumen de la noche", "ensalada de quinoa vegana",
+              "una cena romántica", "algo simple y barato"]
+    for texto in textos:
+        esperado = {categoria for categoria, palabras in PALABRAS_CLAVE.items()
+                    if any(normalizar(p) in normalizar(texto) for p in palabras)}
+        assert MATCHER.categorias(texto) == esperado, texto
+
+    # Palabras solapadas de distintas categorías se detectan todas
+    solapadas = KeywordMatcher({"a": ["ab"], "b": ["bc"], "c": ["abc"], "d": ["b"]})
+    assert solapadas.categorias("xabcx") == {"a", "b", "c", "d"}
+
+
+def main():
+    """Función principal"""
+    print("=== TEST KEYWORD MATCHER ===")
+    for test in [test_categorias_en_una_pasada_con_acentos,
+                 test_equivale_a_buscar_subcadenas]:
+        test()
+        print(f"[OK] {test.__name__}")
+
+
+if __name__ == "__main__":
+    main()
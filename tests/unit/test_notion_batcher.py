@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+Test del Agrupador de Bloques para Notion
+Usa un cliente falso que registra cada request
+"""
+
+import sys
+import time
+import threading
+from pathlib import Path
+
+# Agregar la raíz del proyecto al path
+sys.path.append(str(Path(__file__).parent.parent.parent))
+
+from src.integrations.notion_batcher import NotionBlockBatcher
+
+
+class ClienteNotionFalso:
+    """Registra las llamadas a blocks.children.append y pages.retrieve"""
+
+    def __init__(self):
+        self.requests = []
+        self.blocks = self
+        self.children = self
+        self.pages = self
+
+    def append(self, block_id, children):
+        self.requests.append((block_id, list(children)))
+
+    def retrieve(self, page_id):
+        return {"id": page_id}
+
+
+def parrafo(texto: str) -> dict:
+    return {"object": "block", "type": "paragraph",
+            "paragraph": {"rich_text": [{"type": "text", "text": {"content": texto}}]}}
+
+
+def test_agrupa_hasta_100_hijos_y_conserva_el_orden():
+    """Muchos productores concurrentes se envían en pocos requests ordenados por productor"""
+    cliente = ClienteNotionFalso()
+    batcher = NotionBlockBatcher(cliente, ventana=60)
+
+    def productor(nombre: str):
+        for i in range(25):
+            batcher.blocks.children.append(block_id="pagina", children=[parrafo(f"{nombre}-{i}-{j}") for j in range(4)])
+
+    hilos = [threading.Thread(target=productor, args=(f"mesa{n}",)) for n in range(3)]
+    for hilo in hilos:
+        hilo.start()
+    for hilo in hilos:
+        hilo.join()
+    batcher.cerrar()
+
+    enviados = [b["paragraph"]["rich_text"][0]["text"]["content"] for _, lote in cliente.requests for b in lote]
+    assert len(enviados) == 300
+    assert len(cliente.requests) == 3
+    assert all(len(lote) <= 100 for _, lote in cliente.requests)
+    for n in range(3):
+        propios = [t for t in enviados if t.startswith(f"mesa{n}-")]
+        assert propios == [f"mesa{n}-{i}-{j}" for i in range(25) for j in range(4)]
+    assert batcher.estadisticas["requests"] == 3
+
+
+def test_ventana_de_tiempo_y_limite_de_bytes():
+    """Los pocos bloques se envían al vencer la ventana; el tamaño parte los lotes"""
+    cliente = ClienteNotionFalso()
+    batcher = NotionBlockBatcher(cliente, ventana=0.05)
+    batcher.agregar("pagina", [parrafo("hola")])
+    batcher.agregar("otra", [parrafo("chau")])
+    time.sleep(0.3)
+    assert sorted(pagina for pagina, _ in cliente.requests) == ["otra", "pagina"]
+    assert batcher.pendientes() == 0
+    batcher.cerrar()
+
+    cliente = ClienteNotionFalso()
+    batcher = NotionBlockBatcher(cliente, ventana=60, max_bytes=1000)
+    batcher.agregar("pagina", [parrafo("x" * 300) for _ in range(6)])
+    batcher.cerrar()
+    assert [len(lote) for _, lote in cliente.requests] == [2, 2, 2]
+
+
+class RechazoNotion(Exception):
+    """4xx de validación como los que lanza notion_client"""
+    status = 400
+
+
+class ClienteQueRechaza(ClienteNotionFalso):
+    """Rechaza cualquier request que incluya un bloque 'malo'"""
+
+    def append(self, block_id, children):
+        if any(b["paragraph"]["rich_text"][0]["text"]["content"] == "malo" for b in children):
+            raise RechazoNotion("body failed validation")
+        super().append(block_id, children)
+
+
+def test_rechazo_permanente_solo_pierde_al_productor_culpable():
+    """Un bloque inválido no arrastra los bloques de los demás productores del lote"""
+    cliente = ClienteQueRechaza()
+    batcher = NotionBlockBatcher(cliente, ventana=60)
+    batcher.agregar("pagina", [parrafo("a1"), parrafo("a2")])
+    batcher.agregar("pagina", [parrafo("b1"), parrafo("malo")])
+    batcher.agregar("pagina", [parrafo("c1")])
+    batcher.cerrar()
+
+    enviados = [b["paragraph"]["rich_text"][0]["text"]["content"] for _, lote in cliente.requests for b in lote]
+    assert enviados == ["a1", "a2", "c1"]
+    assert batcher.estadisticas["bloques_perdidos"] == 2
+
+    # Después de cerrar, los bloques se envían en el acto en vez de quedar sin hilo que los mande
+    batcher.agregar("pagina", [parrafo("tarde")])
+    assert cliente.requests[-1] == ("pagina", [parrafo("tarde")])
+    assert batcher.pendientes() == 0
+
+
+def test_delega_los_demas_endpoints():
+    """pages.retrieve sigue funcionando sobre el cliente real"""
+    batcher = NotionBlockBatcher(ClienteNotionFalso(), ventana=60)
+    assert batcher.pages.retrieve(page_id="abc") == {"id": "abc"}
+    batcher.cerrar()
+
+
+def main():
+    """Función principal"""
+    print("=== TEST NOTION BATCHER ===")
+    for test in [test_agrupa_hasta_100_hijos_y_conserva_el_orden,
+                 test_ventana_de_tiempo_y_limite_de_bytes,
+                 test_rechazo_permanente_solo_pierde_al_productor_culpable,
+                 test_delega_los_demas_endpoints]:
+        test()
+        print(f"[OK] {test.__name__}")
+
+
+if __name__ == "__main__":
+    main()
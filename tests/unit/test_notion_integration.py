@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+"""
+Test de la Integración Resiliente con Notion
+Reintentos, circuit breaker, token bucket y escritura contra el servidor falso
+"""
+
+import sys
+import time
+from pathlib import Path
+
+# Agregar la raíz del proyecto al path
+sys.path.append(str(Path(__file__).parent.parent.parent))
+
+from src.integrations.fake_notion_server import FakeNotionServer
+from src.integrations.notion_batcher import NotionBlockBatcher
+from src.integrations.notion_integration import NotionIntegration, NotionNoDisponibleError, TokenBucket
+
+
+class ErrorNotionFalso(Exception):
+    """Error con la forma de notion_client.APIResponseError"""
+
+    def __init__(self, status, code, headers=None):
+        super().__init__(code)
+        self.status = status
+        self.code = code
+        self.headers = headers or {}
+
+
+class ClienteQueFalla:
+    """Falla las primeras 'fallos' llamadas con el error indicado"""
+
+    def __init__(self, fallos, error):
+        self.fallos = fallos
+        self.error = error
+        self.llamadas = 0
+        self.blocks = self
+        self.children = self
+
+    def append(self, block_id, children):
+        self.llamadas += 1
+        if self.llamadas <= self.fallos:
+            raise self.error
+        return {"object": "list", "results": children}
+
+
+def parrafo(texto: str) -> dict:
+    return {"object": "block", "type": "paragraph",
+            "paragraph": {"rich_text": [{"type": "text", "text": {"content": texto}}]}}
+
+
+def test_reintenta_429_respetando_retry_after():
+    """Un 429 se reintenta esperando lo que indica Retry-After"""
+    cliente = ClienteQueFalla(2, ErrorNotionFalso(429, "rate_limited", {"retry-after": "0.2"}))
+    notion = NotionIntegration(cliente=cliente, tasa=100, rafaga=100, backoff_base=5)
+
+    inicio = time.monotonic()
+    notion.blocks.children.append(block_id="pagina", children=[parrafo("hola")])
+    duracion = time.monotonic() - inicio
+
+    assert cliente.llamadas == 3
+    assert 0.4 <= duracion < 2
+    assert notion.resumen()["rate_limited"] == 2
+    assert notion.resumen()["reintentos"] == 2
+
+    # Los errores de validación no se reintentan
+    cliente = ClienteQueFalla(1, ErrorNotionFalso(400, "validation_error"))
+    notion = NotionIntegration(cliente=cliente, tasa=100, rafaga=100)
+    try:
+        notion.blocks.children.append(block_id="pagina", children=[])
+        assert False, "debía propagar el error de validación"
+    except ErrorNotionFalso:
+        pass
+    assert cliente.llamadas == 1
+
+
+def test_circuito_abierto_y_batcher_reencola():
+    """Con Notion caído el circuito se abre y el batcher conserva los bloques"""
+    cliente = ClienteQueFalla(1000, ErrorNotionFalso(503, "service_unavailable"))
+    notion = NotionIntegration(cliente=cliente, tasa=100, rafaga=100, backoff_base=0.01,
+                               umbral_circuito=3, apertura_circuito=60)
+    batcher = NotionBlockBatcher(notion, ventana=60)
+
+    batcher.blocks.children.append(block_id="pagina", children=[parrafo(f"b{i}") for i in range(5)])
+    batcher.flush()
+    assert cliente.llamadas == 3
+    assert notion.circuito.estado == "abierto"
+    assert batcher.pendientes() == 5
+    assert batcher.estadisticas["bloques_perdidos"] == 0
+
+    # Con el circuito abierto no se llega al cliente
+    try:
+        notion.blocks.children.append(block_id="pagina", children=[])
+        assert False, "debía rechazar la llamada"
+    except NotionNoDisponibleError:
+        pass
+    assert cliente.llamadas == 3
+
+    # Cuando vence la apertura y Notion responde, el lote se envía en orden
+    cliente.fallos = 0
+    notion.circuito.tiempo_apertura = 0
+    batcher.cerrar()
+    assert batcher.pendientes() == 0
+    assert notion.circuito.estado == "cerrado"
+
+
+def test_token_bucket_respeta_la_tasa():
+    """Tras la ráfaga, las llamadas se espacian a 1/tasa"""
+    bucket = TokenBucket(tasa=20, capacidad=2)
+    inicio = time.monotonic()
+    for _ in range(8):
+        bucket.adquirir()
+    duracion = time.monotonic() - inicio
+    assert 0.25 <= duracion < 1
+
+
+def test_escritura_contra_servidor_falso():
+    """Ninguna escritura se pierde aunque el servidor limite la tasa"""
+    with FakeNotionServer(tasa=50, rafaga=2, retry_after=0.05) as servidor:
+        notion = NotionIntegration(token="test", base_url=servidor.url, tasa=1000, rafaga=1000)
+        for i in range(15):
+            notion.blocks.children.append(block_id="pagina", children=[parrafo(f"turno {i}")])
+
+        textos = [b["paragraph"]["rich_text"][0]["text"]["content"] for b in servidor.bloques["pagina"]]
+        assert textos == [f"turno {i}" for i in range(15)]
+        assert servidor.estadisticas["rechazados_429"] > 0
+        assert notion.resumen()["fallos"] == 0
+        assert notion.pages.retrieve(page_id="abc")["id"] == "abc"
+
+
+def main():
+    test_reintenta_429_respetando_retry_after()
+    print("[OK] test_reintenta_429_respetando_retry_after")
+    test_circuito_abierto_y_batcher_reencola()
+    print("[OK] test_circuito_abierto_y_batcher_reencola")
+    test_token_bucket_respeta_la_tasa()
+    print("[OK] test_token_bucket_respeta_la_tasa")
+    test_escritura_contra_servidor_falso()
+    print("[OK] test_escritura_contra_servidor_falso")
+
+
+if __name__ == "__main__":
+    main()
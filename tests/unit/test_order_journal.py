@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+"""
+Test del Journal de Pedidos
+Verifica registro append-only, snapshots, reconstrucción y compactación
+"""
+
+import sys
+import tempfile
+from pathlib import Path
+
+# Agregar la raíz del proyecto al path
+sys.path.append(str(Path(__file__).parent.parent.parent))
+
+from src.persistence.order_journal import (
+    OrderJournal, compactar_journals,
+    EVENTO_ITEM_AGREGADO, EVENTO_ITEM_ELIMINADO, EVENTO_PAGO_PROCESADO
+)
+
+
+def registrar_pedido_ejemplo(journal: OrderJournal):
+    """Registrar un pedido típico: agregar, eliminar y pagar"""
+    journal.registrar(EVENTO_ITEM_AGREGADO, {"item": "paella valenciana", "precio": 28000, "cantidad": 2})
+    journal.registrar(EVENTO_ITEM_AGREGADO, {"item": "flan de caramelo", "precio": 8000, "cantidad": 1})
+    journal.registrar(EVENTO_ITEM_ELIMINADO, {"indice": 0, "item": "paella valenciana", "precio": 28000})
+    journal.registrar(EVENTO_PAGO_PROCESADO, {"metodo": "efectivo", "total": 36000})
+
+
+def test_reconstruccion_desde_journal():
+    """El estado se reconstruye reproduciendo los eventos"""
+    with tempfile.TemporaryDirectory() as directorio:
+        journal = OrderJournal("sesion_test", directorio=directorio)
+        registrar_pedido_ejemplo(journal)
+        journal.cerrar()
+
+        recuperado = OrderJournal("sesion_test", directorio=directorio)
+        estado = recuperado.estado
+        recuperado.cerrar()
+
+        assert [i["item"] for i in estado.pedido] == ["paella valenciana", "flan de caramelo"]
+        assert estado.total == 36000
+        assert estado.pagado
+        assert estado.metodo_pago == "efectivo"
+        assert estado.ultimo_seq == 4
+
+
+def test_snapshot_y_compactacion():
+    """Snapshot + compactación descartan eventos sin cambiar el estado"""
+    with tempfile.TemporaryDirectory() as directorio:
+        journal = OrderJournal("sesion_snap", directorio=directorio, intervalo_snapshot=3)
+        registrar_pedido_ejemplo(journal)
+
+        # El snapshot automático cubre los 3 primeros eventos
+        assert journal.compactar() == 3
+        assert len(journal.eventos()) == 1
+        journal.cerrar()
+
+        recuperado = OrderJournal("sesion_snap", directorio=directorio)
+        assert recuperado.estado.total == 36000
+        assert recuperado.estado.pagado
+        recuperado.cerrar()
+
+        resultados = compactar_journals(directorio)
+        assert resultados == {"sesion_snap": 1}
+
+
+def test_compactacion_con_sesion_abierta():
+    """Compactar desde otra instancia no pierde eventos que el escritor agrega después"""
+    with tempfile.TemporaryDirectory() as directorio:
+        journal = OrderJournal("sesion_viva", directorio=directorio)
+        journal.registrar(EVENTO_ITEM_AGREGADO, {"item": "café", "precio": 4000, "cantidad": 1})
+        journal.registrar(EVENTO_ITEM_AGREGADO, {"item": "flan de caramelo", "precio": 8000, "cantidad": 1})
+
+        assert compactar_journals(directorio) == {"sesion_viva": 2}
+        journal.registrar(EVENTO_ITEM_AGREGADO, {"item": "helado de turrón", "precio": 7000, "cantidad": 1})
+        journal.cerrar()
+
+        recuperado = OrderJournal("sesion_viva", directorio=directorio)
+        assert recuperado.estado.total == 19000
+        assert recuperado.estado.ultimo_seq == 3
+        assert [e["seq"] for e in recuperado.eventos()] == [3]
+        recuperado.cerrar()
+
+
+def test_linea_truncada_se_ignora():
+    """Una escritura interrumpida al final del journal no impide recuperar"""
+    with tempfile.TemporaryDirectory() as directorio:
+        journal = OrderJournal("sesion_caida", directorio=directorio)
+        journal.registrar(EVENTO_ITEM_AGREGADO, {"item": "café", "precio": 4000, "cantidad": 1})
+        journal.cerrar()
+
+        with open(journal.journal_path, "a", encoding="utf-8") as f:
+            f.write('{"seq": 2, "tipo": "item_agreg')
+
+        recuperado = OrderJournal("sesion_caida", directorio=directorio)
+        assert recuperado.estado.total == 4000
+        assert recuperado.estado.ultimo_seq == 1
+        recuperado.cerrar()
+
+
+def test_eventos_posteriores_a_una_caida_se_conservan():
+    """Tras una línea truncada, lo registrado al reabrir sobrevive al siguiente reinicio"""
+    with tempfile.TemporaryDirectory() as directorio:
+        journal = OrderJournal("sesion_caida", directorio=directorio)
+        journal.registrar(EVENTO_ITEM_AGREGADO, {"item": "a", "precio": 1000, "cantidad": 1})
+        journal.registrar(EVENTO_ITEM_AGREGADO, {"item": "b", "precio": 1000, "cantidad": 1})
+        journal.cerrar()
+
+        with open(journal.journal_path, "a", encoding="utf-8") as f:
+            f.write('{"seq": 3, "tim')
+
+        reabierto = OrderJournal("sesion_caida", directorio=directorio)
+        reabierto.registrar(EVENTO_ITEM_AGREGADO, {"item": "c", "precio": 1000, "cantidad": 1})
+        reabierto.registrar(EVENTO_ITEM_AGREGADO, {"item": "d", "precio": 1000, "cantidad": 1})
+        reabierto.cerrar()
+
+        recuperado = OrderJournal("sesion_caida", directorio=directorio)
+        assert [i["item"] for i in recuperado.estado.pedido] == ["a", "b", "c", "d"]
+        assert [e["seq"] for e in recuperado.eventos()] == [1, 2, 3, 4]
+        recuperado.cerrar()
+
+
+def test_auditoria_por_tipo():
+    """Los eventos se pueden consultar por tipo sin parsear texto libre"""
+    with tempfile.TemporaryDirectory() as directorio:
+        journal = OrderJournal("sesion_audit", directorio=directorio)
+        registrar_pedido_ejemplo(journal)
+
+        pagos = journal.eventos(EVENTO_PAGO_PROCESADO)
+        journal.cerrar()
+
+        assert len(pagos) == 1
+        assert pagos[0]["datos"]["metodo"] == "efectivo"
+
+
+def main():
+    """Función principal"""
+    print("=== TEST JOURNAL DE PEDIDOS ===")
+    tests = [
+        test_reconstruccion_desde_journal,
+        test_snapshot_y_compactacion,
+        test_compactacion_con_sesion_abierta,
+        test_linea_truncada_se_ignora,
+        test_eventos_posteriores_a_una_caida_se_conservan,
+        test_auditoria_por_tipo
+    ]
+    for test in tests:
+        test()
+        print(f"[OK] {test.__name__}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,205 @@
+#!/usr/bin/env python3
+"""
+Test del Outbox Durable
+Idempotencia, avance de offsets y reproducción del backlog tras un corte
+"""
+
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+# Agregar la raíz del proyecto al path
+sys.path.append(str(Path(__file__).parent.parent.parent))
+
+from src.integrations.notion_integration import MAX_CARACTERES_RICH_TEXT, texto_enriquecido
+from src.integrations.notion_outbox import NotionOutboxClient
+from src.persistence.outbox import DurableOutbox, OutboxReplayer
+
+
+class ErrorNotion(Exception):
+    """Error de la API con su estado HTTP, como APIResponseError de notion_client"""
+
+    def __init__(self, status: int):
+        super().__init__(f"HTTP {status}")
+        self.status = status
+
+
+class ClienteNotionFalso:
+    """Registra los appends; puede simular que Notion está caído o con límite de tasa
+
+    Como Notion, rechaza con 400 los rich_text de más de 2000 caracteres.
+    """
+
+    def __init__(self, caido: bool = False, estado_error: int = None):
+        self.caido = caido
+        self.estado_error = estado_error
+        self.requests = []
+        self.blocks = self
+        self.children = self
+
+    def append(self, block_id, children):
+        if self.caido:
+            raise ConnectionError("Notion caído")
+        if self.estado_error:
+            raise ErrorNotion(self.estado_error)
+        for bloque in children:
+            for texto in bloque.get(bloque["type"], {}).get("rich_text", []):
+                if len(texto["text"]["content"]) > MAX_CARACTERES_RICH_TEXT:
+                    raise ErrorNotion(400)
+        self.requests.append((block_id, list(children)))
+
+
+def parrafo(texto: str) -> dict:
+    return {"object": "block", "type": "paragraph",
+            "paragraph": {"rich_text": [{"type": "text", "text": {"content": texto}}]}}
+
+
+def esperar(condicion, timeout: float = 5):
+    limite = time.monotonic() + timeout
+    while not condicion() and time.monotonic() < limite:
+        time.sleep(0.01)
+    return condicion()
+
+
+def test_claves_idempotentes_y_offset_parcial():
+    """Una clave repetida no se duplica y el offset avanza sólo hasta lo entregado"""
+    with tempfile.TemporaryDirectory() as directorio:
+        outbox = DurableOutbox(str(Path(directorio) / "outbox.db"))
+        assert outbox.agregar("notion", "turno-1", {"n": 1}) is not None
+        assert outbox.agregar("notion", "turno-1", {"n": 1}) is None
+        outbox.agregar("notion", "turno-2", {"n": 2})
+        outbox.agregar("notion", "turno-3", {"n": 3})
+
+        recibidos = []
+
+        def entregar(lote):
+            # El registro 3 falla: se entrega sólo lo anterior
+            entregables = [r for r in lote if r["payload"]["n"] != 3]
+            recibidos.extend(r["payload"]["n"] for r in entregables)
+            return len(entregables)
+
+        replicador = OutboxReplayer(outbox, {"notion": entregar}, intervalo=60, reintento=60)
+        esperar(lambda: replicador.estadisticas["fallos"] > 0)
+        replicador.reproducir(forzar=True)
+        assert recibidos == [1, 2]
+        assert outbox.cantidad_pendiente("notion") == 1
+        assert [r["clave"] for r in outbox.pendientes("notion")] == ["turno-3"]
+        # Ya entregada, la clave se sigue rechazando durante la retención
+        assert outbox.agregar("notion", "turno-1", {"n": 1}) is None
+        replicador.detener()
+        outbox.cerrar()
+
+
+def test_backlog_se_reproduce_al_reiniciar():
+    """Con Notion caído los registros sobreviven al cierre y se entregan en lote al reiniciar"""
+    with tempfile.TemporaryDirectory() as directorio:
+        ruta = str(Path(directorio) / "outbox.db")
+
+        caido = ClienteNotionFalso(caido=True)
+        cliente = NotionOutboxClient(caido, DurableOutbox(ruta), intervalo=60, reintento=60)
+        for i in range(60):
+            cliente.blocks.children.append(block_id="pagina", children=[parrafo(f"t{i}-a"), parrafo(f"t{i}-b")])
+        cliente.blocks.children.append(block_id="pagina", children=[parrafo("t59-a"), parrafo("t59-b")])
+        esperar(lambda: cliente.replicador.estadisticas["fallos"] > 0)
+        cliente.cerrar()
+
+        sano = ClienteNotionFalso()
+        cliente = NotionOutboxClient(sano, DurableOutbox(ruta), intervalo=60)
+        assert esperar(lambda: cliente.pendientes() == 0)
+        cliente.cerrar()
+
+        textos = [b["paragraph"]["rich_text"][0]["text"]["content"] for _, hijos in sano.requests for b in hijos]
+        assert textos == [f"t{i}-{x}" for i in range(60) for x in "ab"]
+        assert len(sano.requests) == 2
+        assert all(len(hijos) <= 100 for _, hijos in sano.requests)
+
+
+def test_rechazo_permanente_no_frena_la_cola():
+    """Un 4xx descarta sólo el registro culpable; un 429 o un 5xx se reintentan"""
+    with tempfile.TemporaryDirectory() as directorio:
+        ruta = str(Path(directorio) / "outbox.db")
+        notion = ClienteNotionFalso(estado_error=429)
+        cliente = NotionOutboxClient(notion, DurableOutbox(ruta), intervalo=60, reintento=60)
+        cliente.blocks.children.append(block_id="pagina", children=[parrafo("antes")])
+        cliente.blocks.children.append(block_id="pagina", children=[parrafo("x" * 2500)])
+        cliente.blocks.children.append(block_id="pagina", children=[parrafo("después")])
+        esperar(lambda: cliente.replicador.estadisticas["fallos"] > 0)
+        assert cliente.pendientes() == 3
+
+        notion.estado_error = 503
+        cliente.replicador.reproducir(forzar=True)
+        assert cliente.pendientes() == 3 and not cliente.outbox.descartados("notion")
+
+        notion.estado_error = None
+        cliente.replicador.reproducir(forzar=True)
+        assert cliente.pendientes() == 0
+        textos = [b["paragraph"]["rich_text"][0]["text"]["content"] for _, hijos in notion.requests for b in hijos]
+        assert textos == ["antes", "después"]
+        descartados = cliente.outbox.descartados("notion")
+        assert len(descartados) == 1 and "400" in descartados[0]["motivo"]
+        assert cliente.replicador.estadisticas["descartados"] == 1
+        cliente.cerrar()
+
+
+def test_un_solo_replicador_por_outbox():
+    """Varios procesos (aquí, instancias) sobre el mismo outbox no entregan dos veces lo mismo"""
+    with tempfile.TemporaryDirectory() as directorio:
+        ruta = str(Path(directorio) / "outbox.db")
+        caido = ClienteNotionFalso(caido=True)
+        cliente = NotionOutboxClient(caido, DurableOutbox(ruta), intervalo=60, reintento=60)
+        for i in range(20):
+            cliente.blocks.children.append(block_id="pagina", children=[parrafo(f"t{i}")])
+        cliente.cerrar()
+
+        class NotionLento(ClienteNotionFalso):
+            def append(self, block_id, children):
+                time.sleep(0.05)
+                super().append(block_id, children)
+
+        notion = NotionLento()
+        replicadores = [NotionOutboxClient(notion, DurableOutbox(ruta), intervalo=60, reintento=60)
+                        for _ in range(3)]
+        hilos = [threading.Thread(target=r.replicador.reproducir, kwargs={"forzar": True}) for r in replicadores]
+        for hilo in hilos:
+            hilo.start()
+        for hilo in hilos:
+            hilo.join()
+        assert all(esperar(lambda: r.pendientes() == 0) for r in replicadores)
+
+        textos = [b["paragraph"]["rich_text"][0]["text"]["content"] for _, hijos in notion.requests for b in hijos]
+        assert textos == [f"t{i}" for i in range(20)]
+        for r in replicadores:
+            r.cerrar()
+
+
+def test_texto_largo_en_fragmentos():
+    """Un texto largo (p. ej. una respuesta que cita el menú) se parte en rich_text aceptables"""
+    texto = "Menú: " + "paella 🥘 " * 400
+    fragmentos = texto_enriquecido(texto)
+    assert len(fragmentos) > 1
+    assert "".join(f["text"]["content"] for f in fragmentos) == texto
+    assert all(len(f["text"]["content"].encode("utf-16-le")) // 2 <= MAX_CARACTERES_RICH_TEXT for f in fragmentos)
+    assert texto_enriquecido("hola") == [{"type": "text", "text": {"content": "hola"}}]
+
+    notion = ClienteNotionFalso()
+    notion.append("pagina", [{"object": "block", "type": "paragraph", "paragraph": {"rich_text": fragmentos}}])
+    assert len(notion.requests) == 1
+
+
+def main():
+    test_claves_idempotentes_y_offset_parcial()
+    print("[OK] test_claves_idempotentes_y_offset_parcial")
+    test_backlog_se_reproduce_al_reiniciar()
+    print("[OK] test_backlog_se_reproduce_al_reiniciar")
+    test_rechazo_permanente_no_frena_la_cola()
+    print("[OK] test_rechazo_permanente_no_frena_la_cola")
+    test_un_solo_replicador_por_outbox()
+    print("[OK] test_un_solo_replicador_por_outbox")
+    test_texto_largo_en_fragmentos()
+    print("[OK] test_texto_largo_en_fragmentos")
+
+
+if __name__ == "__main__":
+    main()
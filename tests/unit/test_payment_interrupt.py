@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+"""
+Test del Pago como Interrupción del Grafo
+La sesión queda estacionada esperando el método de pago, sin input() ni hilo retenido
+"""
+
+import os
+import sys
+import asyncio
+import builtins
+import tempfile
+from pathlib import Path
+
+# Agregar la raíz del proyecto al path
+sys.path.append(str(Path(__file__).parent.parent.parent))
+
+os.environ.setdefault("ANONYMIZED_TELEMETRY", "False")
+
+from aiohttp.test_utils import TestClient, TestServer
+from langchain_core.messages import AIMessage, ToolMessage
+
+from config.settings import Settings
+from src.agents.local_chat_model import LocalChatModel, crear_embeddings_locales
+from src.agents.mozo_virtual_agent import MozoVirtualAgent
+from src.agents.session_state import TableSession
+from src.serving.server import RobinoServer
+
+# El módulo del agente activa LangSmith al importarse; el test corre sin red
+os.environ["LANGCHAIN_TRACING_V2"] = "false"
+
+
+def crear_agente() -> MozoVirtualAgent:
+    """Agente que agrega una paella, responde y luego pide pagar"""
+    guion = [
+        AIMessage(content="", tool_calls=[{"name": "agregar_al_pedido", "args": {"item": "paella valenciana"},
+                                           "id": "agregar"}]),
+        "Paella agregada.",
+        AIMessage(content="", tool_calls=[{"name": "procesar_pago", "args": {}, "id": "pagar"}]),
+        "¡Gracias por su pago!"
+    ]
+    agente = MozoVirtualAgent(llm=LocalChatModel(respuestas=guion), embedding_model=crear_embeddings_locales())
+    agente.registrar_intercambio = lambda query, respuesta, latencia=None: None
+    return agente
+
+
+def sin_input(*args):
+    raise AssertionError("procesar_pago no debe llamar a input()")
+
+
+def test_pago_estaciona_la_sesion_y_se_reanuda():
+    """El pago interrumpe el grafo; una respuesta inválida vuelve a preguntar y una válida lo completa"""
+    agente = crear_agente()
+    input_original = builtins.input
+    builtins.input = sin_input
+    original = Settings.JOURNAL_DIRECTORY
+    with tempfile.TemporaryDirectory() as directorio:
+        Settings.JOURNAL_DIRECTORY = directorio
+        try:
+            sesion = TableSession("mesa_pago")
+            agente.procesar_turno("una paella", sesion)
+
+            respuesta = agente.procesar_turno("quiero pagar", sesion)
+            assert "¿Cómo desea pagar?" in respuesta
+            assert sesion.pago_pendiente["total"] == 28000
+            assert not sesion.pagado
+
+            respuesta = agente.procesar_turno("con bitcoins", sesion)
+            assert "No entendí" in respuesta
+            assert sesion.pago_pendiente is not None
+
+            respuesta = agente.procesar_turno("con tarjeta", sesion)
+            assert respuesta == "¡Gracias por su pago!"
+            assert sesion.pago_pendiente is None
+            assert sesion.pagado
+            assert sesion.order_journal.estado.metodo_pago == "tarjeta de crédito/débito"
+
+            resultado = [m for m in sesion.historial if isinstance(m, ToolMessage) and m.tool_call_id == "pagar"]
+            assert len(resultado) == 1 and "PAGO PROCESADO" in resultado[0].content
+            # Los hilos de los turnos terminados no quedan en el checkpointer
+            assert not agente.checkpointer.storage
+            sesion.cerrar()
+        finally:
+            Settings.JOURNAL_DIRECTORY = original
+            builtins.input = input_original
+    agente.cerrar()
+
+
+def test_pago_junto_a_otra_herramienta():
+    """Al reanudar el pago no se repiten las herramientas pedidas en el mismo mensaje"""
+    guion = [
+        AIMessage(content="", tool_calls=[
+            {"name": "agregar_al_pedido", "args": {"item": "café"}, "id": "cafe"},
+            {"name": "procesar_pago", "args": {}, "id": "pagar"},
+        ]),
+        "Café agregado y pagado."
+    ]
+    agente = MozoVirtualAgent(llm=LocalChatModel(respuestas=guion), embedding_model=crear_embeddings_locales())
+    agente.registrar_intercambio = lambda query, respuesta, latencia=None: None
+    original = Settings.JOURNAL_DIRECTORY
+    with tempfile.TemporaryDirectory() as directorio:
+        Settings.JOURNAL_DIRECTORY = directorio
+        try:
+            sesion = TableSession("mesa_cafe")
+            respuesta = agente.procesar_turno("un café y la cuenta", sesion)
+            assert "¿Cómo desea pagar?" in respuesta
+            total = sesion.pago_pendiente["total"]
+            assert len(sesion.pedido_actual) == 1
+
+            assert agente.procesar_turno("efectivo", sesion) == "Café agregado y pagado."
+            assert len(sesion.pedido_actual) == 1 and sesion.total_pedido == total
+            eventos = [evento["tipo"] for evento in sesion.order_journal.eventos()]
+            assert eventos == ["item_agregado", "pago_procesado"]
+            assert sesion.order_journal.estado.total == total
+            sesion.cerrar()
+        finally:
+            Settings.JOURNAL_DIRECTORY = original
+    agente.cerrar()
+
+
+def test_endpoint_de_pago():
+    """POST /pago reanuda la sesión estacionada; sin pago pendiente responde 409"""
+    async def escenario():
+        agente = crear_agente()
+        async with TestClient(TestServer(RobinoServer(agente).crear_app())) as cliente:
+            session_id = (await (await cliente.post("/sesiones", json={})).json())["session_id"]
+
+            resp = await cliente.post(f"/sesiones/{session_id}/pago", json={"metodo": "1"})
+            assert resp.status == 409
+
+            await cliente.post(f"/sesiones/{session_id}/mensajes", json={"mensaje": "una paella"})
+            datos = await (await cliente.post(f"/sesiones/{session_id}/mensajes", json={"mensaje": "pagar"})).json()
+            assert datos["pago_pendiente"] is True
+
+            datos = await (await cliente.post(f"/sesiones/{session_id}/pago", json={"metodo": "1"})).json()
+            assert datos["pago_pendiente"] is False
+            assert datos["respuesta"] == "¡Gracias por su pago!"
+        agente.cerrar()
+
+    original = Settings.JOURNAL_DIRECTORY
+    with tempfile.TemporaryDirectory() as directorio:
+        Settings.JOURNAL_DIRECTORY = directorio
+        try:
+            asyncio.run(escenario())
+        finally:
+            Settings.JOURNAL_DIRECTORY = original
+
+
+def main():
+    test_pago_estaciona_la_sesion_y_se_reanuda()
+    print("[OK] test_pago_estaciona_la_sesion_y_se_reanuda")
+    test_pago_junto_a_otra_herramienta()
+    print("[OK] test_pago_junto_a_otra_herramienta")
+    test_endpoint_de_pago()
+    print("[OK] test_endpoint_de_pago")
+
+
+if __name__ == "__main__":
+    main()
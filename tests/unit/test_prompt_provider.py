@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+"""
+Test del Proveedor del Prompt de Sistema
+"""
+
+import os
+import sys
+import tempfile
+from datetime import datetime
+from pathlib import Path
+
+# Agregar la raíz del proyecto al path
+sys.path.append(str(Path(__file__).parent.parent.parent))
+
+from src.agents.prompt_provider import SystemPromptProvider
+
+
+def test_prompt_se_reutiliza_en_el_dia():
+    """Mismo objeto durante el día; nuevo render al cambiar de día"""
+    with tempfile.TemporaryDirectory() as directorio:
+        Path(directorio, "carta.txt").write_text("Paella $28.000", encoding="utf-8")
+        provider = SystemPromptProvider(directorio_menu=directorio, intervalo_version=3600)
+
+        lunes = provider.obtener(datetime(2025, 10, 20, 12, 0))
+        assert provider.obtener(datetime(2025, 10, 20, 23, 59)) is lunes
+        assert lunes.content.startswith(provider.prefijo_estable)
+        assert lunes.content.rstrip().endswith("FECHA ACTUAL: Lunes, 20/10/2025")
+
+        martes = provider.obtener(datetime(2025, 10, 21, 0, 1))
+        assert martes is not lunes
+        assert "Martes, 21/10/2025" in martes.content
+        assert provider.renderizados == 2
+
+
+def test_cambio_de_menu_invalida_el_prompt():
+    """Al modificarse el menú se vuelve a renderizar"""
+    with tempfile.TemporaryDirectory() as directorio:
+        carta = Path(directorio, "carta.txt")
+        carta.write_text("Paella $28.000", encoding="utf-8")
+        provider = SystemPromptProvider(directorio_menu=directorio, intervalo_version=0)
+        ahora = datetime(2025, 10, 20, 12, 0)
+
+        antes = provider.obtener(ahora)
+        carta.write_text("Paella $30.000 - nueva temporada", encoding="utf-8")
+        os.utime(carta, ns=(0, 10 ** 18))
+
+        assert provider.obtener(ahora) is not antes
+        assert provider.renderizados == 2
+
+
+def main():
+    """Función principal"""
+    print("=== TEST PROMPT PROVIDER ===")
+    for test in [test_prompt_se_reutiliza_en_el_dia, test_cambio_de_menu_invalida_el_prompt]:
+        test()
+        print(f"[OK] {test.__name__}")
+
+
+if __name__ == "__main__":
+    main()
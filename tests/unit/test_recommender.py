@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Test del Motor de Recomendaciones
+"""
+
+import sys
+import time
+from pathlib import Path
+
+# Agregar la raíz del proyecto al path
+sys.path.append(str(Path(__file__).parent.parent.parent))
+
+from src.agents.keyword_matcher import extraer_preferencias
+from src.agents.local_chat_model import crear_embeddings_locales
+from src.agents.recommender import RecommendationEngine, parsear_menu, COLUMNAS, INDICE
+
+
+def test_parsear_menu_y_rasgos():
+    """El menú se convierte en platos con categoría, precio y rasgos dietarios"""
+    motor = RecommendationEngine.desde_menu()
+    platos = {plato["nombre"]: plato for plato in motor.platos}
+    assert platos["Solomillo de Ternera"]["precio"] == 35000
+    assert platos["Solomillo de Ternera"]["categoria"] == "carnes"
+    assert platos["Rioja Reserva (copa)"]["categoria"] == "bebidas"
+    assert platos["Cocido Madrileño"]["categoria"] == "especialidades"
+    assert len(motor.nombres) == len(set(n.lower() for n in motor.nombres))
+
+    fila = motor.nombres.index("Patatas Bravas")
+    assert motor.matriz[fila, INDICE["vegetariano"]] == 1.0
+    assert motor.matriz[motor.nombres.index("Merluza a la Plancha"), INDICE["pescados_mariscos"]] == 1.0
+    assert motor.matriz.shape == (len(motor.platos), len(COLUMNAS))
+
+    otros = parsear_menu("POSTRES:\n• Flan - $8.000\n  Flan casero\n• Flan - $9.000\n")
+    assert otros == [{"nombre": "Flan", "categoria": "postres", "precio": 8000, "descripcion": "Flan casero"}]
+
+
+def test_recomendaciones_segun_preferencias():
+    """Cada perfil obtiene platos acordes, con explicación"""
+    motor = RecommendationEngine.desde_menu()
+
+    romantica = motor.recomendar(extraer_preferencias("Cena romántica con mi pareja"))
+    assert romantica[0]["nombre"] == "Solomillo de Ternera"
+    assert "ocasión especial" in romantica[0]["explicacion"]
+
+    vegetariana = motor.recomendar(extraer_preferencias("Soy vegetariano"), cantidad=5)
+    assert all(motor.matriz[motor.nombres.index(r["nombre"]), INDICE["vegetariano"]] for r in vegetariana)
+
+    economica = motor.recomendar(extraer_preferencias("algo barato"))
+    assert all(r["precio"] <= 9000 for r in economica)
+
+    textos = motor.recomendar_textos(extraer_preferencias("comida de negocio con pescado"))
+    assert len(textos) == 3 and all(" - " in texto for texto in textos)
+    assert motor.recomendar({}) and RecommendationEngine([]).recomendar({}) == []
+
+
+def test_embeddings_opcionales():
+    """Con modelo de embeddings la similitud con la consulta suma al puntaje"""
+    motor = RecommendationEngine.desde_menu(embedding_model=crear_embeddings_locales())
+    preferencias = extraer_preferencias("algo para compartir")
+    con_consulta = motor.puntajes(preferencias, "Paella Valenciana")
+    sin_consulta = motor.puntajes(preferencias)
+    assert con_consulta.shape == sin_consulta.shape
+    assert (con_consulta != sin_consulta).any()
+    assert len(motor.recomendar(preferencias, consulta="Paella Valenciana")) == 3
+
+
+def test_miles_de_platos_en_menos_de_un_milisegundo():
+    """Puntuar y elegir el top-N sobre miles de platos es una operación vectorizada"""
+    base = RecommendationEngine.desde_menu().platos
+    platos = [dict(base[i % len(base)], nombre=f"{base[i % len(base)]['nombre']} {i}",
+                   precio=base[i % len(base)]["precio"] + i) for i in range(5000)]
+    motor = RecommendationEngine(platos)
+    preferencias = extraer_preferencias("cena romántica con vino, algo premium")
+
+    motor.recomendar(preferencias)
+    repeticiones = 200
+    inicio = time.perf_counter()
+    for _ in range(repeticiones):
+        motor.recomendar(preferencias)
+    promedio = (time.perf_counter() - inicio) / repeticiones
+    assert promedio < 0.001, f"{promedio * 1000:.3f} ms por recomendación"
+
+
+def main():
+    """Función principal"""
+    print("=== TEST RECOMMENDER ===")
+    for test in [test_parsear_menu_y_rasgos,
+                 test_recomendaciones_segun_preferencias,
+                 test_embeddings_opcionales,
+                 test_miles_de_platos_en_menos_de_un_milisegundo]:
+        test()
+        print(f"[OK] {test.__name__}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+"""
+Test del Almacén de Informes
+Escritura JSONL indexada, escaneo por rango, reparación e importación legacy
+"""
+
+import json
+import sys
+import tempfile
+import threading
+from datetime import datetime, timedelta
+from pathlib import Path
+
+# Agregar la raíz del proyecto al path
+sys.path.append(str(Path(__file__).parent.parent.parent))
+
+from src.persistence.report_store import ReportStore
+from src.persistence.report_history import ReportHistory
+
+
+def informe(dia: int, ocasion: str, consulta: str = "cena") -> dict:
+    fecha = datetime(2025, 10, 1) + timedelta(days=dia)
+    return {
+        "timestamp": fecha.strftime("%Y-%m-%d %H:%M:%S"),
+        "tipo": "recomendacion_completa",
+        "consulta_original": consulta,
+        "analisis_realizado": {"documentos_revisados": 3, "preferencias_detectadas": {"ocasion": ocasion},
+                               "recomendaciones_generadas": 1},
+        "recomendaciones": ["Paella de Mariscos"],
+        "justificacion": "Plato popular"
+    }
+
+
+def test_rango_por_fecha_y_ocasion():
+    """El índice resuelve rangos de fechas y filtros por ocasión"""
+    with tempfile.TemporaryDirectory() as directorio:
+        almacen = ReportStore(directorio)
+        for dia in range(30):
+            almacen.agregar(informe(dia, "romantica" if dia % 3 == 0 else "familiar", f"consulta {dia}"))
+
+        semana = list(almacen.rango(datetime(2025, 10, 8), datetime(2025, 10, 15)))
+        assert [i["consulta_original"] for i in semana] == [f"consulta {d}" for d in range(7, 14)]
+
+        romanticas = list(almacen.rango(ocasion="romantica"))
+        assert len(romanticas) == 10
+        assert almacen.contar_por_ocasion() == {"romantica": 10, "familiar": 20}
+        assert almacen.obtener(-1)["consulta_original"] == "consulta 29"
+        assert [i["consulta_original"] for i in almacen.ultimos(2)] == ["consulta 28", "consulta 29"]
+
+        # Una línea JSON por informe
+        lineas = (Path(directorio) / "informes.jsonl").read_text(encoding="utf-8").splitlines()
+        assert len(lineas) == 30 and json.loads(lineas[5])["consulta_original"] == "consulta 5"
+        almacen.cerrar()
+
+
+def test_reabrir_y_reparar_indice():
+    """Al reabrir se usa el índice; si falta una entrada o hay una línea cortada se repara"""
+    with tempfile.TemporaryDirectory() as directorio:
+        almacen = ReportStore(directorio)
+        for dia in range(5):
+            almacen.agregar(informe(dia, "negocio"))
+        almacen.cerrar()
+
+        # Simular un corte: índice sin su última entrada y una línea incompleta en los datos
+        indice = Path(directorio) / "informes.idx"
+        indice.write_bytes(indice.read_bytes()[:-10])
+        with open(Path(directorio) / "informes.jsonl", "ab") as f:
+            f.write(b'{"timestamp": "2025-10-')
+
+        almacen = ReportStore(directorio)
+        assert len(almacen) == 5
+        almacen.agregar(informe(10, "familiar", "después del corte"))
+        almacen.cerrar()
+
+        almacen = ReportStore(directorio)
+        assert len(almacen) == 6
+        assert almacen.obtener(5)["consulta_original"] == "después del corte"
+        almacen.cerrar()
+
+
+def test_varios_escritores():
+    """Dos instancias sobre el mismo almacén: offsets correctos y cada una ve los informes de la otra"""
+    with tempfile.TemporaryDirectory() as directorio:
+        almacenes = [ReportStore(directorio), ReportStore(directorio)]
+
+        def escribir(almacen: ReportStore, nombre: str):
+            for i in range(50):
+                almacen.agregar(informe(i % 28, "familiar", f"{nombre} {i}"))
+
+        hilos = [threading.Thread(target=escribir, args=(a, n)) for a, n in zip(almacenes, ("a", "b"))]
+        for hilo in hilos:
+            hilo.start()
+        for hilo in hilos:
+            hilo.join()
+
+        esperadas = sorted(f"{n} {i}" for n in ("a", "b") for i in range(50))
+        for almacen in almacenes:
+            assert len(almacen) == 100
+            assert sorted(almacen.obtener(i)["consulta_original"] for i in range(100)) == esperadas
+            almacen.cerrar()
+
+        # Al reabrir el índice coincide con los datos: no hace falta repararlo
+        reabierto = ReportStore(directorio)
+        assert sorted(i["consulta_original"] for i in reabierto.ultimos(100)) == esperadas
+        reabierto.cerrar()
+
+
+def test_importar_legacy():
+    """El formato anterior (JSON indentado concatenado) se importa completo"""
+    with tempfile.TemporaryDirectory() as directorio:
+        legacy = Path(directorio) / "informes_robino.json"
+        with open(legacy, "w", encoding="utf-8") as f:
+            for dia in range(3):
+                f.write(json.dumps(informe(dia, "romantica"), ensure_ascii=False, indent=2) + "\n")
+
+        almacen = ReportStore(str(Path(directorio) / "store"))
+        assert almacen.importar_legacy(str(legacy)) == 3
+        assert len(list(almacen.rango(ocasion="romantica"))) == 3
+        almacen.cerrar()
+
+
+def test_historial_acotado_lee_del_disco():
+    """El historial guarda sólo los recientes en memoria y pagina los viejos desde el almacén"""
+    with tempfile.TemporaryDirectory() as directorio:
+        historial = ReportHistory(ReportStore(directorio), capacidad=5)
+        for dia in range(20):
+            historial.append(informe(dia, "romantica" if dia % 2 else "familiar", f"consulta {dia}"))
+
+        assert len(historial) == 20 and len(historial.recientes()) == 5
+        assert historial[-1]["consulta_original"] == "consulta 19"
+        assert historial[2]["consulta_original"] == "consulta 2"  # fuera del anillo: desde disco
+        assert [i["consulta_original"] for i in historial.ultimos(3)] == ["consulta 17", "consulta 18", "consulta 19"]
+        assert len(historial.ultimos(8)) == 8
+        assert [i["consulta_original"] for i in historial][:2] == ["consulta 0", "consulta 1"]
+        assert len(list(historial.rango(datetime(2025, 10, 1), datetime(2025, 10, 5), "familiar"))) == 2
+        try:
+            historial[20]
+            assert False, "Se esperaba IndexError"
+        except IndexError:
+            pass
+
+        # Un proceso nuevo ve el historial completo aunque arranque con el anillo vacío
+        historial.store.cerrar()
+        reabierto = ReportHistory(ReportStore(directorio), capacidad=5)
+        assert len(reabierto) == 20 and reabierto[-1]["consulta_original"] == "consulta 19"
+        reabierto.store.cerrar()
+
+
+def main():
+    test_rango_por_fecha_y_ocasion()
+    print("[OK] test_rango_por_fecha_y_ocasion")
+    test_reabrir_y_reparar_indice()
+    print("[OK] test_reabrir_y_reparar_indice")
+    test_varios_escritores()
+    print("[OK] test_varios_escritores")
+    test_importar_legacy()
+    print("[OK] test_importar_legacy")
+    test_historial_acotado_lee_del_disco()
+    print("[OK] test_historial_acotado_lee_del_disco")
+
+
+if __name__ == "__main__":
+    main()
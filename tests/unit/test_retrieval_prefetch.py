@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+"""
+Test de la Búsqueda Especulativa en el Menú
+La búsqueda del mensaje corre en paralelo con la primera llamada al LLM
+"""
+
+import os
+import sys
+import time
+import tempfile
+from pathlib import Path
+
+# Agregar la raíz del proyecto al path
+sys.path.append(str(Path(__file__).parent.parent.parent))
+
+os.environ.setdefault("ANONYMIZED_TELEMETRY", "False")
+
+from langchain_core.messages import AIMessage, ToolMessage
+
+from config.settings import Settings
+from src.agents.local_chat_model import LocalChatModel, crear_embeddings_locales
+from src.agents.mozo_virtual_agent import MozoVirtualAgent
+from src.agents.retrieval_prefetch import consulta_de_menu_probable, consultas_compatibles
+from src.agents.session_state import TableSession
+
+# El módulo del agente activa LangSmith al importarse; el test corre sin red
+os.environ["LANGCHAIN_TRACING_V2"] = "false"
+
+
+class RetrieverLento:
+    """Retriever que cuenta las búsquedas y demora cada una"""
+
+    def __init__(self, retriever, demora: float = 0.0):
+        self.retriever = retriever
+        self.demora = demora
+        self.consultas = []
+        self.documentos = []
+
+    def invoke(self, consulta):
+        self.consultas.append(consulta)
+        time.sleep(self.demora)
+        self.documentos = self.retriever.invoke(consulta)
+        return self.documentos
+
+
+def consulta_menu(query: str) -> AIMessage:
+    return AIMessage(content="", tool_calls=[{"name": "consultar_menu", "args": {"query": query}, "id": "menu"}])
+
+
+def crear_agente(guion, latencia: float = 0.0, demora: float = 0.0):
+    agente = MozoVirtualAgent(llm=LocalChatModel(respuestas=guion, latencia=latencia),
+                              embedding_model=crear_embeddings_locales())
+    agente.registrar_intercambio = lambda query, respuesta, latencia=None: None
+    agente.prefetcher.retriever = RetrieverLento(agente.prefetcher.retriever, demora)
+    return agente
+
+
+def turno(agente: MozoVirtualAgent, query: str) -> TableSession:
+    original = Settings.JOURNAL_DIRECTORY
+    with tempfile.TemporaryDirectory() as directorio:
+        Settings.JOURNAL_DIRECTORY = directorio
+        try:
+            sesion = TableSession("mesa_prefetch")
+            agente.procesar_turno(query, sesion)
+            sesion.cerrar()
+        finally:
+            Settings.JOURNAL_DIRECTORY = original
+    return sesion
+
+
+def test_consultas_compatibles():
+    """La consulta del modelo debe estar contenida en el mensaje del cliente"""
+    mensaje = "¿Cuánto cuesta la Paella Valenciana?"
+    assert consultas_compatibles(mensaje, "precio paella valenciana", minimo=0.5)
+    assert consultas_compatibles(mensaje, "paella valenciana")
+    assert not consultas_compatibles(mensaje, "horarios del restaurante")
+    assert not consultas_compatibles(mensaje, "menú")
+
+
+def test_acierto_reutiliza_la_busqueda():
+    """Con una consulta compatible consultar_menu no vuelve a buscar"""
+    agente = crear_agente([consulta_menu("paella valenciana"), "La paella cuesta $28.000."])
+    sesion = turno(agente, "¿Cuánto cuesta la paella valenciana?")
+
+    assert agente.prefetcher.retriever.consultas == ["¿Cuánto cuesta la paella valenciana?"]
+    # El historial compacta las salidas ya respondidas: se mira lo que recibió el modelo
+    salida = next(m for m in agente.llm.llamadas[-1] if isinstance(m, ToolMessage))
+    assert salida.content == "\n\n".join(d.page_content for d in agente.prefetcher.retriever.documentos)
+    assert sesion.prefetch is None
+    estadisticas = agente.prefetcher.estadisticas()
+    assert estadisticas["aciertos"] == 1 and estadisticas["tasa_aciertos"] == 1.0
+    agente.prefetcher.cerrar()
+
+
+def test_fallo_y_turno_sin_menu_descartan_la_busqueda():
+    """Una consulta incompatible busca de nuevo; un turno sin consultar_menu descarta la especulativa"""
+    agente = crear_agente([consulta_menu("horarios de atención"), "Abrimos a las 12:00.", "¡Hola!"])
+    turno(agente, "¿Cuánto cuesta la paella valenciana?")
+    assert agente.prefetcher.retriever.consultas[-1] == "horarios de atención"
+
+    sesion = turno(agente, "¿Qué postres tienen?")
+    assert sesion.prefetch is None
+    estadisticas = agente.prefetcher.estadisticas()
+    assert estadisticas["iniciados"] == 2
+    assert estadisticas["fallos"] == 1 and estadisticas.get("aciertos", 0) == 0
+    assert estadisticas["cancelados"] == 2
+    agente.prefetcher.cerrar()
+
+
+def test_turnos_sin_consulta_al_menu_no_especulan():
+    """Saludos y pedidos de la cuenta no lanzan la búsqueda; se cuentan como omitidos"""
+    assert consulta_de_menu_probable("¿Cuánto cuesta la paella valenciana?")
+    assert consulta_de_menu_probable("¿Me mostrás la carta?")
+    assert not consulta_de_menu_probable("Hola, buenas noches")
+    assert not consulta_de_menu_probable("La cuenta, por favor")
+
+    agente = crear_agente(["¡Hola!"])
+    turno(agente, "Hola, buenas noches")
+    turno(agente, "La cuenta, por favor")
+    assert agente.prefetcher.retriever.consultas == []
+    estadisticas = agente.prefetcher.estadisticas()
+    assert estadisticas["omitidos"] == 2 and estadisticas.get("iniciados", 0) == 0
+    agente.prefetcher.cerrar()
+
+
+def test_busqueda_en_paralelo_con_el_llm():
+    """La búsqueda lenta se solapa con la primera llamada al LLM y el ahorro se registra"""
+    agente = crear_agente([consulta_menu("paella valenciana"), "La paella cuesta $28.000."],
+                          latencia=0.2, demora=0.2)
+    inicio = time.perf_counter()
+    turno(agente, "¿Cuánto cuesta la paella valenciana?")
+    duracion = time.perf_counter() - inicio
+
+    # Dos llamadas al LLM (0,4 s) y la búsqueda (0,2 s) solapada con la primera
+    assert duracion < 0.55, f"{duracion:.2f} s"
+    assert agente.prefetcher.estadisticas()["ahorro_ms"]["p50"] > 100
+    agente.prefetcher.cerrar()
+
+
+def main():
+    """Función principal"""
+    print("=== TEST RETRIEVAL PREFETCH ===")
+    for test in [test_consultas_compatibles,
+                 test_acierto_reutiliza_la_busqueda,
+                 test_fallo_y_turno_sin_menu_descartan_la_busqueda,
+                 test_turnos_sin_consulta_al_menu_no_especulan,
+                 test_busqueda_en_paralelo_con_el_llm]:
+        test()
+        print(f"[OK] {test.__name__}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+"""
+Test del Servidor Async del Mozo Virtual
+Levanta la app aiohttp en memoria con un modelo local (sin red)
+"""
+
+import os
+import sys
+import json
+import asyncio
+import tempfile
+from pathlib import Path
+
+# Agregar la raíz del proyecto al path
+sys.path.append(str(Path(__file__).parent.parent.parent))
+
+os.environ.setdefault("ANONYMIZED_TELEMETRY", "False")
+
+from aiohttp.test_utils import TestClient, TestServer
+
+from config.settings import Settings
+from src.agents.mozo_virtual_agent import MozoVirtualAgent
+from src.agents.local_chat_model import LocalChatModel, crear_embeddings_locales
+from src.serving.server import RobinoServer
+
+# El módulo del agente activa LangSmith al importarse; el test corre sin red
+os.environ["LANGCHAIN_TRACING_V2"] = "false"
+
+
+def crear_agente(latencia: float = 0.0) -> MozoVirtualAgent:
+    """Agente con modelo local; el guardado de intercambios queda en memoria"""
+    agente = MozoVirtualAgent(
+        llm=LocalChatModel(latencia=latencia),
+        embedding_model=crear_embeddings_locales()
+    )
+    agente.intercambios = []
+    agente.registrar_intercambio = lambda query, respuesta, latencia=None: agente.intercambios.append((query, respuesta))
+    return agente
+
+
+def ejecutar(test):
+    """Ejecutar un test async con los journals en un directorio temporal"""
+    def wrapper():
+        original = Settings.JOURNAL_DIRECTORY
+        with tempfile.TemporaryDirectory() as directorio:
+            Settings.JOURNAL_DIRECTORY = directorio
+            try:
+                asyncio.run(test())
+            finally:
+                Settings.JOURNAL_DIRECTORY = original
+    wrapper.__name__ = test.__name__
+    return wrapper
+
+
+@ejecutar
+async def test_mensajes_y_streaming_por_sesion():
+    """Respuesta completa, SSE y cierre de sesión"""
+    agente = crear_agente()
+    async with TestClient(TestServer(RobinoServer(agente).crear_app())) as cliente:
+        resp = await cliente.post("/sesiones", json={})
+        session_id = (await resp.json())["session_id"]
+        assert resp.status == 201
+
+        resp = await cliente.post(f"/sesiones/{session_id}/mensajes", json={"mensaje": "hola"})
+        datos = await resp.json()
+        assert "hola" in datos["respuesta"]
+
+        resp = await cliente.post(f"/sesiones/{session_id}/stream", json={"mensaje": "la carta"})
+        cuerpo = await resp.text()
+        tokens = [json.loads(linea[len("data: "):]) for linea in cuerpo.splitlines()
+                  if linea.startswith("data: ") and not linea.startswith("data: {")]
+        assert len(tokens) > 1
+        assert "la carta" in "".join(tokens)
+
+        resp = await cliente.post(f"/sesiones/{session_id}/mensajes", json={})
+        assert resp.status == 400
+
+        resp = await cliente.delete(f"/sesiones/{session_id}")
+        assert resp.status == 200
+        resp = await cliente.post(f"/sesiones/{session_id}/mensajes", json={"mensaje": "hola"})
+        assert resp.status == 404
+
+    assert len(agente.intercambios) == 2
+
+
+@ejecutar
+async def test_websocket_y_sesiones_concurrentes():
+    """Muchas mesas a la vez sobre un solo loop, sin mezclar historiales"""
+    agente = crear_agente(latencia=0.05)
+    async with TestClient(TestServer(RobinoServer(agente).crear_app())) as cliente:
+        async def mesa(i: int) -> str:
+            resp = await cliente.post("/sesiones", json={})
+            session_id = (await resp.json())["session_id"]
+            resp = await cliente.post(f"/sesiones/{session_id}/mensajes", json={"mensaje": f"mesa {i}"})
+            return (await resp.json())["respuesta"]
+
+        respuestas = await asyncio.gather(*(mesa(i) for i in range(20)))
+        for i, respuesta in enumerate(respuestas):
+            assert f"mesa {i}'" in respuesta
+
+        resp = await cliente.post("/sesiones", json={})
+        session_id = (await resp.json())["session_id"]
+        ws = await cliente.ws_connect(f"/sesiones/{session_id}/ws")
+        await ws.send_json({"mensaje": "quiero postre"})
+        tokens = []
+        while True:
+            evento = await ws.receive_json()
+            if evento["tipo"] == "fin":
+                break
+            tokens.append(evento["texto"])
+        await ws.close()
+        assert "".join(tokens) == evento["respuesta"]
+
+        metricas = await (await cliente.get("/metricas")).json()
+        assert metricas["sesiones_activas"] == 21
+        assert metricas["latencias"]["turno"]["muestras"] == 21
+
+
+@ejecutar
+async def test_cuerpos_invalidos_y_cierre_durante_un_turno():
+    """JSON mal formado responde 400; un turno que espera el cierre de su sesión responde 404"""
+    agente = crear_agente(latencia=0.2)
+    async with TestClient(TestServer(RobinoServer(agente).crear_app())) as cliente:
+        resp = await cliente.post("/sesiones", data="{no es json", headers={"Content-Type": "application/json"})
+        assert resp.status == 400
+        resp = await cliente.post("/sesiones", json=["mesa"])
+        assert resp.status == 400
+
+        resp = await cliente.post("/sesiones", json={})
+        session_id = (await resp.json())["session_id"]
+        resp = await cliente.post(f"/sesiones/{session_id}/mensajes", data="{no es json")
+        assert resp.status == 400
+        resp = await cliente.post(f"/sesiones/{session_id}/pago", json={})
+        assert resp.status == 400
+
+        async def mensaje_tardio():
+            await asyncio.sleep(0.05)
+            return await cliente.post(f"/sesiones/{session_id}/mensajes", json={"mensaje": "otra cosa"})
+
+        en_curso, cierre, tardio = await asyncio.gather(
+            cliente.post(f"/sesiones/{session_id}/mensajes", json={"mensaje": "hola"}),
+            cliente.delete(f"/sesiones/{session_id}"),
+            mensaje_tardio()
+        )
+        assert (en_curso.status, cierre.status, tardio.status) == (200, 200, 404)
+        assert (await cliente.delete(f"/sesiones/{session_id}")).status == 404
+
+    assert [query for query, _ in agente.intercambios] == ["hola"]
+    # Al apagar el servidor se cierra el agente: la cola de persistencia queda detenida
+    assert agente.escritor_conversaciones._cerrada
+
+
+def main():
+    """Función principal"""
+    print("=== TEST SERVIDOR ===")
+    for test in [test_mensajes_y_streaming_por_sesion, test_websocket_y_sesiones_concurrentes,
+                 test_cuerpos_invalidos_y_cierre_durante_un_turno]:
+        test()
+        print(f"[OK] {test.__name__}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+"""
+Test del Gestor de Sesiones Concurrentes
+Usa un agente local que simula la latencia del LLM sin llamadas de red
+"""
+
+import sys
+import time
+import tempfile
+import threading
+from contextlib import nullcontext
+from pathlib import Path
+
+# Agregar la raíz del proyecto al path
+sys.path.append(str(Path(__file__).parent.parent.parent))
+
+from config.settings import Settings
+from src.serving.session_manager import SessionManager
+
+
+class AgenteLocal:
+    """Agente de prueba: respeta el límite de LLM y mide la concurrencia alcanzada"""
+
+    def __init__(self, latencia: float = 0.02):
+        self.latencia = latencia
+        self.limite_llm = nullcontext()
+        self.en_vuelo = 0
+        self.max_en_vuelo = 0
+        self._lock = threading.Lock()
+        self._contador = 0
+
+    def generar_session_id(self) -> str:
+        with self._lock:
+            self._contador += 1
+            return f"mesa_{self._contador}"
+
+    def procesar_turno(self, query: str, sesion) -> str:
+        with sesion.lock:
+            with self.limite_llm:
+                with self._lock:
+                    self.en_vuelo += 1
+                    self.max_en_vuelo = max(self.max_en_vuelo, self.en_vuelo)
+                time.sleep(self.latencia)
+                with self._lock:
+                    self.en_vuelo -= 1
+            sesion.historial.append(query)
+            return f"{sesion.session_id}: {query}"
+
+    def finalizar_sesion(self, sesion):
+        sesion.cerrar()
+
+
+def con_journal_temporal(test):
+    """Redirigir los journals de pedido a un directorio temporal"""
+    def wrapper():
+        original = Settings.JOURNAL_DIRECTORY
+        with tempfile.TemporaryDirectory() as directorio:
+            Settings.JOURNAL_DIRECTORY = directorio
+            try:
+                test()
+            finally:
+                Settings.JOURNAL_DIRECTORY = original
+    wrapper.__name__ = test.__name__
+    return wrapper
+
+
+@con_journal_temporal
+def test_sesiones_en_paralelo_respetan_limite_llm():
+    """Muchas mesas en paralelo sin superar el límite global de LLM"""
+    agente = AgenteLocal()
+    manager = SessionManager(agent=agente, modo="thread", max_workers=8, max_llm_concurrentes=3)
+
+    guiones = {f"mesa_{i}": ["hola", "la carta", "la cuenta"] for i in range(12)}
+    respuestas = manager.ejecutar_sesiones(guiones)
+    metricas = manager.obtener_metricas()
+    manager.cerrar()
+
+    assert respuestas["mesa_5"] == ["mesa_5: hola", "mesa_5: la carta", "mesa_5: la cuenta"]
+    assert agente.max_en_vuelo <= 3
+    assert metricas["sesiones_completadas"] == 12
+    assert metricas["turnos"] == 36
+    assert metricas["sesiones_por_segundo"] > 0
+    assert metricas["latencia_turno"]["muestras"] == 36
+
+
+@con_journal_temporal
+def test_turnos_de_una_mesa_no_se_pisan():
+    """Los turnos concurrentes de una misma mesa se ejecutan de a uno sin perderse"""
+    agente = AgenteLocal(latencia=0.005)
+    manager = SessionManager(agent=agente, modo="thread", max_workers=4, max_llm_concurrentes=4)
+
+    session_id = manager.crear_sesion("Ana")
+    futuros = [manager.enviar_mensaje(session_id, f"mensaje {i}") for i in range(10)]
+    for futuro in futuros:
+        futuro.result()
+
+    historial = list(manager.sesiones[session_id].historial)
+    manager.cerrar()
+
+    assert historial == [f"mensaje {i}" for i in range(10)]
+    assert manager.obtener_metricas()["sesiones_completadas"] == 1
+
+
+@con_journal_temporal
+def test_una_mesa_no_acapara_el_pool_y_cerrar_rechaza_turnos():
+    """Los turnos encolados de una mesa no ocupan hilos de otras; tras cerrar se rechazan"""
+    agente = AgenteLocal(latencia=0.05)
+    manager = SessionManager(agent=agente, modo="thread", max_workers=2, max_llm_concurrentes=2)
+
+    ocupada = manager.crear_sesion("Ana")
+    libre = manager.crear_sesion("Luis")
+    encolados = [manager.enviar_mensaje(ocupada, f"mensaje {i}") for i in range(6)]
+    inicio = time.perf_counter()
+    assert manager.enviar_mensaje(libre, "hola").result() == f"{libre}: hola"
+    assert time.perf_counter() - inicio < 0.2
+
+    manager.cerrar_sesion(ocupada)
+    rechazados = 0
+    for futuro in encolados:
+        try:
+            futuro.result()
+        except KeyError:
+            rechazados += 1
+    assert rechazados > 0
+    try:
+        manager.enviar_mensaje(ocupada, "otro")
+        raise AssertionError("Una sesión cerrada no debe aceptar turnos")
+    except KeyError:
+        pass
+    manager.cerrar()
+
+
+def main():
+    """Función principal"""
+    print("=== TEST SESSION MANAGER ===")
+    for test in [test_sesiones_en_paralelo_respetan_limite_llm, test_turnos_de_una_mesa_no_se_pisan,
+                 test_una_mesa_no_acapara_el_pool_y_cerrar_rechaza_turnos]:
+        test()
+        print(f"[OK] {test.__name__}")
+
+
+if __name__ == "__main__":
+    main()
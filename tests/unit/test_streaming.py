@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""
+Test del Streaming de Respuestas
+Verifica que solo se emitan los tokens de la respuesta final del agente
+"""
+
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+# Agregar la raíz del proyecto al path
+sys.path.append(str(Path(__file__).parent.parent.parent))
+
+os.environ.setdefault("ANONYMIZED_TELEMETRY", "False")
+
+from langchain_core.messages import AIMessage
+
+from config.settings import Settings
+from src.agents.mozo_virtual_agent import MozoVirtualAgent
+from src.agents.local_chat_model import LocalChatModel, crear_embeddings_locales
+from src.agents.session_state import TableSession
+
+# El módulo del agente activa LangSmith al importarse; el test corre sin red
+os.environ["LANGCHAIN_TRACING_V2"] = "false"
+
+
+def test_stream_oculta_llamadas_a_herramientas():
+    """El paso de tool call no se emite; la respuesta final llega en varios tokens"""
+    llm = LocalChatModel(respuestas=[
+        AIMessage(content="", tool_calls=[{
+            "name": "agregar_al_pedido",
+            "args": {"item": "flan de caramelo", "cantidad": 1},
+            "id": "llamada_1"
+        }]),
+        "Listo, agregué un flan de caramelo a tu pedido."
+    ])
+    agente = MozoVirtualAgent(llm=llm, embedding_model=crear_embeddings_locales())
+    intercambios = []
+    agente.registrar_intercambio = lambda query, respuesta, latencia=None: intercambios.append((query, respuesta))
+
+    original = Settings.JOURNAL_DIRECTORY
+    with tempfile.TemporaryDirectory() as directorio:
+        Settings.JOURNAL_DIRECTORY = directorio
+        try:
+            sesion = TableSession("mesa_stream")
+            tokens = list(agente.stream_turno("quiero un flan", sesion))
+            sesion.cerrar()
+        finally:
+            Settings.JOURNAL_DIRECTORY = original
+
+    assert len(tokens) > 1
+    assert "".join(tokens) == "Listo, agregué un flan de caramelo a tu pedido."
+    assert "Agregado" not in "".join(tokens)
+    assert sesion.pedido_actual == [{"item": "flan de caramelo", "precio": 8000}]
+    assert sesion.historial[-1].content == "".join(tokens)
+    assert intercambios == [("quiero un flan", "".join(tokens))]
+
+
+def main():
+    """Función principal"""
+    print("=== TEST STREAMING ===")
+    test_stream_oculta_llamadas_a_herramientas()
+    print("[OK] test_stream_oculta_llamadas_a_herramientas")
+
+
+if __name__ == "__main__":
+    main()
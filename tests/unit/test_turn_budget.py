@@ -0,0 +1,230 @@
+#!/usr/bin/env python3
+"""
+Test de Presupuestos por Turno
+Tope de llamadas al LLM, de tiempo por turno y por paso, con respuesta parcial
+"""
+
+import os
+import sys
+import time
+import asyncio
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+# Agregar la raíz del proyecto al path
+sys.path.append(str(Path(__file__).parent.parent.parent))
+
+os.environ.setdefault("ANONYMIZED_TELEMETRY", "False")
+
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
+
+from config.settings import Settings
+from src.agents.dag_executor import DAGExecutor
+from src.agents.local_chat_model import LocalChatModel, crear_embeddings_locales
+from src.agents.mozo_virtual_agent import MozoVirtualAgent
+from src.agents.session_state import TableSession
+from src.agents.turn_budget import (
+    METRICAS_PRESUPUESTO, RESPUESTA_SIN_TIEMPO, BudgetExceeded, TurnBudget, respuesta_parcial
+)
+
+# El módulo del agente activa LangSmith al importarse; el test corre sin red
+os.environ["LANGCHAIN_TRACING_V2"] = "false"
+
+
+def crear_agente(llm: LocalChatModel) -> MozoVirtualAgent:
+    agente = MozoVirtualAgent(llm=llm, embedding_model=crear_embeddings_locales())
+    agente.registrar_intercambio = lambda query, respuesta, latencia=None: None
+    return agente
+
+
+def en_sesion(funcion, *args):
+    """Ejecutar un turno con journals temporales"""
+    original = Settings.JOURNAL_DIRECTORY
+    with tempfile.TemporaryDirectory() as directorio:
+        Settings.JOURNAL_DIRECTORY = directorio
+        try:
+            sesion = TableSession("mesa_presupuesto")
+            resultado = funcion(*args, sesion)
+            sesion.cerrar()
+        finally:
+            Settings.JOURNAL_DIRECTORY = original
+    return resultado, sesion
+
+
+def test_etapas_consumen_del_turno():
+    """Las llamadas de una etapa cuentan para el turno y el tiempo es el menor de ambos"""
+    turno = TurnBudget("turno_prueba", segundos=60, max_llamadas=2)
+    etapa = turno.etapa("etapa_prueba", segundos=0.5)
+    assert etapa.restante() <= 0.5
+    assert etapa.llamar(lambda: "uno") == "uno"
+    assert turno.etapa("otra_prueba").llamar(lambda: "dos") == "dos"
+    assert turno.llamadas == 2
+
+    antes = METRICAS_PRESUPUESTO.contador("presupuesto_excedido.etapa_prueba.llamadas")
+    try:
+        etapa.llamar(lambda: "tres")
+        raise AssertionError("debía agotarse el presupuesto")
+    except BudgetExceeded as e:
+        assert e.motivo == "llamadas"
+    assert etapa.excedido == turno.excedido == "llamadas"
+    assert METRICAS_PRESUPUESTO.contador("presupuesto_excedido.etapa_prueba.llamadas") == antes + 1
+
+    mensajes = [HumanMessage(content="una paella"),
+                AIMessage(content="", tool_calls=[{"name": "agregar_al_pedido", "args": {}, "id": "a"}]),
+                ToolMessage(content="Agregado paella valenciana", tool_call_id="a")]
+    assert "Agregado paella valenciana" in respuesta_parcial(mensajes)
+    assert respuesta_parcial([HumanMessage(content="hola")]) == RESPUESTA_SIN_TIEMPO
+
+
+def test_bucle_de_herramientas_acotado():
+    """Un modelo que siempre pide herramientas se corta al tope de llamadas con lo resuelto"""
+    llm = LocalChatModel(respuestas=[
+        AIMessage(content="", tool_calls=[{"name": "ver_pedido_actual", "args": {}, "id": "ver"}])
+    ])
+    agente = crear_agente(llm)
+    respuesta, sesion = en_sesion(agente.procesar_turno, "¿qué pedí?")
+
+    assert len(llm.llamadas) == Settings.MAX_LLM_CALLS_PER_TURN
+    assert respuesta.startswith("Esto es lo que pude resolver por ahora")
+    assert sesion.historial[-1].content == respuesta
+    assert agente.config_turno(sesion)["recursion_limit"] == 2 * Settings.MAX_ITERATIONS + 1
+
+
+def test_techo_de_latencia_sync_y_async():
+    """Con un LLM lento el turno termina al vencer su plazo, en los cuatro caminos"""
+    agente = crear_agente(LocalChatModel(latencia=2.0))
+    original = Settings.AGENT_TURN_TIMEOUT
+    Settings.AGENT_TURN_TIMEOUT = 0.2
+    try:
+        inicio = time.perf_counter()
+        respuesta, _ = en_sesion(agente.procesar_turno, "hola")
+        assert time.perf_counter() - inicio < 1.5
+        assert respuesta == RESPUESTA_SIN_TIEMPO
+
+        tokens, _ = en_sesion(lambda q, s: list(agente.stream_turno(q, s)), "hola")
+        assert tokens == [RESPUESTA_SIN_TIEMPO]
+
+        inicio = time.perf_counter()
+        respuesta, _ = en_sesion(lambda q, s: asyncio.run(agente.aprocesar_turno(q, s)), "hola")
+        assert time.perf_counter() - inicio < 1.5
+        assert respuesta == RESPUESTA_SIN_TIEMPO
+
+        async def juntar(q, s):
+            return [texto async for texto in agente.astream_turno(q, s)]
+
+        tokens, _ = en_sesion(lambda q, s: asyncio.run(juntar(q, s)), "hola")
+        assert tokens == [RESPUESTA_SIN_TIEMPO]
+    finally:
+        Settings.AGENT_TURN_TIMEOUT = original
+
+
+def test_llamada_abandonada_libera_su_lugar():
+    """Al vencer el plazo el lugar en el límite de concurrencia se devuelve y se cuenta el abandono"""
+    limite = threading.BoundedSemaphore(1)
+    terminada = threading.Event()
+
+    def lenta():
+        time.sleep(0.3)
+        terminada.set()
+        return "tarde"
+
+    antes = METRICAS_PRESUPUESTO.contador("llamadas_abandonadas")
+    try:
+        TurnBudget("abandono", segundos=0.05).llamar(lenta, limite=limite)
+        raise AssertionError("El plazo vencido debe lanzar BudgetExceeded")
+    except BudgetExceeded:
+        pass
+    assert METRICAS_PRESUPUESTO.contador("llamadas_abandonadas") == antes + 1
+    # Mientras la abandonada sigue en curso, otra llamada puede tomar el lugar
+    assert not terminada.is_set()
+    assert TurnBudget("siguiente", segundos=1).llamar(lambda: "a tiempo", limite=limite) == "a tiempo"
+
+    # Al terminar, la abandonada no devuelve el lugar otra vez
+    assert terminada.wait(1)
+    time.sleep(0.05)
+    assert limite.acquire(blocking=False)
+    assert not limite.acquire(blocking=False)
+    limite.release()
+
+
+def test_timeout_del_cliente_no_pasa_del_presupuesto():
+    """El LLM recibe como timeout el tiempo que le queda al turno, no LLM_REQUEST_TIMEOUT entero"""
+    assert TurnBudget("sin_limite").plazo_cliente() == Settings.LLM_REQUEST_TIMEOUT
+    assert 0 < TurnBudget("corto", segundos=0.5).plazo_cliente() <= 0.5
+    assert TurnBudget("vencido", segundos=0).plazo_cliente() > 0
+
+    llm = LocalChatModel(respuestas=["Listo"])
+    agente = crear_agente(llm)
+    en_sesion(agente.procesar_turno, "hola")
+    en_sesion(lambda q, s: asyncio.run(agente.aprocesar_turno(q, s)), "hola")
+    assert len(llm.timeouts_usados) == 2
+    assert all(0 < t <= min(Settings.AGENT_TURN_TIMEOUT, Settings.LLM_REQUEST_TIMEOUT)
+               for t in llm.timeouts_usados)
+
+
+def test_respuesta_parcial_no_repite_lo_emitido():
+    """Si la respuesta parcial es un texto que ya salió por el stream, no se emite de nuevo"""
+    texto = "Dejame revisar tu pedido."
+    agente = crear_agente(LocalChatModel(respuestas=[
+        AIMessage(content=texto, tool_calls=[{"name": "ver_pedido_actual", "args": {}, "id": "ver"}])
+    ]))
+    original = Settings.MAX_LLM_CALLS_PER_TURN
+    Settings.MAX_LLM_CALLS_PER_TURN = 2
+    try:
+        tokens, _ = en_sesion(lambda q, s: list(agente.stream_turno(q, s)), "¿qué pedí?")
+        assert "".join(tokens) == texto * 2
+
+        async def juntar(q, s):
+            return [t async for t in agente.astream_turno(q, s)]
+
+        tokens, _ = en_sesion(lambda q, s: asyncio.run(juntar(q, s)), "¿qué pedí?")
+        assert "".join(tokens) == texto * 2
+    finally:
+        Settings.MAX_LLM_CALLS_PER_TURN = original
+
+    assert MozoVirtualAgent.resto_sin_emitir("Hola, ¿qué tal?", "Hola,") == " ¿qué tal?"
+    assert MozoVirtualAgent.resto_sin_emitir(RESPUESTA_SIN_TIEMPO, "") == RESPUESTA_SIN_TIEMPO
+
+
+def test_paso_del_dag_con_limite_usa_su_respaldo():
+    """Un paso vencido no demora el DAG: sus dependientes corren con el respaldo"""
+    vencidos = []
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        dag = DAGExecutor(pool)
+        dag.agregar("lento", lambda datos: time.sleep(1.0) or "completo",
+                    limite=0.1, respaldo=lambda datos: "parcial")
+        dag.agregar("rapido", lambda datos: "ok")
+        dag.agregar("union", lambda datos: f"{datos['lento']}+{datos['rapido']}", dependencias=["lento", "rapido"])
+
+        inicio = time.perf_counter()
+        resultados = dag.ejecutar(al_vencer=lambda nombre, limite: vencidos.append(nombre))
+        assert time.perf_counter() - inicio < 0.8
+        assert resultados["union"] == "parcial+ok"
+        assert vencidos == ["lento"]
+
+        sin_respaldo = DAGExecutor(pool).agregar("lento", lambda datos: time.sleep(0.5), limite=0.05)
+        try:
+            sin_respaldo.ejecutar()
+            raise AssertionError("debía vencer el paso")
+        except TimeoutError:
+            pass
+
+
+def main():
+    """Función principal"""
+    print("=== TEST TURN BUDGET ===")
+    for test in [test_etapas_consumen_del_turno,
+                 test_bucle_de_herramientas_acotado,
+                 test_techo_de_latencia_sync_y_async,
+                 test_llamada_abandonada_libera_su_lugar,
+                 test_timeout_del_cliente_no_pasa_del_presupuesto,
+                 test_respuesta_parcial_no_repite_lo_emitido,
+                 test_paso_del_dag_con_limite_usa_su_respaldo]:
+        test()
+        print(f"[OK] {test.__name__}")
+
+
+if __name__ == "__main__":
+    main()
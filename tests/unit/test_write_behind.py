@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+"""
+Test de la Cola Write-Behind de Persistencia
+"""
+
+import os
+import sys
+import time
+import tempfile
+import threading
+from pathlib import Path
+
+# Agregar la raíz del proyecto al path
+sys.path.append(str(Path(__file__).parent.parent.parent))
+
+os.environ.setdefault("ANONYMIZED_TELEMETRY", "False")
+
+from config.settings import Settings
+from src.persistence.write_behind import WriteBehindQueue
+from src.persistence.conversation_log import ConversationLogWriter, leer_log
+from src.persistence.outbox import DurableOutbox
+from src.integrations.notion_outbox import NotionOutboxClient
+from src.agents.local_chat_model import LocalChatModel, crear_embeddings_locales
+from src.agents.mozo_virtual_agent import MozoVirtualAgent
+from src.agents.session_state import TableSession, usar_sesion
+
+# El módulo del agente activa LangSmith al importarse; el test corre sin red
+os.environ["LANGCHAIN_TRACING_V2"] = "false"
+
+
+def test_encolar_no_espera_al_sink_y_cerrar_vacia():
+    """El productor no espera la escritura; al cerrar se escribe todo en orden"""
+    escritos = []
+    cola = WriteBehindQueue(lambda r: (time.sleep(0.02), escritos.append(r)), capacidad=50)
+
+    inicio = time.perf_counter()
+    for i in range(10):
+        assert cola.encolar(i)
+    assert time.perf_counter() - inicio < 0.05
+
+    cola.cerrar()
+    assert escritos == list(range(10))
+    assert cola.estadisticas()["escritos"] == 10
+    assert cola.estadisticas()["profundidad"] == 0
+    assert not cola.encolar(99)
+
+
+def test_cola_llena_descarta_o_bloquea():
+    """Con la cola llena se cuentan descartes y bloqueos según la política"""
+    liberar = threading.Event()
+    cola = WriteBehindQueue(lambda r: liberar.wait(), capacidad=2, politica="descartar")
+    resultados = [cola.encolar(i) for i in range(6)]
+    # Uno en proceso en el sink, dos en la cola, el resto descartado
+    assert resultados.count(False) >= 3
+    assert cola.estadisticas()["descartados"] == resultados.count(False)
+    liberar.set()
+    cola.cerrar()
+
+    liberar.clear()
+    cola = WriteBehindQueue(lambda r: liberar.wait(), capacidad=1, politica="bloquear", timeout_bloqueo=0.05)
+    resultados = [cola.encolar(i) for i in range(4)]
+    estadisticas = cola.estadisticas()
+    assert estadisticas["bloqueos"] >= 1
+    assert estadisticas["descartados"] == resultados.count(False)
+    liberar.set()
+    cola.cerrar()
+
+
+def test_turno_no_espera_a_notion():
+    """Un guardado lento en Notion no demora la respuesta al cliente"""
+    agente = MozoVirtualAgent(llm=LocalChatModel(), embedding_model=crear_embeddings_locales())
+    guardados = []
+    agente.guardar_conversacion = lambda cliente, robino, **metadatos: (time.sleep(0.3), guardados.append(cliente))
+
+    original = Settings.JOURNAL_DIRECTORY
+    with tempfile.TemporaryDirectory() as directorio:
+        Settings.JOURNAL_DIRECTORY = directorio
+        try:
+            sesion = TableSession("mesa_write_behind")
+            inicio = time.perf_counter()
+            agente.procesar_turno("hola", sesion)
+            agente.procesar_turno("la carta", sesion)
+            duracion = time.perf_counter() - inicio
+            sesion.cerrar()
+        finally:
+            Settings.JOURNAL_DIRECTORY = original
+
+    assert duracion < 0.3
+    agente.cerrar()
+    assert guardados == ["hola", "la carta"]
+
+
+class ClienteNotionFalso:
+    """Registra los appends a Notion"""
+
+    def __init__(self):
+        self.requests = []
+        self.blocks = self
+        self.children = self
+
+    def append(self, block_id, children):
+        self.requests.append(children)
+
+
+def test_intercambio_se_persiste_una_vez_por_turno():
+    """Un mismo (sesión, turno) se escribe una sola vez en Notion y en el log local"""
+    agente = MozoVirtualAgent(llm=LocalChatModel(), embedding_model=crear_embeddings_locales())
+    assert "guardar_conversacion" not in [herramienta.name for herramienta in agente.tools]
+
+    with tempfile.TemporaryDirectory() as directorio:
+        notion = ClienteNotionFalso()
+        agente.notion_client = NotionOutboxClient(notion, DurableOutbox(str(Path(directorio) / "outbox.db")))
+        agente.log_conversaciones = ConversationLogWriter(ruta=str(Path(directorio) / "conversaciones.log"))
+
+        sesion = TableSession("mesa_idempotente")
+        sesion.turnos = 1
+        registro = {"tipo": "intercambio", "mensaje_cliente": "hola", "respuesta_robino": "¡Bienvenido!",
+                    "session_id": sesion.session_id, "turno": 1, "id_turno": sesion.id_turno(),
+                    "timestamp": "2025-10-20 21:00:00", "latencia": 0.5}
+        agente.persistir_registro(registro)
+        agente.persistir_registro(dict(registro))
+        agente.log_conversaciones.flush()
+        registros = leer_log(str(Path(directorio) / "conversaciones.log"))
+        assert [(r["rol"], r["turno"]) for r in registros] == [("cliente", 1), ("robino", 1)]
+
+        # Aunque otro proceso (sin memoria de claves) lo repita, el outbox no lo reenvía a Notion
+        agente.intercambios_persistidos.clear()
+        agente.persistir_registro(dict(registro))
+        agente.cerrar()
+        sesion.order_journal.cerrar()
+        assert len(notion.requests) == 1
+
+
+def test_inicio_conserva_la_sesion_que_lo_encolo():
+    """El hilo escritor registra el inicio con la sesión de quien lo encoló, no la por defecto"""
+    agente = MozoVirtualAgent(llm=LocalChatModel(), embedding_model=crear_embeddings_locales())
+    with tempfile.TemporaryDirectory() as directorio:
+        agente.notion_client = ClienteNotionFalso()
+        agente.log_conversaciones = ConversationLogWriter(ruta=str(Path(directorio) / "conversaciones.log"))
+        Settings.JOURNAL_DIRECTORY, original = directorio, Settings.JOURNAL_DIRECTORY
+        try:
+            mesa, terraza = TableSession("mesa_inicio"), TableSession("terraza_inicio")
+        finally:
+            Settings.JOURNAL_DIRECTORY = original
+
+        with usar_sesion(mesa):
+            agente.registrar_inicio_conversacion("Ana")
+        agente.registrar_inicio_conversacion("Luis", terraza.session_id)
+        agente.escritor_conversaciones.vaciar(5)
+        agente.log_conversaciones.flush()
+
+        registros = leer_log(str(Path(directorio) / "conversaciones.log"))
+        assert [(r["session_id"], r["texto"]) for r in registros] == [
+            ("mesa_inicio", "Cliente Ana inició conversación"),
+            ("terraza_inicio", "Cliente Luis inició conversación"),
+        ]
+        agente.cerrar()
+
+
+def main():
+    """Función principal"""
+    print("=== TEST WRITE-BEHIND ===")
+    for test in [test_encolar_no_espera_al_sink_y_cerrar_vacia,
+                 test_cola_llena_descarta_o_bloquea,
+                 test_turno_no_espera_a_notion,
+                 test_intercambio_se_persiste_una_vez_por_turno,
+                 test_inicio_conserva_la_sesion_que_lo_encolo]:
+        test()
+        print(f"[OK] {test.__name__}")
+
+
+if __name__ == "__main__":
+    main()